@@ -0,0 +1,199 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+"""
+micro-benchmark of the per-query cost of the lookups made by database_conn, comparing the former str.format queries,
+whose SQL text changes with every value and therefore is compiled at every call, with the ?-parameterized statements,
+which are compiled once and then served from the statement cache of sqlite3
+
+Usage: python benchmarks/bench_database_conn.py [--db path/to/populated.db] [--repeat N]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+
+NUM_USERS = 2000
+NUM_COMMITS = 20000
+FILES_PER_COMMIT = 3
+
+
+def populate(path_to_db):
+    """
+    creates a database with the tables used by the benchmark and fills them with synthetic data
+
+    Parameters
+    ----------
+    path_to_db: str
+
+    Returns
+    -------
+    None
+    """
+    conn = sqlite3.connect(path_to_db)
+    conn.execute('CREATE TABLE user(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, email string, login string);')
+    conn.execute('CREATE TABLE repocommit(ID INTEGER PRIMARY KEY AUTOINCREMENT, date text, sha text, comment text, '
+                 'user_id integer, repository_id integer, UNIQUE (sha) ON CONFLICT IGNORE);')
+    conn.execute('CREATE TABLE filemodification(ID INTEGER PRIMARY KEY AUTOINCREMENT, filename text, '
+                 'additions integer, deletions integer, changes integer, status text, commit_id integer, '
+                 'UNIQUE (filename, commit_id) ON CONFLICT IGNORE);')
+    rnd = random.Random(42)
+    users = [('user {}'.format(i), 'user{}@ibm.com'.format(i), 'user{}'.format(i)) for i in range(NUM_USERS)]
+    conn.executemany('insert into user(name, email, login) values (?, ?, ?);', users)
+    start = datetime(2018, 1, 1)
+    commits = list()
+    for i in range(NUM_COMMITS):
+        dt = start + timedelta(minutes=30 * i)
+        commits.append((dt.isoformat(), '{:040x}'.format(i), 'commit {}'.format(i), rnd.randint(1, NUM_USERS),
+                        1 + i % 10))
+    conn.executemany('insert into repocommit(date, sha, comment, user_id, repository_id) values (?, ?, ?, ?, ?);',
+                     commits)
+    fms = list()
+    for commit_id in range(1, NUM_COMMITS + 1):
+        for j in range(FILES_PER_COMMIT):
+            additions, deletions = rnd.randint(0, 100), rnd.randint(0, 100)
+            fms.append(('src/file{}.py'.format(rnd.randint(0, 500)), additions, deletions, additions + deletions,
+                        'modified', commit_id))
+    conn.executemany('insert into filemodification(filename, additions, deletions, changes, status, commit_id) '
+                     'values (?, ?, ?, ?, ?, ?);', fms)
+    conn.commit()
+    conn.close()
+
+
+def get_samples(conn, size):
+    """
+
+    Parameters
+    ----------
+    conn: sqlite3.Connection
+    size: int
+
+    Returns
+    -------
+    dict
+        values used as arguments of the queries
+    """
+    rnd = random.Random(7)
+    users = conn.execute('select ID, name, email from user;').fetchall()
+    commits = conn.execute('select ID, sha from repocommit;').fetchall()
+    fms = conn.execute('select commit_id, filename from filemodification;').fetchall()
+    return {'users': [rnd.choice(users) for _ in range(size)],
+            'commits': [rnd.choice(commits) for _ in range(size)],
+            'fms': [rnd.choice(fms) for _ in range(size)]}
+
+
+def formatted_queries(conn, samples):
+    """
+    the queries as they were written before they were parameterized
+
+    Returns
+    -------
+    dict
+        name of the query -> function that runs it once for every sample
+    """
+    def get_user_by_id():
+        for user_id, _, _ in samples['users']:
+            conn.execute('select name, email, ID, login from user where ID=={};'.format(user_id)).fetchone()
+
+    def get_user_by_name_and_email():
+        for _, name, email in samples['users']:
+            conn.execute('select ID from user where name="{}" and email="{}";'.format(name, email)).fetchone()
+
+    def get_commit_by_sha():
+        for _, sha in samples['commits']:
+            conn.execute('select date, sha, user_id, id, comment from {} where sha == "{}"'
+                         .format('repocommit', sha)).fetchone()
+
+    def get_file_modification():
+        for commit_id, filename in samples['fms']:
+            conn.execute('select filename, changes, additions, deletions, status from {} where commit_id == {} and '
+                         'filename == "{}";'.format('filemodification', commit_id, filename)).fetchone()
+
+    return {'get_user(user_id)': get_user_by_id, 'insert_user lookup': get_user_by_name_and_email,
+            'commit by sha': get_commit_by_sha, 'get_file_modification': get_file_modification}
+
+
+def parameterized_queries(conn, samples):
+    """
+    the same queries as formatted_queries, written as they are now
+
+    Returns
+    -------
+    dict
+        name of the query -> function that runs it once for every sample
+    """
+    def get_user_by_id():
+        for user_id, _, _ in samples['users']:
+            conn.execute('select name, email, ID, login from user where ID == ?;', (user_id,)).fetchone()
+
+    def get_user_by_name_and_email():
+        for _, name, email in samples['users']:
+            conn.execute('select ID from user where name == ? and email == ?;', (name, email)).fetchone()
+
+    def get_commit_by_sha():
+        for _, sha in samples['commits']:
+            conn.execute('select date, sha, user_id, id, comment from repocommit where sha == ?;', (sha,)).fetchone()
+
+    def get_file_modification():
+        for commit_id, filename in samples['fms']:
+            conn.execute('select filename, changes, additions, deletions, status from filemodification '
+                         'where commit_id == ? and filename == ?;', (commit_id, filename)).fetchone()
+
+    return {'get_user(user_id)': get_user_by_id, 'insert_user lookup': get_user_by_name_and_email,
+            'commit by sha': get_commit_by_sha, 'get_file_modification': get_file_modification}
+
+
+def run(path_to_db, num_samples, repeat):
+    """
+
+    Parameters
+    ----------
+    path_to_db: str
+    num_samples: int
+        number of queries per measurement
+    repeat: int
+        number of measurements; the best one is reported
+
+    Returns
+    -------
+    None
+    """
+    conn = sqlite3.connect(path_to_db)
+    samples = get_samples(conn, num_samples)
+    before = formatted_queries(conn, samples)
+    after = parameterized_queries(conn, samples)
+    print('{:<24} {:>14} {:>14} {:>8}'.format('query', 'format (us)', '? (us)', 'speedup'))
+    for name in before.keys():
+        t_before = min(timeit.repeat(before[name], number=1, repeat=repeat)) / num_samples * 1e6
+        t_after = min(timeit.repeat(after[name], number=1, repeat=repeat)) / num_samples * 1e6
+        print('{:<24} {:>14.2f} {:>14.2f} {:>7.2f}x'.format(name, t_before, t_after, t_before / t_after))
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='per-query cost of str.format vs parameterized SQL')
+    parser.add_argument('--db', help='populated database (it is copied, not modified); if omitted, a synthetic one '
+                                     'is generated')
+    parser.add_argument('--samples', type=int, default=5000, help='number of queries per measurement')
+    parser.add_argument('--repeat', type=int, default=5, help='number of measurements')
+    args = parser.parse_args()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path_to_db = os.path.join(temp_dir, 'bench.db')
+        if args.db is not None:
+            shutil.copy(args.db, path_to_db)
+        else:
+            populate(path_to_db)
+        run(path_to_db, num_samples=args.samples, repeat=args.repeat)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+"""
+benchmark of the line counts of GHEExtractor._diff_files, comparing the former difflib.Differ implementation, which
+builds the whole diff to count its '+' and '-' lines, with LineDiff, which counts them from the matching blocks of the
+ids of the lines. Pairs of multi-MB files are generated with scattered edits, and the counts of both implementations
+are printed next to their times. They are usually the same, but repeated lines may be aligned differently by each
+implementation, so either one may count fewer changes, always with the same additions - deletions. LineDiff counts
+fewer more often, since it matches lines that are repeated too often for Differ's SequenceMatcher; it counts more
+when its anchors or its trimming of the common prefix and suffix give up a longer match of repeated lines
+
+Usage: python benchmarks/bench_line_diff.py [--lines N] [--edits N] [--repeat N]
+"""
+import argparse
+import difflib
+import os
+import random
+import shutil
+import tempfile
+import timeit
+from microservices_miner.mining.line_diff import LineDiff
+
+
+def differ_count(older_filename, newer_filename):
+    """
+    _diff_files as it was written before LineDiff
+
+    Returns
+    -------
+    (int, int)
+    """
+    additions = deletions = 0
+    with open(older_filename) as text1:
+        with open(newer_filename) as text2:
+            d = difflib.Differ()
+            diff = list(d.compare(text1.readlines(), text2.readlines()))
+            for d in diff:
+                if d.startswith('+'):
+                    additions += 1
+                elif d.startswith('-'):
+                    deletions += 1
+    return additions, deletions
+
+
+def make_source(rnd, num_lines):
+    """
+    lines that look like source code, with blank lines and repeated braces
+
+    Returns
+    -------
+    list of str
+    """
+    lines = list()
+    for i in range(num_lines):
+        kind = rnd.random()
+        if kind < 0.1:
+            lines.append('\n')
+        elif kind < 0.2:
+            lines.append('    }\n')
+        else:
+            lines.append('    value_{} = compute(value_{}, {});\n'.format(i, rnd.randint(0, i + 1), rnd.random()))
+    return lines
+
+
+def make_generated(rnd, num_lines):
+    """
+    lines of a generated file (e.g. a lock file), whose entries have a unique line and lines that repeat many times
+
+    Returns
+    -------
+    list of str
+    """
+    lines = list()
+    for i in range(num_lines // 4):
+        lines.append('  "pkg-{}": {{\n'.format(i))
+        lines.append('    "version": "1.0.{}",\n'.format(rnd.randint(0, 20)))
+        lines.append('    "dev": true,\n' if rnd.random() < 0.5 else '    "optional": true,\n')
+        lines.append('  },\n')
+    return lines
+
+
+def edit(rnd, lines, num_edits):
+    """
+    changes, replaces, inserts and deletes blocks of up to 20 lines at random positions; changed lines are similar to
+    the original ones, which is what makes Differ compare their characters
+
+    Returns
+    -------
+    list of str
+    """
+    lines = list(lines)
+    for _ in range(num_edits):
+        pos = rnd.randint(0, len(lines) - 1)
+        size = rnd.randint(1, 20)
+        new_lines = ['    edited_{} = {};\n'.format(pos, rnd.random()) for _ in range(size)]
+        kind = rnd.randint(0, 3)
+        if kind == 0:
+            lines[pos:pos + size] = [line.replace('1', '2') for line in lines[pos:pos + size]]
+        elif kind == 1:
+            lines[pos:pos + size] = new_lines
+        elif kind == 2:
+            lines[pos:pos] = new_lines
+        else:
+            del lines[pos:pos + size]
+    return lines
+
+
+def write(path, lines):
+    with open(path, 'w') as f:
+        f.writelines(lines)
+    return os.path.getsize(path)
+
+
+def run(temp_dir, num_lines, num_edits, repeat):
+    """
+
+    Parameters
+    ----------
+    temp_dir: str
+    num_lines: int
+        number of lines of the older version of each file
+    num_edits: int
+        number of edited blocks of the newer version
+    repeat: int
+        number of measurements; the best one is reported
+
+    Returns
+    -------
+    None
+    """
+    rnd = random.Random(42)
+    cases = {'source': make_source(rnd, num_lines), 'generated': make_generated(rnd, num_lines)}
+    print('{:<10} {:>8} {:>12} {:>12} {:>14} {:>14} {:>8}'.format('file', 'MB', 'Differ (s)', 'LineDiff (s)',
+                                                                  'Differ +/-', 'LineDiff +/-', 'speedup'))
+    for name, lines in cases.items():
+        older = os.path.join(temp_dir, name + '.old')
+        newer = os.path.join(temp_dir, name + '.new')
+        size = write(older, lines)
+        write(newer, edit(rnd, lines, num_edits))
+        before = differ_count(older, newer)
+        after = LineDiff.count_changes(older, newer)
+        t_before = min(timeit.repeat(lambda: differ_count(older, newer), number=1, repeat=repeat))
+        t_after = min(timeit.repeat(lambda: LineDiff.count_changes(older, newer), number=1, repeat=repeat))
+        print('{:<10} {:>8.1f} {:>12.3f} {:>12.3f} {:>14} {:>14} {:>7.1f}x'.format(
+            name, size / 1e6, t_before, t_after, '{}/{}'.format(*before), '{}/{}'.format(*after),
+            t_before / t_after))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='difflib.Differ vs LineDiff on multi-MB files')
+    parser.add_argument('--lines', type=int, default=100000, help='number of lines of each file')
+    parser.add_argument('--edits', type=int, default=200, help='number of edited blocks')
+    parser.add_argument('--repeat', type=int, default=3, help='number of measurements')
+    args = parser.parse_args()
+    temp_dir = tempfile.mkdtemp()
+    try:
+        run(temp_dir, num_lines=args.lines, num_edits=args.edits, repeat=args.repeat)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
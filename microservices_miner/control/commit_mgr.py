@@ -4,7 +4,7 @@
 #
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
 from microservices_miner.control.database_conn import RepositoryCommitConn, RepositoryConn, UserConn, FileModificationConn, \
-    ParentCommitConn, ParentCommitRepoCommitConn
+    ParentCommitConn, ParentCommitRepoCommitConn, LocTimelineConn
 from microservices_miner.model.repository import Repository
 from microservices_miner.model.git_commit import Commit
 from datetime import datetime
@@ -54,6 +54,63 @@ class CommitMgr:
             parent_commit_id = parent_commit_conn.insert_repository_commit(sha=parent_sha, position=positions)
             parent_commit_repo_commit_conn.insert_parent_commit_repository_commit(repo_commit_id=commit.commit_id,
                                                                                   parent_commit_id=parent_commit_id)
+        LocTimelineConn(path_to_db=self.path_to_db).append_commits(repository_id=repository.repository_id)
+
+    def insert_commits(self, repository, commits):
+        """
+        inserts a batch of commits along with their file modifications and parent commits in a single transaction.
+        Rows that are already in the database are ignored, so a batch can be safely inserted again
+
+        Parameters
+        ----------
+        repository: Repository
+        commits: list of tuple
+            (Commit, parent_commit_shas) pairs, where parent_commit_shas is a list of (position, SHA) tuples as in
+            insert_commit
+
+        Returns
+        -------
+        None
+        """
+        if len(commits) == 0:
+            return
+        user_conn = UserConn(path_to_db=self.path_to_db)
+        file_modification_conn = FileModificationConn(path_to_db=self.path_to_db)
+        parent_commit_conn = ParentCommitConn(path_to_db=self.path_to_db)
+        parent_commit_repo_commit_conn = ParentCommitRepoCommitConn(path_to_db=self.path_to_db)
+
+        user_ids = list()
+        for commit, parent_commit_shas in commits:
+            user_id = commit.user.user_id
+            if user_id is None:
+                user = user_conn.get_user(name=commit.user.name, email=commit.user.email)
+                assert user is not None, "Error! Unable to find the User"
+                user_id = user.user_id
+            user_ids.append(user_id)
+            positions = [position for position, _ in parent_commit_shas]
+            assert len(positions) == len(set(positions)), "Error! Repeated positions: {}".format(parent_commit_shas)
+
+        # all Conn objects share the connection of this thread, so everything below is a single transaction
+        with self.repo_commit_conn.conn:
+            commit_ids = self.repo_commit_conn.insert_repository_commits(
+                commits=[commit for commit, _ in commits], repository_id=repository.repository_id, user_ids=user_ids,
+                commit=False)
+            rows = list()
+            sha_positions = list()
+            for commit, parent_commit_shas in commits:
+                commit.commit_id = commit_ids[commit.sha]
+                rows.extend([(commit.commit_id, fm) for fm in commit.file_modifications])
+                sha_positions.extend([(parent_sha, position) for position, parent_sha in parent_commit_shas])
+            file_modification_conn.insert_file_modifications(rows=rows, commit=False)
+            parent_commit_ids = parent_commit_conn.insert_parent_commits(sha_positions=sha_positions, commit=False)
+            pairs = list()
+            for commit, parent_commit_shas in commits:
+                for position, parent_sha in parent_commit_shas:
+                    pairs.append((parent_commit_ids[(parent_sha, position)], commit.commit_id))
+            parent_commit_repo_commit_conn.insert_parent_commit_repository_commits(pairs=pairs, commit=False)
+            # the LOC timelines of the repository are extended in the same transaction
+            LocTimelineConn(path_to_db=self.path_to_db).append_commits(repository_id=repository.repository_id,
+                                                                       commit=False)
 
     def find_inconsistent_commits(self, repository_id, extensions):
         """
@@ -95,7 +152,22 @@ class CommitMgr:
             commit = sorted_commits[pos]
             return commit
 
-    def get_base_commits(self, repo: Repository, start_date, end_date):
+    def get_last_commit_date(self, repository_id):
+        """
+        unlike get_commit_by_position, it does not load the commits of the repository
+
+        Parameters
+        ----------
+        repository_id: int
+
+        Returns
+        -------
+        datetime
+            date of the newest commit of the repository or None if it has no commits
+        """
+        return self.repo_commit_conn.get_last_commit_date(repository_id=repository_id)
+
+    def get_base_commits(self, repo: Repository, start_date, end_date, filename_filter=None):
         """
         gets a list of Commit objects that represent the base commits, that is, commits that are the base for merge operations
         Parameters
@@ -105,33 +177,22 @@ class CommitMgr:
             ISO format
         end_date: str
             ISO format
+        filename_filter: FilenameFilter
+            if given, only the file modifications that pass it are loaded
 
         Returns
         -------
         List
         """
-        commits = self.get_commits_by_repo(repository_id=repo.repository_id, start_date=start_date, end_date=end_date)
-        commit_list = list()
-        if commits is not None and len(commits) > 0:
-            commit = commits[-1]
-
-            if start_date is not None:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            else:
-                start_dt = datetime(year=1000, month=1, day=1)
-
-            if end_date is not None:
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            else:
-                end_dt = datetime(year=9999, month=12, day=1)
-            commit_conn = RepositoryCommitConn(self.path_to_db)
-            while commit is not None and start_dt <= commit.date < end_dt:
-                new_commit = commit_conn.get_commit_and_its_filemodifications_by_sha(sha=commit.sha)
-                commit_list.append(new_commit)
-
-                parent_sha = self.get_parent_commit_sha(commit=commit)
-                commit = self.get_commit(sha=parent_sha)
-
+        # validate the format of the dates
+        if start_date is not None:
+            datetime.strptime(start_date, '%Y-%m-%d')
+        if end_date is not None:
+            datetime.strptime(end_date, '%Y-%m-%d')
+        # the chain of first parents is followed by the database rather than one commit at a time
+        commit_list = self.repo_commit_conn.get_first_parent_chain(repository_id=repo.repository_id,
+                                                                   start_date=start_date, end_date=end_date,
+                                                                   filename_filter=filename_filter)
         return commit_list
 
     def get_loc_per_commit(self, commit):
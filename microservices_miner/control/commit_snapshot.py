@@ -0,0 +1,280 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.control.database_conn import ServiceConn, ServiceRepositoryConn, RepositoryCommitConn
+from microservices_miner.control.filesystem_mgr import FileSystemMgr, FilenameFilter
+from microservices_miner.control.service_mgr import ServiceMgr
+from microservices_miner.control.commit_stats import CommitStats
+import numpy as np
+import logging
+import os
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class CommitSnapshot:
+    """
+    columnar copy of the commits of every service, saved as a compressed NPZ file. It has one row per base commit of
+    each repository of each service, i.e., the commits that ServiceMgr.get_service loads, with the sum of additions,
+    deletions and changes of the file modifications that pass the extension and filename pattern rules of the service.
+
+    refresh() only recomputes the (service, repository) pairs whose commits, file modifications, dates or rules changed
+    since the snapshot was saved, so it is cheap to run after every mining run. Analytics read the arrays, e.g.
+    through get_commit_stats, instead of building Service, Repository, Commit and FileModification objects
+    """
+
+    COMMIT_COLUMNS = ('service_id', 'repository_id', 'sha', 'date', 'additions', 'deletions', 'changes', 'is_bugfix',
+                      'closes_issue')
+    PAIR_COLUMNS = ('pair_service_id', 'pair_repository_id', 'pair_start_date', 'pair_initial_loc',
+                    'pair_fingerprint')
+    # initial_loc of the pairs without one
+    NO_INITIAL_LOC = -1
+
+    def __init__(self, db_path, path):
+        """
+
+        Parameters
+        ----------
+        db_path: str or ConnectionPool
+        path: str
+            path to the NPZ file
+        """
+        self.db_path = db_path
+        self.path = path
+        self._data = None
+
+    @staticmethod
+    def is_bug_fix(comment):
+        """
+
+        Parameters
+        ----------
+        comment: str
+
+        Returns
+        -------
+        bool
+        """
+        words = comment.split()
+        if any(w in words for w in ['fix', 'bug', 'error', 'erro', 'falha', 'fail', 'bug-fix', 'correction']):
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def closes_issue(comment):
+        """
+        checks whether the comment closes an issue using keywords, e.g., "fixes 12"
+
+        Parameters
+        ----------
+        comment: str
+
+        Returns
+        -------
+        bool
+        """
+        keywords = ['closes', 'closed', 'close', 'fixes', 'fixed', 'fix', 'resolves', 'resolved', 'resolve']
+        fields = comment.lower().split(' ')
+        for i in range(len(fields) - 1):
+            if fields[i] in keywords:
+                try:
+                    int(fields[i + 1])
+                    return True
+                except ValueError:
+                    continue
+        return False
+
+    @staticmethod
+    def _empty():
+        """
+
+        Returns
+        -------
+        dict
+            arrays of a snapshot without rows
+        """
+        return {'service_id': np.zeros(0, dtype=np.int64), 'repository_id': np.zeros(0, dtype=np.int64),
+                'sha': np.zeros(0, dtype='<U40'), 'date': np.zeros(0, dtype='datetime64[us]'),
+                'additions': np.zeros(0, dtype=np.int64), 'deletions': np.zeros(0, dtype=np.int64),
+                'changes': np.zeros(0, dtype=np.int64), 'is_bugfix': np.zeros(0, dtype=bool),
+                'closes_issue': np.zeros(0, dtype=bool),
+                'pair_service_id': np.zeros(0, dtype=np.int64), 'pair_repository_id': np.zeros(0, dtype=np.int64),
+                'pair_start_date': np.zeros(0, dtype='<U10'), 'pair_initial_loc': np.zeros(0, dtype=np.int64),
+                'pair_fingerprint': np.zeros(0, dtype='<U1')}
+
+    def load(self):
+        """
+
+        Returns
+        -------
+        dict
+            column name -> np.ndarray; if the file does not exist, the arrays are empty
+        """
+        if self._data is None:
+            if os.path.isfile(self.path):
+                with np.load(self.path, allow_pickle=False) as npz:
+                    self._data = {k: npz[k] for k in npz.files}
+            else:
+                self._data = CommitSnapshot._empty()
+        return self._data
+
+    def _save(self, data):
+        """
+        writes the snapshot to a temporary file, which then replaces the previous one, so that readers never see a
+        partially written file
+
+        Parameters
+        ----------
+        data: dict
+
+        Returns
+        -------
+        None
+        """
+        temp_path = '{}.tmp'.format(self.path)
+        with open(temp_path, 'wb') as f:
+            np.savez_compressed(f, **data)
+        os.replace(temp_path, self.path)
+        self._data = data
+
+    def _list_pairs(self):
+        """
+
+        Returns
+        -------
+        list of dict
+            rows of the servicerepository table, grouped by service in the order ServiceMgr.get_service adds them
+        """
+        service_conn = ServiceConn(path_to_db=self.db_path)
+        service_repo_conn = ServiceRepositoryConn(path_to_db=self.db_path)
+        pairs = list()
+        for service_name in sorted(service_conn.list_all_service_names()):
+            pairs.extend(service_repo_conn.get_service_repository(service_name=service_name))
+        return pairs
+
+    def _compute_pair(self, service_id, repository_id, rules, start_date, end_date):
+        """
+        aggregates the base commits of a repository of a service
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        rules: tuple
+            returned by FileSystemMgr.get_rules
+        start_date: date
+        end_date: date
+
+        Returns
+        -------
+        dict
+            column name -> list
+        """
+        commit_conn = RepositoryCommitConn(path_to_db=self.db_path)
+        commits = commit_conn.get_first_parent_chain(repository_id=repository_id, start_date=start_date.isoformat(),
+                                                     end_date=end_date.isoformat(),
+                                                     filename_filter=FilenameFilter(*rules))
+        # same order as Repository.commits
+        commits = sorted(commits, key=lambda k: k.date)
+        columns = {name: list() for name in CommitSnapshot.COMMIT_COLUMNS}
+        for c in commits:
+            additions = deletions = changes = 0
+            for fm in c.file_modifications:
+                additions += fm.additions
+                deletions += fm.deletions
+                changes += fm.changes
+            comment = c.comment if c.comment is not None else ''
+            columns['service_id'].append(service_id)
+            columns['repository_id'].append(repository_id)
+            columns['sha'].append(c.sha)
+            columns['date'].append(c.date)
+            columns['additions'].append(additions)
+            columns['deletions'].append(deletions)
+            columns['changes'].append(changes)
+            columns['is_bugfix'].append(CommitSnapshot.is_bug_fix(comment))
+            columns['closes_issue'].append(CommitSnapshot.closes_issue(comment))
+        return columns
+
+    def refresh(self):
+        """
+        brings the snapshot up to date with the database
+
+        Returns
+        -------
+        int
+            number of (service, repository) pairs that were recomputed
+        """
+        old = self.load()
+        old_fingerprints = dict()
+        for i in range(old['pair_service_id'].shape[0]):
+            key = (int(old['pair_service_id'][i]), int(old['pair_repository_id'][i]))
+            old_fingerprints[key] = str(old['pair_fingerprint'][i])
+        old_keys = old['service_id'] * (2 ** 32) + old['repository_id']
+
+        filesystem_mgr = FileSystemMgr(db_path=self.db_path)
+        watermarks = RepositoryCommitConn(path_to_db=self.db_path).get_commit_watermarks()
+        pair_columns = {name: list() for name in CommitSnapshot.PAIR_COLUMNS}
+        parts = list()
+        num_recomputed = 0
+        for sr in self._list_pairs():
+            service_id = sr.get('service_id')
+            repository_id = sr.get('repository_id')
+            start_date, end_date = ServiceMgr.get_date_range(start_date=sr.get('start_date'),
+                                                             end_date=sr.get('end_date'))
+            rules = filesystem_mgr.get_rules(service_id=service_id, repository_id=repository_id)
+            fingerprint = repr((watermarks.get(repository_id), start_date.isoformat(), end_date.isoformat(),
+                                sorted(rules[0]), rules[1], rules[2]))
+            if old_fingerprints.get((service_id, repository_id)) == fingerprint:
+                rows = old_keys == service_id * (2 ** 32) + repository_id
+                parts.append({name: old[name][rows] for name in CommitSnapshot.COMMIT_COLUMNS})
+            else:
+                parts.append(self._compute_pair(service_id=service_id, repository_id=repository_id, rules=rules,
+                                                start_date=start_date, end_date=end_date))
+                num_recomputed += 1
+            initial_loc = sr.get('initial_loc')
+            pair_columns['pair_service_id'].append(service_id)
+            pair_columns['pair_repository_id'].append(repository_id)
+            pair_columns['pair_start_date'].append(sr.get('start_date') or '')
+            pair_columns['pair_initial_loc'].append(initial_loc if initial_loc is not None
+                                                    else CommitSnapshot.NO_INITIAL_LOC)
+            pair_columns['pair_fingerprint'].append(fingerprint)
+
+        data = CommitSnapshot._empty()
+        for name in CommitSnapshot.COMMIT_COLUMNS:
+            arrays = [np.asarray(part[name], dtype=data[name].dtype) for part in parts]
+            data[name] = np.concatenate([data[name]] + arrays)
+        for name in CommitSnapshot.PAIR_COLUMNS:
+            if len(pair_columns[name]) > 0:
+                data[name] = np.asarray(pair_columns[name])
+        self._save(data)
+        logging.info('Commit snapshot {} refreshed: {} of {} pairs recomputed'
+                     .format(self.path, num_recomputed, len(pair_columns['pair_service_id'])))
+        return num_recomputed
+
+    def get_commit_stats(self, service_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+
+        Returns
+        -------
+        CommitStats
+            same as CommitStats.from_service of the service returned by ServiceMgr.get_service
+        """
+        data = self.load()
+        repositories = list()
+        for i in np.flatnonzero(data['pair_service_id'] == service_id):
+            repository_id = data['pair_repository_id'][i]
+            rows = (data['service_id'] == service_id) & (data['repository_id'] == repository_id)
+            values = np.column_stack([data['additions'][rows], data['deletions'][rows], data['changes'][rows]])
+            initial_loc = int(data['pair_initial_loc'][i])
+            repositories.append(CommitStats.make_repository(
+                name=str(repository_id), dates=data['date'][rows], values=values,
+                start_date=str(data['pair_start_date'][i]) or None,
+                initial_loc=initial_loc if initial_loc != CommitSnapshot.NO_INITIAL_LOC else None))
+        return CommitStats(service_name=str(service_id), repositories=repositories)
@@ -0,0 +1,278 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.model.service import Service
+from typing import List, Tuple
+from datetime import datetime
+import numpy as np
+
+ADDITIONS = 0
+DELETIONS = 1
+CHANGES = 2
+NET = 3
+
+
+class CommitStats:
+    """
+    the commits of a service as arrays, one per repository, of their dates and of the prefix sums of their additions,
+    deletions, changes and additions - deletions. The sum of any of these values over the commits of a time window is
+    the difference between two prefix sums at the positions returned by np.searchsorted, so each metric is computed for
+    all time bins at once instead of scanning every commit of every repository in every bin.
+
+    compute_loc, compute_changes and compute_changes_per_loc return the same lists as the loops DataMgr had before,
+    including their corner cases (e.g. how the start_date of a repository moves the beginning of a time bin)
+    """
+
+    def __init__(self, service_name, repositories):
+        """
+
+        Parameters
+        ----------
+        service_name: str
+        repositories: list of dict
+            built by make_repository, in the order of Service.list_repository_data()
+        """
+        self.service_name = service_name
+        self.repositories = repositories
+
+    @staticmethod
+    def from_service(service: Service):
+        """
+
+        Parameters
+        ----------
+        service: Service
+
+        Returns
+        -------
+        CommitStats
+        """
+        repositories = list()
+        for repo_data in service.list_repository_data():
+            repo = repo_data.get('repository')
+            commits = repo.commits
+            values = np.zeros((len(commits), 3), dtype=np.int64)
+            for i, c in enumerate(commits):
+                additions = deletions = changes = 0
+                for fm in c.file_modifications:
+                    additions += fm.additions
+                    deletions += fm.deletions
+                    changes += fm.changes
+                values[i] = additions, deletions, changes
+            dates = np.array([c.date for c in commits], dtype='datetime64[us]')
+            repositories.append(CommitStats.make_repository(name=repo.name, dates=dates, values=values,
+                                                            start_date=repo_data.get('start_date'),
+                                                            initial_loc=repo_data.get('initial_loc')))
+        return CommitStats(service_name=service.name, repositories=repositories)
+
+    @staticmethod
+    def make_repository(name, dates, values, start_date, initial_loc):
+        """
+
+        Parameters
+        ----------
+        name: str
+        dates: np.ndarray
+            datetime64 dates of the commits, sorted
+        values: np.ndarray
+            additions, deletions and changes of each commit
+        start_date: str
+            YYYY-MM-DD or None
+        initial_loc: int
+
+        Returns
+        -------
+        dict
+        """
+        values = np.column_stack([values, values[:, ADDITIONS] - values[:, DELETIONS]]).astype(np.int64)
+        prefix = np.zeros((values.shape[0] + 1, 4), dtype=np.int64)
+        np.cumsum(values, axis=0, out=prefix[1:])
+        inconsistent = np.flatnonzero(values[:, ADDITIONS] + values[:, DELETIONS] != values[:, CHANGES])
+        if start_date is not None:
+            start_dt = np.datetime64(datetime.strptime(start_date, '%Y-%m-%d'), 'us')
+        else:
+            start_dt = None
+        return {'name': name, 'dates': dates.astype('datetime64[us]'), 'values': values, 'prefix': prefix,
+                'inconsistent': inconsistent, 'start_dt': start_dt,
+                'initial_loc': int(initial_loc) if initial_loc is not None else None}
+
+    @staticmethod
+    def _to_bins(time_bins):
+        """
+
+        Parameters
+        ----------
+        time_bins: Tuple[datetime]
+
+        Returns
+        -------
+        np.ndarray, np.ndarray
+            beginning and end of each time bin
+        """
+        bins = np.array(time_bins, dtype='datetime64[us]')
+        return bins[:-1], bins[1:]
+
+    @staticmethod
+    def _check_modifications(repo, lo, hi):
+        """
+        checks that additions + deletions == changes for every commit within [lo, hi) of some time bin, as
+        DataMgr.compute_modifications does for every commit it counts
+
+        Parameters
+        ----------
+        repo: dict
+        lo: np.ndarray
+        hi: np.ndarray
+
+        Returns
+        -------
+        None
+        """
+        for i in repo.get('inconsistent'):
+            if np.any((lo <= i) & (i < hi)):
+                additions, deletions, changes, _ = repo.get('values')[i]
+                raise AssertionError('Error! deletions + additions != changes: {} + {} != {}'
+                                     .format(deletions, additions, changes))
+
+    def _windows(self, time_bins, inclusive_start):
+        """
+        computes, for each repository, the range of its commits that fall within each time bin. If the start_date of a
+        repository falls within a time bin, the beginning of the bin is moved to this date for this repository and for
+        the next ones of the service
+
+        Parameters
+        ----------
+        time_bins: Tuple[datetime]
+        inclusive_start: bool
+            whether a start_date equal to the beginning of the bin moves it
+
+        Returns
+        -------
+        list of tuple
+            (repository, lo, hi, moved), where lo and hi are the indexes of the first commit of each bin and of the
+            first commit after it, and moved tells the bins whose beginning was moved by the start_date
+        """
+        prev, cur = CommitStats._to_bins(time_bins)
+        windows = list()
+        for repo in self.repositories:
+            start_dt = repo.get('start_dt')
+            if start_dt is not None:
+                after_prev = prev <= start_dt if inclusive_start else prev < start_dt
+                moved = after_prev & (start_dt < cur)
+                prev = np.where(moved, start_dt, prev)
+            else:
+                moved = np.zeros(cur.shape, dtype=bool)
+            lo = np.searchsorted(repo.get('dates'), prev, side='left')
+            hi = np.searchsorted(repo.get('dates'), cur, side='left')
+            CommitStats._check_modifications(repo, lo, hi)
+            windows.append((repo, lo, hi, moved))
+        return windows
+
+    @staticmethod
+    def _loc(windows, num_bins):
+        """
+        LOC at the end of each time bin. The LOC of the service accumulates additions - deletions across repositories
+        and bins, but it is reset to the initial_loc of a repository when its start_date moves the beginning of a bin
+
+        Parameters
+        ----------
+        windows: list of tuple
+        num_bins: int
+
+        Returns
+        -------
+        np.ndarray
+        """
+        added = np.zeros(num_bins, dtype=np.int64)
+        # LOC of the bins with a reset, which does not depend on the previous bins
+        reset_loc = np.zeros(num_bins, dtype=np.int64)
+        reset = np.zeros(num_bins, dtype=bool)
+        for repo, lo, hi, moved in windows:
+            net = repo.get('prefix')[hi, NET] - repo.get('prefix')[lo, NET]
+            initial_loc = repo.get('initial_loc')
+            if initial_loc is not None:
+                reset_loc = np.where(moved, initial_loc, reset_loc)
+                reset |= moved
+            reset_loc += net
+            added += net
+        cumulative = np.cumsum(added)
+        last_reset = np.maximum.accumulate(np.where(reset, np.arange(num_bins), -1))
+        offset = np.where(last_reset >= 0, (reset_loc - cumulative)[last_reset], 0)
+        return offset + cumulative
+
+    def compute_loc(self, time_bins: Tuple[datetime]) -> List[int]:
+        """
+        see DataMgr.compute_loc
+
+        Parameters
+        ----------
+        time_bins: Tuple[datetime]
+
+        Returns
+        -------
+        List[int]
+        """
+        windows = self._windows(time_bins, inclusive_start=True)
+        return CommitStats._loc(windows, num_bins=len(time_bins) - 1).tolist()
+
+    def compute_changes_per_loc(self, time_bins: Tuple[datetime]) -> List[float]:
+        """
+        see DataMgr.compute_changes_per_loc
+
+        Parameters
+        ----------
+        time_bins: Tuple[datetime]
+
+        Returns
+        -------
+        List[float]
+        """
+        num_bins = len(time_bins) - 1
+        windows = self._windows(time_bins, inclusive_start=False)
+        loc = CommitStats._loc(windows, num_bins=num_bins)
+        changes = np.zeros(num_bins, dtype=np.int64)
+        for repo, lo, hi, _ in windows:
+            changes += repo.get('prefix')[hi, CHANGES] - repo.get('prefix')[lo, CHANGES]
+        return [np.nan if l == 0 else c / l for c, l in zip(changes.tolist(), loc.tolist())]
+
+    def compute_changes(self, time_bins: Tuple[datetime]) -> List[int]:
+        """
+        see DataMgr.compute_changes. Unlike compute_loc, a bin of a repository ends at its first commit at or after the
+        end of the bin, which is counted too, and the first commit of a repository is never counted if it is after the
+        end of the bin. Whenever the last commit of a repository is counted, the difference between the LOC of the
+        service and the initial_loc of the repository is added to the changes
+
+        Parameters
+        ----------
+        time_bins: Tuple[datetime]
+
+        Returns
+        -------
+        List[int]
+        """
+        prev, cur = CommitStats._to_bins(time_bins)
+        shape = (cur.shape[0], len(self.repositories))
+        net = np.zeros(shape, dtype=np.int64)
+        changes = np.zeros(shape, dtype=np.int64)
+        last_counted = np.zeros(shape, dtype=bool)
+        initial_locs = np.zeros(shape[1], dtype=np.int64)
+        for j, repo in enumerate(self.repositories):
+            num_commits = repo.get('dates').shape[0]
+            if num_commits == 0:
+                continue
+            before_cur = np.searchsorted(repo.get('dates'), cur, side='left')
+            hi = np.where(before_cur == 0, 0, np.minimum(before_cur + 1, num_commits))
+            lo = np.minimum(np.searchsorted(repo.get('dates'), prev, side='left'), hi)
+            CommitStats._check_modifications(repo, lo, hi)
+            prefix = repo.get('prefix')
+            net[:, j] = prefix[hi, NET] - prefix[lo, NET]
+            changes[:, j] = prefix[hi, CHANGES] - prefix[lo, CHANGES]
+            if repo.get('initial_loc') is not None:
+                last_counted[:, j] = (hi == num_commits) & (lo < hi)
+                initial_locs[j] = repo.get('initial_loc')
+        # LOC of the service after each repository of each bin, in the order they are visited
+        loc = np.cumsum(net.ravel()).reshape(shape)
+        changes += np.where(last_counted, np.abs(loc - initial_locs), 0)
+        return changes.sum(axis=1).tolist()
@@ -12,17 +12,50 @@ from typing import Tuple
 from microservices_miner.control.service_mgr import ServiceMgr
 from microservices_miner.model.repository import Repository
 from microservices_miner.control.database_conn import RepositoryConn, RepositoryCommitConn, \
-    ServiceRepositoryConn
+    ServiceRepositoryConn, ServiceConn, ConnectionPool, ConnectionProfile
 from typing import List
 import os
 from microservices_miner.control.plot_mgr import PlotMgr
+from microservices_miner.control.commit_stats import CommitStats
+from microservices_miner.control.commit_snapshot import CommitSnapshot
+from microservices_miner.control.loc_timeline_mgr import LocTimelineMgr
 from datetime import datetime
 
 
 class DataMgr:
 
-    def __init__(self, db_path):
-        self.db_path = db_path
+    def __init__(self, db_path, snapshot_path=None):
+        """
+
+        Parameters
+        ----------
+        db_path: str or ConnectionPool
+            a path is opened with ConnectionProfile.READ_ONLY, as DataMgr only reads
+        snapshot_path: str
+            path to a CommitSnapshot file; if set, commits are read from it instead of the database
+        """
+        self.db_path = ConnectionPool.get_pool(db_path, profile=ConnectionProfile.READ_ONLY)
+        if snapshot_path is not None:
+            self.commit_snapshot = CommitSnapshot(db_path=self.db_path, path=snapshot_path)
+        else:
+            self.commit_snapshot = None
+
+    def get_commit_stats(self, service_name):
+        """
+
+        Parameters
+        ----------
+        service_name: str
+
+        Returns
+        -------
+        CommitStats
+        """
+        if self.commit_snapshot is not None:
+            service = ServiceConn(path_to_db=self.db_path).get_service(name=service_name)
+            return self.commit_snapshot.get_commit_stats(service_id=service.service_id)
+        service = ServiceMgr(db_path=self.db_path).get_service(service_name=service_name)
+        return CommitStats.from_service(service)
 
     def get_time_bins(self, service_names: List[str], step_size_aprox: int, until: datetime) -> Tuple:
         """
@@ -93,44 +126,7 @@ class DataMgr:
         dict, list
         """
         print('Computing changes per loc of {} service'.format(service.name))
-        loc = 0
-        changes_per_loc_list = list()
-        for i in range(1, len(time_bins)):
-            total_changes = 0
-            prev_time = time_bins[i - 1]
-            cur_time = time_bins[i]
-            for repo_data in service.list_repository_data():
-                repo = repo_data.get('repository')
-                start_date = repo_data.get('start_date')
-                if start_date is not None:
-                    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                else:
-                    start_dt = None
-                initial_loc = repo_data.get('initial_loc')
-                # print('Total number of commits = {}'.format(len(repo.commits)))
-                sorted_commits = sorted(repo.commits, key=lambda k: k.date)
-                if start_dt is not None and prev_time < start_dt < cur_time:
-                    prev_time = start_dt
-                    if initial_loc is not None:
-                        loc = initial_loc
-                for c in sorted_commits:
-                    # if there is no modification in current and previous time bins
-                    if prev_time <= c.date < cur_time:
-                        num_additions, num_deletions, num_changes = \
-                            DataMgr.compute_modifications(file_modifications=c.file_modifications)
-                        try:
-                            loc += num_additions - num_deletions
-                        except TypeError as e:
-                            print('Error! msg={} loc={} num_additions={} num_deletions={} sha={}'
-                                  .format(e, loc, num_additions, num_deletions, c.sha))
-                            raise e
-                        total_changes += num_changes
-            if loc == 0:
-                changes_per_loc = np.nan
-            else:
-                changes_per_loc = total_changes/loc
-            changes_per_loc_list.append(changes_per_loc)
-        return changes_per_loc_list
+        return CommitStats.from_service(service).compute_changes_per_loc(time_bins)
 
     @staticmethod
     def compute_changes(service: Service, time_bins: Tuple):
@@ -147,39 +143,10 @@ class DataMgr:
         dict, list
         """
         print('Computing changes of {} service'.format(service.name))
-        loc = 0
-        changes = list()
-
-        for i in range(1, len(time_bins)):
-            total_changes = 0
-            prev_time = time_bins[i - 1]
-            cur_time = time_bins[i]
-            for repo_data in service.list_repository_data():
-                repo = repo_data.get('repository')
-                initial_loc = repo_data.get('initial_loc')
-                sorted_commits = sorted(repo.commits, key=lambda k: k.date)
-                i = 0
-                c = sorted_commits[i]
-                commit_date = c.date
-                while i < len(sorted_commits) and commit_date < cur_time:
-                    # if there is no modification in current and previous time bins
-                    c = sorted_commits[i]
-                    commit_date = c.date
-
-                    if prev_time <= c.date:
-                        num_additions, num_deletions, num_changes = \
-                            DataMgr.compute_modifications(file_modifications=c.file_modifications)
-                        loc += num_additions - num_deletions
-                        total_changes += num_changes
-                        if i == len(sorted_commits) - 1 and initial_loc is not None:
-                            num_changes = np.abs(loc - initial_loc)
-                            total_changes += num_changes
-                    i += 1
-            changes.append(total_changes)
-        return changes
+        return CommitStats.from_service(service).compute_changes(time_bins)
 
     @staticmethod
-    def compute_loc(service: Service, time_bins: Tuple[datetime]):
+    def compute_loc(service: Service, time_bins: Tuple[datetime], loc_timeline_mgr: LocTimelineMgr = None):
         """
         compute the number of LOC given the specified Service object for the specified time bins. That is, be tn a date,
          this method computes the number of LOC in tn. t0 is ignored
@@ -188,56 +155,41 @@ class DataMgr:
         ----------
         service: Service
         time_bins: Tuple[datetime]
+        loc_timeline_mgr: LocTimelineMgr
+            if given and the timelines of the repositories of the service are current, LOC is read from them instead
+            of the commits of the service
 
         Returns
         -------
         List[int]
         """
         print('Computing LOC of {} service between time bins {}'.format(service.name, time_bins))
-        loc = 0
-        loc_list = list()
-        for i in range(1, len(time_bins)):
-            prev_time = time_bins[i-1]
-            cur_time = time_bins[i]
-            for repo_data in service.list_repository_data():
-                repo = repo_data.get('repository')
-                start_date = repo_data.get('start_date')
-                if start_date is not None:
-                    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                else:
-                    start_dt = None
-                # print('Total number of commits = {}'.format(len(repo.commits)))
-                sorted_commits = sorted(repo.commits, key=lambda k: k.date)
-                if start_dt is not None and prev_time <= start_dt < cur_time:
-                    prev_time = start_dt
-                    initial_loc = repo_data.get('initial_loc')
-                    if initial_loc is not None:
-                        loc = initial_loc
-                for c in sorted_commits:
-                    # if there is no modification in current and previous time bins
-                    if prev_time <= c.date < cur_time:
-                        if c.sha == '632ed9a8ede4912168e9b40382882a97836391e5':
-                            print(c)
-                        num_additions, num_deletions, _ = \
-                            DataMgr.compute_modifications(file_modifications=c.file_modifications)
-                        loc_aux = num_additions - num_deletions
-                        loc += loc_aux
-                        # print('date={} loc={}'.format(c.date, loc))
-            loc_list.append(loc)
-        return loc_list
+        if loc_timeline_mgr is not None and loc_timeline_mgr.is_service_current(service):
+            return loc_timeline_mgr.compute_loc(service=service, time_bins=time_bins)
+        return CommitStats.from_service(service).compute_loc(time_bins)
 
     @staticmethod
-    def compute_loc_per_repository(repository: Repository) -> (List[int], List[int], List[str]):
+    def compute_loc_per_repository(repository: Repository, service_id: int = None,
+                                   loc_timeline_mgr: LocTimelineMgr = None) -> (List[int], List[int], List[str]):
         """
 
         Parameters
         ----------
         repository: Repository
+        service_id: int
+            service the repository was loaded for
+        loc_timeline_mgr: LocTimelineMgr
+            if given along with service_id and the timeline of the repository is current, LOC is read from it instead
+            of the commits of the repository
 
         Returns
         -------
         Tuple
         """
+        if service_id is not None and loc_timeline_mgr is not None and \
+                loc_timeline_mgr.is_current(service_id=service_id, repository_id=repository.repository_id):
+            return loc_timeline_mgr.get_loc_per_repository(service_id=service_id,
+                                                           repository_id=repository.repository_id)
         loc = 0
         loc_list = list()
         sha_list = list()
@@ -483,38 +435,7 @@ class DataMgr:
         -------
 
         """
-        line = line.lower()
-        keywords = [
-            'closes',
-            'closed',
-            'close',
-            'fixes',
-            'fixed',
-            'fix',
-            'resolves',
-            'resolved',
-            'resolve',
-        ]
-        found = False
-        j = 0
-        while j < len(keywords) and not found:
-            k = keywords[j]
-            j += 1
-            fields = line.split(' ')
-            i = 0
-            while i < len(fields):
-                field = fields[i]
-                if k == field and i + 1 < len(fields):
-                    next_field = fields[i + 1]
-                    try:
-                        int(next_field)
-                        found = True
-                    except ValueError:
-                        i += 1
-                        continue
-                i += 1
-
-        return found
+        return CommitSnapshot.closes_issue(comment=line)
 
     @staticmethod
     def analyze_bugs_and_locs(filepath):
@@ -581,11 +502,7 @@ class DataMgr:
         -------
 
         """
-        words = comment.split()
-        if any(w in words for w in ['fix', 'bug', 'error', 'erro', 'falha', 'fail', 'bug-fix', 'correction']):
-            return True
-        else:
-            return False
+        return CommitSnapshot.is_bug_fix(comment=comment)
 
     def compute_bug_per_loc_ratio(self, service_names, time_bins):
         """
@@ -603,6 +520,7 @@ class DataMgr:
         # connecting to the database
         issue_mgr = IssueMgr(path_to_db=self.db_path)
         service_mgr = ServiceMgr(db_path=self.db_path)
+        loc_timeline_mgr = LocTimelineMgr(db_path=self.db_path)
 
         # initializing variables
         bugs = list()
@@ -613,8 +531,15 @@ class DataMgr:
         # for each service
         for service_name in service_names:
             print('Analysing the defect density of {} service'.format(service_name))
+            if self.commit_snapshot is not None:
+                bugs_aux, loc_aux = self._compute_bugs_and_loc_from_snapshot(service_name, time_bins, issue_mgr)
+                bugs.extend(bugs_aux)
+                loc_list.extend(loc_aux)
+                service_list.extend([service_name] * len(bugs_aux))
+                date_list.extend(time_bins[1:])
+                continue
             service = service_mgr.get_service(service_name=service_name)
-            loc_aux = self.compute_loc(service, time_bins)
+            loc_aux = self.compute_loc(service, time_bins, loc_timeline_mgr=loc_timeline_mgr)
             loc_list.extend(loc_aux)
             for i in range(1, len(time_bins)):
 
@@ -652,6 +577,38 @@ class DataMgr:
         df_group.to_csv(os.path.join(os.getenv('BASE_DIR'), 'data', 'metrics', PlotMgr.DEFECT_DENSITY_CSV_FILE))
         return df_group
 
+    def _compute_bugs_and_loc_from_snapshot(self, service_name, time_bins, issue_mgr):
+        """
+        same as the body of the loop of compute_bug_per_loc_ratio, but reading the commits from the snapshot
+
+        Parameters
+        ----------
+        service_name: str
+        time_bins: Tuple[datetime]
+        issue_mgr: IssueMgr
+
+        Returns
+        -------
+        list of int, list of int
+            number of bugs and LOC of each time bin
+        """
+        service = ServiceConn(path_to_db=self.db_path).get_service(name=service_name)
+        data = self.commit_snapshot.load()
+        bins = np.array(time_bins, dtype='datetime64[us]')
+        bugs = np.zeros(len(time_bins) - 1, dtype=np.int64)
+        for repository_id in data['pair_repository_id'][data['pair_service_id'] == service.service_id]:
+            issues = issue_mgr.get_issues_by_label(repository_id=int(repository_id))
+            closed_at = np.sort(np.array([issue.closed_at for issue in issues if issue.closed_at is not None],
+                                         dtype='datetime64[us]'))
+            rows = (data['service_id'] == service.service_id) & (data['repository_id'] == repository_id) & \
+                data['is_bugfix'] & ~data['closes_issue']
+            bug_fixes = np.sort(data['date'][rows])
+            for dates in (closed_at, bug_fixes):
+                counts = np.searchsorted(dates, bins, side='left')
+                bugs += counts[1:] - counts[:-1]
+        loc = self.commit_snapshot.get_commit_stats(service_id=service.service_id).compute_loc(time_bins)
+        return bugs.tolist(), loc
+
     def compute_bugs(self, service: Service, time_bins: Tuple[datetime]):
         """
 
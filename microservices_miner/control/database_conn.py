@@ -4,7 +4,13 @@
 #
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
 
+import os
+import json
+import queue
 import sqlite3
+import threading
+from concurrent.futures import Future
+from urllib.request import pathname2url
 from microservices_miner.model.user import User
 from microservices_miner.model.label import Label
 from microservices_miner.model.assignee import Assignee
@@ -18,11 +24,351 @@ from typing import List, Tuple
 import logging
 logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
 
+# maximum number of values bound to a single "in (...)" clause; older SQLite versions allow at most 999 variables
+MAX_SQL_VARIABLES = 500
+
+
+def _chunks(values, size=MAX_SQL_VARIABLES):
+    """
+
+    Parameters
+    ----------
+    values: list
+    size: int
+
+    Returns
+    -------
+    generator of list
+    """
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+# columns of the user table selected by the loaders that join it; they are NULL if the user is missing
+USER_COLUMNS = 'user.ID, user.name, user.email, user.login'
+# text after the last dot of a filename column (the whole filename if there is no dot), as computed by
+# FilenameFilter.get_extension. rtrim removes every trailing character but dots, which leaves the filename up to its
+# last dot. SchemaMgr indexes filemodification on this expression, so it must be used with exactly this text
+EXTENSION_SQL = "replace({0}, rtrim({0}, replace({0}, '.', '')), '')"
+
+
+def _get_user(users, user_id, name, email, login):
+    """
+    gets a User from an identity map, so that the rows of the same author share one object
+
+    Parameters
+    ----------
+    users: dict
+        user ID -> User
+    user_id: int or None
+        None if the user is not in the database
+    name: str
+    email: str
+    login: str
+
+    Returns
+    -------
+    User or None
+    """
+    if user_id is None:
+        return None
+    user = users.get(user_id)
+    if user is None:
+        user = User(name=name, email=email, login=login)
+        user.user_id = user_id
+        users[user_id] = user
+    return user
+
+
+class ConnectionProfile:
+    """
+    settings of the connections opened by a ConnectionPool. There are three profiles:
+        DEFAULT: larger caches only; the journal mode of the database is left as it is, so opening a database does
+            not convert it
+        BULK_LOAD: used by the miners; WAL journal, so that readers do not block the writer and vice versa, which
+            stays set on the database, synchronous=OFF and larger caches. A crash of the process does not corrupt the
+            database, but a power loss may lose the last transactions
+        READ_ONLY: used by analytics; the database is opened with a mode=ro URI, so it can be queried while
+            ghe_extractor is running
+    """
+
+    def __init__(self, name, pragmas, read_only=False):
+        """
+
+        Parameters
+        ----------
+        name: str
+        pragmas: list of tuple
+            (pragma, value) pairs executed when a connection is opened
+        read_only: bool
+        """
+        self.name = name
+        self.pragmas = pragmas
+        self.read_only = read_only
+
+    def connect(self, path_to_db):
+        """
+        opens a connection to the database with the settings of this profile
+
+        Parameters
+        ----------
+        path_to_db: str
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+        if self.read_only and path_to_db != ':memory:':
+            uri = 'file:{}?mode=ro'.format(pathname2url(path_to_db))
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(path_to_db, check_same_thread=False)
+        for pragma, value in self.pragmas:
+            try:
+                conn.execute('PRAGMA {} = {};'.format(pragma, value))
+            except sqlite3.OperationalError as e:
+                # e.g. the journal mode cannot be changed while another connection holds a lock
+                logging.warning('Unable to set PRAGMA {} = {} on {}: {}'.format(pragma, value, path_to_db, e))
+        return conn
+
+    def __str__(self):
+        return self.name
+
+
+ConnectionProfile.DEFAULT = ConnectionProfile(name='default', pragmas=[
+    ('cache_size', -64 * 1024), ('temp_store', 'MEMORY'), ('mmap_size', 256 * 1024 * 1024)])
+ConnectionProfile.BULK_LOAD = ConnectionProfile(name='bulk_load', pragmas=[
+    ('journal_mode', 'WAL'), ('synchronous', 'OFF'), ('cache_size', -256 * 1024), ('temp_store', 'MEMORY'),
+    ('mmap_size', 256 * 1024 * 1024), ('wal_autocheckpoint', 10000)])
+ConnectionProfile.READ_ONLY = ConnectionProfile(name='read_only', read_only=True, pragmas=[
+    ('query_only', 'ON'), ('cache_size', -64 * 1024), ('temp_store', 'MEMORY'), ('mmap_size', 256 * 1024 * 1024)])
+
+
+class ConnectionPool:
+    """
+    process-wide pool of connections to a database file. Each thread gets a single connection, which is shared by all
+    the *Conn objects created by this thread. Conn and Mgr classes accept either a path to the database file or a
+    ConnectionPool wherever they expect path_to_db/db_path. There is one pool per database file and ConnectionProfile
+    """
+
+    _pools = dict()
+    _pools_lock = threading.Lock()
+
+    def __init__(self, path_to_db, profile=None):
+        """
+
+        Parameters
+        ----------
+        path_to_db: str
+        profile: ConnectionProfile
+            if None, ConnectionProfile.DEFAULT is used
+        """
+        assert isinstance(path_to_db, str), "Error! path_to_db is not a str: {}".format(path_to_db)
+        self.path_to_db = path_to_db
+        self.profile = profile if profile is not None else ConnectionProfile.DEFAULT
+        self._local = threading.local()
+        self._connections = list()
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        """
+        gets the connection of the calling thread, opening it if needed
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # the connection is only used by this thread, but it may be closed by another one (see close)
+            conn = self.profile.connect(self.path_to_db)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+            logging.info('Opened connection to {} (profile={} thread={})'.format(self.path_to_db, self.profile,
+                                                                                 threading.get_ident()))
+        return conn
+
+    @property
+    def num_connections(self):
+        return len(self._connections)
+
+    def close(self):
+        """
+        closes the connections of all threads
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = list()
+            self._local = threading.local()
+
+    @staticmethod
+    def get_pool(path_to_db, profile=None):
+        """
+        gets the pool of the given database file and profile, creating it if needed
+
+        Parameters
+        ----------
+        path_to_db: str or ConnectionPool
+            if it is a pool, it is returned as is
+        profile: ConnectionProfile
+            if None, ConnectionProfile.DEFAULT is used
+
+        Returns
+        -------
+        ConnectionPool
+        """
+        if isinstance(path_to_db, ConnectionPool):
+            return path_to_db
+        assert path_to_db is not None, "Error! path_to_db is None"
+        if profile is None:
+            profile = ConnectionProfile.DEFAULT
+        path = path_to_db if path_to_db == ':memory:' else os.path.abspath(path_to_db)
+        key = (path, profile.name)
+        with ConnectionPool._pools_lock:
+            pool = ConnectionPool._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(path_to_db=path, profile=profile)
+                ConnectionPool._pools[key] = pool
+        return pool
+
+    @staticmethod
+    def connect(path_to_db):
+        """
+        gets the connection of the calling thread to the given database
+
+        Parameters
+        ----------
+        path_to_db: str or ConnectionPool
+
+        Returns
+        -------
+        sqlite3.Connection
+        """
+        return ConnectionPool.get_pool(path_to_db).get_connection()
+
+    @staticmethod
+    def close_all():
+        """
+        closes all connections of all pools
+
+        Returns
+        -------
+        None
+        """
+        with ConnectionPool._pools_lock:
+            for pool in ConnectionPool._pools.values():
+                pool.close()
+            ConnectionPool._pools = dict()
+
+
+class DatabaseWriter:
+    """
+    thread that makes the writes of several threads to a database, one at a time and in the order they were submitted.
+    SQLite allows a single writer, so threads that mine in parallel submit their writes here instead of contending for
+    the lock of the database, while their reads keep using their own connections. A write is a callable that creates
+    the Conn or Mgr objects it needs, so that they use the connection of the writer thread
+    """
+
+    # maximum number of writes waiting in the queue; submit blocks when it is full
+    MAX_PENDING = 1000
+
+    def __init__(self, path_to_db, max_pending=MAX_PENDING):
+        """
+
+        Parameters
+        ----------
+        path_to_db: str or ConnectionPool
+        max_pending: int
+        """
+        self.path_to_db = path_to_db
+        self.num_writes = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name='database-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """
+        executes the writes in the queue until close is called
+
+        Returns
+        -------
+        None
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            fn, args, kwargs, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                conn = ConnectionPool.connect(self.path_to_db)
+                if conn.in_transaction:
+                    conn.rollback()
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            self.num_writes += 1
+
+    def submit(self, fn, *args, **kwargs):
+        """
+
+        Parameters
+        ----------
+        fn: callable
+
+        Returns
+        -------
+        concurrent.futures.Future
+            result of fn, once the writer thread has called it
+        """
+        assert self._thread.is_alive(), "Error! The database writer is closed"
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        calls fn in the writer thread and waits for its result
+
+        Parameters
+        ----------
+        fn: callable
+
+        Returns
+        -------
+        object
+            result of fn; exceptions raised by fn are raised again in the calling thread
+        """
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def close(self):
+        """
+        waits for the pending writes and stops the writer thread
+
+        Returns
+        -------
+        None
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
 
 class UserConn:
 
     def __init__(self, path_to_db):
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
 
     def insert_user(self, user):
         """
@@ -36,13 +382,12 @@ class UserConn:
         int
         """
         cursor = self.conn.cursor()
-        sql = 'select ID from user where name="{}" and email="{}";'.format(user.name, user.email)
-        cur = cursor.execute(sql)
+        sql = 'select ID from user where name == ? and email == ?;'
+        cur = cursor.execute(sql, (user.name, user.email))
         row = cur.fetchone()
         if row is None:
-            sql = 'insert into user(name, email, login) values ("{}", "{}", "{}");'.format(user.name, user.email,
-                                                                                           user.login)
-            cursor.execute(sql)
+            sql = 'insert into user(name, email, login) values (?, ?, ?);'
+            cursor.execute(sql, (user.name, user.email, user.login))
             last_row_id = cursor.lastrowid
             self.conn.commit()
             logging.info('The following SQL query was executed: {}'.format(sql))
@@ -67,17 +412,22 @@ class UserConn:
         """
         cursor = self.conn.cursor()
         if name is not None and email is not None:
-            sql = 'select name, email, ID, login from user where name=="{}" and email=="{}";'.format(name, email)
+            sql = 'select name, email, ID, login from user where name == ? and email == ?;'
+            params = (name, email)
         elif name is not None:
-            sql = 'select name, email, ID, login from user where name=="{}";'.format(name)
+            sql = 'select name, email, ID, login from user where name == ?;'
+            params = (name,)
         elif user_id is not None:
-            sql = 'select name, email, ID, login from user where ID=={};'.format(user_id)
+            sql = 'select name, email, ID, login from user where ID == ?;'
+            params = (user_id,)
         elif login is not None:
-            sql = 'select name, email, ID, login from user where login=="{}";'.format(login)
+            sql = 'select name, email, ID, login from user where login == ?;'
+            params = (login,)
         else:
-            sql = 'select name, email, ID, login from user where email=="{}";'.format(email)
+            sql = 'select name, email, ID, login from user where email == ?;'
+            params = (email,)
         try:
-            cur = cursor.execute(sql)
+            cur = cursor.execute(sql, params)
         except sqlite3.OperationalError as e:
             logging.critical('Error! {} sql={}'.format(e, sql))
             raise e
@@ -89,6 +439,44 @@ class UserConn:
             user = None
         return user
 
+    def find_user(self, login=None, name=None, email=None):
+        """
+        gets the user with the given login or, if there is none, name or, if there is none, email using a single query
+
+        Parameters
+        ----------
+        login: str
+        name: str
+        email: str
+
+        Returns
+        -------
+        User
+        """
+        sql = 'select name, email, ID, login from user where login == ? or name == ? or email == ? ' \
+              'order by case when login == ? then 0 when name == ? then 1 else 2 end, ID limit 1;'
+        row = self.conn.execute(sql, (login, name, email, login, name)).fetchone()
+        if row is None:
+            return None
+        user = User(name=row[0], email=row[1], login=row[3])
+        user.user_id = row[2]
+        return user
+
+    def get_all_users(self):
+        """
+
+        Returns
+        -------
+        list of User
+            ordered by ID
+        """
+        users = list()
+        for name, email, user_id, login in self.conn.execute('select name, email, ID, login from user order by ID;'):
+            user = User(name=name, email=email, login=login)
+            user.user_id = user_id
+            users.append(user)
+        return users
+
 
 class ParentCommitConn:
 
@@ -96,7 +484,7 @@ class ParentCommitConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def insert_repository_commit(self, sha, position):
@@ -113,14 +501,12 @@ class ParentCommitConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'select id from {} where sha == "{}" and position = {};' \
-            .format(ParentCommitConn.TABLE_NAME, sha, position)
-        cursor.execute(sql)
+        sql = 'select id from {} where sha == ? and position == ?;'.format(ParentCommitConn.TABLE_NAME)
+        cursor.execute(sql, (sha, position))
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(sha, position) values ("{}", {});' \
-                .format(ParentCommitConn.TABLE_NAME, sha, position)
-            cursor.execute(sql)
+            sql = 'insert into {}(sha, position) values (?, ?);'.format(ParentCommitConn.TABLE_NAME)
+            cursor.execute(sql, (sha, position))
             last_row_id = cursor.lastrowid
             self.conn.commit()
             logging.info('The following SQL query was executed: {}'.format(sql))
@@ -129,6 +515,41 @@ class ParentCommitConn:
         cursor.close()
         return last_row_id
 
+    def insert_parent_commits(self, sha_positions, commit=True):
+        """
+        inserts the (sha, position) pairs that are not in the database yet using a single statement for all of them
+
+        Parameters
+        ----------
+        sha_positions: list of tuple
+            (sha, position) pairs
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        dict
+            (sha, position) -> ID
+        """
+        sha_positions = list(set(sha_positions))
+        cursor = self.conn.cursor()
+        # the table has no unique constraint on (sha, position), so duplicates are skipped by the select
+        sql = 'insert into {0}(sha, position) select ?, ? where not exists ' \
+              '(select 1 from {0} where sha == ? and position == ?);'.format(ParentCommitConn.TABLE_NAME)
+        cursor.executemany(sql, [(sha, position, sha, position) for sha, position in sha_positions])
+        parent_commit_ids = dict()
+        wanted = set(sha_positions)
+        for chunk in _chunks(sorted({sha for sha, _ in sha_positions})):
+            sql = 'select sha, position, min(ID) from {} where sha in ({}) group by sha, position;' \
+                .format(ParentCommitConn.TABLE_NAME, ', '.join(['?'] * len(chunk)))
+            for sha, position, parent_commit_id in cursor.execute(sql, chunk):
+                if (sha, position) in wanted:
+                    parent_commit_ids[(sha, position)] = parent_commit_id
+        if commit:
+            self.conn.commit()
+        cursor.close()
+        return parent_commit_ids
+
     def get_parent_commit_sha(self, child_commit_id):
         """
         gets the SHA of the parent commit given a child commit ID
@@ -141,12 +562,12 @@ class ParentCommitConn:
         -------
         str or None
         """
-        sql = 'select sha from {0} join {1} on {0}.ID == {1}.parentcommit_id where {1}.repocommit_id == {2} ' \
+        sql = 'select sha from {0} join {1} on {0}.ID == {1}.parentcommit_id where {1}.repocommit_id == ? ' \
               'and {0}.position = 0;' \
-            .format(ParentCommitConn.TABLE_NAME, ParentCommitRepoCommitConn.TABLE_NAME, child_commit_id)
+            .format(ParentCommitConn.TABLE_NAME, ParentCommitRepoCommitConn.TABLE_NAME)
         cursor = self.conn.cursor()
         # logging.info('The following SQL query was executed: {}'.format(sql))
-        cursor.execute(sql)
+        cursor.execute(sql, (child_commit_id,))
         row = cursor.fetchone()
         if row is not None:
             sha = row[0]
@@ -166,11 +587,10 @@ class ParentCommitConn:
         -------
         int or None
         """
-        sql = 'select ID from {0} where sha == "{1}";' \
-            .format(ParentCommitConn.TABLE_NAME, ParentCommitRepoCommitConn.TABLE_NAME, sha)
+        sql = 'select ID from {} where sha == ?;'.format(ParentCommitConn.TABLE_NAME)
         cursor = self.conn.cursor()
-        logging.info('The following SQL query was executed: {}'.format(sql))
-        cursor.execute(sql)
+        logging.info('The following SQL query was executed: {} sha={}'.format(sql, sha))
+        cursor.execute(sql, (sha,))
         row = cursor.fetchone()
         if row is not None:
             parent_commit_id = row[0]
@@ -189,19 +609,19 @@ class ParentCommitConn:
         -------
         set
         """
-        sql = 'select ID from {} where sha == "{}"'.format(ParentCommitConn.TABLE_NAME, parent_commit_sha)
+        sql = 'select ID from {} where sha == ?;'.format(ParentCommitConn.TABLE_NAME)
         cursor = self.conn.cursor()
-        logging.info('The following SQL query was executed: {}'.format(sql))
-        cursor.execute(sql)
+        logging.info('The following SQL query was executed: {} sha={}'.format(sql, parent_commit_sha))
+        cursor.execute(sql, (parent_commit_sha,))
         row = cursor.fetchone()
         repocommit_ids = set()
         if row is not None:
             parent_id = row[0]
-            sql = 'select repocommit_id from {} where parentcommit_id == {}' \
-                .format(ParentCommitRepoCommitConn.TABLE_NAME, parent_id)
+            sql = 'select repocommit_id from {} where parentcommit_id == ?;' \
+                .format(ParentCommitRepoCommitConn.TABLE_NAME)
             cursor = self.conn.cursor()
-            logging.info('The following SQL query was executed: {}'.format(sql))
-            cursor.execute(sql)
+            logging.info('The following SQL query was executed: {} parentcommit_id={}'.format(sql, parent_id))
+            cursor.execute(sql, (parent_id,))
             rows = cursor.fetchall()
             for row in rows:
                 repocommit_ids.add(row[0])
@@ -219,11 +639,11 @@ class ParentCommitConn:
         -------
 
         """
-        sql = 'delete from {} where ID == {}'.format(ParentCommitConn.TABLE_NAME, parent_commit_id)
+        sql = 'delete from {} where ID == ?;'.format(ParentCommitConn.TABLE_NAME)
         cursor = self.conn.cursor()
-        logging.info('The following SQL query was executed: {}'.format(sql))
+        logging.info('The following SQL query was executed: {} ID={}'.format(sql, parent_commit_id))
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (parent_commit_id,))
         except sqlite3.OperationalError as e:
             print('sql={} error={}'.format(sql, e))
             logging.error(e)
@@ -236,7 +656,7 @@ class ParentCommitRepoCommitConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def insert_parent_commit_repository_commit(self, parent_commit_id, repo_commit_id):
@@ -253,15 +673,16 @@ class ParentCommitRepoCommitConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'select * from {} where repocommit_id == {} and parentcommit_id == {};' \
-            .format(ParentCommitRepoCommitConn.TABLE_NAME, parent_commit_id, repo_commit_id)
-        logging.info('The following SQL query was executed: {}'.format(sql))
-        cursor.execute(sql)
+        sql = 'select * from {} where repocommit_id == ? and parentcommit_id == ?;' \
+            .format(ParentCommitRepoCommitConn.TABLE_NAME)
+        cursor.execute(sql, (repo_commit_id, parent_commit_id))
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(repocommit_id, parentcommit_id) values ({}, {});' \
-                .format(ParentCommitRepoCommitConn.TABLE_NAME, repo_commit_id, parent_commit_id)
-            cursor.execute(sql)
+            sql = 'insert into {}(repocommit_id, parentcommit_id) values (?, ?);' \
+                .format(ParentCommitRepoCommitConn.TABLE_NAME)
+            cursor.execute(sql, (repo_commit_id, parent_commit_id))
+            logging.info('The following SQL query was executed: {} repocommit_id={} parentcommit_id={}'
+                         .format(sql, repo_commit_id, parent_commit_id))
             last_row_id = cursor.lastrowid
             self.conn.commit()
 
@@ -270,6 +691,29 @@ class ParentCommitRepoCommitConn:
         cursor.close()
         return last_row_id
 
+    def insert_parent_commit_repository_commits(self, pairs, commit=True):
+        """
+        inserts many (parent_commit_id, repo_commit_id) pairs; pairs that are already in the database are ignored
+
+        Parameters
+        ----------
+        pairs: list of tuple
+            (parent_commit_id, repo_commit_id) pairs
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        None
+        """
+        sql = 'insert into {}(parentcommit_id, repocommit_id) values (?, ?) on conflict do nothing;' \
+            .format(ParentCommitRepoCommitConn.TABLE_NAME)
+        cursor = self.conn.cursor()
+        cursor.executemany(sql, pairs)
+        if commit:
+            self.conn.commit()
+        cursor.close()
+
     def delete_parent_commit_repocommit(self, parent_commit_id):
         """
 
@@ -281,11 +725,10 @@ class ParentCommitRepoCommitConn:
         -------
 
         """
-        sql = 'delete from {} where parentcommit_id == {}'.format(ParentCommitRepoCommitConn.TABLE_NAME,
-                                                                  parent_commit_id)
+        sql = 'delete from {} where parentcommit_id == ?;'.format(ParentCommitRepoCommitConn.TABLE_NAME)
         cursor = self.conn.cursor()
-        logging.info('The following SQL query was executed: {}'.format(sql))
-        cursor.execute(sql)
+        logging.info('The following SQL query was executed: {} parentcommit_id={}'.format(sql, parent_commit_id))
+        cursor.execute(sql, (parent_commit_id,))
         self.conn.commit()
 
 
@@ -295,7 +738,7 @@ class RepositoryCommitConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def insert_repository_commit(self, commit, repository_id, user_id):
@@ -313,27 +756,60 @@ class RepositoryCommitConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'select id from {} where sha == "{}" and repository_id == {};' \
-            .format(RepositoryCommitConn.TABLE_NAME, commit.sha, repository_id)
+        sql = 'select id from {} where sha == ? and repository_id == ?;'.format(RepositoryCommitConn.TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (commit.sha, repository_id))
         except sqlite3.OperationalError as e:
             logging.error('Error! sql={} msg={}'.format(sql, e))
             raise e
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(repository_id, user_id, date, sha, comment) values ("{}", "{}", "{}", "{}", "{}");' \
-                .format(RepositoryCommitConn.TABLE_NAME, repository_id, user_id, commit.date.isoformat(), commit.sha,
-                        commit.comment)
-            cursor.execute(sql)
+            sql = 'insert into {}(repository_id, user_id, date, sha, comment) values (?, ?, ?, ?, ?);' \
+                .format(RepositoryCommitConn.TABLE_NAME)
+            cursor.execute(sql, (repository_id, user_id, commit.date.isoformat(), commit.sha, commit.comment))
             last_row_id = cursor.lastrowid
             self.conn.commit()
-            logging.info('The following SQL query was executed: {}'.format(sql))
+            logging.info('The following SQL query was executed: {} sha={}'.format(sql, commit.sha))
         else:
             last_row_id = row[0]
         cursor.close()
         return last_row_id
 
+    def insert_repository_commits(self, commits, repository_id, user_ids, commit=True):
+        """
+        inserts many commits of a repository; commits whose SHA is already in the database are ignored
+
+        Parameters
+        ----------
+        commits: list of Commit
+        repository_id: int
+        user_ids: list of int
+            the ID of the author of each commit
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        dict
+            SHA -> ID of each given commit
+        """
+        assert len(commits) == len(user_ids), "Error! Every commit must have an author"
+        cursor = self.conn.cursor()
+        sql = 'insert into {}(repository_id, user_id, date, sha, comment) values (?, ?, ?, ?, ?) ' \
+              'on conflict(sha) do nothing;'.format(RepositoryCommitConn.TABLE_NAME)
+        cursor.executemany(sql, [(repository_id, user_id, c.date.isoformat(), c.sha, c.comment)
+                                 for c, user_id in zip(commits, user_ids)])
+        commit_ids = dict()
+        for chunk in _chunks([c.sha for c in commits]):
+            sql = 'select sha, ID from {} where sha in ({});' \
+                .format(RepositoryCommitConn.TABLE_NAME, ', '.join(['?'] * len(chunk)))
+            for sha, commit_id in cursor.execute(sql, chunk):
+                commit_ids[sha] = commit_id
+        if commit:
+            self.conn.commit()
+        cursor.close()
+        return commit_ids
+
     def get_commits_by_repo(self, repository_id, start_date=None, end_date=None):
         """
         gets a list of Commit objects given a repository specified by repository_id and between start and end dates
@@ -355,25 +831,28 @@ class RepositoryCommitConn:
             if end_date is None:
                 end_date = '9999-12-31'
 
-            sql = 'select date, sha, user_id, id, comment from {} where repository_id == {} and ' \
-                  'date between date("{}") and date("{}");' \
-                .format(RepositoryCommitConn.TABLE_NAME, repository_id, start_date, end_date)
+            sql = 'select date, sha, {0}.ID, comment, {1} from {0} left join user on user.ID == {0}.user_id ' \
+                  'where repository_id == ? and date between date(?) and date(?);' \
+                .format(RepositoryCommitConn.TABLE_NAME, USER_COLUMNS)
+            params = (repository_id, start_date, end_date)
         else:
-            sql = 'select date, sha, user_id, id, comment from {} where repository_id == {};' \
-                .format(RepositoryCommitConn.TABLE_NAME, repository_id)
+            sql = 'select date, sha, {0}.ID, comment, {1} from {0} left join user on user.ID == {0}.user_id ' \
+                  'where repository_id == ?;'.format(RepositoryCommitConn.TABLE_NAME, USER_COLUMNS)
+            params = (repository_id,)
 
-        rows = cursor.execute(sql)
+        rows = cursor.execute(sql, params)
         commits = list()
-        user_conn = UserConn(path_to_db=self.db_path)
+        users = dict()
         for row in rows:
             dt = row[0]
             if 'T' not in dt:
                 dt = dt.replace(' ', 'T')
             commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
-            c = Commit(date=commit_date, sha=row[1], comment=row[4])
-            user = user_conn.get_user(user_id=row[2])
-            c.user = user
-            c.commit_id = row[3]
+            c = Commit(date=commit_date, sha=row[1], comment=row[3])
+            user = _get_user(users, *row[4:8])
+            if user is not None:
+                c.user = user
+            c.commit_id = row[2]
             commits.append(c)
 
         return commits
@@ -393,23 +872,25 @@ class RepositoryCommitConn:
         Commit
         """
         cursor = self.conn.cursor()
-        start_sql = 'select date, sha, user_id, {0}.ID, comment, filename, additions, deletions, changes, status from' \
-                    ' {0} join {1} on {0}.ID == {1}.commit_id where sha == "{2}"' \
-            .format(RepositoryCommitConn.TABLE_NAME, FileModificationConn.TABLE_NAME, sha)
+        start_sql = 'select date, sha, {2}, {0}.ID, comment, filename, additions, deletions, changes, status from' \
+                    ' {0} join {1} on {0}.ID == {1}.commit_id left join user on user.ID == {0}.user_id' \
+                    ' where sha == ?' \
+            .format(RepositoryCommitConn.TABLE_NAME, FileModificationConn.TABLE_NAME, USER_COLUMNS)
         if start_date is None and end_date is None:
-            sql = start_sql
+            sql = '{};'.format(start_sql)
+            params = (sha,)
         elif start_date is not None and end_date is not None:
-            sql = '{0} and date("{1}") >= date(date) and date(date) < date("{2}");' \
-                .format(start_sql, start_date, end_date)
+            sql = '{} and date(?) >= date(date) and date(date) < date(?);'.format(start_sql)
+            params = (sha, start_date, end_date)
         elif start_date is not None:
-            sql = '{} and date("{}") >= date(date);' \
-                .format(start_sql, start_date)
+            sql = '{} and date(?) >= date(date);'.format(start_sql)
+            params = (sha, start_date)
         else:
-            sql = '{} and date(date) < date("{}");' \
-                .format(start_sql, end_date)
-        cursor.execute(sql)
+            sql = '{} and date(date) < date(?);'.format(start_sql)
+            params = (sha, end_date)
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
-        user_conn = UserConn(path_to_db=self.db_path)
+        users = dict()
         commit = None
         filemodifications = list()
         for index, row in enumerate(rows):
@@ -418,11 +899,13 @@ class RepositoryCommitConn:
                 if 'T' not in dt:
                     dt = dt.replace(' ', 'T')
                 commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
-                commit = Commit(date=commit_date, sha=row[1], comment=row[4])
-                user = user_conn.get_user(user_id=row[2])
-                commit.user = user
-                commit.commit_id = row[3]
-            fm = FileModification(filename=row[5], additions=row[6], deletions=row[7], changes=row[8], status=row[9])
+                commit = Commit(date=commit_date, sha=row[1], comment=row[7])
+                user = _get_user(users, *row[2:6])
+                if user is not None:
+                    commit.user = user
+                commit.commit_id = row[6]
+            fm = FileModification(filename=row[8], additions=row[9], deletions=row[10], changes=row[11],
+                                  status=row[12])
 
             filemodifications.append(fm)
 
@@ -430,145 +913,314 @@ class RepositoryCommitConn:
             commit.file_modifications = filemodifications
         else:
             # if this commits has no file modifications
-            sql = 'select date, sha, user_id, id, comment from {} where sha == "{}"' \
-                .format(RepositoryCommitConn.TABLE_NAME, sha)
-            cursor.execute(sql)
+            sql = 'select date, sha, {0}.ID, comment, {1} from {0} left join user on user.ID == {0}.user_id ' \
+                  'where sha == ?;'.format(RepositoryCommitConn.TABLE_NAME, USER_COLUMNS)
+            cursor.execute(sql, (sha,))
             row = cursor.fetchone()
             if row is not None:
                 dt = row[0]
                 if 'T' not in dt:
                     dt = dt.replace(' ', 'T')
                 commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
-                commit = Commit(date=commit_date, sha=row[1], comment=row[4])
-                user = user_conn.get_user(user_id=row[2])
-                commit.user = user
-                commit.commit_id = row[3]
+                commit = Commit(date=commit_date, sha=row[1], comment=row[3])
+                user = _get_user(users, *row[4:8])
+                if user is not None:
+                    commit.user = user
+                commit.commit_id = row[2]
 
         return commit
 
-    def get_inconsistent_commits(self, repository_id, extensions):
+    def get_commit_watermarks(self):
         """
-
-        Parameters
-        ----------
-        repository_id: int
-        extensions: list of str
+        summarizes the commits and file modifications of each repository, so that callers can tell whether the
+        data of a repository changed since they last read it. The sums of additions, deletions and changes tell apart
+        file modifications that were updated in place, e.g. by the repair of inconsistencies
 
         Returns
         -------
-        list of Commit
+        dict
+            repository_id -> (max commit ID, number of commits, max file modification ID, number of file modifications,
+            sum of additions, sum of deletions, sum of changes)
         """
         cursor = self.conn.cursor()
-        s = '('
-        for ext in extensions:
-            s += 'filename like "%.{}" or '.format(ext)
-        # remove the last and
-        index = s.rfind('"') + 1
-        s = s[:index]
-        s += ')'
-        sql = 'select date, sha, user_id, {0}.ID, comment, filename, additions, deletions, changes, status ' \
-              ' from {0} join {1} on {0}.ID == {1}.commit_id where repository_id == {2} and ' \
-              '( (status == "modified" and changes == 0) or (status == "added" and additions == 0) or ' \
-              '(status == "removed" and deletions == 0) ) and {3};' \
-            .format(RepositoryCommitConn.TABLE_NAME, FileModificationConn.TABLE_NAME, repository_id, s)
-        try:
-            cursor.execute(sql)
-        except sqlite3.OperationalError as e:
-            logging.critical('Error! sql={} e={}'.format(sql, e))
-        rows = cursor.fetchall()
-        user_conn = UserConn(path_to_db=self.db_path)
-        commits = list()
-        filemodifications = dict()
-        for index, row in enumerate(rows):
-
-            dt = row[0]
-            if 'T' not in dt:
-                dt = dt.replace(' ', 'T')
-            commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
-            sha = row[1]
-            commit = Commit(date=commit_date, sha=sha, comment=row[4])
-            if commit not in commits:
-                user = user_conn.get_user(user_id=row[2])
-                commit.user = user
-                commit.commit_id = row[3]
-                commits.append(commit)
-            fm = FileModification(filename=row[5], additions=row[6], deletions=row[7], changes=row[8], status=row[9])
-            if sha not in filemodifications.keys():
-                filemodifications[sha] = [fm]
-            else:
-                filemodifications[sha].append(fm)
-        for commit in commits:
-            commit.file_modifications = filemodifications[commit.sha]
-        return commits
+        sql = 'select {0}.repository_id, max({0}.ID), count(distinct {0}.ID), max({1}.ID), count({1}.ID), ' \
+              'sum({1}.additions), sum({1}.deletions), sum({1}.changes) from {0} ' \
+              'left join {1} on {1}.commit_id == {0}.ID group by {0}.repository_id;' \
+            .format(RepositoryCommitConn.TABLE_NAME, FileModificationConn.TABLE_NAME)
+        cursor.execute(sql)
+        watermarks = dict()
+        for row in cursor.fetchall():
+            watermarks[row[0]] = tuple(v if v is not None else 0 for v in row[1:])
+        cursor.close()
+        return watermarks
 
-    def delete_commit(self, commit_id):
+    def get_last_commit_date(self, repository_id):
         """
 
+        Parameters
+        ----------
+        repository_id: int
+
         Returns
         -------
-        Commit
+        datetime
+            date of the newest commit of the repository or None if it has no commits
         """
-        cursor = self.conn.cursor()
-        sql = 'delete from {} where id == {};' \
-            .format(RepositoryCommitConn.TABLE_NAME, commit_id)
-        # logging.info('sql={}'.format(sql))
-        cursor.execute(sql)
-        self.conn.commit()
-        cursor.close()
-        print('Deleted commits, query={}'.format(sql))
-        return
-
-
-class RepositoryConn:
-
-    TABLE_NAME = 'repository'
-
-    def __init__(self, path_to_db):
-        self.conn = sqlite3.connect(path_to_db)
+        sql = 'select max(date) from {} where repository_id == ?;'.format(RepositoryCommitConn.TABLE_NAME)
+        row = self.conn.execute(sql, (repository_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return datetime.strptime(row[0].replace(' ', 'T'), '%Y-%m-%dT%H:%M:%S')
 
-    def insert_repository(self, repository):
+    def get_chain_head(self, repository_id, start_date=None, end_date=None):
         """
+        gets the commit the chain of first parents of a repository starts at, i.e. the last commit that
+        get_commits_by_repo would return
 
         Parameters
         ----------
-        repository: Repository
+        repository_id: int
+        start_date: str
+            YYYY-MM-DD, inclusive
+        end_date: str
+            YYYY-MM-DD, exclusive
 
         Returns
         -------
         int
+            ID of the commit or None if the repository has no commit between the dates
         """
-        cursor = self.conn.cursor()
-
-        sql = 'insert into {}(name, url) values ("{}", "{}");' \
-            .format(RepositoryConn.TABLE_NAME, repository.name, repository.url)
-        cursor.execute(sql)
-        last_row_id = cursor.lastrowid
-        self.conn.commit()
-        logging.info('The following SQL query was executed: {}'.format(sql))
-
-        cursor.close()
-        return last_row_id
+        if start_date is not None or end_date is not None:
+            sql = 'select max(ID) from {} where repository_id == ? and date between date(?) and date(?);' \
+                .format(RepositoryCommitConn.TABLE_NAME)
+            params = (repository_id, start_date if start_date is not None else '1000-01-01',
+                      end_date if end_date is not None else '9999-12-31')
+        else:
+            sql = 'select max(ID) from {} where repository_id == ?;'.format(RepositoryCommitConn.TABLE_NAME)
+            params = (repository_id,)
+        row = self.conn.execute(sql, params).fetchone()
+        return row[0] if row is not None else None
 
-    def get_repository(self, repo_id: int = None):
+    @staticmethod
+    def get_chain_sql(head_id, start_date=None, end_date=None, stop_sql=None, stop_params=()):
         """
+        the recursive common table expression chain(ID, depth) with the commits found by following the first parents
+        of a commit, as long as they are between start and end dates; the commit itself has depth 0
 
         Parameters
         ----------
-        repo_id: int
-            repository ID
+        head_id: int
+        start_date: str
+            YYYY-MM-DD, inclusive
+        end_date: str
+            YYYY-MM-DD, exclusive
+        stop_sql: str
+            if given, condition on chain.ID of the commits whose parents are not followed, e.g. the commits that are
+            already known
+        stop_params: tuple
+            parameters of stop_sql
 
         Returns
         -------
-        Repository
-        """
-        assert repo_id is not None, "Error! Both parameters cannot be none"
-        cursor = self.conn.cursor()
-        sql = 'select name, url, ID from {0} where {0}.id = {1}' \
-            .format(RepositoryConn.TABLE_NAME, repo_id)
+        str, tuple
+            the expression, which is followed by a select statement, and its parameters
+        """
+        lower = start_date if start_date is not None else '1000-01-01'
+        upper = end_date if end_date is not None else '9999-12-01'
+        # dates are ISO strings, so comparing them with YYYY-MM-DD bounds is the same as comparing datetimes
+        sql = 'with recursive chain(ID, depth) as (' \
+              ' select ID, 0 from {0} where ID == ? and date >= ? and date < ?' \
+              ' union all' \
+              ' select c.ID, chain.depth + 1 from chain join {0} c on c.sha == (' \
+              '  select p.sha from {1} p join {2} pr on p.ID == pr.parentcommit_id' \
+              '  where pr.repocommit_id == chain.ID and p.position = 0 limit 1)' \
+              ' where c.date >= ? and c.date < ?{3})' \
+            .format(RepositoryCommitConn.TABLE_NAME, ParentCommitConn.TABLE_NAME, ParentCommitRepoCommitConn.TABLE_NAME,
+                    ' and not ({})'.format(stop_sql) if stop_sql is not None else '')
+        return sql, (head_id, lower, upper, lower, upper) + tuple(stop_params)
+
+    def get_first_parent_chain(self, repository_id, start_date=None, end_date=None, filename_filter=None):
+        """
+        gets the commits (and their file modifications) found by following the first parents of the last commit of
+        a repository, as long as they are between start and end dates. The chain is resolved by a single recursive
+        query
 
-        cursor.execute(sql)
-        row = cursor.fetchone()
-        if row is not None:
+        Parameters
+        ----------
+        repository_id: int
+        start_date: str
+            YYYY-MM-DD, inclusive
+        end_date: str
+            YYYY-MM-DD, exclusive
+        filename_filter: FilenameFilter
+            if given, only the file modifications that pass it are loaded; it is evaluated by the database
+
+        Returns
+        -------
+        list of Commit
+            from the last commit to the oldest one
+        """
+        cursor = self.conn.cursor()
+        head_id = self.get_chain_head(repository_id=repository_id, start_date=start_date, end_date=end_date)
+        if head_id is None:
+            return list()
+        if filename_filter is not None:
+            filter_sql, filter_params = filename_filter.to_sql(column='fm.filename')
+            filter_sql = ' and ' + filter_sql
+        else:
+            filter_sql, filter_params = '', ()
+        chain_sql, chain_params = RepositoryCommitConn.get_chain_sql(head_id=head_id, start_date=start_date,
+                                                                     end_date=end_date)
+        sql = chain_sql + \
+            ' select c.date, c.sha, {1}, c.ID, c.comment, fm.filename, fm.additions, fm.deletions, fm.changes,' \
+            ' fm.status from chain join {0} c on c.ID == chain.ID left join user on user.ID == c.user_id' \
+            ' left join {2} fm on fm.commit_id == c.ID{3} order by chain.depth;' \
+            .format(RepositoryCommitConn.TABLE_NAME, USER_COLUMNS, FileModificationConn.TABLE_NAME, filter_sql)
+        cursor.execute(sql, chain_params + tuple(filter_params))
+        users = dict()
+        commits = list()
+        commit = None
+        for row in cursor.fetchall():
+            if commit is None or commit.commit_id != row[6]:
+                dt = row[0]
+                if 'T' not in dt:
+                    dt = dt.replace(' ', 'T')
+                commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
+                commit = Commit(date=commit_date, sha=row[1], comment=row[7])
+                user = _get_user(users, *row[2:6])
+                if user is not None:
+                    commit.user = user
+                commit.commit_id = row[6]
+                commits.append(commit)
+            # commits without file modifications have a single row of NULLs
+            if row[8] is not None:
+                fm = FileModification(filename=row[8], additions=row[9], deletions=row[10], changes=row[11],
+                                      status=row[12])
+                commit.file_modifications.append(fm)
+        cursor.close()
+        return commits
+
+    def get_inconsistent_commits(self, repository_id, extensions):
+        """
+
+        Parameters
+        ----------
+        repository_id: int
+        extensions: list of str
+
+        Returns
+        -------
+        list of Commit
+        """
+        cursor = self.conn.cursor()
+        # one placeholder per extension, so that the statement is reused for the same number of extensions
+        s = '({})'.format(' or '.join(['filename like ?'] * len(extensions)) if len(extensions) > 0 else '0')
+        sql = 'select date, sha, {3}, {0}.ID, comment, filename, additions, deletions, changes, status ' \
+              ' from {0} join {1} on {0}.ID == {1}.commit_id left join user on user.ID == {0}.user_id ' \
+              'where repository_id == ? and ' \
+              "( (status == 'modified' and changes == 0) or (status == 'added' and additions == 0) or " \
+              "(status == 'removed' and deletions == 0) ) and {2};" \
+            .format(RepositoryCommitConn.TABLE_NAME, FileModificationConn.TABLE_NAME, s, USER_COLUMNS)
+        params = [repository_id]
+        params.extend(['%.{}'.format(ext) for ext in extensions])
+        try:
+            cursor.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            logging.critical('Error! sql={} e={}'.format(sql, e))
+        rows = cursor.fetchall()
+        users = dict()
+        commits = list()
+        filemodifications = dict()
+        for index, row in enumerate(rows):
+            sha = row[1]
+            if sha not in filemodifications.keys():
+                dt = row[0]
+                if 'T' not in dt:
+                    dt = dt.replace(' ', 'T')
+                commit_date = datetime.strptime(dt, '%Y-%m-%dT%H:%M:%S')
+                commit = Commit(date=commit_date, sha=sha, comment=row[7])
+                user = _get_user(users, *row[2:6])
+                if user is not None:
+                    commit.user = user
+                commit.commit_id = row[6]
+                commits.append(commit)
+            fm = FileModification(filename=row[8], additions=row[9], deletions=row[10], changes=row[11],
+                                  status=row[12])
+            if sha not in filemodifications.keys():
+                filemodifications[sha] = [fm]
+            else:
+                filemodifications[sha].append(fm)
+        for commit in commits:
+            commit.file_modifications = filemodifications[commit.sha]
+        return commits
+
+    def delete_commit(self, commit_id):
+        """
+
+        Returns
+        -------
+        Commit
+        """
+        cursor = self.conn.cursor()
+        LocTimelineConn(self.db_path).invalidate(commit_id=commit_id, commit=False)
+        sql = 'delete from {} where id == ?;'.format(RepositoryCommitConn.TABLE_NAME)
+        # logging.info('sql={}'.format(sql))
+        cursor.execute(sql, (commit_id,))
+        self.conn.commit()
+        cursor.close()
+        print('Deleted commits, query={} id={}'.format(sql, commit_id))
+        return
+
+
+class RepositoryConn:
+
+    TABLE_NAME = 'repository'
+
+    def __init__(self, path_to_db):
+        self.conn = ConnectionPool.connect(path_to_db)
+
+    def insert_repository(self, repository):
+        """
+
+        Parameters
+        ----------
+        repository: Repository
+
+        Returns
+        -------
+        int
+        """
+        cursor = self.conn.cursor()
+
+        sql = 'insert into {}(name, url) values (?, ?);'.format(RepositoryConn.TABLE_NAME)
+        cursor.execute(sql, (repository.name, repository.url))
+        last_row_id = cursor.lastrowid
+        self.conn.commit()
+        logging.info('The following SQL query was executed: {} name={} url={}'.format(sql, repository.name,
+                                                                                      repository.url))
+
+        cursor.close()
+        return last_row_id
+
+    def get_repository(self, repo_id: int = None):
+        """
+
+        Parameters
+        ----------
+        repo_id: int
+            repository ID
+
+        Returns
+        -------
+        Repository
+        """
+        assert repo_id is not None, "Error! Both parameters cannot be none"
+        cursor = self.conn.cursor()
+        sql = 'select name, url, ID from {0} where {0}.id = ?;'.format(RepositoryConn.TABLE_NAME)
+
+        cursor.execute(sql, (repo_id,))
+        row = cursor.fetchone()
+        if row is not None:
             assert row is not None, "Error! sql={}".format(sql)
             repo = Repository(name=row[0], url=row[1])
             repo.repository_id = row[2]
@@ -592,10 +1244,9 @@ class RepositoryConn:
         assert url is not None, "Error! Both parameters cannot be none"
         cursor = self.conn.cursor()
 
-        sql = 'select name, ID from {0} where {0}.url = "{1}"' \
-            .format(RepositoryConn.TABLE_NAME, url)
+        sql = 'select name, ID from {0} where {0}.url = ?;'.format(RepositoryConn.TABLE_NAME)
 
-        cursor.execute(sql)
+        cursor.execute(sql, (url,))
         row = cursor.fetchone()
         if row is not None:
             assert row is not None, "Error! sql={}".format(sql)
@@ -618,10 +1269,10 @@ class RepositoryConn:
         Repository
         """
         cursor = self.conn.cursor()
-        sql = 'select name, url, {0}.ID from {0} join {1} on {0}.id = {1}.repository_id where sha == "{2}";' \
-            .format(RepositoryConn.TABLE_NAME, RepositoryCommitConn.TABLE_NAME, sha)
+        sql = 'select name, url, {0}.ID from {0} join {1} on {0}.id = {1}.repository_id where sha == ?;' \
+            .format(RepositoryConn.TABLE_NAME, RepositoryCommitConn.TABLE_NAME)
 
-        cursor.execute(sql)
+        cursor.execute(sql, (sha,))
         row = cursor.fetchone()
         if row is not None:
             assert row is not None, "Error! sql={}".format(sql)
@@ -663,10 +1314,12 @@ class RepositoryConn:
 
         cursor = self.conn.cursor()
         if repository_id is not None:
-            sql = 'delete from {} where ID == {};'.format(RepositoryConn.TABLE_NAME, repository_id)
+            sql = 'delete from {} where ID == ?;'.format(RepositoryConn.TABLE_NAME)
+            params = (repository_id,)
         else:
-            sql = 'delete from {} where name == "{}";'.format(RepositoryConn.TABLE_NAME, repository_name)
-        cursor.execute(sql)
+            sql = 'delete from {} where name == ?;'.format(RepositoryConn.TABLE_NAME)
+            params = (repository_name,)
+        cursor.execute(sql, params)
         self.conn.commit()
 
 
@@ -675,7 +1328,8 @@ class FileModificationConn:
     TABLE_NAME = 'filemodification'
 
     def __init__(self, path_to_db):
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
+        self.db_path = path_to_db
 
     def insert_file_modification(self, commit_id, fm):
         """
@@ -690,18 +1344,41 @@ class FileModificationConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'select * from {} where commit_id == {} AND additions == {} AND changes == {} AND deletions == {} AND ' \
-              'filename == "{}";'.format(FileModificationConn.TABLE_NAME, commit_id, fm.additions, fm.changes,
-                                         fm.deletions, fm.filename)
-        cursor.execute(sql)
+        sql = 'select * from {} where commit_id == ? AND additions == ? AND changes == ? AND deletions == ? AND ' \
+              'filename == ?;'.format(FileModificationConn.TABLE_NAME)
+        cursor.execute(sql, (commit_id, fm.additions, fm.changes, fm.deletions, fm.filename))
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(filename, changes, additions, deletions, status, commit_id) values ("{}", {}, {}, {}, "{}",' \
-                  ' {});' \
-                .format(FileModificationConn.TABLE_NAME, fm.filename, fm.changes, fm.additions, fm.deletions, fm.status,
-                        commit_id)
-            logging.info(sql)
-            cursor.execute(sql)
+            sql = 'insert into {}(filename, changes, additions, deletions, status, commit_id) ' \
+                  'values (?, ?, ?, ?, ?, ?);' \
+                .format(FileModificationConn.TABLE_NAME)
+            logging.info('{} filename={} commit_id={}'.format(sql, fm.filename, commit_id))
+            cursor.execute(sql, (fm.filename, fm.changes, fm.additions, fm.deletions, fm.status, commit_id))
+            self.conn.commit()
+        cursor.close()
+
+    def insert_file_modifications(self, rows, commit=True):
+        """
+        inserts many file modifications; a file modification is ignored if its commit already has one of the same
+        file
+
+        Parameters
+        ----------
+        rows: list of tuple
+            (commit_id, FileModification) pairs
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        None
+        """
+        sql = 'insert into {}(filename, changes, additions, deletions, status, commit_id) values (?, ?, ?, ?, ?, ?) ' \
+              'on conflict(filename, commit_id) do nothing;'.format(FileModificationConn.TABLE_NAME)
+        cursor = self.conn.cursor()
+        cursor.executemany(sql, [(fm.filename, fm.changes, fm.additions, fm.deletions, fm.status, commit_id)
+                                 for commit_id, fm in rows])
+        if commit:
             self.conn.commit()
         cursor.close()
 
@@ -717,13 +1394,12 @@ class FileModificationConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'delete from {} where commit_id == {};' \
-            .format(FileModificationConn.TABLE_NAME, commit_id)
+        sql = 'delete from {} where commit_id == ?;'.format(FileModificationConn.TABLE_NAME)
         # logging.info('sql={}'.format(sql))
-        cursor.execute(sql)
+        cursor.execute(sql, (commit_id,))
         self.conn.commit()
         cursor.close()
-        print('Deleted file modifications, query={}'.format(sql))
+        print('Deleted file modifications, query={} commit_id={}'.format(sql, commit_id))
         return
 
     def get_file_modification_by_name_and_date(self, filename, until_date, repository_id):
@@ -743,12 +1419,11 @@ class FileModificationConn:
         file_modifications = list()
         cursor = self.conn.cursor()
         sql = 'select * from {0} join {1} on {1}.id == {0}.commit_id ' \
-              'where date({1}.date) < date("{2}") and {1}.repository_id == {3} ' \
-              'and {0}.filename == "{4}";' \
-            .format(FileModificationConn.TABLE_NAME, RepositoryCommitConn.TABLE_NAME, until_date, repository_id,
-                    filename)
+              'where date({1}.date) < date(?) and {1}.repository_id == ? ' \
+              'and {0}.filename == ?;' \
+            .format(FileModificationConn.TABLE_NAME, RepositoryCommitConn.TABLE_NAME)
         # logging.info('sql={}'.format(sql))
-        cursor.execute(sql)
+        cursor.execute(sql, (until_date, repository_id, filename))
         rows = cursor.fetchall()
         for row in rows:
             fm = FileModification(filename=row[0], changes=row[1], additions=row[2], deletions=row[3],
@@ -758,6 +1433,8 @@ class FileModificationConn:
 
     def update_filemodification(self, filemodification, commit_id):
         """
+        updates a file modification; the LOC timelines that have its commit are not updated, so that the commits of a
+        batch of repairs are recomputed once (see LocTimelineConn.recompute_commits)
 
         Parameters
         ----------
@@ -769,11 +1446,12 @@ class FileModificationConn:
 
         """
         cursor = self.conn.cursor()
-        sql = 'update {} set changes={}, deletions={}, additions={} where filename="{}" and commit_id={}' \
-            .format(FileModificationConn.TABLE_NAME, filemodification.changes, filemodification.deletions,
-                    filemodification.additions, filemodification.filename, commit_id)
-        logging.info('updating: {}'.format(sql))
-        cursor.execute(sql)
+        sql = 'update {} set changes = ?, deletions = ?, additions = ? where filename == ? and commit_id == ?;' \
+            .format(FileModificationConn.TABLE_NAME)
+        params = (filemodification.changes, filemodification.deletions, filemodification.additions,
+                  filemodification.filename, commit_id)
+        logging.info('updating: {} params={}'.format(sql, params))
+        cursor.execute(sql, params)
         self.conn.commit()
         return
 
@@ -793,19 +1471,23 @@ class FileModificationConn:
         """
         file_modifications = list()
         cursor = self.conn.cursor()
-        sql = 'select filename, changes, additions, deletions, status from {} where commit_id == {};' \
-            .format(FileModificationConn.TABLE_NAME, commit.commit_id)
-
-        cursor.execute(sql)
+        sql = 'select filename, changes, additions, deletions, status from {} where commit_id == ?' \
+            .format(FileModificationConn.TABLE_NAME)
+        params = [commit.commit_id]
+        # a row is kept if no excluding pattern is in its filename or if any including pattern is
+        if len(excluding_patterns) > 0:
+            sql += ' and (not ({}) or {})'.format(' or '.join(['instr(filename, ?) > 0'] * len(excluding_patterns)),
+                                                  ' or '.join(['instr(filename, ?) > 0'] * len(including_patterns))
+                                                  if len(including_patterns) > 0 else '0')
+            params.extend(excluding_patterns)
+            params.extend(including_patterns)
+        cursor.execute(sql + ';', params)
         rows = cursor.fetchall()
 
         for row in rows:
             fm = FileModification(filename=row[0], changes=row[1], additions=row[2], deletions=row[3],
                                   status=row[4])
-            if all(exc_pat not in fm.filename for exc_pat in excluding_patterns) or \
-                any(inc_pat in fm.filename for inc_pat in including_patterns) or \
-                len(including_patterns) == len(excluding_patterns) == 0:
-                file_modifications.append(fm)
+            file_modifications.append(fm)
 
         return file_modifications
 
@@ -822,10 +1504,9 @@ class FileModificationConn:
         FileModification
         """
         cursor = self.conn.cursor()
-        sql = 'select filename, changes, additions, deletions, status from {} where commit_id == {} and filename == "{}";' \
-            .format(FileModificationConn.TABLE_NAME, commit_id, filename)
-        print(sql)
-        cursor.execute(sql)
+        sql = 'select filename, changes, additions, deletions, status from {} where commit_id == ? and filename == ?;' \
+            .format(FileModificationConn.TABLE_NAME)
+        cursor.execute(sql, (commit_id, filename))
         row = cursor.fetchone()
         if row is not None:
             fm = FileModification(filename=row[0], changes=row[1], additions=row[2], deletions=row[3],
@@ -845,7 +1526,7 @@ class IssueConn:
 
     def __init__(self, path_to_db):
         self.db_path = path_to_db
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
 
     def insert_issue(self, title, body, created_at, closed_at, updated_at, repository_id, user_id, state):
         """
@@ -869,11 +1550,11 @@ class IssueConn:
         int
         """
         cursor = self.conn.cursor()
-        sql = 'select ID from {} where created_at == "{}" AND repository_id == {} AND user_id == {} AND title == "{}";' \
-            .format(IssueConn.ISSUE_TABLE_NAME, created_at, repository_id, user_id, title)
+        sql = 'select ID from {} where created_at == ? AND repository_id == ? AND user_id == ? AND title == ?;' \
+            .format(IssueConn.ISSUE_TABLE_NAME)
         # logging.info('sql={}'.format(sql))
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (created_at, repository_id, user_id, title))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
@@ -904,22 +1585,22 @@ class IssueConn:
         List[Issue]
         """
         sql = 'select issue.ID, issue.title, issue.body, issue.created_at, issue.closed_at, issue.updated_at,' \
-              ' issue.repository_id, issue.state, issue.user_id from {} join' \
-              ' issuelabel on issuelabel.issue_id == issue.ID and issue.repository_id == {}' \
-              ' join label on issuelabel.label_id == label.ID and label.name == "bug";' \
-            .format(IssueConn.ISSUE_TABLE_NAME, repository_id)
+              ' issue.repository_id, issue.state, {1} from {0} join' \
+              ' issuelabel on issuelabel.issue_id == issue.ID and issue.repository_id == ?' \
+              " join label on issuelabel.label_id == label.ID and label.name == 'bug'" \
+              ' left join user on user.ID == issue.user_id;' \
+            .format(IssueConn.ISSUE_TABLE_NAME, USER_COLUMNS)
         cursor = self.conn.cursor()
-        user_conn = UserConn(path_to_db=self.db_path)
+        users = dict()
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (repository_id,))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
         rows = cursor.fetchall()
         issues = list()
         for row in rows:
-            user_id = row[8]
-            user = user_conn.get_user(user_id=user_id)
+            user = _get_user(users, *row[8:12])
             created_at = row[3]  # type: str
             if created_at is not None and not created_at.endswith('Z'):
                 created_at += 'Z'
@@ -946,20 +1627,17 @@ class IssueConn:
         int
         """
         cursor = self.conn.cursor()
-        sql = 'select ID from {} where name == "{}" AND description == "{}";' \
-            .format(IssueConn.LABEL_TABLE_NAME, label.name, label.description)
+        sql = 'select ID from {} where name == ? AND description IS ?;'.format(IssueConn.LABEL_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (label.name, label.description))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(name, description)' \
-                  ' values ("{}", "{}");' \
-                .format(IssueConn.LABEL_TABLE_NAME, label.name, label.description)
+            sql = 'insert into {}(name, description) values (?, ?);'.format(IssueConn.LABEL_TABLE_NAME)
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (label.name, label.description))
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
                 raise e
@@ -983,10 +1661,9 @@ class IssueConn:
         list of Label
         """
         cursor = self.conn.cursor()
-        sql = 'select id, name, description from {} where name == "{}";' \
-            .format(IssueConn.LABEL_TABLE_NAME, name)
+        sql = 'select id, name, description from {} where name == ?;'.format(IssueConn.LABEL_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (name,))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
@@ -1010,20 +1687,17 @@ class IssueConn:
         int
         """
         cursor = self.conn.cursor()
-        sql = 'select ID from {} where login == "{}";' \
-            .format(IssueConn.ASSIGNEE_TABLE_NAME, assignee.login)
+        sql = 'select ID from {} where login == ?;'.format(IssueConn.ASSIGNEE_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (assignee.login,))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(login, htmlurl)' \
-                  ' values ("{}", "{}");' \
-                .format(IssueConn.ASSIGNEE_TABLE_NAME, assignee.login, assignee.htmlurl)
+            sql = 'insert into {}(login, htmlurl) values (?, ?);'.format(IssueConn.ASSIGNEE_TABLE_NAME)
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (assignee.login, assignee.htmlurl))
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
                 raise e
@@ -1047,10 +1721,9 @@ class IssueConn:
         list of Assignee
         """
         cursor = self.conn.cursor()
-        sql = 'select ID, login, htmlurl from {} where login == "{}";' \
-            .format(IssueConn.ASSIGNEE_TABLE_NAME, login)
+        sql = 'select ID, login, htmlurl from {} where login == ?;'.format(IssueConn.ASSIGNEE_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (login,))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
@@ -1076,19 +1749,17 @@ class IssueConn:
         """
 
         cursor = self.conn.cursor()
-        sql = 'select issue_id from {} where issue_id == {} and label_id == {}' \
-            .format(IssueConn.ISSUELABEL_TABLE_NAME, issue_id, label_id)
+        sql = 'select issue_id from {} where issue_id == ? and label_id == ?;'.format(IssueConn.ISSUELABEL_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (issue_id, label_id))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(issue_id, label_id) values ({}, {});' \
-                .format(IssueConn.ISSUELABEL_TABLE_NAME, issue_id, label_id)
+            sql = 'insert into {}(issue_id, label_id) values (?, ?);'.format(IssueConn.ISSUELABEL_TABLE_NAME)
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (issue_id, label_id))
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
                 raise e
@@ -1109,19 +1780,18 @@ class IssueConn:
         None
         """
         cursor = self.conn.cursor()
-        sql = 'select issue_id from {} where issue_id == {} and assignee_id == {};' \
-            .format(IssueConn.ISSUEASSIGNEE_TABLE_NAME, issue_id, assignee_id)
+        sql = 'select issue_id from {} where issue_id == ? and assignee_id == ?;' \
+            .format(IssueConn.ISSUEASSIGNEE_TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (issue_id, assignee_id))
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
             raise e
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(issue_id, assignee_id) values ({}, {});' \
-                .format(IssueConn.ISSUEASSIGNEE_TABLE_NAME, issue_id, assignee_id)
+            sql = 'insert into {}(issue_id, assignee_id) values (?, ?);'.format(IssueConn.ISSUEASSIGNEE_TABLE_NAME)
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (issue_id, assignee_id))
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
                 raise e
@@ -1135,7 +1805,7 @@ class ServiceConn:
     TABLE_NAME = 'service'
 
     def __init__(self, path_to_db):
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
 
     def update_service(self, start_date: date, end_date: date, service_id: int):
         """
@@ -1161,13 +1831,13 @@ class ServiceConn:
 
         cursor = self.conn.cursor()
         if end_date is not None:
-            sql = 'update {} set start_date = "{}" , end_date = "{}" where id = {}' \
-                .format(ServiceConn.TABLE_NAME, start_date.isoformat(), end_date.isoformat(), service_id)
+            sql = 'update {} set start_date = ?, end_date = ? where id = ?;'.format(ServiceConn.TABLE_NAME)
+            params = (start_date.isoformat(), end_date.isoformat(), service_id)
         else:
-            sql = 'update {} set start_date = "{}" where id = {}' \
-                .format(ServiceConn.TABLE_NAME, start_date.isoformat(), service_id)
+            sql = 'update {} set start_date = ? where id = ?;'.format(ServiceConn.TABLE_NAME)
+            params = (start_date.isoformat(), service_id)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, params)
         except sqlite3.OperationalError as e:
             logging.critical('Error! update_service sql={} msg={}'.format(sql, e))
             raise e
@@ -1192,11 +1862,13 @@ class ServiceConn:
         if since_date is None:
             sql = 'select id, name, start_date, end_date from {};' \
                 .format(ServiceConn.TABLE_NAME)
+            params = ()
         else:
             assert isinstance(since_date, date), "Error! since_date is not a type of date"
-            sql = 'select id, name, start_date, end_date from {} where date(start_date) <= date("{}");' \
-                .format(ServiceConn.TABLE_NAME, since_date.isoformat(), since_date.isoformat())
-        cursor.execute(sql)
+            sql = 'select id, name, start_date, end_date from {} where date(start_date) <= date(?);' \
+                .format(ServiceConn.TABLE_NAME)
+            params = (since_date.isoformat(),)
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
         services = list()
         for row in rows:
@@ -1250,12 +1922,12 @@ class ServiceConn:
         assert name is not None or service_id is not None, "Error! both parameters are none"
         cursor = self.conn.cursor()
         if name is not None:
-            sql = 'select id, name, start_date, end_date from {} where name == "{}";' \
-                .format(ServiceConn.TABLE_NAME, name)
+            sql = 'select id, name, start_date, end_date from {} where name == ?;'.format(ServiceConn.TABLE_NAME)
+            params = (name,)
         else:
-            sql = 'select id, name, start_date, end_date from {} where ID == {};' \
-                .format(ServiceConn.TABLE_NAME, service_id)
-        cursor.execute(sql)
+            sql = 'select id, name, start_date, end_date from {} where ID == ?;'.format(ServiceConn.TABLE_NAME)
+            params = (service_id,)
+        cursor.execute(sql, params)
         row = cursor.fetchone()
         if row is None:
             return None
@@ -1284,10 +1956,10 @@ class ServiceConn:
             assert name is not None, "Error! database schema does not allow name to be None"
             assert start_date is not None, "Error! database schema does not allow start_date to be None"
             assert isinstance(start_date, date), "Error! start_date is not a date: {}".format(type(start_date))
-            sql = 'insert into service(name, start_date) values ("{}", "{}")'.format(name, start_date.isoformat())
+            sql = 'insert into {}(name, start_date) values (?, ?);'.format(ServiceConn.TABLE_NAME)
             cursor = self.conn.cursor()
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (name, start_date.isoformat()))
 
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
@@ -1311,10 +1983,10 @@ class ServiceConn:
         int
             new service ID
         """
-        sql = 'delete from service where ID={}'.format(service_id)
+        sql = 'delete from {} where ID == ?;'.format(ServiceConn.TABLE_NAME)
         cursor = self.conn.cursor()
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (service_id,))
 
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
@@ -1327,7 +1999,8 @@ class ServiceRepositoryConn:
     TABLE_NAME = 'servicerepository'
 
     def __init__(self, path_to_db):
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
+        self.db_path = path_to_db
 
     def get_service_repository(self, service_name=None, repository_name=None):
         """
@@ -1345,14 +2018,16 @@ class ServiceRepositoryConn:
         if service_name is not None:
             sql = 'select {0}.repository_id, {0}.service_id, {0}.start_date, ' \
                   '{0}.end_date, {0}.initial_loc from {0} join {1} ' \
-                  'on {1}.ID == {0}.service_id where service.name == "{2}";' \
-                .format(ServiceRepositoryConn.TABLE_NAME, ServiceConn.TABLE_NAME, service_name)
+                  'on {1}.ID == {0}.service_id where service.name == ?;' \
+                .format(ServiceRepositoryConn.TABLE_NAME, ServiceConn.TABLE_NAME)
+            params = (service_name,)
         else:
-            sql = 'select servicerepository.repository_id, servicerepository.service_id, servicerepository.start_date, ' \
-                  'servicerepository.end_date from {0} join {1} ' \
-                  'on service.ID == servicerepository.service_id where {1}.name == "{2}";' \
-                .format(ServiceRepositoryConn.TABLE_NAME, RepositoryConn.TABLE_NAME, repository_name)
-        cursor.execute(sql)
+            sql = 'select {0}.repository_id, {0}.service_id, {0}.start_date, ' \
+                  '{0}.end_date, {0}.initial_loc from {0} join {1} ' \
+                  'on {1}.ID == {0}.repository_id where {1}.name == ?;' \
+                .format(ServiceRepositoryConn.TABLE_NAME, RepositoryConn.TABLE_NAME)
+            params = (repository_name,)
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
         services = list()
         if rows is not None:
@@ -1376,10 +2051,9 @@ class ServiceRepositoryConn:
         :rtype: List[dict]
         """
         cursor = self.conn.cursor()
-        sql = 'select servicerepository.repository_id, servicerepository.service_id, servicerepository.start_date, ' \
-              'servicerepository.end_date from {0} where service_id == "{1}";' \
-            .format(ServiceRepositoryConn.TABLE_NAME, service_id)
-        cursor.execute(sql)
+        sql = 'select repository_id, service_id, start_date, end_date, initial_loc from {} where service_id == ?;' \
+            .format(ServiceRepositoryConn.TABLE_NAME)
+        cursor.execute(sql, (service_id,))
         rows = cursor.fetchall()
         service_repos = list()
         if rows is not None:
@@ -1415,25 +2089,26 @@ class ServiceRepositoryConn:
             assert isinstance(initial_loc, int), "Error! Invalid type of initial_loc"
             assert initial_loc >= 0, "Error! Invalid initial_loc = {}".format(initial_loc)
         cursor = self.conn.cursor()
-        sql = 'select start_date, end_date, initial_loc from servicerepository where service_id = {} and' \
-              ' repository_id = {}'.format(service_id, repository_id)
+        sql = 'select start_date, end_date, initial_loc from {} where service_id = ? and repository_id = ?;' \
+            .format(ServiceRepositoryConn.TABLE_NAME)
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, (service_id, repository_id))
         except sqlite3.OperationalError as e:
             raise e
         row = cursor.fetchone()
         # if this relationship has not been inserted, then insert it
         if row is None:
             if end_date is not None:
-                sql = 'insert into servicerepository(service_id, repository_id, start_date, end_date, initial_loc)' \
-                      ' values ({}, {}, "{}", "{}", {})'.format(service_id, repository_id, start_date, end_date,
-                                                                initial_loc)
+                sql = 'insert into {}(service_id, repository_id, start_date, end_date, initial_loc)' \
+                      ' values (?, ?, ?, ?, ?);'.format(ServiceRepositoryConn.TABLE_NAME)
+                params = (service_id, repository_id, start_date, end_date, initial_loc)
             else:
-                sql = 'insert into servicerepository(service_id, repository_id, start_date, initial_loc)' \
-                      ' values ({}, {}, "{}", {})'.format(service_id, repository_id, start_date, initial_loc)
+                sql = 'insert into {}(service_id, repository_id, start_date, initial_loc)' \
+                      ' values (?, ?, ?, ?);'.format(ServiceRepositoryConn.TABLE_NAME)
+                params = (service_id, repository_id, start_date, initial_loc)
 
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, params)
 
             except sqlite3.OperationalError as e:
                 logging.error('Error! Invalid operation: {}'.format(sql))
@@ -1452,13 +2127,18 @@ class ServiceRepositoryConn:
         :return:
         """
         assert (service_id is not None) or (repository_id is not None)
+        timeline_conn = LocTimelineConn(self.db_path)
         if service_id is not None:
-            sql = 'delete from servicerepository where service_id={}'.format(service_id)
+            sql = 'delete from {} where service_id == ?;'.format(ServiceRepositoryConn.TABLE_NAME)
+            params = (service_id,)
+            timeline_conn.invalidate(service_id=service_id, commit=False)
         else:
-            sql = 'delete from servicerepository where repository_id={}'.format(repository_id)
+            sql = 'delete from {} where repository_id == ?;'.format(ServiceRepositoryConn.TABLE_NAME)
+            params = (repository_id,)
+            timeline_conn.invalidate(repository_id=repository_id, commit=False)
         cursor = self.conn.cursor()
         try:
-            cursor.execute(sql)
+            cursor.execute(sql, params)
 
         except sqlite3.OperationalError as e:
             logging.error('Error! Invalid operation: {}'.format(sql))
@@ -1472,7 +2152,7 @@ class ServiceExtensionsConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def insert_service_extension(self, service_id: int, extension_id: int):
@@ -1489,15 +2169,13 @@ class ServiceExtensionsConn:
         """
         cursor = self.conn.cursor()
 
-        sql = 'select * from {} where service_id = {} and extension_id = {};' \
-            .format(ServiceExtensionsConn.TABLE_NAME, service_id, extension_id)
-        cursor.execute(sql)
+        sql = 'select * from {} where service_id = ? and extension_id = ?;'.format(ServiceExtensionsConn.TABLE_NAME)
+        cursor.execute(sql, (service_id, extension_id))
         row = cursor.fetchone()
         if row is None:
-            sql = 'insert into {}(service_id, extension_id) values({},{});' \
-                .format(ServiceExtensionsConn.TABLE_NAME, service_id, extension_id)
+            sql = 'insert into {}(service_id, extension_id) values (?, ?);'.format(ServiceExtensionsConn.TABLE_NAME)
             try:
-                cursor.execute(sql)
+                cursor.execute(sql, (service_id, extension_id))
             except sqlite3.OperationalError as e:
                 logging.error('Error! insert_service_extension: sql={} msg={}'.format(sql, e))
                 raise e
@@ -1512,7 +2190,7 @@ class ExtensionsConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def list_extensions(self) -> list:
@@ -1556,9 +2234,9 @@ class ExtensionsConn:
         assert isinstance(service_id, int), "Error! service_id is not a int"
         cursor = self.conn.cursor()
 
-        sql = 'select value from {0} join {1} on {0}.id == {1}.extension_id where {1}.service_id == {2};' \
-            .format(ExtensionsConn.TABLE_NAME, ExtensionsConn.SERVICE_EXTENSIONS, service_id)
-        cursor.execute(sql)
+        sql = 'select value from {0} join {1} on {0}.id == {1}.extension_id where {1}.service_id == ?;' \
+            .format(ExtensionsConn.TABLE_NAME, ExtensionsConn.SERVICE_EXTENSIONS)
+        cursor.execute(sql, (service_id,))
         rows = cursor.fetchall()
         exts = list()
         if rows is None or len(rows) == 0:
@@ -1576,7 +2254,7 @@ class FilenamePatternConn:
 
     def __init__(self, path_to_db):
 
-        self.conn = sqlite3.connect(path_to_db)
+        self.conn = ConnectionPool.connect(path_to_db)
         self.db_path = path_to_db
 
     def get_patterns(self, service_id, repository_id, pattern_type):
@@ -1596,9 +2274,9 @@ class FilenamePatternConn:
             "Error! Invalid pattern type: {}".format(pattern_type)
         cursor = self.conn.cursor()
 
-        sql = 'select pattern from {0} where service_id == {1} and repository_id = {2} and type = "{3}";' \
-            .format(FilenamePatternConn.TABLE_NAME, service_id, repository_id, pattern_type)
-        cursor.execute(sql)
+        sql = 'select pattern from {} where service_id == ? and repository_id == ? and type == ?;' \
+            .format(FilenamePatternConn.TABLE_NAME)
+        cursor.execute(sql, (service_id, repository_id, pattern_type))
         rows = cursor.fetchall()
         if rows is None or len(rows) == 0:
             return list()
@@ -1608,3 +2286,609 @@ class FilenamePatternConn:
                 value = row[0]
                 patterns.append(value)
             return patterns
+
+    def insert_pattern(self, pattern, pattern_type, service_id, repository_id):
+        """
+        insert a filename pattern if it is new
+
+        Parameters
+        ----------
+        pattern: str
+        pattern_type: str
+            'inclusion' or 'exclusion'
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        int
+            ID of the pattern
+        """
+        assert pattern_type == 'inclusion' or pattern_type == 'exclusion', \
+            "Error! Invalid pattern type: {}".format(pattern_type)
+        assert isinstance(pattern, str), "Error! pattern is not a str: {}".format(pattern)
+        cursor = self.conn.cursor()
+        sql = 'select id from {} where pattern == ? and type == ? and service_id == ? and repository_id == ?;' \
+            .format(FilenamePatternConn.TABLE_NAME)
+        cursor.execute(sql, (pattern, pattern_type, service_id, repository_id))
+        row = cursor.fetchone()
+        if row is not None:
+            return row[0]
+        sql = 'insert into {}(pattern, type, service_id, repository_id) values (?, ?, ?, ?);' \
+            .format(FilenamePatternConn.TABLE_NAME)
+        try:
+            cursor.execute(sql, (pattern, pattern_type, service_id, repository_id))
+        except sqlite3.OperationalError as e:
+            logging.error('Error! insert_pattern: sql={} msg={}'.format(sql, e))
+            raise e
+        self.conn.commit()
+        return cursor.lastrowid
+
+
+class MiningCheckpointConn:
+    """
+    state of each phase (e.g. commits, issues, repair) of the mining of each repository. A phase that is RUNNING was
+    interrupted and resumes from page_url, last_sha and last_id; a phase that is DONE resumes from last_date, which is
+    the date of the newest item it mined
+    """
+
+    TABLE_NAME = 'miningcheckpoint'
+    RUNNING = 'running'
+    DONE = 'done'
+
+    def __init__(self, path_to_db):
+        self.conn = ConnectionPool.connect(path_to_db)
+
+    def get_checkpoint(self, repository_id, phase):
+        """
+
+        Parameters
+        ----------
+        repository_id: int
+        phase: str
+
+        Returns
+        -------
+        dict
+            page_url, last_sha, last_date, last_id, status and updated_at of the checkpoint or None if the phase has
+            no checkpoint
+        """
+        cursor = self.conn.cursor()
+        sql = 'select page_url, last_sha, last_date, last_id, status, updated_at from {} ' \
+              'where repository_id == ? and phase == ?;'.format(MiningCheckpointConn.TABLE_NAME)
+        cursor.execute(sql, (repository_id, phase))
+        row = cursor.fetchone()
+        cursor.close()
+        if row is None:
+            return None
+        return {'page_url': row[0], 'last_sha': row[1], 'last_date': row[2], 'last_id': row[3], 'status': row[4],
+                'updated_at': row[5]}
+
+    def save_checkpoint(self, repository_id, phase, page_url=None, last_sha=None, last_date=None, last_id=None,
+                        status=RUNNING):
+        """
+        inserts or replaces the checkpoint of a phase of the mining of a repository
+
+        Parameters
+        ----------
+        repository_id: int
+        phase: str
+        page_url: str
+            URL of the next page to be processed
+        last_sha: str
+            SHA of the last commit that was written to the database
+        last_date: str
+            ISO format
+        last_id: int
+            ID of the last row that was processed
+        status: str
+            RUNNING or DONE
+
+        Returns
+        -------
+        None
+        """
+        assert status in (MiningCheckpointConn.RUNNING, MiningCheckpointConn.DONE), \
+            "Error! Invalid status: {}".format(status)
+        cursor = self.conn.cursor()
+        sql = 'insert or replace into {}(repository_id, phase, page_url, last_sha, last_date, last_id, status, ' \
+              'updated_at) values (?, ?, ?, ?, ?, ?, ?, ?);'.format(MiningCheckpointConn.TABLE_NAME)
+        params = (repository_id, phase, page_url, last_sha, last_date, last_id, status,
+                  datetime.now().isoformat(sep='T'))
+        try:
+            cursor.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            logging.critical('Error! save_checkpoint sql={} msg={}'.format(sql, e))
+            raise e
+        cursor.close()
+        self.conn.commit()
+
+    def delete_checkpoint(self, repository_id, phase):
+        """
+
+        Parameters
+        ----------
+        repository_id: int
+        phase: str
+
+        Returns
+        -------
+        None
+        """
+        sql = 'delete from {} where repository_id == ? and phase == ?;'.format(MiningCheckpointConn.TABLE_NAME)
+        self.conn.execute(sql, (repository_id, phase))
+        self.conn.commit()
+
+
+class LocTimelineConn:
+    """
+    running additions, deletions and LOC of the chain of first parents of a repository of a service (see
+    RepositoryCommitConn.get_first_parent_chain), one row per commit, so that the LOC of the repository at any time is
+    a single indexed lookup. The timeline of a pair (service, repository) is built by rebuild, which also stores the
+    dates and the filename filter of the pair, and then it is kept up to date when commits are inserted (append_commits)
+    and when file modifications are repaired (recompute_commits). Rows are in the order of their dates and then of their
+    positions in the chain, as DataMgr.compute_loc_per_repository sorts commits, and LOC is never negative, as there.
+    A database that has not been migrated to the tables of the timelines has no timelines to keep up to date
+    """
+
+    TABLE_NAME = 'loctimeline'
+    PAIR_TABLE_NAME = 'loctimelinepair'
+    PAIR_COLUMNS = ('service_id', 'repository_id', 'start_date', 'end_date', 'extensions', 'including_patterns',
+                    'excluding_patterns')
+
+    def __init__(self, path_to_db):
+        self.conn = ConnectionPool.connect(path_to_db)
+        self.db_path = path_to_db
+
+    def has_timelines(self):
+        """
+
+        Returns
+        -------
+        bool
+            whether the database has the tables of the timelines
+        """
+        sql = "select count(*) from sqlite_master where type == 'table' and name in (?, ?);"
+        row = self.conn.execute(sql, (LocTimelineConn.TABLE_NAME, LocTimelineConn.PAIR_TABLE_NAME)).fetchone()
+        return row[0] == 2
+
+    def get_pair(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        dict
+            start_date, end_date and the extensions, including_patterns and excluding_patterns of the filename filter
+            the timeline was built with (None if it was built without a filter), or None if it has not been built
+        """
+        sql = 'select {} from {} where service_id == ? and repository_id == ?;' \
+            .format(', '.join(LocTimelineConn.PAIR_COLUMNS), LocTimelineConn.PAIR_TABLE_NAME)
+        row = self.conn.execute(sql, (service_id, repository_id)).fetchone()
+        return LocTimelineConn._to_pair(row) if row is not None else None
+
+    def _get_pairs(self, repository_id=None, commit_id=None):
+        """
+
+        Parameters
+        ----------
+        repository_id: int
+        commit_id: int
+            if given, only the pairs whose timelines have the commit
+
+        Returns
+        -------
+        list of dict
+            pairs whose timelines have been built
+        """
+        if not self.has_timelines():
+            return list()
+        if commit_id is not None:
+            sql = 'select {} from {} p join {} t on t.service_id == p.service_id ' \
+                  'and t.repository_id == p.repository_id where t.commit_id == ?;' \
+                .format(', '.join('p.' + column for column in LocTimelineConn.PAIR_COLUMNS),
+                        LocTimelineConn.PAIR_TABLE_NAME, LocTimelineConn.TABLE_NAME)
+            params = (commit_id,)
+        else:
+            sql = 'select {} from {} where repository_id == ?;' \
+                .format(', '.join(LocTimelineConn.PAIR_COLUMNS), LocTimelineConn.PAIR_TABLE_NAME)
+            params = (repository_id,)
+        return [LocTimelineConn._to_pair(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _to_pair(row):
+        pair = dict(zip(LocTimelineConn.PAIR_COLUMNS, row))
+        for column in ('extensions', 'including_patterns', 'excluding_patterns'):
+            if pair.get(column) is not None:
+                pair[column] = json.loads(pair.get(column))
+        return pair
+
+    @staticmethod
+    def _get_filter_sql(pair):
+        """
+
+        Parameters
+        ----------
+        pair: dict
+
+        Returns
+        -------
+        str, tuple
+            condition on the file modifications fm that are counted, preceded by 'and', and its parameters
+        """
+        if pair.get('extensions') is None:
+            return '', ()
+        # filesystem_mgr imports this module
+        from microservices_miner.control.filesystem_mgr import FilenameFilter
+        filename_filter = FilenameFilter(extensions=pair.get('extensions'),
+                                         including_patterns=pair.get('including_patterns'),
+                                         excluding_patterns=pair.get('excluding_patterns'))
+        filter_sql, filter_params = filename_filter.to_sql(column='fm.filename')
+        return ' and ' + filter_sql, tuple(filter_params)
+
+    def rebuild(self, service_id, repository_id, start_date=None, end_date=None, filename_filter=None, commit=True):
+        """
+        builds the timeline of a repository of a service from scratch
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        start_date: str
+            YYYY-MM-DD, inclusive
+        end_date: str
+            YYYY-MM-DD, exclusive
+        filename_filter: FilenameFilter
+            if given, only the file modifications that pass it are counted
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        int
+            number of commits of the timeline
+        """
+        if filename_filter is not None:
+            rules = (json.dumps(sorted(filename_filter.extensions)),
+                     json.dumps(list(filename_filter.including_patterns)),
+                     json.dumps(list(filename_filter.excluding_patterns)))
+        else:
+            rules = (None, None, None)
+        sql = 'insert or replace into {}({}) values ({});'.format(
+            LocTimelineConn.PAIR_TABLE_NAME, ', '.join(LocTimelineConn.PAIR_COLUMNS),
+            ', '.join(['?'] * len(LocTimelineConn.PAIR_COLUMNS)))
+        self.conn.execute(sql, (service_id, repository_id, start_date, end_date) + rules)
+        num_commits = self._rebuild_pair(self.get_pair(service_id=service_id, repository_id=repository_id))
+        if commit:
+            self.conn.commit()
+        return num_commits
+
+    def _rebuild_pair(self, pair):
+        """
+        builds a timeline with the dates and filter that are stored in its pair
+
+        Parameters
+        ----------
+        pair: dict
+
+        Returns
+        -------
+        int
+            number of commits of the timeline
+        """
+        service_id, repository_id = pair.get('service_id'), pair.get('repository_id')
+        self.conn.execute('delete from {} where service_id == ? and repository_id == ?;'
+                          .format(LocTimelineConn.TABLE_NAME), (service_id, repository_id))
+        commit_conn = RepositoryCommitConn(self.db_path)
+        head_id = commit_conn.get_chain_head(repository_id=repository_id, start_date=pair.get('start_date'),
+                                             end_date=pair.get('end_date'))
+        num_commits = 0
+        if head_id is not None:
+            rows = self._get_chain_sums(pair=pair, head_id=head_id)
+            self._insert_rows(pair=pair, rows=reversed(rows), first_position=0)
+            self._update_running(service_id=service_id, repository_id=repository_id)
+            num_commits = len(rows)
+        logging.info('Built the LOC timeline of service_id={} repository_id={} with {} commits'
+                     .format(service_id, repository_id, num_commits))
+        return num_commits
+
+    def _get_chain_sums(self, pair, head_id, known_only=False):
+        """
+
+        Parameters
+        ----------
+        pair: dict
+        head_id: int
+        known_only: bool
+            if True, the chain stops at the first commit that is already in the timeline
+
+        Returns
+        -------
+        list of tuple
+            (commit ID, date, additions, deletions, changes, position in the timeline or None) of each commit of the
+            chain, from the head to the oldest one
+        """
+        service_id, repository_id = pair.get('service_id'), pair.get('repository_id')
+        if known_only:
+            stop_sql = 'exists (select 1 from {} k where k.service_id == ? and k.repository_id == ? ' \
+                       'and k.commit_id == chain.ID)'.format(LocTimelineConn.TABLE_NAME)
+            stop_params = (service_id, repository_id)
+        else:
+            stop_sql, stop_params = None, ()
+        chain_sql, chain_params = RepositoryCommitConn.get_chain_sql(
+            head_id=head_id, start_date=pair.get('start_date'), end_date=pair.get('end_date'), stop_sql=stop_sql,
+            stop_params=stop_params)
+        filter_sql, filter_params = LocTimelineConn._get_filter_sql(pair)
+        sql = chain_sql + \
+            ' select c.ID, c.date, coalesce(sum(fm.additions), 0), coalesce(sum(fm.deletions), 0),' \
+            ' coalesce(sum(fm.changes), 0), t.position' \
+            ' from chain join {0} c on c.ID == chain.ID' \
+            ' left join {1} t on t.service_id == ? and t.repository_id == ? and t.commit_id == c.ID' \
+            ' left join {2} fm on fm.commit_id == c.ID{3} group by chain.ID order by chain.depth;' \
+            .format(RepositoryCommitConn.TABLE_NAME, LocTimelineConn.TABLE_NAME, FileModificationConn.TABLE_NAME,
+                    filter_sql)
+        return self.conn.execute(sql, chain_params + (service_id, repository_id) + filter_params).fetchall()
+
+    def _insert_rows(self, pair, rows, first_position):
+        """
+
+        Parameters
+        ----------
+        pair: dict
+        rows: iterable of tuple
+            (commit ID, date, additions, deletions, changes, ...) from the oldest commit to the newest one
+        first_position: int
+            position in the chain of the first row
+
+        Returns
+        -------
+        None
+        """
+        sql = 'insert into {}(service_id, repository_id, commit_id, position, date, additions, deletions, changes, ' \
+              'running_additions, running_deletions, loc) values (?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0);' \
+            .format(LocTimelineConn.TABLE_NAME)
+        self.conn.executemany(sql, [(pair.get('service_id'), pair.get('repository_id'), row[0], first_position + i,
+                                     row[1], row[2], row[3], row[4]) for i, row in enumerate(rows)])
+
+    def _update_running(self, service_id, repository_id, from_date='', from_position=0):
+        """
+        recomputes the running additions, deletions and LOC of the rows from (from_date, from_position) on, which is
+        the suffix of the timeline that a change of a row affects
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        from_date: str
+        from_position: int
+
+        Returns
+        -------
+        int
+            number of updated rows
+        """
+        sql = 'select running_additions, running_deletions, loc from {} where service_id == ? and repository_id == ? ' \
+              'and (date, position) < (?, ?) order by date desc, position desc limit 1;' \
+            .format(LocTimelineConn.TABLE_NAME)
+        row = self.conn.execute(sql, (service_id, repository_id, from_date, from_position)).fetchone()
+        running_additions, running_deletions, loc = row if row is not None else (0, 0, 0)
+        sql = 'select commit_id, additions, deletions from {} where service_id == ? and repository_id == ? ' \
+              'and (date, position) >= (?, ?) order by date, position;'.format(LocTimelineConn.TABLE_NAME)
+        params = list()
+        for commit_id, additions, deletions in self.conn.execute(sql, (service_id, repository_id, from_date,
+                                                                       from_position)).fetchall():
+            running_additions += additions
+            running_deletions += deletions
+            loc = max(loc + additions - deletions, 0)
+            params.append((running_additions, running_deletions, loc, service_id, repository_id, commit_id))
+        sql = 'update {} set running_additions = ?, running_deletions = ?, loc = ? ' \
+              'where service_id == ? and repository_id == ? and commit_id == ?;'.format(LocTimelineConn.TABLE_NAME)
+        self.conn.executemany(sql, params)
+        return len(params)
+
+    def append_commits(self, repository_id, commit=True):
+        """
+        adds the commits of a repository that have just been inserted to its timelines. The chain of first parents is
+        followed from its new head only until a commit that is already in the timeline, so inserting the next commits
+        of a branch costs as much as these commits. If that commit is not the last one of the timeline (e.g. the head
+        moved to another branch), the rows after it are replaced; if the chain does not reach the timeline, the
+        timeline is rebuilt
+
+        Parameters
+        ----------
+        repository_id: int
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        None
+        """
+        commit_conn = RepositoryCommitConn(self.db_path)
+        for pair in self._get_pairs(repository_id=repository_id):
+            service_id = pair.get('service_id')
+            head_id = commit_conn.get_chain_head(repository_id=repository_id, start_date=pair.get('start_date'),
+                                                 end_date=pair.get('end_date'))
+            sql = 'select commit_id, position from {} where service_id == ? and repository_id == ? ' \
+                  'order by position desc limit 1;'.format(LocTimelineConn.TABLE_NAME)
+            last = self.conn.execute(sql, (service_id, repository_id)).fetchone()
+            if last is not None and last[0] == head_id:
+                continue
+            if head_id is None or last is None:
+                self._rebuild_pair(pair)
+                continue
+            rows = self._get_chain_sums(pair=pair, head_id=head_id, known_only=True)
+            known_position = rows[-1][5]
+            if known_position is None:
+                self._rebuild_pair(pair)
+                continue
+            new_rows = rows[-2::-1]
+            sql = 'select date, position from {} where service_id == ? and repository_id == ? and position > ? ' \
+                  'order by date, position limit 1;'.format(LocTimelineConn.TABLE_NAME)
+            first_dropped = self.conn.execute(sql, (service_id, repository_id, known_position)).fetchone()
+            self.conn.execute('delete from {} where service_id == ? and repository_id == ? and position > ?;'
+                              .format(LocTimelineConn.TABLE_NAME), (service_id, repository_id, known_position))
+            self._insert_rows(pair=pair, rows=new_rows, first_position=known_position + 1)
+            first = min([(row[1], known_position + 1 + i) for i, row in enumerate(new_rows)] +
+                        ([tuple(first_dropped)] if first_dropped is not None else []))
+            self._update_running(service_id=service_id, repository_id=repository_id, from_date=first[0],
+                                 from_position=first[1])
+        if commit:
+            self.conn.commit()
+
+    def recompute_commits(self, commit_ids, commit=True):
+        """
+        recomputes the additions, deletions and changes of commits in the timelines that have them, e.g. after their
+        file modifications are repaired; the running values of each timeline are then recomputed once, from the oldest
+        commit whose additions or deletions changed
+
+        Parameters
+        ----------
+        commit_ids: iterable of int
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        None
+        """
+        pairs = dict()
+        for commit_id in sorted(set(commit_ids)):
+            for pair in self._get_pairs(commit_id=commit_id):
+                key = (pair.get('service_id'), pair.get('repository_id'))
+                pairs.setdefault(key, (pair, list()))[1].append(commit_id)
+        for (service_id, repository_id), (pair, pair_commit_ids) in pairs.items():
+            filter_sql, filter_params = LocTimelineConn._get_filter_sql(pair)
+            first = None
+            for commit_id in pair_commit_ids:
+                sql = 'select coalesce(sum(fm.additions), 0), coalesce(sum(fm.deletions), 0), ' \
+                      'coalesce(sum(fm.changes), 0) from {} fm where fm.commit_id == ?{};' \
+                    .format(FileModificationConn.TABLE_NAME, filter_sql)
+                additions, deletions, changes = self.conn.execute(sql, (commit_id,) + filter_params).fetchone()
+                params = (service_id, repository_id, commit_id)
+                sql = 'select date, position, additions, deletions, changes from {} where service_id == ? ' \
+                      'and repository_id == ? and commit_id == ?;'.format(LocTimelineConn.TABLE_NAME)
+                row = self.conn.execute(sql, params).fetchone()
+                if (row[2], row[3], row[4]) == (additions, deletions, changes):
+                    continue
+                sql = 'update {} set additions = ?, deletions = ?, changes = ? where service_id == ? ' \
+                      'and repository_id == ? and commit_id == ?;'.format(LocTimelineConn.TABLE_NAME)
+                self.conn.execute(sql, (additions, deletions, changes) + params)
+                if (row[2], row[3]) != (additions, deletions) and (first is None or (row[0], row[1]) < first):
+                    first = (row[0], row[1])
+            if first is not None:
+                self._update_running(service_id=service_id, repository_id=repository_id, from_date=first[0],
+                                     from_position=first[1])
+        if commit:
+            self.conn.commit()
+
+    def get_loc(self, service_id, repository_id, at, inclusive=True):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        at: str
+            ISO format
+        inclusive: bool
+            if False, a commit at the given time is not counted
+
+        Returns
+        -------
+        dict
+            commit_id, date, running_additions, running_deletions and loc of the last commit of the timeline that is
+            not after (or, if not inclusive, before) the given time, or None if there is none
+        """
+        sql = 'select commit_id, date, running_additions, running_deletions, loc from {} ' \
+              'where service_id == ? and repository_id == ? and date {} ? order by date desc, position desc limit 1;' \
+            .format(LocTimelineConn.TABLE_NAME, '<=' if inclusive else '<')
+        row = self.conn.execute(sql, (service_id, repository_id, at)).fetchone()
+        if row is None:
+            return None
+        return {'commit_id': row[0], 'date': row[1], 'running_additions': row[2], 'running_deletions': row[3],
+                'loc': row[4]}
+
+    def get_inconsistent_commits(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        list of dict
+            date, additions, deletions and changes of each commit of the timeline whose additions + deletions !=
+            changes, from the oldest to the newest
+        """
+        sql = 'select date, additions, deletions, changes from {} where service_id == ? and repository_id == ? ' \
+              'and additions + deletions != changes order by date, position;'.format(LocTimelineConn.TABLE_NAME)
+        return [{'date': row[0], 'additions': row[1], 'deletions': row[2], 'changes': row[3]}
+                for row in self.conn.execute(sql, (service_id, repository_id)).fetchall()]
+
+    def get_timeline(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        list of dict
+            sha, date, additions, deletions, running_additions, running_deletions and loc of each commit, from the
+            oldest to the newest
+        """
+        sql = 'select c.sha, t.date, t.additions, t.deletions, t.running_additions, t.running_deletions, t.loc ' \
+              'from {} t join {} c on c.ID == t.commit_id where t.service_id == ? and t.repository_id == ? ' \
+              'order by t.date, t.position;'.format(LocTimelineConn.TABLE_NAME, RepositoryCommitConn.TABLE_NAME)
+        timeline = list()
+        for row in self.conn.execute(sql, (service_id, repository_id)).fetchall():
+            timeline.append({'sha': row[0], 'date': row[1], 'additions': row[2], 'deletions': row[3],
+                             'running_additions': row[4], 'running_deletions': row[5], 'loc': row[6]})
+        return timeline
+
+    def invalidate(self, service_id=None, repository_id=None, commit_id=None, commit=True):
+        """
+        drops the timelines of a service, of a repository or that have a commit, which are rebuilt by the next run of
+        the miners (see LocTimelineMgr.build)
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        commit_id: int
+        commit: bool
+            if False, the caller is responsible for committing the transaction
+
+        Returns
+        -------
+        None
+        """
+        assert service_id is not None or repository_id is not None or commit_id is not None, \
+            "Error! Unable to invalidate every timeline"
+        if commit_id is not None:
+            pairs = self._get_pairs(commit_id=commit_id)
+        elif self.has_timelines():
+            conditions = ['{} == ?'.format(column) for column, value in (('service_id', service_id),
+                                                                       ('repository_id', repository_id))
+                          if value is not None]
+            sql = 'select {} from {} where {};'.format(', '.join(LocTimelineConn.PAIR_COLUMNS),
+                                                       LocTimelineConn.PAIR_TABLE_NAME, ' and '.join(conditions))
+            params = tuple(value for value in (service_id, repository_id) if value is not None)
+            pairs = [LocTimelineConn._to_pair(row) for row in self.conn.execute(sql, params).fetchall()]
+        else:
+            pairs = list()
+        for pair in pairs:
+            params = (pair.get('service_id'), pair.get('repository_id'))
+            for table in (LocTimelineConn.TABLE_NAME, LocTimelineConn.PAIR_TABLE_NAME):
+                self.conn.execute('delete from {} where service_id == ? and repository_id == ?;'.format(table), params)
+        if commit:
+            self.conn.commit()
@@ -3,18 +3,150 @@
 # by GSA ADP Schedule Contract with IBM Corp.
 #
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
-from microservices_miner.control.database_conn import ExtensionsConn, FilenamePatternConn, ServiceExtensionsConn
+from microservices_miner.control.database_conn import ExtensionsConn, FilenamePatternConn, ServiceExtensionsConn, \
+    ConnectionPool, EXTENSION_SQL
 from typing import Tuple, List
+import threading
 import logging
+import re
 
 logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
 
 
+class FilenameFilter:
+    """
+    the extension and filename pattern rules of a repository of a service, compiled once. The extensions are kept in a
+    set and each list of patterns is compiled into a single regex that matches any of them, so checking a filename
+    does not depend on the number of patterns nor query the database
+    """
+
+    def __init__(self, extensions, including_patterns, excluding_patterns):
+        """
+
+        Parameters
+        ----------
+        extensions: list of str
+        including_patterns: tuple of str
+            if empty, every filename is included
+        excluding_patterns: tuple of str
+        """
+        self.extensions = frozenset(extensions)
+        self.including_patterns = tuple(including_patterns)
+        self.excluding_patterns = tuple(excluding_patterns)
+        self._including = FilenameFilter._compile(self.including_patterns)
+        self._excluding = FilenameFilter._compile(self.excluding_patterns)
+
+    @staticmethod
+    def _compile(patterns):
+        """
+
+        Parameters
+        ----------
+        patterns: tuple of str
+
+        Returns
+        -------
+        re.Pattern
+            regex that finds any of the patterns (as plain substrings) or None if there is no pattern
+        """
+        if len(patterns) == 0:
+            return None
+        # longest patterns first, although any match is enough
+        alternatives = sorted(set(patterns), key=len, reverse=True)
+        return re.compile('|'.join(re.escape(p) for p in alternatives))
+
+    @staticmethod
+    def get_extension(filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+
+        Returns
+        -------
+        str
+            text after the last dot, or the whole filename if there is no dot
+        """
+        return filename[filename.rfind('.') + 1:]
+
+    def is_valid(self, filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+
+        Returns
+        -------
+        bool
+            True if the extension is allowed, no excluding pattern is found in the filename and either there is no
+            including pattern or one of them is found
+        """
+        if filename is None or not isinstance(filename, str):
+            return False
+        if FilenameFilter.get_extension(filename) not in self.extensions:
+            return False
+        if self._excluding is not None and self._excluding.search(filename) is not None:
+            return False
+        return self._including is None or self._including.search(filename) is not None
+
+    def filter(self, filenames):
+        """
+
+        Parameters
+        ----------
+        filenames: list of str
+
+        Returns
+        -------
+        list of bool
+            is_valid of each filename
+        """
+        return [self.is_valid(filename) for filename in filenames]
+
+    def to_sql(self, column):
+        """
+        the same rules as a SQL condition, so that the rows that do not pass them are discarded by the database
+
+        Parameters
+        ----------
+        column: str
+            column with the filename, e.g., fm.filename
+
+        Returns
+        -------
+        str, list
+            condition and its parameters
+        """
+        if len(self.extensions) == 0:
+            return '0', []
+        conditions = ['{} in ({})'.format(EXTENSION_SQL.format(column), ', '.join(['?'] * len(self.extensions)))]
+        params = sorted(self.extensions)
+        if len(self.excluding_patterns) > 0:
+            conditions.append('not ({})'.format(' or '.join(['instr({}, ?) > 0'.format(column)] *
+                                                            len(self.excluding_patterns))))
+            params.extend(self.excluding_patterns)
+        if len(self.including_patterns) > 0:
+            conditions.append('({})'.format(' or '.join(['instr({}, ?) > 0'.format(column)] *
+                                                       len(self.including_patterns))))
+            params.extend(self.including_patterns)
+        return ' and '.join(conditions), params
+
+
 class FileSystemMgr:
     INCLUSION = 'inclusion'
     EXCLUSION = 'exclusion'
     EXCLUDING_PATTERNS = ('_BASE_', '_REMOTE_', '_LOCAL_', '_BACKUP_')
 
+    # FilenameFilter of each (database, service_id, repository_id), allowed extensions of each (database, service_id)
+    # and language of each extension of each database. They are shared by all instances and dropped by
+    # invalidate_filters when the rules change
+    _filters = dict()
+    _extensions = dict()
+    _languages = dict()
+    _cache_lock = threading.Lock()
+
     def __init__(self, db_path):
         self.db_path = db_path
 
@@ -111,6 +243,122 @@ class FileSystemMgr:
 
             if not found:
                 logging.warning('The following language has not been inserted into the database: {}'.format(lang))
+        self.invalidate_filters(service_id=service_id)
+
+    def insert_pattern(self, pattern: str, pattern_type: str, service_id: int, repository_id: int):
+        """
+
+        Parameters
+        ----------
+        pattern: str
+            substring of the filenames
+        pattern_type: str
+            FileSystemMgr.INCLUSION or FileSystemMgr.EXCLUSION
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        int
+            ID of the pattern
+        """
+        fpc = FilenamePatternConn(self.db_path)
+        pattern_id = fpc.insert_pattern(pattern=pattern, pattern_type=pattern_type, service_id=service_id,
+                                        repository_id=repository_id)
+        self.invalidate_filters(service_id=service_id)
+        return pattern_id
+
+    def _get_db_key(self):
+        """
+
+        Returns
+        -------
+        str
+            absolute path of the database, which identifies its entries in the caches
+        """
+        return ConnectionPool.get_pool(self.db_path).path_to_db
+
+    def invalidate_filters(self, service_id=None):
+        """
+        drops the cached filters and extensions of a service, or of every service if service_id is None. It must be
+        called whenever the extensions or patterns are changed without using this class
+
+        Parameters
+        ----------
+        service_id: int
+
+        Returns
+        -------
+        None
+        """
+        db_key = self._get_db_key()
+        with FileSystemMgr._cache_lock:
+            for cache in (FileSystemMgr._filters, FileSystemMgr._extensions):
+                for key in list(cache.keys()):
+                    if key[0] == db_key and (service_id is None or key[1] == service_id):
+                        del cache[key]
+            FileSystemMgr._languages.pop(db_key, None)
+
+    def _get_allowed_extensions(self, service_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+
+        Returns
+        -------
+        frozenset of str
+        """
+        key = (self._get_db_key(), service_id)
+        extensions = FileSystemMgr._extensions.get(key)
+        if extensions is None:
+            extensions = frozenset(self.get_extensions(service_id=service_id))
+            with FileSystemMgr._cache_lock:
+                FileSystemMgr._extensions[key] = extensions
+        return extensions
+
+    def get_language(self, filename):
+        """
+
+        Parameters
+        ----------
+        filename: str
+
+        Returns
+        -------
+        str
+            language of the extension of the filename in the extensions table, or None if it is not there
+        """
+        db_key = self._get_db_key()
+        languages = FileSystemMgr._languages.get(db_key)
+        if languages is None:
+            ext_conn = ExtensionsConn(self.db_path)
+            languages = {ext.get('value'): ext.get('language') for ext in ext_conn.list_extensions()}
+            with FileSystemMgr._cache_lock:
+                FileSystemMgr._languages[db_key] = languages
+        return languages.get(FilenameFilter.get_extension(filename))
+
+    def get_filter(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        FilenameFilter
+            rules of the repository of the service, loaded from the database only once
+        """
+        key = (self._get_db_key(), service_id, repository_id)
+        filename_filter = FileSystemMgr._filters.get(key)
+        if filename_filter is None:
+            filename_filter = FilenameFilter(*self.get_rules(service_id=service_id, repository_id=repository_id))
+            with FileSystemMgr._cache_lock:
+                FileSystemMgr._filters[key] = filename_filter
+        return filename_filter
 
     def check_extension(self, service_id, filename):
         """
@@ -125,13 +373,7 @@ class FileSystemMgr:
         bool
         """
 
-        index = filename.rfind('.') + 1
-        if index < 0:
-            # print('Ignoring file: {}'.format(filename))
-            return False
-        extension = filename[index:]
-        allowed_extensions = self.get_extensions(service_id=service_id)
-        return extension in allowed_extensions
+        return FilenameFilter.get_extension(filename) in self._get_allowed_extensions(service_id=service_id)
 
     def check_filename(self, filename, service_id, repository_id):
         """
@@ -149,11 +391,22 @@ class FileSystemMgr:
         -------
         bool
         """
-        including_patterns = self.get_including_patterns(service_id=service_id,
-                                                         repository_id=repository_id)
+        return self.get_filter(service_id=service_id, repository_id=repository_id).is_valid(filename)
+
+    def get_rules(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        list of str, tuple of str, tuple of str
+            allowed extensions, including patterns and excluding patterns of the repository of the service
+        """
+        extensions = self.get_extensions(service_id=service_id)
+        including_patterns = self.get_including_patterns(service_id=service_id, repository_id=repository_id)
         excluding_patterns = self.get_excluding_patterns(service_id=service_id, repository_id=repository_id)
-        is_valid = filename is not None and isinstance(filename, str) and \
-                   self.check_extension(service_id=service_id, filename=filename) and \
-                   all(excluding_pattern not in filename for excluding_pattern in excluding_patterns) and \
-                   (len(including_patterns) == 0 or any(pat in filename for pat in including_patterns))
-        return is_valid
+        return extensions, including_patterns, excluding_patterns
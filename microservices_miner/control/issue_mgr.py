@@ -38,7 +38,7 @@ class IssueMgr:
                 closed_at_str = None
             else:
                 closed_at_str = issue.closed_at.isoformat()
-            user_id = issue.user.commit_id
+            user_id = issue.user.user_id
             issue_id = self.issue_conn.insert_issue(title=issue.title, body=issue.body, repository_id=repo.repository_id,
                                                     closed_at=closed_at_str, updated_at=updated_at_str,
                                                     created_at=issue.created_at.isoformat(),
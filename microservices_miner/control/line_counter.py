@@ -0,0 +1,149 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.control.filesystem_mgr import FileSystemMgr
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+C_STYLE = ((b'//',), ((b'/*', b'*/'),))
+HASH_STYLE = ((b'#',), ())
+
+
+class LineCounter:
+    """
+    counts the lines of a file as bytes, so that files that are not UTF-8 are counted too. count_lines reads the file in
+    chunks of CHUNK_SIZE bytes into a single buffer and counts its newlines, which runs at the speed of the disk and
+    gives the same number as len(readlines()). count_code_lines also skips blank lines and lines that only have
+    comments, according to the comment syntax of the language of the file, which is the language of its extension in
+    the extensions table (see FileSystemMgr.get_language). Comments are recognized where a line starts and where a
+    block comment ends, not after code, and delimiters inside strings are not told apart
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # language (in lower case) -> prefixes of line comments and delimiters of block comments
+    COMMENT_SYNTAX = {
+        'c': C_STYLE, 'c++': C_STYLE, 'c#': C_STYLE, 'go': C_STYLE, 'java': C_STYLE, 'javascript': C_STYLE,
+        'typescript': C_STYLE, 'kotlin': C_STYLE, 'scala': C_STYLE, 'swift': C_STYLE, 'rust': C_STYLE,
+        'groovy': C_STYLE, 'dart': C_STYLE, 'objective-c': C_STYLE,
+        'php': ((b'//', b'#'), ((b'/*', b'*/'),)),
+        'css': ((), ((b'/*', b'*/'),)),
+        'scss': C_STYLE,
+        'python': ((b'#',), ((b'"""', b'"""'), (b"'''", b"'''"))),
+        'ruby': ((b'#',), ((b'=begin', b'=end'),)),
+        'shell': HASH_STYLE, 'perl': HASH_STYLE, 'r': HASH_STYLE, 'yaml': HASH_STYLE, 'dockerfile': HASH_STYLE,
+        'makefile': HASH_STYLE, 'powershell': ((b'#',), ((b'<#', b'#>'),)),
+        'sql': ((b'--',), ((b'/*', b'*/'),)),
+        'lua': ((b'--',), ()),
+        'haskell': ((b'--',), ((b'{-', b'-}'),)),
+        'html': ((), ((b'<!--', b'-->'),)),
+        'xml': ((), ((b'<!--', b'-->'),)),
+    }
+
+    def __init__(self, db_path):
+        """
+
+        Parameters
+        ----------
+        db_path: str
+            database with the extensions and their languages
+        """
+        self.db_path = db_path
+        self.filesystem_mgr = FileSystemMgr(db_path=db_path)
+
+    @staticmethod
+    def count_lines(path):
+        """
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        int
+            number of lines, including the last one if it does not end with a newline
+        """
+        num_lines = 0
+        last_byte = b'\n'
+        buffer = bytearray(LineCounter.CHUNK_SIZE)
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                size = f.readinto(buffer)
+                if not size:
+                    break
+                num_lines += buffer.count(b'\n', 0, size)
+                last_byte = buffer[size - 1:size]
+        if last_byte != b'\n':
+            num_lines += 1
+        return num_lines
+
+    @staticmethod
+    def count_code_lines(path, language=None):
+        """
+
+        Parameters
+        ----------
+        path: str
+        language: str
+            name of the language of the file; if it is None or its comment syntax is unknown, only blank lines are
+            skipped
+
+        Returns
+        -------
+        int
+            number of lines that are neither blank nor only comments
+        """
+        line_prefixes, block_delimiters = LineCounter.COMMENT_SYNTAX.get((language or '').lower(), ((), ()))
+        num_lines = 0
+        # delimiter that ends the block comment the current line is in, if any
+        block_end = None
+        with open(path, 'rb') as f:
+            for line in f:
+                rest = line.strip()
+                while rest:
+                    if block_end is not None:
+                        end = rest.find(block_end)
+                        if end < 0:
+                            rest = b''
+                        else:
+                            rest = rest[end + len(block_end):].lstrip()
+                            block_end = None
+                    elif rest.startswith(line_prefixes):
+                        rest = b''
+                    else:
+                        for start, end in block_delimiters:
+                            if rest.startswith(start):
+                                block_end = end
+                                rest = rest[len(start):]
+                                break
+                        else:
+                            num_lines += 1
+                            break
+        return num_lines
+
+    def count_loc(self, path, filename=None, skip_comments=False):
+        """
+
+        Parameters
+        ----------
+        path: str
+            file whose lines are counted, e.g. a downloaded blob
+        filename: str
+            name of the file in the repository, whose extension gives its language; if None, path is used
+        skip_comments: bool
+            whether blank and comment lines are skipped
+
+        Returns
+        -------
+        int
+        """
+        if not skip_comments:
+            return LineCounter.count_lines(path)
+        language = self.filesystem_mgr.get_language(filename if filename is not None else path)
+        if language is not None and language.lower() not in LineCounter.COMMENT_SYNTAX:
+            logging.warning('Unknown comment syntax of {}; only blank lines are skipped'.format(language))
+        return LineCounter.count_code_lines(path, language=language)
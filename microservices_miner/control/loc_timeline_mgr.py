@@ -0,0 +1,272 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.control.database_conn import LocTimelineConn, ServiceConn, ServiceRepositoryConn
+from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.service_mgr import ServiceMgr
+from microservices_miner.model.service import Service
+from typing import List, Tuple
+from datetime import datetime, date, time
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class LocTimelineMgr:
+    """
+    LOC of the repositories of the services over time, read from the timelines of LocTimelineConn instead of loading
+    the commits of a repository and summing their file modifications. The timelines are built by the miners (see
+    build), which also keep them up to date as they insert and repair commits; a timeline is out of date when the
+    dates of its repository in the service or the rules of the service changed since it was built. Queries only read
+    the database, so they can use a ConnectionProfile.READ_ONLY pool, and they fail on a timeline that is missing or
+    out of date; use is_current to fall back to the commits. Whether a timeline is current is checked once per
+    manager, by build or by its first query
+    """
+
+    def __init__(self, db_path):
+        """
+
+        Parameters
+        ----------
+        db_path: str or ConnectionPool
+        """
+        self.db_path = db_path
+        self.timeline_conn = LocTimelineConn(path_to_db=db_path)
+        # whether the timeline of each (service_id, repository_id) is current, as checked by _is_up_to_date
+        self._current = dict()
+
+    def build(self, service_id=None):
+        """
+        builds the timelines of the repositories of a service, or of every service if service_id is None, that are
+        missing or out of date
+
+        Parameters
+        ----------
+        service_id: int
+
+        Returns
+        -------
+        int
+            number of timelines that were built
+        """
+        service_repo_conn = ServiceRepositoryConn(path_to_db=self.db_path)
+        if service_id is not None:
+            service_repos = service_repo_conn.get_service_repository_by_service_id(service_id=service_id)
+        else:
+            service_conn = ServiceConn(path_to_db=self.db_path)
+            service_repos = list()
+            for service_name in service_conn.list_all_service_names():
+                service_repos.extend(service_repo_conn.get_service_repository(service_name=service_name))
+        num_built = 0
+        for sr in service_repos:
+            key = (sr.get('service_id'), sr.get('repository_id'))
+            if not self._is_up_to_date(*key):
+                start_date, end_date, filename_filter = self._get_settings(*key)
+                self.timeline_conn.rebuild(service_id=key[0], repository_id=key[1], start_date=start_date,
+                                           end_date=end_date, filename_filter=filename_filter)
+                num_built += 1
+            self._current[key] = True
+        logging.info('Built {} of {} LOC timelines'.format(num_built, len(service_repos)))
+        return num_built
+
+    def _get_settings(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        str, str, FilenameFilter
+            start date, end date (YYYY-MM-DD) and filename filter that a timeline of the repository of the service must
+            be built with
+        """
+        service_repo_conn = ServiceRepositoryConn(path_to_db=self.db_path)
+        service_repos = [sr for sr in service_repo_conn.get_service_repository_by_service_id(service_id=service_id)
+                         if sr.get('repository_id') == repository_id]
+        assert len(service_repos) == 1, "Error! Repository {} does not belong to service {}" \
+            .format(repository_id, service_id)
+        start_date, end_date = ServiceMgr.get_date_range(start_date=service_repos[0].get('start_date'),
+                                                         end_date=service_repos[0].get('end_date'))
+        filesystem_mgr = FileSystemMgr(db_path=self.db_path)
+        filename_filter = filesystem_mgr.get_filter(service_id=service_id, repository_id=repository_id)
+        return start_date.isoformat(), end_date.isoformat(), filename_filter
+
+    def _is_up_to_date(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        bool
+            True if the timeline exists and was built with the current dates and rules of its pair
+        """
+        if not self.timeline_conn.has_timelines():
+            return False
+        pair = self.timeline_conn.get_pair(service_id=service_id, repository_id=repository_id)
+        if pair is None:
+            return False
+        start_date, end_date, filename_filter = self._get_settings(service_id=service_id, repository_id=repository_id)
+        return (pair.get('start_date'), pair.get('end_date'), pair.get('extensions'), pair.get('including_patterns'),
+                pair.get('excluding_patterns')) == \
+            (start_date, end_date, sorted(filename_filter.extensions), list(filename_filter.including_patterns),
+             list(filename_filter.excluding_patterns))
+
+    def is_current(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        bool
+            True if the timeline can be queried, i.e., it exists and is up to date
+        """
+        key = (service_id, repository_id)
+        if key not in self._current:
+            self._current[key] = self._is_up_to_date(service_id=service_id, repository_id=repository_id)
+        return self._current.get(key)
+
+    def is_service_current(self, service: Service):
+        """
+
+        Parameters
+        ----------
+        service: Service
+
+        Returns
+        -------
+        bool
+            True if the timelines of all repositories of the service can be queried
+        """
+        return all(self.is_current(service_id=service.service_id,
+                                   repository_id=repo_data.get('repository').repository_id)
+                   for repo_data in service.list_repository_data())
+
+    def _check_current(self, service_id, repository_id):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        None
+        """
+        assert self.is_current(service_id=service_id, repository_id=repository_id), \
+            "Error! The LOC timeline of repository {} of service {} is missing or out of date" \
+            .format(repository_id, service_id)
+
+    def get_loc(self, service_id, repository_id, at):
+        """
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+        at: datetime or date or str
+            a date stands for the end of that day; a str must be in ISO format
+
+        Returns
+        -------
+        int
+            LOC of the repository after its last commit that is not after the given time, 0 if there is none
+        """
+        if isinstance(at, datetime):
+            at = at.isoformat()
+        elif isinstance(at, date):
+            at = datetime.combine(at, time.max).isoformat()
+        self._check_current(service_id=service_id, repository_id=repository_id)
+        row = self.timeline_conn.get_loc(service_id=service_id, repository_id=repository_id, at=at)
+        return row.get('loc') if row is not None else 0
+
+    def get_loc_per_repository(self, service_id, repository_id):
+        """
+        the same LOC as DataMgr.compute_loc_per_repository of the repository loaded by ServiceMgr.get_service
+
+        Parameters
+        ----------
+        service_id: int
+        repository_id: int
+
+        Returns
+        -------
+        list of int, list of str, list of str
+            LOC after each commit, SHA of each commit and date of each commit (ISO format), from the oldest to the
+            newest
+        """
+        self._check_current(service_id=service_id, repository_id=repository_id)
+        timeline = self.timeline_conn.get_timeline(service_id=service_id, repository_id=repository_id)
+        return [row.get('loc') for row in timeline], [row.get('sha') for row in timeline], \
+            [row.get('date') for row in timeline]
+
+    def compute_loc(self, service: Service, time_bins: Tuple[datetime]) -> List[int]:
+        """
+        the same LOC as CommitStats.compute_loc of the service, which also fails if additions + deletions != changes
+        for a commit within a time bin. The additions - deletions of a repository within a time bin is the difference
+        between the running values of the timeline at both ends of the bin, so each bin costs two indexed lookups per
+        repository
+
+        Parameters
+        ----------
+        service: Service
+            only the IDs, start_date and initial_loc of its repositories are used, in the order of
+            list_repository_data
+        time_bins: Tuple[datetime]
+
+        Returns
+        -------
+        List[int]
+        """
+        repositories = list()
+        for repo_data in service.list_repository_data():
+            repository_id = repo_data.get('repository').repository_id
+            self._check_current(service_id=service.service_id, repository_id=repository_id)
+            start_date, initial_loc = repo_data.get('start_date'), repo_data.get('initial_loc')
+            inconsistent = self.timeline_conn.get_inconsistent_commits(service_id=service.service_id,
+                                                                       repository_id=repository_id)
+            repositories.append((repository_id,
+                                 datetime.strptime(start_date, '%Y-%m-%d') if start_date is not None else None,
+                                 int(initial_loc) if initial_loc is not None else None, inconsistent))
+        # the end of a bin is the beginning of the next one, unless a start_date moves it
+        nets = dict()
+
+        def get_net(repository_id, before):
+            if (repository_id, before) not in nets:
+                row = self.timeline_conn.get_loc(service_id=service.service_id, repository_id=repository_id,
+                                                 at=before.isoformat(), inclusive=False)
+                nets[(repository_id, before)] = \
+                    row.get('running_additions') - row.get('running_deletions') if row is not None else 0
+            return nets.get((repository_id, before))
+
+        loc = 0
+        loc_list = list()
+        for i in range(1, len(time_bins)):
+            prev_time, cur_time = time_bins[i - 1], time_bins[i]
+            for repository_id, start_dt, initial_loc, inconsistent in repositories:
+                # a start_date within the bin moves its beginning, for the next repositories too, and resets the LOC
+                if start_dt is not None and prev_time <= start_dt < cur_time:
+                    prev_time = start_dt
+                    if initial_loc is not None:
+                        loc = initial_loc
+                # as CommitStats._check_modifications
+                for c in inconsistent:
+                    if prev_time.isoformat() <= c.get('date') < cur_time.isoformat():
+                        raise AssertionError('Error! deletions + additions != changes: {} + {} != {}'
+                                             .format(c.get('deletions'), c.get('additions'), c.get('changes')))
+                loc += get_net(repository_id, cur_time) - get_net(repository_id, prev_time)
+            loc_list.append(loc)
+        return loc_list
@@ -11,6 +11,7 @@ from matplotlib.pyplot import figure
 import os
 import numpy as np
 from typing import List, Tuple
+from microservices_miner.control.database_conn import ConnectionPool, ConnectionProfile
 plt.rcParams.update({'font.size': 10})
 
 
@@ -22,7 +23,7 @@ class PlotMgr:
     HEIGHT = 4
 
     def __init__(self, db_path: str):
-        self.db_path = db_path
+        self.db_path = ConnectionPool.get_pool(db_path, profile=ConnectionProfile.READ_ONLY)
 
     @staticmethod
     def _get_full_path(filename):
@@ -79,15 +79,10 @@ class RepositoryMgr:
             repo = self.repo_conn.get_repository_by_url(url=url)
         if repo is not None:
             commit_mgr = CommitMgr(path_to_db=self.path_to_db)
-            repo.commits = commit_mgr.get_base_commits(repo=repo, start_date=start_date, end_date=end_date)
-            for c in repo.commits:
-
-                for i in range(len(c.file_modifications)-1, -1, -1):
-                    fm = c.file_modifications[i]
-
-                    if not filesystem_mgr.check_filename(filename=fm.filename, service_id=service_id,
-                                                         repository_id=repo.repository_id):
-                        del c.file_modifications[i]
+            # the file modifications that do not pass the rules of the service are discarded by the database
+            filename_filter = filesystem_mgr.get_filter(service_id=service_id, repository_id=repo.repository_id)
+            repo.commits = commit_mgr.get_base_commits(repo=repo, start_date=start_date, end_date=end_date,
+                                                       filename_filter=filename_filter)
 
         return repo
 
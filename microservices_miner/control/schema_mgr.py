@@ -0,0 +1,194 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+import sqlite3
+import logging
+from microservices_miner.control.database_conn import ConnectionPool, EXTENSION_SQL
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class SchemaMgr:
+    """
+    creates the tables of the mining database and keeps its schema up to date. The version of the schema is stored in
+    PRAGMA user_version and every migration whose version is greater than it is applied in its own transaction. A
+    database built before migrations existed has version 0, so the tables of migration 1 are created only if they do
+    not exist
+    """
+
+    # list of (version, statements); new migrations are appended with the next version number
+    MIGRATIONS = [
+        (1, [
+            'CREATE TABLE IF NOT EXISTS repository(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, url string);',
+            'CREATE TABLE IF NOT EXISTS user(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, email string, '
+            'login string);',
+            'CREATE TABLE IF NOT EXISTS issue(ID INTEGER PRIMARY KEY AUTOINCREMENT, title text, body text, '
+            'created_at text, closed_at text, updated_at text, repository_id integer, state text, user_id integer,'
+            'FOREIGN KEY (repository_id) REFERENCES repository(ID), FOREIGN KEY (user_id) REFERENCES user(ID));',
+            'CREATE TABLE IF NOT EXISTS label(ID integer primary key autoincrement, name text, description text);',
+            'CREATE TABLE IF NOT EXISTS assignee(ID integer primary key autoincrement, login text, htmlurl text, '
+            'type text);',
+            'CREATE TABLE IF NOT EXISTS issueassignee(issue_id integer, assignee_id integer, '
+            'primary key(issue_id, assignee_id),foreign key (issue_id) references issue(ID), '
+            'foreign key (assignee_id) references assignee(ID));',
+            'CREATE TABLE IF NOT EXISTS issuelabel(issue_id integer, label_id integer, primary key(issue_id, label_id),'
+            'foreign key (issue_id) references issue(ID), foreign key (label_id) references label(ID));',
+            'CREATE TABLE IF NOT EXISTS service(ID INTEGER PRIMARY KEY AUTOINCREMENT, name text not null, '
+            'start_date text not null, end_date text);',
+            'CREATE TABLE IF NOT EXISTS filemodification(ID INTEGER PRIMARY KEY AUTOINCREMENT, filename text, '
+            'additions integer, deletions integer, changes integer, status text, commit_id integer, '
+            'UNIQUE (filename, commit_id) ON CONFLICT IGNORE, '
+            'FOREIGN KEY (commit_id) REFERENCES repositorycommit(ID));',
+            'CREATE TABLE IF NOT EXISTS servicerepository(service_id integer, repository_id integer, start_date text, '
+            'end_date text, initial_loc integer, primary key(service_id, repository_id),'
+            'foreign key (service_id) references service(ID), foreign key (repository_id) references repository(ID));',
+            'CREATE TABLE IF NOT EXISTS repocommit(ID INTEGER PRIMARY KEY AUTOINCREMENT, date text, sha text, '
+            'comment text, user_id integer, repository_id integer, UNIQUE (sha) ON CONFLICT IGNORE, '
+            'FOREIGN KEY (user_id) REFERENCES user(ID), FOREIGN KEY (repository_id) REFERENCES repository(ID));',
+            'CREATE TABLE IF NOT EXISTS parentcommit_repocommit(parentcommit_id integer, repocommit_id integer, '
+            'primary key(parentcommit_id, repocommit_id), foreign key (repocommit_id) references repocommit(ID), '
+            'foreign key (parentcommit_id) references parentcommit(ID));',
+            'CREATE TABLE IF NOT EXISTS parentcommit(ID INTEGER PRIMARY KEY AUTOINCREMENT, sha text, '
+            'position integer);',
+            'CREATE TABLE IF NOT EXISTS extensions(id integer primary key autoincrement, value text not null, '
+            'language text);',
+            'CREATE TABLE IF NOT EXISTS service_extensions(service_id integer, extension_id integer, '
+            'foreign key (service_id) references service(ID), '
+            'foreign key (extension_id) references extensions(id));',
+            'CREATE TABLE IF NOT EXISTS filename_pattern(id integer primary key autoincrement, pattern text, '
+            'type text, service_id integer, repository_id integer, foreign key (service_id) references service(ID));',
+        ]),
+        # indexes of the predicates used by database_conn; repocommit.sha is already indexed by its unique constraint
+        (2, [
+            'CREATE INDEX IF NOT EXISTS repocommit_repository_id_date ON repocommit(repository_id, date);',
+            'CREATE INDEX IF NOT EXISTS filemodification_commit_id ON filemodification(commit_id);',
+            'CREATE INDEX IF NOT EXISTS user_login ON user(login);',
+            'CREATE INDEX IF NOT EXISTS user_email ON user(email);',
+            'CREATE INDEX IF NOT EXISTS user_name_email ON user(name, email);',
+            'CREATE INDEX IF NOT EXISTS filename_pattern_service_id_repository_id_type '
+            'ON filename_pattern(service_id, repository_id, type);',
+            'CREATE INDEX IF NOT EXISTS parentcommit_sha_position ON parentcommit(sha, position);',
+            'CREATE INDEX IF NOT EXISTS parentcommit_repocommit_repocommit_id '
+            'ON parentcommit_repocommit(repocommit_id);',
+            'CREATE INDEX IF NOT EXISTS servicerepository_repository_id ON servicerepository(repository_id);',
+            'CREATE INDEX IF NOT EXISTS service_extensions_service_id ON service_extensions(service_id);',
+            'CREATE INDEX IF NOT EXISTS service_name ON service(name);',
+            'CREATE INDEX IF NOT EXISTS repository_url ON repository(url);',
+            'CREATE INDEX IF NOT EXISTS issue_repository_id ON issue(repository_id);',
+            'CREATE INDEX IF NOT EXISTS label_name ON label(name);',
+            'CREATE INDEX IF NOT EXISTS assignee_login ON assignee(login);',
+        ]),
+        # extension of the filenames, so that the file modifications of a commit can be filtered by the database
+        (3, [
+            'CREATE INDEX IF NOT EXISTS filemodification_commit_id_extension '
+            'ON filemodification(commit_id, {});'.format(EXTENSION_SQL.format('filename')),
+        ]),
+        # where an interrupted mining run resumes, per repository and phase
+        (4, [
+            'CREATE TABLE IF NOT EXISTS miningcheckpoint(repository_id integer, phase text, page_url text, '
+            'last_sha text, updated_at text, primary key(repository_id, phase), '
+            'foreign key (repository_id) references repository(ID));',
+        ]),
+        # state of each phase, so that a restarted run skips the work that is already done
+        (5, [
+            'ALTER TABLE miningcheckpoint ADD COLUMN last_date text;',
+            'ALTER TABLE miningcheckpoint ADD COLUMN last_id integer;',
+            'ALTER TABLE miningcheckpoint ADD COLUMN status text;',
+        ]),
+        # running additions, deletions and LOC of each commit of each repository of each service (see LocTimelineConn)
+        (6, [
+            'CREATE TABLE IF NOT EXISTS loctimelinepair(service_id integer, repository_id integer, start_date text, '
+            'end_date text, extensions text, including_patterns text, excluding_patterns text, '
+            'primary key(service_id, repository_id), foreign key (service_id) references service(ID), '
+            'foreign key (repository_id) references repository(ID));',
+            'CREATE TABLE IF NOT EXISTS loctimeline(service_id integer, repository_id integer, commit_id integer, '
+            'position integer, date text, additions integer, deletions integer, changes integer, '
+            'running_additions integer, running_deletions integer, loc integer, '
+            'primary key(service_id, repository_id, commit_id), '
+            'foreign key (service_id, repository_id) references loctimelinepair(service_id, repository_id), '
+            'foreign key (commit_id) references repocommit(ID));',
+            'CREATE INDEX IF NOT EXISTS loctimeline_service_id_repository_id_date_position '
+            'ON loctimeline(service_id, repository_id, date, position);',
+            'CREATE INDEX IF NOT EXISTS loctimeline_service_id_repository_id_position '
+            'ON loctimeline(service_id, repository_id, position);',
+            'CREATE INDEX IF NOT EXISTS loctimeline_commit_id ON loctimeline(commit_id);',
+        ]),
+    ]
+
+    def __init__(self, path_to_db):
+        """
+
+        Parameters
+        ----------
+        path_to_db: str or ConnectionPool
+        """
+        self.conn = ConnectionPool.connect(path_to_db)
+
+    def get_version(self):
+        """
+
+        Returns
+        -------
+        int
+            version of the schema of the database
+        """
+        return self.conn.execute('PRAGMA user_version;').fetchone()[0]
+
+    @staticmethod
+    def get_latest_version():
+        """
+
+        Returns
+        -------
+        int
+            version of the schema after all migrations are applied
+        """
+        return SchemaMgr.MIGRATIONS[-1][0]
+
+    def migrate(self):
+        """
+        applies the migrations that have not been applied yet
+
+        Returns
+        -------
+        int
+            version of the schema after the migrations
+        """
+        version = self.get_version()
+        for migration_version, statements in SchemaMgr.MIGRATIONS:
+            if migration_version <= version:
+                continue
+            if self.conn.in_transaction:
+                self.conn.commit()
+            # DDL statements do not open transactions implicitly
+            self.conn.execute('BEGIN;')
+            try:
+                for sql in statements:
+                    self.conn.execute(sql)
+                self.conn.execute('PRAGMA user_version = {:d};'.format(migration_version))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                logging.critical('Error! Unable to apply migration {}: {}'.format(migration_version, e))
+                raise e
+            logging.info('Applied migration {} to the database'.format(migration_version))
+            version = migration_version
+        return version
+
+    def get_query_plan(self, sql, params=()):
+        """
+
+        Parameters
+        ----------
+        sql: str
+        params: tuple
+
+        Returns
+        -------
+        list of str
+            details of each step of the plan of the query
+        """
+        rows = self.conn.execute('EXPLAIN QUERY PLAN {}'.format(sql), params).fetchall()
+        return [row[-1] for row in rows]
@@ -4,7 +4,8 @@
 #
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
 from microservices_miner.control.repository_mgr import RepositoryMgr
-from microservices_miner.control.database_conn import ServiceRepositoryConn, ServiceConn, RepositoryCommitConn
+from microservices_miner.control.database_conn import ServiceRepositoryConn, ServiceConn, RepositoryCommitConn, \
+    ConnectionPool, ConnectionProfile
 from microservices_miner.model.service import Service
 from microservices_miner.model.repository import Repository
 from datetime import datetime, date
@@ -17,6 +18,8 @@ class ServiceMgr:
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # the services are read by the analytics with ConnectionProfile.READ_ONLY, unless a pool is given
+        self.read_db_path = ConnectionPool.get_pool(db_path, profile=ConnectionProfile.READ_ONLY)
 
     def get_service(self, service_id=None, service_name=None) -> Service:
         """
@@ -30,25 +33,17 @@ class ServiceMgr:
         -------
         Service
         """
-        repo_mgr = RepositoryMgr(path_to_db=self.db_path)
-        service_conn = ServiceConn(path_to_db=self.db_path)
+        repo_mgr = RepositoryMgr(path_to_db=self.read_db_path)
+        service_conn = ServiceConn(path_to_db=self.read_db_path)
         service = service_conn.get_service(service_id=service_id, name=service_name)  # type: Service
-        service_repo_conn = ServiceRepositoryConn(path_to_db=self.db_path)
+        service_repo_conn = ServiceRepositoryConn(path_to_db=self.read_db_path)
         if service is not None:
             service_repo_list = service_repo_conn.get_service_repository(service_name=service.name)
             for sr in service_repo_list:
 
                 start_date = sr.get('start_date')
-                try:
-                    st = datetime.strptime(start_date, '%Y-%m-%d').date()
-                except (TypeError, ValueError) as e:
-                    st = datetime(year=1000, month=1, day=1).date()
-
                 end_date = sr.get('end_date')
-                try:
-                    ed = datetime.strptime(end_date, '%Y-%m-%d').date()
-                except (TypeError, ValueError) as e:
-                    ed = datetime(year=9999, month=12, day=30).date()
+                st, ed = ServiceMgr.get_date_range(start_date=start_date, end_date=end_date)
 
                 repository_id = sr.get('repository_id')
                 initial_loc = sr.get('initial_loc')
@@ -60,6 +55,33 @@ class ServiceMgr:
                                        initial_loc=initial_loc)
         return service
 
+    @staticmethod
+    def get_date_range(start_date, end_date):
+        """
+        dates between which the commits of a repository belong to a service
+
+        Parameters
+        ----------
+        start_date: str
+            start_date of the servicerepository table
+        end_date: str
+            end_date of the servicerepository table
+
+        Returns
+        -------
+        date, date
+            if a date is missing or invalid, the range is open on that side
+        """
+        try:
+            st = datetime.strptime(start_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            st = datetime(year=1000, month=1, day=1).date()
+        try:
+            ed = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            ed = datetime(year=9999, month=12, day=30).date()
+        return st, ed
+
     def update_dates(self, service_id: int, end_date: date, start_date: date = None) -> bool:
         """
         update the field start_date of Service table based on the first commit date of any of the service's
@@ -119,7 +141,7 @@ class ServiceMgr:
         -------
 
         """
-        service_conn = ServiceConn(path_to_db=self.db_path)
+        service_conn = ServiceConn(path_to_db=self.read_db_path)
         names = service_conn.list_all_service_names()
         return names
 
@@ -11,6 +11,45 @@ class UserMgr:
 
     def __init__(self, path_to_db):
         self.db_conn = UserConn(path_to_db)
+        # users by login, name and email; None until warm_cache is called
+        self._cache = None
+        self.num_cache_hits = 0
+        self.num_cache_misses = 0
+
+    def warm_cache(self):
+        """
+        loads every user with a single query, so that get_user_from_database answers from memory and only queries the
+        database for users inserted by others since then (e.g. by other threads)
+
+        Returns
+        -------
+        int
+            number of users loaded
+        """
+        self._cache = {'login': dict(), 'name': dict(), 'email': dict()}
+        users = self.db_conn.get_all_users()
+        for user in users:
+            self.add_to_cache(user)
+        return len(users)
+
+    def add_to_cache(self, user):
+        """
+        adds a user to the cache, unless the cache was not warmed. Like the queries of get_user_from_database, the user
+        with the lowest ID wins when several have the same login, name or email
+
+        Parameters
+        ----------
+        user: User
+
+        Returns
+        -------
+        None
+        """
+        if self._cache is None:
+            return
+        for key, value in (('login', user.login), ('name', user.name), ('email', user.email)):
+            if value is not None:
+                self._cache[key].setdefault(value, user)
 
     def insert_user(self, user):
         """
@@ -24,6 +63,8 @@ class UserMgr:
         int
         """
         user_id = self.db_conn.insert_user(user)
+        user.user_id = user_id
+        self.add_to_cache(user)
         return user_id
 
     def get_user_from_database(self, login: str, name: str = None, email: str = None) -> User:
@@ -40,6 +81,8 @@ class UserMgr:
         User
         """
 
+        if self._cache is not None:
+            return self._get_cached_user(login=login, name=name, email=email)
         user = self.db_conn.get_user(login=login)
         # try to get the user by its name
         if user is None and name is not None:
@@ -49,6 +92,34 @@ class UserMgr:
             user = self.db_conn.get_user(email=email)
         return user
 
+    def _get_cached_user(self, login, name, email):
+        """
+        same as get_user_from_database, but the cache is looked up first and the database is queried once on a miss.
+        A login that is not in the cache may have been inserted by others since it was warmed, so the cached names and
+        emails are only used for lookups without a login; otherwise they could give another user with the same name
+
+        Parameters
+        ----------
+        login: str
+        name: str
+        email: str
+
+        Returns
+        -------
+        User
+        """
+        keys = (('login', login),) if login is not None else (('name', name), ('email', email))
+        for key, value in keys:
+            user = self._cache[key].get(value) if value is not None else None
+            if user is not None:
+                self.num_cache_hits += 1
+                return user
+        self.num_cache_misses += 1
+        user = self.db_conn.find_user(login=login, name=name, email=email)
+        if user is not None:
+            self.add_to_cache(user)
+        return user
+
     @staticmethod
     def make_user(email: str, name: str, login: str) -> User:
         """
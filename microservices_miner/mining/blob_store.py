@@ -0,0 +1,183 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from collections import OrderedDict
+import threading
+import os
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class BlobStore:
+    """
+    content-addressed store of file contents, keyed by their git blob SHA, so that a version of a file that appears in
+    many commits is downloaded and stored once. Blobs are files named after their SHA under path, and an index maps
+    (commit SHA, filename) to the blob of that file in that commit. When the store grows beyond max_size bytes, the
+    least recently used blobs are evicted. A blob that is being read may be evicted if max_size is smaller than the
+    blobs in use at a time, so max_size should be much larger than the largest files
+    """
+
+    MAX_SIZE = 1024 * 1024 * 1024
+    # fraction of max_size the store is reduced to when it is full, so that it is not evicted on every put
+    EVICTION_TARGET = 0.9
+
+    def __init__(self, path, max_size=MAX_SIZE):
+        """
+
+        Parameters
+        ----------
+        path: str
+            directory of the blobs
+        max_size: int
+            maximum size (in bytes) of the blobs
+        """
+        assert isinstance(max_size, int) and max_size > 0, "Error! Invalid max_size={}".format(max_size)
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # blob SHA -> size, from the least to the most recently used
+        self._blobs = OrderedDict()
+        self._index = dict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.num_evicted = 0
+        os.makedirs(path, exist_ok=True)
+        blobs = list()
+        for directory in os.listdir(path):
+            directory_path = os.path.join(path, directory)
+            if not os.path.isdir(directory_path):
+                continue
+            for name in os.listdir(directory_path):
+                blob_path = os.path.join(directory_path, name)
+                if name.endswith('.tmp'):
+                    os.remove(blob_path)
+                    continue
+                stat = os.stat(blob_path)
+                blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, sha, size in sorted(blobs):
+            self._blobs[sha] = size
+            self._size += size
+
+    @property
+    def size(self):
+        return self._size
+
+    def get_blob_path(self, sha):
+        """
+
+        Parameters
+        ----------
+        sha: str
+
+        Returns
+        -------
+        str
+        """
+        return os.path.join(self.path, sha[:2], sha)
+
+    def get(self, sha):
+        """
+
+        Parameters
+        ----------
+        sha: str
+            blob SHA
+
+        Returns
+        -------
+        str or None
+            path to the blob, if it is in the store
+        """
+        with self._lock:
+            if sha not in self._blobs:
+                self.misses += 1
+                return None
+            self._blobs.move_to_end(sha)
+            self.hits += 1
+        return self.get_blob_path(sha)
+
+    def put(self, sha, content):
+        """
+        stores a blob, which is written to a temporary file that then replaces the blob, so that readers never see a
+        partially written one
+
+        Parameters
+        ----------
+        sha: str
+            blob SHA
+        content: bytes
+
+        Returns
+        -------
+        str
+            path to the blob
+        """
+        blob_path = self.get_blob_path(sha)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        temp_path = '{}.{}.tmp'.format(blob_path, threading.get_ident())
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, blob_path)
+        with self._lock:
+            self._size += len(content) - self._blobs.pop(sha, 0)
+            self._blobs[sha] = len(content)
+            if self._size > self.max_size:
+                self._evict()
+        return blob_path
+
+    def _evict(self):
+        """
+        removes the least recently used blobs until the store is at EVICTION_TARGET of max_size; it must be called with
+        the lock held
+
+        Returns
+        -------
+        None
+        """
+        target = self.max_size * BlobStore.EVICTION_TARGET
+        while self._size > target and len(self._blobs) > 1:
+            sha, size = self._blobs.popitem(last=False)
+            try:
+                os.remove(self.get_blob_path(sha))
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            self.num_evicted += 1
+        logging.info('Blob store {} evicted down to {} bytes'.format(self.path, self._size))
+
+    def get_sha(self, commit_sha, filename):
+        """
+
+        Parameters
+        ----------
+        commit_sha: str
+        filename: str
+
+        Returns
+        -------
+        str or None
+            SHA of the blob of the file in the commit, if it is known
+        """
+        with self._lock:
+            return self._index.get((commit_sha, filename))
+
+    def add_to_index(self, commit_sha, filename, sha):
+        """
+
+        Parameters
+        ----------
+        commit_sha: str
+        filename: str
+        sha: str
+            SHA of the blob of the file in the commit
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self._index[(commit_sha, filename)] = sha
@@ -0,0 +1,283 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+import random
+import threading
+from contextlib import nullcontext
+import time
+import logging
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from microservices_miner.mining.rate_limiter import RateLimiter
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class HostLimiter:
+    """
+    caps the number of requests in flight to each host, across all the clients (and therefore all the threads) that
+    share it
+    """
+
+    MAX_REQUESTS_PER_HOST = 8
+
+    def __init__(self, max_requests_per_host=MAX_REQUESTS_PER_HOST):
+        """
+
+        Parameters
+        ----------
+        max_requests_per_host: int
+        """
+        assert isinstance(max_requests_per_host, int) and max_requests_per_host > 0, \
+            "Error! Invalid max_requests_per_host={}".format(max_requests_per_host)
+        self.max_requests_per_host = max_requests_per_host
+        self._semaphores = dict()
+        self._lock = threading.Lock()
+
+    def get_semaphore(self, host):
+        """
+
+        Parameters
+        ----------
+        host: str
+            scheme and network location, e.g. https://api.github.com
+
+        Returns
+        -------
+        threading.BoundedSemaphore
+        """
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.max_requests_per_host)
+                self._semaphores[host] = semaphore
+        return semaphore
+
+
+class GHEClient:
+    """
+    HTTP client for the GHE API. It keeps one requests.Session (and therefore one pool of keep-alive connections) per
+    GHE host and retries requests that failed due to connection errors or 5xx responses using exponential backoff
+    with jitter. Requests are paced by a RateLimiter, which also makes rate limited requests wait and retry. If a
+    ResponseCache is given, requests are made conditional and 304 Not Modified responses are served from the cache
+    """
+
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+    MAX_RETRIES = 5
+    MAX_THROTTLED_RETRIES = 10
+    BACKOFF_FACTOR = 0.5
+    MAX_BACKOFF = 60
+    POOL_SIZE = 10
+    TIMEOUT = 60
+
+    def __init__(self, api_token=None, pool_size=POOL_SIZE, max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 max_backoff=MAX_BACKOFF, timeout=TIMEOUT, rate_limiter=None, cache=None, host_limiter=None):
+        """
+
+        Parameters
+        ----------
+        api_token: str
+            token used when a request does not specify its own
+        pool_size: int
+            maximum number of connections kept alive per host
+        max_retries: int
+        backoff_factor: float
+            the n-th retry waits between backoff_factor * 2 ** n / 2 and backoff_factor * 2 ** n seconds
+        max_backoff: float
+            upper bound of the time (in seconds) between two retries
+        timeout: float
+            timeout (in seconds) of each request
+        rate_limiter: RateLimiter
+            scheduler shared by all requests made with the same token; if None, a new one is created
+        cache: ResponseCache
+            cache of responses; if None, responses are not cached
+        host_limiter: HostLimiter
+            cap of concurrent requests per host shared with other clients; if None, requests are not capped
+        """
+        assert isinstance(pool_size, int) and pool_size > 0, "Error! Invalid pool_size={}".format(pool_size)
+        assert isinstance(max_retries, int) and max_retries >= 0, "Error! Invalid max_retries={}".format(max_retries)
+        self.api_token = api_token
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.host_limiter = host_limiter
+        self._sessions = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_host(url):
+        """
+
+        Parameters
+        ----------
+        url: str
+
+        Returns
+        -------
+        str
+            scheme and network location of the URL
+        """
+        parsed_url = urlparse(url)
+        return '{}://{}'.format(parsed_url.scheme, parsed_url.netloc)
+
+    def _get_session(self, url):
+        """
+        gets the session of the host of the given URL, creating it if needed
+
+        Parameters
+        ----------
+        url: str
+
+        Returns
+        -------
+        requests.Session
+        """
+        host = GHEClient._get_host(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(host, adapter)
+                self._sessions[host] = session
+        return session
+
+    def _get_backoff_time(self, attempt):
+        """
+
+        Parameters
+        ----------
+        attempt: int
+            number of attempts that have already failed
+
+        Returns
+        -------
+        float
+            time to wait in seconds
+        """
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def get(self, url, params=None, api_token=None, allow_redirects=False):
+        """
+
+        Parameters
+        ----------
+        url: str
+        params: dict
+        api_token: str
+            if None, the token of the client is used
+        allow_redirects: bool
+
+        Returns
+        -------
+        requests.Response
+        """
+        return self._request(method='GET', url=url, params=params, api_token=api_token,
+                             allow_redirects=allow_redirects)
+
+    def post(self, url, json, api_token=None):
+        """
+        sends a POST request with a JSON body, e.g. a GraphQL query. It is paced, capped and retried like a GET request,
+        so it must not have side effects; its response is never cached
+
+        Parameters
+        ----------
+        url: str
+        json: dict
+        api_token: str
+            if None, the token of the client is used
+
+        Returns
+        -------
+        requests.Response
+        """
+        return self._request(method='POST', url=url, json=json, api_token=api_token)
+
+    def _request(self, method, url, params=None, json=None, api_token=None, allow_redirects=False):
+        """
+
+        Parameters
+        ----------
+        method: str
+            GET or POST
+        url: str
+        params: dict
+        json: dict
+        api_token: str
+        allow_redirects: bool
+
+        Returns
+        -------
+        requests.Response
+        """
+        if api_token is None:
+            api_token = self.api_token
+        headers = dict()
+        if api_token is not None:
+            headers['Authorization'] = 'token %s' % api_token
+        cache_key = cached_entry = None
+        if self.cache is not None and method == 'GET':
+            cache_key = self.cache.make_key(url=url, params=params)
+            cached_entry = self.cache.get(cache_key)
+            if cached_entry is not None:
+                headers.update(self.cache.get_conditional_headers(cached_entry))
+        session = self._get_session(url)
+        if self.host_limiter is not None:
+            host_slot = self.host_limiter.get_semaphore(GHEClient._get_host(url))
+        else:
+            host_slot = nullcontext()
+        attempt = 0
+        throttled_attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                # the slot is only held during the request, not while waiting to retry it
+                with host_slot:
+                    resp = session.request(method=method, url=url, params=params, json=json, headers=headers,
+                                           allow_redirects=allow_redirects, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    logging.error('Error! {} {} failed after {} attempts: {}'.format(method, url, attempt + 1, e))
+                    raise e
+                logging.warning('{} {} failed: {}'.format(method, url, e))
+            else:
+                # the rate limiter makes the next acquire() wait until GHE accepts requests again
+                if self.rate_limiter.update(resp) and throttled_attempt < GHEClient.MAX_THROTTLED_RETRIES:
+                    throttled_attempt += 1
+                    continue
+                if resp.status_code == 304 and cached_entry is not None:
+                    self.cache.touch(cache_key)
+                    return self.cache.make_response(entry=cached_entry, not_modified_resp=resp)
+                if resp.status_code == 200 and cache_key is not None:
+                    self.cache.put(cache_key, resp)
+                if resp.status_code not in GHEClient.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    return resp
+                logging.warning('{} {} returned status={}'.format(method, resp.url, resp.status_code))
+            backoff_time = self._get_backoff_time(attempt)
+            attempt += 1
+            logging.info('Retrying {} {} in {:.2f}s (attempt {} of {})'.format(method, url, backoff_time, attempt,
+                                                                               self.max_retries))
+            time.sleep(backoff_time)
+
+    def close(self):
+        """
+        closes the sessions of all hosts
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = dict()
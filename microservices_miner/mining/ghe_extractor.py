@@ -4,10 +4,10 @@
 #
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
 import os
-import requests
 from microservices_miner.model.git_commit import Commit
 from microservices_miner.model.user import User
-from microservices_miner.control.database_conn import FileModificationConn
+from microservices_miner.control.database_conn import FileModificationConn, ConnectionPool, ConnectionProfile, \
+    MiningCheckpointConn, RepositoryConn, ServiceConn, LocTimelineConn
 from microservices_miner.model.assignee import Assignee
 from microservices_miner.control.issue_mgr import IssueMgr
 from microservices_miner.model.repository import Repository
@@ -16,18 +16,27 @@ from datetime import datetime, date
 from microservices_miner.control.user_mgr import UserMgr
 from microservices_miner.control.repository_mgr import RepositoryMgr
 from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.commit_snapshot import CommitSnapshot
 from microservices_miner.control.service_mgr import ServiceMgr
+from microservices_miner.control.loc_timeline_mgr import LocTimelineMgr
 from microservices_miner.model.file_modification import FileModification
 from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.line_counter import LineCounter
 from microservices_miner.model.issue import Issue
+from microservices_miner.mining.ghe_client import GHEClient, HostLimiter
+from microservices_miner.mining.response_cache import ResponseCache
+from microservices_miner.mining.blob_store import BlobStore
+from microservices_miner.mining.line_diff import LineDiff
 import re
 import base64
-import difflib
 from pathlib import Path
 from typing import List, Dict
 import json
 import logging
 import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
 
@@ -39,21 +48,92 @@ class GHEExtractor:
     COM_PATTERN = '.com'
     PUBLIC_GITHUB_API = 'https://api.github.com'
     PUBLIC_GITHUB_REPO_URL = 'https://github.com/'
-
-    def __init__(self, db_path):
+    NUM_WORKERS = 4
+    # number of commits written to the database per transaction
+    BATCH_SIZE = 100
+    # number of commits per page of the commits API, which allows at most 100
+    PAGE_SIZE = 100
+    # phases of the mining of a repository, each of them with its own checkpoint
+    COMMITS_PHASE = 'commits'
+    ISSUES_PHASE = 'issues'
+    REPAIR_PHASE = 'repair'
+
+    def __init__(self, db_path, num_workers=NUM_WORKERS, api_token=None, client=None, cache_path=None, writer=None,
+                 blob_store=None):
         """
 
         Parameters
         ----------
         db_path: str
             path to the database file
+        num_workers: int
+            maximum number of concurrent requests to GHE when fetching the details of commits
+        api_token: str
+            token used by requests that do not specify one
+        client: GHEClient
+            HTTP client shared by all requests; if None, a new one is created
+        cache_path: str
+            path to the file that caches GHE responses across runs; only used if client is None
+        writer: DatabaseWriter
+            thread that makes the writes of this extractor; if None, they are made by the calling thread
+        blob_store: BlobStore
+            store of the downloaded files, which may be shared by many extractors; if None, it is created when a file
+            is downloaded
         """
-
+        assert isinstance(num_workers, int) and num_workers > 0, "Error! Invalid num_workers={}".format(num_workers)
         self.db_path = db_path
+        self.num_workers = num_workers
         self.commit_mgr = CommitMgr(self.db_path)
+        if client is None:
+            cache = ResponseCache(path=cache_path) if cache_path is not None else None
+            client = GHEClient(api_token=api_token, pool_size=num_workers, cache=cache)
+        self.client = client
+        self.writer = writer
+        self.blob_store = blob_store
+        # UserMgr with a cache of users, and the users of the authors and logins looked up during the run
+        self._user_mgr = None
+        self._resolved_users = dict()
+        self._fetched_users = dict()
+
+    def _save_checkpoint(self, repository_id, phase, **kwargs):
+        """
+        see MiningCheckpointConn.save_checkpoint
 
-    @staticmethod
-    def _extract_users_from_ghe(base_url, username, api_token=None):
+        Parameters
+        ----------
+        repository_id: int
+        phase: str
+
+        Returns
+        -------
+        None
+        """
+        self._write(MiningCheckpointConn, 'save_checkpoint', repository_id=repository_id, phase=phase, **kwargs)
+
+    def _write(self, cls, method, *args, **kwargs):
+        """
+        calls a method of a new cls object (e.g. CommitMgr) that writes to the database. If the extractor has a
+        writer, the object is created and called by the writer thread, so that it uses the connection of this thread
+
+        Parameters
+        ----------
+        cls: type
+            Mgr or Conn class, whose constructor takes the path to the database
+        method: str
+            name of the method
+
+        Returns
+        -------
+        object
+            result of the method
+        """
+        def write():
+            return getattr(cls(self.db_path), method)(*args, **kwargs)
+        if self.writer is None:
+            return write()
+        return self.writer.call(write)
+
+    def _extract_users_from_ghe(self, base_url, username, api_token=None):
         """
 
         Parameters
@@ -69,16 +149,104 @@ class GHEExtractor:
         username = username.replace('.', '-')
         url = '{}/users/{}'.format(base_url, username)
 
-        resp = GHEExtractor._make_get_request(url=url, api_token=api_token)
+        resp = self._make_get_request(url=url, api_token=api_token)
         user_resp = resp.json()
         user = UserMgr.make_user(email=user_resp.get('email'), login=user_resp.get('login'), name=user_resp.get('name'))
 
         return user
 
-    @staticmethod
-    def _make_get_request(url, params=None, api_token=None, allow_redirects=False):
+    def _get_user_mgr(self):
+        """
+        gets the UserMgr of this extractor, whose cache is warmed the first time, so that the authors of a run are
+        looked up in memory
+
+        Returns
+        -------
+        UserMgr
+        """
+        if self._user_mgr is None:
+            self._user_mgr = UserMgr(path_to_db=self.db_path)
+            num_users = self._user_mgr.warm_cache()
+            logging.info('{} users loaded into the cache'.format(num_users))
+        return self._user_mgr
+
+    def _fetch_user(self, base_url, login):
         """
 
+        Parameters
+        ----------
+        base_url: str
+        login: str
+
+        Returns
+        -------
+        User or AssertionError
+            the user or, if GHE does not have it, the error
+        """
+        try:
+            return self._extract_users_from_ghe(username=login, base_url=base_url)
+        except AssertionError as e:
+            return e
+
+    def _resolve_users(self, base_url, authors, user_mgr, fallback):
+        """
+        finds the users of the authors of a page of commits or issues. Each author is looked up once per run: first in
+        the cache of user_mgr (or the database, if it is not there), then, if it is not found, in GHE. The logins that
+        are not found are requested concurrently, using up to num_workers requests, and the users are inserted
+
+        Parameters
+        ----------
+        base_url: str
+        authors: list of tuple
+            (login, name, email) of each author; name and email may be None
+        user_mgr: UserMgr
+        fallback: bool
+            if True, an author that GHE does not have is inserted with its login, name and email; otherwise, the error
+            is raised
+
+        Returns
+        -------
+        dict
+            (login, name, email) -> User
+        """
+        users = dict()
+        missing = dict()
+        for key in authors:
+            if key in users or key in missing:
+                continue
+            user = self._resolved_users.get(key)
+            if user is None:
+                login, name, email = key
+                user = user_mgr.get_user_from_database(login=login, name=name, email=email)
+            if user is not None:
+                users[key] = self._resolved_users[key] = user
+            else:
+                missing[key] = key[0]
+        logins = sorted(set(login for login in missing.values() if login not in self._fetched_users), key=str)
+        if len(logins) > 0:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                fetched = executor.map(lambda login: self._fetch_user(base_url=base_url, login=login), logins)
+                for login, user in zip(logins, fetched):
+                    self._fetched_users[login] = user
+        for key, login in missing.items():
+            user = self._fetched_users.get(login)
+            if isinstance(user, AssertionError):
+                if not fallback:
+                    raise user
+                user = UserMgr.make_user(email=key[2], name=key[1], login=login)
+            elif user.user_id is not None:
+                # inserted for another author with the same login
+                users[key] = self._resolved_users[key] = user
+                continue
+            user.user_id = self._write(UserMgr, 'insert_user', user)
+            user_mgr.add_to_cache(user)
+            users[key] = self._resolved_users[key] = user
+        return users
+
+    def _make_get_request(self, url, params=None, api_token=None, allow_redirects=False):
+        """
+        makes a GET request using the shared HTTP client, which reuses connections and retries failed requests
+
         Parameters
         ----------
         url: str
@@ -90,57 +258,105 @@ class GHEExtractor:
         -------
         requests.Response
         """
-        headers = None
-        # if not url.startswith(GHEExtractor.PUBLIC_GITHUB_API):
-        headers = dict()
-        headers['Authorization'] = 'token %s' % api_token
-        resp = requests.get(url=url, params=params, headers=headers, allow_redirects=allow_redirects)
+        resp = self.client.get(url=url, params=params, api_token=api_token, allow_redirects=allow_redirects)
         return resp
 
-    def extract_commits_from_ghe(self, base_url, owner, repo, api_token, since=None):
+    def _get_commit_page(self, url, params, api_token):
         """
-        gets commit data from GHE API
 
         Parameters
         ----------
-        base_url: str
-        owner: str
-            owner name
-        repo: Repository
-            repository name
-        since: datetime
+        url: str
+        params: dict
         api_token: str
 
         Returns
         -------
-        list of dict
-            a sorted list of commit data
+        requests.Response
         """
-        logging.info('Extracting commits from repo: {} since={}'.format(repo.name, since))
-        user_mgr = UserMgr(path_to_db=self.db_path)
-        url = '{}/repos/{}/{}/commits'.format(base_url, owner, repo.name)
-        commit_list = list()
-        params = {'sha': 'master'}
-        if since is not None:
-            params['since'] = since.isoformat(sep='T')
-        resp = GHEExtractor._make_get_request(url=url, params=params, api_token=api_token)
+        logging.info('Requesting to GHE: URL={} params={}'.format(url, params))
+        resp = self._make_get_request(url=url, params=params, api_token=api_token)
         assert resp.status_code == 200, \
             "Error! status_code={} msg={} url={}".format(resp.status_code, resp.content, resp.url)
         resp_data = resp.json()
         assert resp_data is not None, 'Error! response is None'
         assert isinstance(resp_data, list), "Error! response is not list"
-        commit_list.extend(resp_data)
-        while 'next' in resp.links.keys():
-            url = resp.links['next']['url']
-            resp = GHEExtractor._make_get_request(url=url, params=params, api_token=api_token)
-            logging.info('Requesting to GHE: URL={} params={}'.format(url, params))
-            resp_data = resp.json()
-            assert resp_data is not None, 'Error! response is None'
-            assert isinstance(resp_data, list), "Error! response is not list"
-            commit_list.extend(resp_data)
-
-        commit_list_aux = list()
-        for c in commit_list:
+        return resp
+
+    def iter_commit_pages(self, base_url, owner, repo, api_token, since=None, page_url=None):
+        """
+        yields the pages of commits of the master branch as they arrive. GHE lists the newest commits first, so pages
+        are requested from the last one to the first one and each of them is reversed: commits are yielded from the
+        oldest to the newest one, and the last commit of the branch is the last one inserted into the database (see
+        RepositoryCommitConn.get_first_parent_chain). The first page, which is requested to find the last one, is not
+        requested again at the end. Commits pushed in the meantime only shift older commits to pages that were already
+        read, so they may be yielded twice (and are ignored by the database) but are not missed. The query has no
+        'until' parameter, so that its URLs are the same across runs and the cached responses can be revalidated
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+        api_token: str
+        since: datetime
+        page_url: str
+            URL of the page to start from (e.g. of a checkpoint), which already has the parameters of the query
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the commit data of each page and the URL of the page that comes after it, which is None for the last page
+        """
+        first_page = None
+        if page_url is None:
+            url = '{}/repos/{}/{}/commits'.format(base_url, owner, repo.name)
+            params = {'sha': 'master', 'per_page': GHEExtractor.PAGE_SIZE}
+            if since is not None:
+                params['since'] = since.isoformat(sep='T')
+            resp = self._get_commit_page(url=url, params=params, api_token=api_token)
+            first_page = list(reversed(resp.json()))
+            if 'next' not in resp.links.keys():
+                yield first_page, None
+                return
+            assert 'last' in resp.links.keys(), "Error! {} has no link to its last page".format(resp.url)
+            page_url = resp.links['last']['url']
+        while page_url is not None:
+            resp = self._get_commit_page(url=page_url, params=None, api_token=api_token)
+            if 'prev' in resp.links.keys():
+                page_url = resp.links['prev']['url']
+            else:
+                page_url = None
+            yield list(reversed(resp.json())), page_url
+            if first_page is not None and page_url is not None and \
+                    page_url == resp.links.get('first', dict()).get('url'):
+                yield first_page, None
+                return
+
+    def _parse_commits(self, base_url, commit_data, user_mgr):
+        """
+        converts the commit data returned by GHE, inserting the authors that are not in the database yet
+
+        Parameters
+        ----------
+        base_url: str
+        commit_data: list of dict
+        user_mgr: UserMgr
+
+        Returns
+        -------
+        list of dict
+        """
+        authors = list()
+        for c in commit_data:
+            author_data = (c.get('commit') or dict()).get('author')
+            if author_data is not None and author_data.get('date') is not None:
+                email = author_data.get('email')
+                login = email.split('@')[0] if email is not None and '@' in email else None
+                authors.append((login, author_data.get('name'), email))
+        users = self._resolve_users(base_url=base_url, authors=authors, user_mgr=user_mgr, fallback=True)
+        commit_list = list()
+        for c in commit_data:
             commit_item = c.get('commit')
             sha = c.get('sha')
             if commit_item is not None:
@@ -161,14 +377,7 @@ class GHEExtractor:
                     message = ''
                     for k in message_aux.split("\n"):
                         message += re.sub(r"[^a-zA-Z0-9]+", ' ', k)
-                    user = user_mgr.get_user_from_database(login=login, email=email, name=name)
-                    if user is None:
-                        try:
-                            user = GHEExtractor._extract_users_from_ghe(username=login, base_url=base_url)
-                        except AssertionError:
-                            name = author_data.get('name')
-                            user = UserMgr.make_user(email=email, name=name, login=login)
-                        user.user_id = user_mgr.insert_user(user)
+                    user = users.get((login, name, email))
 
                     author_dt_str = author_data.get('date')
                     dt = datetime.strptime(author_dt_str, "%Y-%m-%dT%H:%M:%SZ")
@@ -186,13 +395,94 @@ class GHEExtractor:
 
                     else:
                         d['parents_sha'] = list()
-                    commit_list_aux.append(d)
-        sorted_commit_list = sorted(commit_list_aux, key=lambda k: k.get('date'))
+                    commit_list.append(d)
+        return commit_list
 
-        return sorted_commit_list
+    def extract_commits_from_ghe(self, base_url, owner, repo, api_token, since=None, page_url=None):
+        """
+        gets commit data from GHE API, one page at a time
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+            owner name
+        repo: Repository
+            repository name
+        since: datetime
+        api_token: str
+        page_url: str
+            see iter_commit_pages
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the commit data of each page, from the oldest to the newest commit, and the URL of the next page
+        """
+        logging.info('Extracting commits from repo: {} since={} page_url={}'.format(repo.name, since, page_url))
+        user_mgr = self._get_user_mgr()
+        for commit_data, next_page_url in self.iter_commit_pages(base_url=base_url, owner=owner, repo=repo,
+                                                                 api_token=api_token, since=since, page_url=page_url):
+            yield self._parse_commits(base_url=base_url, commit_data=commit_data, user_mgr=user_mgr), next_page_url
+
+    def mine_commits(self, base_url, owner, repo, api_token, since=None):
+        """
+        extracts the commits of a repository and writes them page by page, so that at most one page of commits is in
+        memory. After each page, the URL of the next one is saved as a checkpoint; if the previous run was interrupted,
+        this one resumes from its checkpoint and since is ignored. Otherwise, if since is None, only the commits made
+        since the newest one of the previous run are extracted
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+        api_token: str
+        since: datetime
+
+        Returns
+        -------
+        int
+            number of commits extracted
+        """
+        checkpoint_conn = MiningCheckpointConn(path_to_db=self.db_path)
+        checkpoint = checkpoint_conn.get_checkpoint(repository_id=repo.repository_id,
+                                                    phase=GHEExtractor.COMMITS_PHASE)
+        page_url = last_sha = None
+        if checkpoint is not None:
+            last_sha = checkpoint.get('last_sha')
+        if checkpoint is not None and checkpoint.get('status') != MiningCheckpointConn.DONE \
+                and checkpoint.get('page_url') is not None:
+            page_url = checkpoint.get('page_url')
+            logging.info('Resuming the extraction of commits from repo {} after SHA={}'.format(repo.name, last_sha))
+        elif since is None and checkpoint is not None and checkpoint.get('last_date') is not None:
+            since = datetime.strptime(checkpoint.get('last_date'), '%Y-%m-%dT%H:%M:%S')
+        elif since is None:
+            # the repository was mined before checkpoints existed or it was never mined
+            since = self.commit_mgr.get_last_commit_date(repository_id=repo.repository_id)
+        num_commits = 0
+        pages = self.extract_commits_from_ghe(base_url=base_url, owner=owner, repo=repo, api_token=api_token,
+                                              since=since, page_url=page_url)
+        for commit_list, next_page_url in pages:
+            self._insert_commit_data_into_database(base_url=base_url, commit_list=commit_list, repo=repo, owner=owner,
+                                                   api_token=api_token)
+            num_commits += len(commit_list)
+            if len(commit_list) > 0:
+                last_sha = commit_list[-1].get('sha')
+            if next_page_url is not None:
+                self._save_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.COMMITS_PHASE,
+                                      page_url=next_page_url, last_sha=last_sha)
+        last_date = self.commit_mgr.get_last_commit_date(repository_id=repo.repository_id)
+        self._save_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.COMMITS_PHASE,
+                              last_sha=last_sha, status=MiningCheckpointConn.DONE,
+                              last_date=last_date.isoformat() if last_date is not None else None)
+        return num_commits
 
     def _insert_commit_data_into_database(self, base_url, commit_list, repo, owner, api_token):
         """
+        fetches the file modifications of the commits that are not in the database yet and inserts them. Requests to
+        GHE are made concurrently (see _fetch_file_modifications), but all writes happen in the calling thread, in
+        batches of BATCH_SIZE commits per transaction
 
         Parameters
         ----------
@@ -206,33 +496,74 @@ class GHEExtractor:
         -------
 
         """
-        commit_dates = list()
-        num_commits = len(commit_list)
-
-        for i, d in enumerate(commit_list):
-
+        missing_commits = list()
+        for d in commit_list:
             sha = d.get('sha')
-            commit = Commit(date=d.get('date'), sha=sha, user=d.get('user'), comment=d.get('message'))
-            logging.info('Extracting commit from repo {}: SHA={} {} out of {}'.format(repo.name, sha, i+1, num_commits))
-
             existing_commit = self.commit_mgr.get_commit(sha=sha)
             # if commit has not already been inserted into the database or its file modifications have not been
             # collected
             if existing_commit is None or len(existing_commit.file_modifications) == 0:
-                # get the file modifications from a single commit
-                commit.file_modifications, num_add, num_del = \
-                    self._extract_file_modifications_from_ghe(owner=owner, repo=repo, sha=sha, base_url=base_url,
-                                                              api_token=api_token)
-                commit_dates.append(commit.date.isoformat())
-                self.commit_mgr.insert_commit(repository=repo, commit=commit, parent_commit_shas=d.get('parents_sha'))
-
+                missing_commits.append(d)
             else:
                 logging.info('Yay! {} has already been inserted into the database'.format(repo.name))
 
+        num_commits = len(missing_commits)
+        modifications = self._fetch_file_modifications(base_url=base_url, commit_list=missing_commits, repo=repo,
+                                                       owner=owner, api_token=api_token)
+        batch = list()
+        for i, (d, file_modifications) in enumerate(modifications):
+            sha = d.get('sha')
+            logging.info('Extracting commit from repo {}: SHA={} {} out of {}'.format(repo.name, sha, i+1, num_commits))
+            commit = Commit(date=d.get('date'), sha=sha, user=d.get('user'), comment=d.get('message'))
+            commit.file_modifications = file_modifications
+            batch.append((commit, d.get('parents_sha')))
+            if len(batch) >= GHEExtractor.BATCH_SIZE:
+                self._write(CommitMgr, 'insert_commits', repository=repo, commits=batch)
+                batch = list()
+        self._write(CommitMgr, 'insert_commits', repository=repo, commits=batch)
+
+    def _fetch_file_modifications(self, base_url, commit_list, repo, owner, api_token):
+        """
+        fetches the file modifications of each commit using up to num_workers concurrent requests. At most
+        2 * num_workers requests are in flight at a time and results are yielded in the same order of commit_list
+
+        Parameters
+        ----------
+        base_url: str
+        commit_list: List[dict]
+        repo: Repository
+        owner: str
+        api_token: str
+
+        Returns
+        -------
+        generator of (dict, list of FileModification)
+        """
+        max_in_flight = 2 * self.num_workers
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            in_flight = deque()
+            for d in commit_list:
+                future = executor.submit(self._extract_file_modifications_from_ghe, base_url=base_url,
+                                         owner=owner, repo=repo, sha=d.get('sha'), api_token=api_token)
+                in_flight.append((d, future))
+                if len(in_flight) >= max_in_flight:
+                    done, future = in_flight.popleft()
+                    file_modifications, _, _ = future.result()
+                    yield done, file_modifications
+            while len(in_flight) > 0:
+                done, future = in_flight.popleft()
+                file_modifications, _, _ = future.result()
+                yield done, file_modifications
+
     def _find_and_repair_inconsistencies(self, repository, owner, extensions, base_url):
         """
         find and repair inconsistencies on data made provided by GHE (e.g., a file that has status modified but the
-        number of modifications is zero)
+        number of modifications is zero). Commits are compared to their parents and their files are downloaded using
+        up to num_workers concurrent threads, at most 2 * num_workers commits at a time, but they are repaired in the
+        order they were inserted. After every BATCH_SIZE repaired commits, and when the repair stops, the LOC timelines
+        of the batch are recomputed once and the ID of its last commit is saved as a checkpoint, so the commits that
+        were already repaired are skipped by the next runs. Author dates are not used for the checkpoint, since a later
+        run may insert commits that are older than the ones repaired (e.g. of a merged branch)
 
         Parameters
         ----------
@@ -246,21 +577,77 @@ class GHEExtractor:
 
         """
         repository_mgr = RepositoryMgr(self.db_path)
+        checkpoint_conn = MiningCheckpointConn(path_to_db=self.db_path)
+        repository_id = repository.repository_id
+        checkpoint = checkpoint_conn.get_checkpoint(repository_id=repository_id, phase=GHEExtractor.REPAIR_PHASE)
+        last_id = checkpoint.get('last_id') if checkpoint is not None else None
 
         commits = repository_mgr.find_inconsistent_commits(repository=repository, extensions=extensions)
-        sorted_commits = sorted(commits, key=lambda c: c.date)
+        # IDs grow in the order commits are inserted
+        sorted_commits = sorted(commits, key=lambda c: c.commit_id)
         repo_mgr = RepositoryMgr(path_to_db=self.db_path)
 
-        for commit in sorted_commits[1:]:
+        max_in_flight = 2 * self.num_workers
+        # commits repaired since the last checkpoint
+        repaired = list()
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                in_flight = deque()
+                pending = iter(sorted_commits)
+                while True:
+                    # the database is only read and written by this thread
+                    for commit in pending:
+                        if last_id is not None and commit.commit_id <= last_id:
+                            continue
+                        parent_commit_sha = self.commit_mgr.get_parent_commit_sha(commit=commit)
+                        if parent_commit_sha is None:
+                            # the first commit of the repository has nothing to be compared to
+                            logging.info('Commit {} has no parent, so it is not repaired'.format(commit.sha))
+                            continue
+                        commit_repository = repo_mgr.get_repository_by_commit(sha=commit.sha)
+                        future = executor.submit(self._get_repaired_file_modifications, base_url=base_url,
+                                                 older_commit_sha=parent_commit_sha, newer_commit=commit,
+                                                 repo=commit_repository, owner=owner)
+                        in_flight.append((commit, future))
+                        if len(in_flight) >= max_in_flight:
+                            break
+                    if len(in_flight) == 0:
+                        break
+                    commit, future = in_flight.popleft()
+                    for fm in future.result():
+                        self._write(FileModificationConn, 'update_filemodification', filemodification=fm,
+                                    commit_id=commit.commit_id)
+                    last_id = commit.commit_id
+                    repaired.append(commit)
+                    if len(repaired) >= GHEExtractor.BATCH_SIZE:
+                        self._save_repaired(repository_id=repository_id, repaired=repaired)
+                        repaired = list()
+        finally:
+            if len(repaired) > 0:
+                self._save_repaired(repository_id=repository_id, repaired=repaired)
+        self._save_checkpoint(repository_id=repository_id, phase=GHEExtractor.REPAIR_PHASE, last_id=last_id,
+                              status=MiningCheckpointConn.DONE)
+
+    def _save_repaired(self, repository_id, repaired):
+        """
+        recomputes the LOC timelines that have the repaired commits and saves the last one as the checkpoint of the
+        repair phase
 
-            parent_commit_sha = self.commit_mgr.get_parent_commit_sha(commit=commit)
-            assert parent_commit_sha is not None, 'Error! Unable to find parent of commit: {}'.format(commit.sha)
-            repository = repo_mgr.get_repository_by_commit(sha=commit.sha)
-            self._compare_two_commits(older_commit_sha=parent_commit_sha, newer_commit=commit,
-                                      owner=owner, repo=repository, base_url=base_url)
+        Parameters
+        ----------
+        repository_id: int
+        repaired: List[Commit]
+            commits repaired since the last checkpoint, in the order they were repaired
 
-    @staticmethod
-    def _extract_file_modifications_from_ghe(base_url, owner, repo, sha, api_token):
+        Returns
+        -------
+        None
+        """
+        self._write(LocTimelineConn, 'recompute_commits', commit_ids=[c.commit_id for c in repaired])
+        self._save_checkpoint(repository_id=repository_id, phase=GHEExtractor.REPAIR_PHASE,
+                              last_sha=repaired[-1].sha, last_id=repaired[-1].commit_id)
+
+    def _extract_file_modifications_from_ghe(self, base_url, owner, repo, sha, api_token):
         """
         extracts file modifications from GHE, given an owner, a repository and the SHA of the commit
 
@@ -276,7 +663,7 @@ class GHEExtractor:
         list of FileModification
         """
         url = '{}/repos/{}/{}/commits/{}'.format(base_url, owner, repo.name, sha)
-        resp = GHEExtractor._make_get_request(url=url, api_token=api_token)
+        resp = self._make_get_request(url=url, api_token=api_token)
         assert resp.status_code == 200, "Error! status={} msg={} url={}".format(resp.status_code, resp.text, resp.url)
         single_commit = resp.json()
         stats = single_commit.get('stats')
@@ -309,21 +696,46 @@ class GHEExtractor:
         Returns
         -------
 
+        """
+        for fm in self._get_repaired_file_modifications(base_url=base_url, older_commit_sha=older_commit_sha,
+                                                        newer_commit=newer_commit, repo=repo, owner=owner):
+            self._write(FileModificationConn, 'update_filemodification', filemodification=fm,
+                        commit_id=newer_commit.commit_id)
+        self._write(LocTimelineConn, 'recompute_commits', commit_ids=[newer_commit.commit_id])
+
+    def _get_repaired_file_modifications(self, base_url, older_commit_sha, newer_commit, repo, owner):
+        """
+        compare two commits and compute the file modifications of the newer one that are inconsistent, downloading
+        the files into the blob store; it makes no writes, so it can run in any thread
+
+        Parameters
+        ----------
+        older_commit_sha: str
+        newer_commit: Commit
+        repo: Repository
+        owner: str
+
+        Returns
+        -------
+        list of FileModification
         """
         url = '{}/repos/{}/{}/compare/{}...{}'.format(base_url, owner, repo.name, older_commit_sha,
                                                       newer_commit.sha)
-        resp = GHEExtractor._make_get_request(url=url)
+        resp = self._make_get_request(url=url)
         # logging.info('GET {}'.format(url))
         assert resp.status_code == 200, "Error! status={} msg={} url={}".format(resp.status_code, resp.text, resp.url)
         compare_resp = resp.json()
         assert isinstance(compare_resp, dict), "Error! Unexpected response: {}".format(compare_resp)
-        filemodification_conn = FileModificationConn(path_to_db=self.db_path)
         files = compare_resp.get('files')
         assert isinstance(files, list), "Error! files is not a list: {}".format(files)
+        blob_store = self._get_blob_store()
+        repaired = list()
         for file in files:
             assert isinstance(file, dict), "Error! item of files is not a dict: {}".format(file)
-            assert 'status'
             f_name = file.get('filename')
+            # the blob of the file in the newer commit, which is the older commit of the next comparison
+            if file.get('status') != 'removed' and file.get('sha') is not None:
+                blob_store.add_to_index(commit_sha=newer_commit.sha, filename=f_name, sha=file.get('sha'))
             for fm in newer_commit.file_modifications:
                 if f_name in fm.filename and not f_name.endswith('__init__.py'):
                     try:
@@ -341,15 +753,12 @@ class GHEExtractor:
                     contents_url = contents_url[:equal_index]
                     # update data when file is modified but number of changes is zero
                     if fm.status == 'modified' and fm.changes == 0:
-
-                        downloaded_files = list()
-                        for sha in [older_commit_sha, newer_commit.sha]:
-
-                            downloaded_file_path = self._download_file(url=contents_url, commit_sha=sha,
-                                                                       filename=fm.filename)
-                            downloaded_files.append(downloaded_file_path)
-                        num_additions, num_deletions = GHEExtractor._diff_files(older_filename=downloaded_files[0],
-                                                                                newer_filename=downloaded_files[1])
+                        older_path = self._download_file(url=contents_url, commit_sha=older_commit_sha,
+                                                         filename=fm.filename)
+                        newer_path = self._download_file(url=contents_url, commit_sha=newer_commit.sha,
+                                                         filename=fm.filename, blob_sha=file.get('sha'))
+                        num_additions, num_deletions = GHEExtractor._diff_files(older_filename=older_path,
+                                                                                newer_filename=newer_path)
                         fm.additions = num_additions
                         fm.deletions = num_deletions
                     # update data when file is removed but number of deletions is zero
@@ -362,16 +771,18 @@ class GHEExtractor:
                     # update data when file is added but number of additions is zero
                     elif fm.status == 'added' and fm.additions == 0:
                         downloaded_file_path = self._download_file(url=contents_url, commit_sha=newer_commit.sha,
-                                                                   filename=fm.filename)
+                                                                   filename=fm.filename, blob_sha=file.get('sha'))
 
                         num_additions = GHEExtractor._count_loc(downloaded_file_path)
                         fm.additions = num_additions
                     logging.info('filemodification={}'.format(fm))
-                    filemodification_conn.update_filemodification(filemodification=fm, commit_id=newer_commit.commit_id)
+                    repaired.append(fm)
+        return repaired
 
     @staticmethod
     def _count_loc(file):
         """
+        see LineCounter.count_lines
 
         Parameters
         ----------
@@ -381,53 +792,66 @@ class GHEExtractor:
         -------
         int
         """
-        with open(file, 'r') as f:
-            lines = f.readlines()
-            loc = len(lines)
-        return loc
+        return LineCounter.count_lines(file)
 
-    def _download_file(self, url, commit_sha, filename):
+    def _get_blob_store(self):
         """
+        gets the blob store of this extractor, creating it in DIFF_DIR next to the working directory if needed
+
+        Returns
+        -------
+        BlobStore
+        """
+        if self.blob_store is None:
+            self.blob_store = BlobStore(path=str(Path(os.getcwd()).parent / GHEExtractor.DIFF_DIR / 'blobs'))
+        return self.blob_store
+
+    def _download_file(self, url, commit_sha, filename, blob_sha=None):
+        """
+        gets the content of a file in a commit from the blob store or, if it is not there, downloads it into the
+        store
 
         Parameters
         ----------
         url:str
+            contents URL of the file, without the ref
         commit_sha: str
         filename: str
+        blob_sha: str
+            SHA of the blob of the file in the commit, if it is known (e.g. from a comparison)
 
         Returns
         -------
         str
+            path to the blob
         """
-        p = Path(os.getcwd())
-        posix_path = p.parent / GHEExtractor.DIFF_DIR / commit_sha / filename
-        path = str(posix_path)
-        if not os.path.isfile(path):
-            url += commit_sha
-            resp = GHEExtractor._make_get_request(url, allow_redirects=True)
-            data = resp.json()
-            relative_path = data.get('path')
-            posix_path = p.parent / GHEExtractor.DIFF_DIR / commit_sha / relative_path
-            path = str(posix_path)
-            index = path.rfind('/')
-            dirs_path = path[:index]
-            os.makedirs(dirs_path, exist_ok=True)
-            with open(path, 'wb') as f:
-                content = data.get('content')
-                try:
-                    body = base64.b64decode(content)
-                except TypeError as e:
-                    logging.critical('path={} url={} exception={}'.format(path, url, e))
-                    raise e
-                f.write(body)
-
-        assert os.path.isfile(path) is True, "Error! {} file not found".format(path)
-        logging.info('saved file {}'.format(path))
+        blob_store = self._get_blob_store()
+        if blob_sha is None:
+            blob_sha = blob_store.get_sha(commit_sha=commit_sha, filename=filename)
+        if blob_sha is not None:
+            path = blob_store.get(blob_sha)
+            if path is not None:
+                return path
+        url += commit_sha
+        resp = self._make_get_request(url, allow_redirects=True)
+        data = resp.json()
+        content = data.get('content')
+        try:
+            body = base64.b64decode(content)
+        except TypeError as e:
+            logging.critical('filename={} url={} exception={}'.format(filename, url, e))
+            raise e
+        blob_sha = data.get('sha')
+        assert blob_sha is not None, "Error! {} has no blob SHA".format(url)
+        path = blob_store.put(sha=blob_sha, content=body)
+        blob_store.add_to_index(commit_sha=commit_sha, filename=filename, sha=blob_sha)
+        logging.info('saved blob {} of {} in {}'.format(blob_sha, filename, commit_sha))
         return path
 
     @staticmethod
     def _diff_files(older_filename, newer_filename):
         """
+        see LineDiff.count_changes
 
         Parameters
         ----------
@@ -438,17 +862,7 @@ class GHEExtractor:
         -------
         (int, int)
         """
-        additions = deletions = 0
-        with open(older_filename) as text1:
-            with open(newer_filename) as text2:
-                d = difflib.Differ()
-                diff = list(d.compare(text1.readlines(), text2.readlines()))
-                for d in diff:
-                    if d.startswith('+'):
-                        additions += 1
-                    elif d.startswith('-'):
-                        deletions += 1
-        return additions, deletions
+        return LineDiff.count_changes(older_filename=older_filename, newer_filename=newer_filename)
 
     def _get_filemodification(self, filename, until_date, repository_id):
         """
@@ -485,7 +899,7 @@ class GHEExtractor:
         if label is None:
             description = label_data.get('description')
             label = Label(name=name, description=description)
-            label_id = issue_mgr.insert_label(label)
+            label_id = self._write(IssueMgr, 'insert_label', label)
             label.label_id = label_id
         return label
 
@@ -506,10 +920,110 @@ class GHEExtractor:
         if assignee is None:
             html_url = assignee_data.get('html_url')
             assignee = Assignee(login=login, htmlurl=html_url)
-            assignee_id = issue_mgr.insert_assignee(assignee)
+            assignee_id = self._write(IssueMgr, 'insert_assignee', assignee)
             assignee.assignee_id = assignee_id
         return assignee
 
+    def iter_issue_pages(self, base_url, owner, repo_name, since=None, page_url=None):
+        """
+        yields the pages of issues (and pull requests) of a repository as they arrive, from the least to the most
+        recently updated one
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo_name: str
+        since: datetime
+            only issues updated at or after since are returned
+        page_url: str
+            URL of the page to start from (e.g. of a checkpoint), which already has the parameters of the query
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the issue data of each page and the URL of the next page, which is None for the last page
+        """
+        if page_url is None:
+            url = '{}/repos/{}/{}/issues'.format(base_url, owner, repo_name)
+            params = {'state': 'all', 'filter': 'all', 'sort': 'updated', 'direction': 'asc',
+                      'per_page': GHEExtractor.PAGE_SIZE}
+            if since is not None:
+                params['since'] = since.strftime('%Y-%m-%dT%H:%M:%SZ')
+        else:
+            url = page_url
+            params = None
+        resp = self._make_get_request(url=url, params=params)
+        # e.g. the issues of the repository are disabled
+        if resp.status_code != 200:
+            logging.warning('Unable to get issues: status={} url={}'.format(resp.status_code, resp.url))
+            return
+        while True:
+            if 'next' in resp.links.keys():
+                url = resp.links['next']['url']
+            else:
+                url = None
+            yield resp.json(), url
+            if url is None:
+                break
+            resp = self._make_get_request(url=url)
+            assert resp.status_code == 200, "Error! status={} msg={}".format(resp.status_code, resp.text)
+
+    def _parse_issues(self, base_url, issue_data, user_mgr):
+        """
+        converts the issue data returned by GHE, skipping pull requests and inserting the authors, labels and
+        assignees that are not in the database yet
+
+        Parameters
+        ----------
+        base_url: str
+        issue_data: list of dict
+        user_mgr: UserMgr
+
+        Returns
+        -------
+        list of Issue
+        """
+        authors = [(i.get('user').get('login'), None, None) for i in issue_data if 'pull_request' not in i.keys()]
+        users = self._resolve_users(base_url=base_url, authors=authors, user_mgr=user_mgr, fallback=False)
+        issues = list()
+        for i in issue_data:
+            if 'pull_request' not in i.keys():
+
+                title_aux = i.get('title')
+                title = ''
+                for k in title_aux.split("\n"):
+                    title += re.sub(r"[^a-zA-Z0-9]+", ' ', k)
+                body_aux = i.get('body')
+                body = ''
+                if body_aux is not None and isinstance(body_aux, str):
+                    for k in body_aux.split("\n"):
+                        body += re.sub(r"[^a-zA-Z0-9]+", ' ', k)
+                created_at = i.get('created_at')
+                closed_at = i.get('closed_at')
+                updated_at = i.get('updated_at')
+                state = i.get('state')
+                labels = list()
+                label_resp = i.get('labels')
+                if label_resp is not None:
+                    for l in label_resp:
+                        labels.append(self._get_label(l))
+
+                login = i.get('user').get('login')
+                user = users.get((login, None, None))
+                assert user is not None, "Error! User is None: login={}".format(login)
+                assignees_data = i.get('assignees')
+                assignees_list = list()
+                for a in assignees_data:
+                    assignees_list.append(self._create_assignee(assignee_data=a))
+
+                issue = Issue(title=title, body=body, create_at=created_at, state=state, user=user,
+                              closed_at=closed_at, updated_at=updated_at)
+                issue.assignees = assignees_list
+                issues.append(issue)
+                issue.labels = labels
+        return issues
+
     def _get_issues_from_ghe(self, base_url, owner, repo_name):
         """
 
@@ -524,62 +1038,58 @@ class GHEExtractor:
 
         """
         issues = list()
-        url = '{}/repos/{}/{}/issues'.format(base_url, owner, repo_name)
-        # for la in ['bug', 'enhancement']:
-        params = {'state': 'all', 'filter': 'all'}
-        resp = GHEExtractor._make_get_request(url=url, params=params)
-        # assert resp.status_code == 200, "Error! status={} msg={}".format(resp.status_code, resp.text)
-        status = resp.status_code
-        has_next = True
-        while status == 200 and has_next:
-            ghe_issues_resp = resp.json()
-            user_mgr = UserMgr(path_to_db=self.db_path)
-            for i in ghe_issues_resp:
-                if 'pull_request' not in i.keys():
-
-                    title_aux = i.get('title')
-                    title = ''
-                    for k in title_aux.split("\n"):
-                        title += re.sub(r"[^a-zA-Z0-9]+", ' ', k)
-                    body_aux = i.get('body')
-                    body = ''
-                    if body_aux is not None and isinstance(body_aux, str):
-                        for k in body_aux.split("\n"):
-                            body += re.sub(r"[^a-zA-Z0-9]+", ' ', k)
-                    created_at = i.get('created_at')
-                    closed_at = i.get('closed_at')
-                    updated_at = i.get('updated_at')
-                    state = i.get('state')
-                    labels = list()
-                    label_resp = i.get('labels')
-                    if label_resp is not None:
-                        for l in label_resp:
-                            labels.append(self._get_label(l))
-
-                    login = i.get('user').get('login')
-                    user = user_mgr.get_user_from_database(login=login)
-                    if user is None:
-                        user = GHEExtractor._extract_users_from_ghe(base_url=base_url, username=login)
-                        user.user_id = user_mgr.insert_user(user)
-                    assert user is not None, "Error! User is None: login={}".format(login)
-                    assignees_data = i.get('assignees')
-                    assignees_list = list()
-                    for a in assignees_data:
-                        assignees_list.append(self._create_assignee(assignee_data=a))
-
-                    issue = Issue(title=title, body=body, create_at=created_at, state=state, user=user,
-                                  closed_at=closed_at, updated_at=updated_at)
-                    issue.assignees = assignees_list
-                    issues.append(issue)
-                    issue.labels = labels
-            if 'next' in resp.links.keys():
-                url = resp.links['next']['url']
-                resp = GHEExtractor._make_get_request(url=url, params=params)
-                assert resp.status_code == 200, "Error! status={} msg={}".format(resp.status_code, resp.text)
-            else:
-                has_next = False
+        user_mgr = self._get_user_mgr()
+        for issue_data, _ in self.iter_issue_pages(base_url=base_url, owner=owner, repo_name=repo_name):
+            issues.extend(self._parse_issues(base_url=base_url, issue_data=issue_data, user_mgr=user_mgr))
         return issues
 
+    def mine_issues(self, base_url, owner, repo):
+        """
+        extracts the issues of a repository and writes them page by page, saving the URL of the next page as a
+        checkpoint. If the previous run was interrupted, this one resumes from its checkpoint; otherwise, only the
+        issues updated since the most recently updated one of the previous run are extracted
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+
+        Returns
+        -------
+        int
+            number of issues extracted
+        """
+        checkpoint_conn = MiningCheckpointConn(path_to_db=self.db_path)
+        checkpoint = checkpoint_conn.get_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.ISSUES_PHASE)
+        page_url = since = last_date = None
+        if checkpoint is not None:
+            last_date = checkpoint.get('last_date')
+            if checkpoint.get('status') != MiningCheckpointConn.DONE and checkpoint.get('page_url') is not None:
+                page_url = checkpoint.get('page_url')
+                logging.info('Resuming the extraction of issues from repo {}'.format(repo.name))
+            elif last_date is not None:
+                since = datetime.strptime(last_date, '%Y-%m-%dT%H:%M:%SZ')
+        user_mgr = self._get_user_mgr()
+        num_issues = 0
+        for issue_data, next_page_url in self.iter_issue_pages(base_url=base_url, owner=owner, repo_name=repo.name,
+                                                               since=since, page_url=page_url):
+            repo.issues = self._parse_issues(base_url=base_url, issue_data=issue_data, user_mgr=user_mgr)
+            self._write(IssueMgr, 'insert_issue_into_db', repo)
+            num_issues += len(repo.issues)
+            # ISO dates in UTC are sorted as strings
+            dates = [i.get('updated_at') for i in issue_data if i.get('updated_at') is not None]
+            if last_date is not None:
+                dates.append(last_date)
+            if len(dates) > 0:
+                last_date = max(dates)
+            if next_page_url is not None:
+                self._save_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.ISSUES_PHASE,
+                                      page_url=next_page_url, last_date=last_date)
+        self._save_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.ISSUES_PHASE,
+                              last_date=last_date, status=MiningCheckpointConn.DONE)
+        return num_issues
+
     @staticmethod
     def _get_base_url(repo_url: str) -> str:
         """
@@ -602,90 +1112,182 @@ class GHEExtractor:
             return s
 
     @staticmethod
-    def extract_new_data_from_ghe(service_list: List[Dict], db_path: str, api_token: str) -> None:
+    def register_service(service_description: Dict, db_path) -> List[Dict]:
         """
+        inserts the service and its repositories into the database, unless they are already there
 
         Parameters
         ----------
-        service_list: List[Dict]
-        db_path: str
-        api_token: str
+        service_description: Dict
+            item of the input data (see get_target_services_description)
+        db_path: str or ConnectionPool
 
         Returns
         -------
-        None
+        List[Dict]
+            one job per repository of the service to be given to mine_repository, with its url, base_url, owner,
+            repository and the extensions of the service
         """
-        extractor = GHEExtractor(db_path=db_path)
-        commit_mgr = CommitMgr(path_to_db=db_path)
         repo_mgr = RepositoryMgr(path_to_db=db_path)
+        repo_conn = RepositoryConn(path_to_db=db_path)
         service_mgr = ServiceMgr(db_path=db_path)
+        service_conn = ServiceConn(path_to_db=db_path)
         filesystem_mgr = FileSystemMgr(db_path)
+        service_name = service_description.get('name')
+        # only the row of the service is needed, not its commits
+        service = service_conn.get_service(name=service_name)
+        if service is None:
+            sid = service_mgr.insert_service(name=service_name, start_date_str=service_description.get('start_date'))
+            assert isinstance(sid, int)
+            filesystem_mgr.insert_extensions(service_id=sid,
+                                             programming_languages=service_description.get('programming_languages'))
+        else:
+            sid = service.service_id
+
+        # get list of extensions of this service
+        extensions = filesystem_mgr.get_extensions(service_id=sid)
+        jobs = list()
+        for rep in service_description.get('repositories'):
+            url = rep.get('url')
+            base_url = GHEExtractor._get_base_url(repo_url=url)
+            repo_name = rep.get('name')
+            owner = rep.get('owner')
+            # repositories are stored with the URL of the API, so that the checkpoints of a repository are found
+            # by the next runs; its commits are not loaded
+            repo_url = '{}/{}/{}'.format(base_url, owner, repo_name)
+            repo = repo_conn.get_repository_by_url(url=repo_url)
+            if repo is None:
+                repo = repo_conn.get_repository_by_url(url=url)
+            if repo is None:
+                repo = repo_mgr.create_repository(name=repo_name, url=repo_url)
+                repo.repository_id = repo_mgr.insert_repository(repository=repo)
+                repo.owner = owner
+
+            start_date_repo = rep.get('start_date')
+            end_date_repo = rep.get('end_date')
+            initial_loc = rep.get('initial_loc')
+            service_mgr.insert_service_repository(service_name=service_name, repository_id=repo.repository_id,
+                                                  start_date=start_date_repo, end_date=end_date_repo,
+                                                  initial_loc=initial_loc)
+
+            assert repo is not None, "Error! Invalid repo"
+            assert isinstance(repo, Repository), "Error! repo is not a type of Repository"
+            assert repo.repository_id is not None, "Error! repo id is none: {}".format(repo)
+            jobs.append({'url': url, 'base_url': base_url, 'owner': owner, 'repository': repo,
+                         'extensions': extensions})
+        return jobs
 
-        for s in service_list:
-            service_name = s.get('name')
-            end_date_str = s.get('end_date')
-            start_date_str = s.get('start_date')
-            programming_languages = s.get('programming_languages')
-            logging.info('Extracting data from: {}'.format(service_name))
-            service = service_mgr.get_service(service_name=service_name)
-            if service is None:
-                sid = service_mgr.insert_service(name=service_name, start_date_str=start_date_str)
-                service = service_mgr.get_service(service_id=sid)
-                assert isinstance(sid, int)
-                filesystem_mgr.insert_extensions(service_id=sid, programming_languages=programming_languages)
-            else:
-                sid = service.service_id
-
-            # get list of extensions of this service
-            extensions = filesystem_mgr.get_extensions(service_id=sid)
-            for rep in s.get('repositories'):
-                url = rep.get('url')
-                base_url = GHEExtractor._get_base_url(repo_url=url)
-                print('Getting data from: {}'.format(url))
-                repo_name = rep.get('name')
-                owner = rep.get('owner')
-                repo = repo_mgr.get_repository(url=url, service_id=sid)
-                if repo is None:
-                    repo_url = '{}/{}/{}'.format(base_url, owner, repo_name)
-                    repo = repo_mgr.create_repository(name=repo_name, url=repo_url)
-                    repo.repository_id = repo_mgr.insert_repository(repository=repo)
-                    repo.owner = owner
-
-                start_date_repo = rep.get('start_date')
-                end_date_repo = rep.get('end_date')
-                initial_loc = rep.get('initial_loc')
-                service_mgr.insert_service_repository(service_name=service_name, repository_id=repo.repository_id,
-                                                      start_date=start_date_repo, end_date=end_date_repo,
-                                                      initial_loc=initial_loc)
-
-                # get most recent commits
-                last_commit = commit_mgr.get_commit_by_position(repository_id=repo.repository_id, pos=-1)
-                if last_commit is not None:
-                    since = last_commit.date
-                else:
-                    since = None
-                assert repo is not None, "Error! Invalid repo"
-                assert isinstance(repo, Repository), "Error! repo is not a type of Repository"
-                assert repo.repository_id is not None, "Error! repo id is none: {}".format(repo)
-                commits = extractor.extract_commits_from_ghe(base_url=base_url, owner=owner, repo=repo, since=since,
-                                                             api_token=api_token)
-                extractor._insert_commit_data_into_database(commit_list=commits, repo=repo, owner=owner,
-                                                            base_url=base_url, api_token=api_token)
-
-                extractor._find_and_repair_inconsistencies(owner=owner, repository=repo, extensions=extensions,
-                                                           base_url=base_url)
-            try:
-                end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-            except (ValueError, TypeError) as e:
-                end_date = None
+    @staticmethod
+    def update_service_dates(service_description: Dict, db_path) -> None:
+        """
 
-            try:
-                start_date_dt = datetime.strptime(start_date_str, "%Y-%m-%d")
-                start_date = start_date_dt.date()
-            except (ValueError, TypeError) as e:
-                start_date = None
+        Parameters
+        ----------
+        service_description: Dict
+        db_path: str or ConnectionPool
+
+        Returns
+        -------
+        None
+        """
+        end_date_str = service_description.get('end_date')
+        start_date_str = service_description.get('start_date')
+        try:
+            end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
+        except (ValueError, TypeError) as e:
+            end_date = None
+
+        try:
+            start_date_dt = datetime.strptime(start_date_str, "%Y-%m-%d")
+            start_date = start_date_dt.date()
+        except (ValueError, TypeError) as e:
+            start_date = None
+
+        service = ServiceConn(path_to_db=db_path).get_service(name=service_description.get('name'))
+        ServiceMgr(db_path=db_path).update_dates(service_id=service.service_id, end_date=end_date,
+                                                 start_date=start_date)
 
-            service_mgr.update_dates(service_id=service.service_id, end_date=end_date, start_date=start_date)
+    @staticmethod
+    def build_loc_timelines(service_description: Dict, db_path) -> int:
+        """
+        builds the LOC timelines of the repositories of a service that are missing or out of date, e.g. after its dates
+        or rules changed, so that analytics can read them instead of the commits (see LocTimelineMgr)
+
+        Parameters
+        ----------
+        service_description: Dict
+        db_path: str or ConnectionPool
+
+        Returns
+        -------
+        int
+            number of timelines that were built
+        """
+        service = ServiceConn(path_to_db=db_path).get_service(name=service_description.get('name'))
+        return LocTimelineMgr(db_path=db_path).build(service_id=service.service_id)
+
+    def mine_repository(self, job: Dict) -> Dict:
+        """
+        mines the commits and issues of a repository and repairs its inconsistencies; each phase resumes from its
+        checkpoint
+
+        Parameters
+        ----------
+        job: Dict
+            returned by register_service
+
+        Returns
+        -------
+        Dict
+            number of commits and issues extracted
+        """
+        print('Getting data from: {}'.format(job.get('url')))
+        repo = job.get('repository')
+        base_url = job.get('base_url')
+        owner = job.get('owner')
+        num_commits = self.mine_commits(base_url=base_url, owner=owner, repo=repo, api_token=self.client.api_token)
+        num_issues = self.mine_issues(base_url=base_url, owner=owner, repo=repo)
+        self._find_and_repair_inconsistencies(owner=owner, repository=repo, extensions=job.get('extensions'),
+                                              base_url=base_url)
+        return {'commits': num_commits, 'issues': num_issues}
+
+    @classmethod
+    def extract_new_data_from_ghe(cls, service_list: List[Dict], db_path: str, api_token: str,
+                                  num_workers: int = NUM_WORKERS, cache_path: str = None) -> None:
+        """
+        mines the repositories of the services one at a time, using an extractor of this class
+
+        Parameters
+        ----------
+        service_list: List[Dict]
+        db_path: str
+        api_token: str
+        num_workers: int
+            maximum number of concurrent requests to GHE
+        cache_path: str
+            path to the file that caches GHE responses across runs; if None, responses are not cached
+
+        Returns
+        -------
+        None
+        """
+        # every Mgr and Conn below shares the connections of the bulk load profile
+        db_path = ConnectionPool.get_pool(db_path, profile=ConnectionProfile.BULK_LOAD)
+        # create the database if it does not exist and bring its schema up to date, e.g. the checkpoints table
+        schema_version = SchemaMgr(path_to_db=db_path).migrate()
+        logging.info('Database {} is at schema version {}'.format(db_path, schema_version))
+        extractor = cls(db_path=db_path, num_workers=num_workers, api_token=api_token, cache_path=cache_path)
+        for s in service_list:
+            logging.info('Extracting data from: {}'.format(s.get('name')))
+            for job in GHEExtractor.register_service(service_description=s, db_path=db_path):
+                extractor.mine_repository(job)
+            GHEExtractor.update_service_dates(service_description=s, db_path=db_path)
+            GHEExtractor.build_loc_timelines(service_description=s, db_path=db_path)
+        logging.info('Data extraction is over: {}'.format(extractor.client.rate_limiter))
+        if extractor.client.cache is not None:
+            logging.info('Response cache: hits={} misses={} size={}'.format(extractor.client.cache.hits,
+                                                                            extractor.client.cache.misses,
+                                                                            extractor.client.cache.size))
 
     @staticmethod
     def get_target_services_description(path: str) -> List[Dict]:
@@ -720,6 +1322,19 @@ def main():
     logging.info('Starting GHE extractor...')
     parser = argparse.ArgumentParser(description='path to input data')
     parser.add_argument('--path', type=str, nargs='?', help='path to input data')
+    parser.add_argument('--workers', type=int, default=GHEExtractor.NUM_WORKERS,
+                        help='maximum number of concurrent requests to GHE')
+    parser.add_argument('--cache', type=str, default=os.getenv('HTTP_CACHE_PATH'),
+                        help='path to the file that caches GHE responses across runs')
+    parser.add_argument('--snapshot', type=str, default=os.getenv('COMMIT_SNAPSHOT_PATH'),
+                        help='path to the commit snapshot file that is refreshed after mining')
+    parser.add_argument('--repository-workers', type=int, default=1,
+                        help='number of repositories mined in parallel')
+    parser.add_argument('--max-requests-per-host', type=int, default=HostLimiter.MAX_REQUESTS_PER_HOST,
+                        help='maximum number of concurrent requests to each GHE host when mining in parallel')
+    parser.add_argument('--backend', type=str, choices=['rest', 'graphql', 'git'], default='rest',
+                        help='source of commits and issues: the REST or GraphQL API, or mirrors of the repositories '
+                             'for commits and the REST API for issues')
     args = parser.parse_args()
     path = args.path
     assert path is not None
@@ -728,11 +1343,34 @@ def main():
 
     mining_token = os.getenv('MINING_GHE_PERSONAL_ACCESS_TOKEN')
     db_path = os.getenv('DB_PATH')
-    assert os.path.isfile(db_path), "Error! There is no {} database file".format(db_path)
-
-    GHEExtractor.extract_new_data_from_ghe(service_list=target_services_description, api_token=mining_token,
-                                           db_path=db_path)
+    assert db_path is not None, "Error! DB_PATH is not set"
+    if args.backend == 'graphql':
+        # imported here because the GraphQL extractor depends on this module
+        from microservices_miner.mining.graphql_extractor import GraphQLExtractor
+        extractor_class = GraphQLExtractor
+    elif args.backend == 'git':
+        from microservices_miner.mining.local_git_extractor import LocalGitExtractor
+        extractor_class = LocalGitExtractor
+    else:
+        extractor_class = GHEExtractor
+    if args.repository_workers > 1:
+        # imported here because the orchestrator depends on this module
+        from microservices_miner.mining.orchestrator import MiningOrchestrator
+        orchestrator = MiningOrchestrator(db_path=db_path, api_token=mining_token,
+                                          num_repository_workers=args.repository_workers, num_workers=args.workers,
+                                          max_requests_per_host=args.max_requests_per_host, cache_path=args.cache,
+                                          extractor_class=extractor_class)
+        progress = orchestrator.run(service_list=target_services_description)
+        for url, error in progress.failures.items():
+            print('Error! Unable to mine {}: {}'.format(url, error))
+    else:
+        extractor_class.extract_new_data_from_ghe(service_list=target_services_description, api_token=mining_token,
+                                                  db_path=db_path, num_workers=args.workers, cache_path=args.cache)
     logging.info('Data mining is completed: {}'.format(target_services_description))
+    if args.snapshot is not None:
+        num_recomputed = CommitSnapshot(db_path=db_path, path=args.snapshot).refresh()
+        logging.info('Commit snapshot {} is up to date ({} repositories recomputed)'.format(args.snapshot,
+                                                                                           num_recomputed))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,366 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.control.user_mgr import UserMgr
+from datetime import datetime, timezone
+import json
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class GraphQLExtractor(GHEExtractor):
+    """
+    extractor that lists commits and issues using the GraphQL API (v4) instead of the REST API (v3). A page of the
+    history of the master branch has the message, author (and the login of its user), parents and number of changed
+    files of up to PAGE_SIZE commits, and a page of issues has their authors, labels and assignees, so the requests
+    for the users of the REST flow are not made, and pull requests are not listed along with the issues. GraphQL
+    does not give the files of a commit, so they are still fetched from the REST API, except for commits that changed
+    no files. Pages are converted to the format of the REST API, so the rest of the flow (e.g. parsing, checkpoints and
+    the repair of inconsistencies) is the same of GHEExtractor
+    """
+
+    GRAPHQL_PATH = 'graphql'
+    MAX_PARENTS = 10
+    MAX_LABELS = 100
+    MAX_ASSIGNEES = 100
+
+    COMMITS_QUERY = '''
+query($owner: String!, $name: String!, $expression: String!, $first: Int!, $after: String, $since: GitTimestamp,
+      $withNodes: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    object(expression: $expression) {
+      ... on Commit {
+        oid
+        history(first: $first, after: $after, since: $since) {
+          pageInfo { hasNextPage endCursor }
+          nodes @include(if: $withNodes) {
+            oid
+            message
+            authoredDate
+            changedFilesIfAvailable
+            author { name email user { login name email } }
+            parents(first: %d) { nodes { oid } }
+          }
+        }
+      }
+    }
+  }
+}''' % MAX_PARENTS
+
+    ISSUES_QUERY = '''
+query($owner: String!, $name: String!, $first: Int!, $after: String, $since: DateTime) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $first, after: $after, orderBy: {field: UPDATED_AT, direction: ASC}, filterBy: {since: $since}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        title
+        body
+        createdAt
+        closedAt
+        updatedAt
+        state
+        author { login ... on User { name email } }
+        labels(first: %d) { nodes { name description } }
+        assignees(first: %d) { nodes { login url } }
+      }
+    }
+  }
+}''' % (MAX_LABELS, MAX_ASSIGNEES)
+
+    def __init__(self, db_path, num_workers=GHEExtractor.NUM_WORKERS, api_token=None, client=None, cache_path=None,
+                 writer=None, blob_store=None):
+        """
+        see GHEExtractor
+        """
+        super().__init__(db_path=db_path, num_workers=num_workers, api_token=api_token, client=client,
+                         cache_path=cache_path, writer=writer, blob_store=blob_store)
+        # users that came with the commits and issues, by the login GHEExtractor looks them up with
+        self._users = dict()
+        # SHAs of the commits that changed no files
+        self._empty_commits = set()
+
+    @staticmethod
+    def _get_graphql_url(base_url):
+        """
+
+        Parameters
+        ----------
+        base_url: str
+            URL of the REST API, e.g. https://api.github.com or https://github.ibm.com/api/v3
+
+        Returns
+        -------
+        str
+        """
+        rest_suffix = '/' + GHEExtractor.API_V3
+        if base_url.endswith(rest_suffix):
+            base_url = base_url[:-len('/v3')]
+        return '{}/{}'.format(base_url, GraphQLExtractor.GRAPHQL_PATH)
+
+    @staticmethod
+    def _format_date(date_str):
+        """
+
+        Parameters
+        ----------
+        date_str: str
+            ISO 8601 date with a time zone
+
+        Returns
+        -------
+        str
+            the same date in UTC, in the format of the REST API
+        """
+        if date_str is None:
+            return None
+        dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        return dt.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def _query(self, base_url, query, variables, api_token=None):
+        """
+
+        Parameters
+        ----------
+        base_url: str
+        query: str
+        variables: dict
+        api_token: str
+
+        Returns
+        -------
+        dict
+            data of the response
+        """
+        url = GraphQLExtractor._get_graphql_url(base_url)
+        logging.info('Querying GHE: URL={} variables={}'.format(url, variables))
+        resp = self.client.post(url=url, json={'query': query, 'variables': variables}, api_token=api_token)
+        assert resp.status_code == 200, \
+            "Error! status_code={} msg={} url={}".format(resp.status_code, resp.content, resp.url)
+        resp_data = resp.json()
+        assert resp_data.get('errors') is None, "Error! query failed: {}".format(resp_data.get('errors'))
+        return resp_data.get('data')
+
+    def _query_history(self, base_url, owner, repo, api_token, expression, since, after, with_nodes):
+        """
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+        api_token: str
+        expression: str
+            branch or SHA of the newest commit of the history
+        since: str
+        after: str
+            cursor of the page that comes before the requested one, or None for the first page
+        with_nodes: bool
+            whether the commits are returned, or just the page info
+
+        Returns
+        -------
+        dict
+            the commit of the expression, with its oid and history
+        """
+        variables = {'owner': owner, 'name': repo.name, 'expression': expression, 'first': GHEExtractor.PAGE_SIZE,
+                     'after': after, 'since': since, 'withNodes': with_nodes}
+        data = self._query(base_url=base_url, query=GraphQLExtractor.COMMITS_QUERY, variables=variables,
+                           api_token=api_token)
+        commit = data.get('repository').get('object')
+        assert commit is not None, "Error! {} not found in {}/{}".format(expression, owner, repo.name)
+        return commit
+
+    def _to_rest_commit(self, node):
+        """
+        converts a commit of the history to the format of the REST API, keeping its author
+
+        Parameters
+        ----------
+        node: dict
+
+        Returns
+        -------
+        dict
+        """
+        author = node.get('author')
+        email = author.get('email')
+        # _parse_commits looks the author up by the login taken from its email
+        if email is not None and '@' in email:
+            login = email.split('@')[0]
+        else:
+            login = None
+        if login is not None and login not in self._users:
+            author_user = author.get('user')
+            if author_user is not None:
+                self._users[login] = UserMgr.make_user(email=author_user.get('email') or email,
+                                                       name=author_user.get('name') or author.get('name'),
+                                                       login=author_user.get('login'))
+            else:
+                self._users[login] = UserMgr.make_user(email=email, name=author.get('name'), login=login)
+        if node.get('changedFilesIfAvailable') == 0:
+            self._empty_commits.add(node.get('oid'))
+        return {'sha': node.get('oid'),
+                'commit': {'author': {'name': author.get('name'), 'email': email,
+                                      'date': GraphQLExtractor._format_date(node.get('authoredDate'))},
+                           'message': node.get('message')},
+                'parents': [{'sha': p.get('oid')} for p in node.get('parents').get('nodes')]}
+
+    def iter_commit_pages(self, base_url, owner, repo, api_token, since=None, page_url=None):
+        """
+        yields the pages of commits of the master branch from the oldest to the newest one, like
+        GHEExtractor.iter_commit_pages. The history can only be paginated from its newest commit, so the cursors of its
+        pages are listed first, without their commits, and then the pages are requested from the last one to the first
+        one. The history starts at the commit the master branch pointed to when the query started
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+        api_token: str
+        since: datetime
+        page_url: str
+            position of the page to start from (e.g. of a checkpoint)
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the commit data of each page and the position of the page that comes after it, which is None for the last
+            page
+        """
+        if page_url is None:
+            since_str = since.strftime('%Y-%m-%dT%H:%M:%SZ') if since is not None else None
+            expression = 'master'
+            # cursors of the pages, from the newest to the oldest one; the first page has none
+            afters = [None]
+            while True:
+                commit = self._query_history(base_url=base_url, owner=owner, repo=repo, api_token=api_token,
+                                             expression=expression, since=since_str, after=afters[-1],
+                                             with_nodes=False)
+                expression = commit.get('oid')
+                page_info = commit.get('history').get('pageInfo')
+                if not page_info.get('hasNextPage'):
+                    break
+                afters.append(page_info.get('endCursor'))
+            position = {'head': expression, 'since': since_str, 'afters': afters}
+        else:
+            position = json.loads(page_url)
+        afters = position.get('afters')
+        while len(afters) > 0:
+            after = afters.pop()
+            commit = self._query_history(base_url=base_url, owner=owner, repo=repo, api_token=api_token,
+                                         expression=position.get('head'), since=position.get('since'), after=after,
+                                         with_nodes=True)
+            nodes = commit.get('history').get('nodes')
+            next_page_url = json.dumps(position) if len(afters) > 0 else None
+            yield [self._to_rest_commit(node) for node in reversed(nodes)], next_page_url
+
+    def _extract_users_from_ghe(self, base_url, username, api_token=None):
+        """
+        gets a user that came with the commits or issues, or requests it from GHE otherwise
+
+        Parameters
+        ----------
+        username: str
+        base_url: str
+        api_token: str
+
+        Returns
+        -------
+        User
+        """
+        user = self._users.get(username)
+        if user is not None:
+            return UserMgr.make_user(email=user.email, name=user.name, login=user.login)
+        return super()._extract_users_from_ghe(base_url=base_url, username=username, api_token=api_token)
+
+    def _extract_file_modifications_from_ghe(self, base_url, owner, repo, sha, api_token):
+        """
+        see GHEExtractor._extract_file_modifications_from_ghe; commits that changed no files are not requested
+
+        Parameters
+        ----------
+        sha: str
+        repo: Repository
+        owner: str
+        base_url: str
+
+        Returns
+        -------
+        list of FileModification
+        """
+        if sha in self._empty_commits:
+            return list(), 0, 0
+        return super()._extract_file_modifications_from_ghe(base_url=base_url, owner=owner, repo=repo, sha=sha,
+                                                            api_token=api_token)
+
+    def _to_rest_issue(self, node):
+        """
+        converts an issue to the format of the REST API, keeping its author
+
+        Parameters
+        ----------
+        node: dict
+
+        Returns
+        -------
+        dict
+        """
+        author = node.get('author')
+        # the author of an issue whose account was deleted
+        if author is None:
+            author = {'login': 'ghost'}
+        login = author.get('login')
+        if login not in self._users:
+            # the email and name of a user are empty if they are not public
+            self._users[login] = UserMgr.make_user(email=author.get('email') or '', name=author.get('name') or '',
+                                                   login=login)
+        return {'title': node.get('title'), 'body': node.get('body'), 'state': node.get('state').lower(),
+                'created_at': node.get('createdAt'), 'closed_at': node.get('closedAt'),
+                'updated_at': node.get('updatedAt'), 'user': {'login': login},
+                'labels': node.get('labels').get('nodes'),
+                'assignees': [{'login': a.get('login'), 'html_url': a.get('url')}
+                              for a in node.get('assignees').get('nodes')]}
+
+    def iter_issue_pages(self, base_url, owner, repo_name, since=None, page_url=None):
+        """
+        yields the pages of issues of a repository from the least to the most recently updated one, like
+        GHEExtractor.iter_issue_pages, but without pull requests
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo_name: str
+        since: datetime
+            only issues updated at or after since are returned
+        page_url: str
+            position of the page to start from (e.g. of a checkpoint)
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the issue data of each page and the position of the next page, which is None for the last page
+        """
+        if page_url is None:
+            position = {'since': since.strftime('%Y-%m-%dT%H:%M:%SZ') if since is not None else None, 'after': None}
+        else:
+            position = json.loads(page_url)
+        while True:
+            variables = {'owner': owner, 'name': repo_name, 'first': GHEExtractor.PAGE_SIZE,
+                         'after': position.get('after'), 'since': position.get('since')}
+            data = self._query(base_url=base_url, query=GraphQLExtractor.ISSUES_QUERY, variables=variables)
+            issues = data.get('repository').get('issues')
+            page_info = issues.get('pageInfo')
+            if page_info.get('hasNextPage'):
+                position['after'] = page_info.get('endCursor')
+                next_page_url = json.dumps(position)
+            else:
+                next_page_url = None
+            yield [self._to_rest_issue(node) for node in issues.get('nodes')], next_page_url
+            if next_page_url is None:
+                break
@@ -0,0 +1,194 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from difflib import SequenceMatcher
+from collections import Counter
+from bisect import bisect_left
+
+
+class LineDiff:
+    """
+    counts the lines added and deleted between two versions of a file without building the diff. The common prefix of
+    the files is skipped while they are read and the remaining lines are replaced by integer ids (equal lines have equal
+    ids). Then, as in patience diff, the lines that occur once in each version are matched in order (the longest
+    increasing sequence of their positions) and only the lines between two of these anchors are compared by
+    SequenceMatcher, so it never scans the whole file. Anchors may split runs of repeated lines that would otherwise be
+    matched, so blocks of up to MAX_UNANCHORED_SIZE are also matched without them and the result with more matches is
+    kept. A line that is not matched is an addition or a deletion, which is what difflib.Differ reports as a '+' or '-'
+    line; the counts are almost always the same as Differ's, but repeated lines (e.g. blank ones) may be aligned
+    differently, so that either one counts fewer changes (LineDiff does more often), with the same additions - deletions
+    """
+
+    # maximum product of the numbers of older and newer lines of a replaced block whose lines are matched again
+    MAX_REPLACE_SIZE = 1000000
+    # maximum product of the numbers of older and newer lines of a block that is also matched without anchors, which
+    # is too slow on large generated files
+    MAX_UNANCHORED_SIZE = 1000000
+
+    @staticmethod
+    def count_changes(older_filename, newer_filename):
+        """
+
+        Parameters
+        ----------
+        older_filename: str
+        newer_filename: str
+
+        Returns
+        -------
+        (int, int)
+            number of additions and deletions
+        """
+        line_ids = dict()
+
+        def get_id(line):
+            line_id = line_ids.get(line)
+            if line_id is None:
+                line_id = line_ids[line] = len(line_ids)
+            return line_id
+
+        older_lines = list()
+        newer_lines = list()
+        with open(older_filename, errors='replace') as older_file, open(newer_filename, errors='replace') as newer_file:
+            for older_line in older_file:
+                newer_line = newer_file.readline()
+                if older_line != newer_line:
+                    older_lines.append(get_id(older_line))
+                    if newer_line:
+                        newer_lines.append(get_id(newer_line))
+                    break
+            older_lines.extend(map(get_id, older_file))
+            newer_lines.extend(map(get_id, newer_file))
+        return LineDiff.count_line_changes(older_lines=older_lines, newer_lines=newer_lines)
+
+    @staticmethod
+    def count_line_changes(older_lines, newer_lines):
+        """
+
+        Parameters
+        ----------
+        older_lines: list
+            lines, or ids of lines, of the older version
+        newer_lines: list
+
+        Returns
+        -------
+        (int, int)
+            number of additions and deletions
+        """
+        num_matches = LineDiff._count_matches(older_lines=older_lines, newer_lines=newer_lines, with_anchors=True)
+        return len(newer_lines) - num_matches, len(older_lines) - num_matches
+
+    @staticmethod
+    def _get_anchors(older_lines, newer_lines):
+        """
+
+        Parameters
+        ----------
+        older_lines: list
+        newer_lines: list
+
+        Returns
+        -------
+        list of (int, int)
+            positions in older_lines and newer_lines of the longest sequence of lines that occur once in each of them
+            and are in the same order in both
+        """
+        older_counts = Counter(older_lines)
+        newer_counts = Counter(newer_lines)
+        newer_positions = {line: j for j, line in enumerate(newer_lines)
+                           if newer_counts[line] == 1 and older_counts.get(line) == 1}
+        pairs = [(i, newer_positions[line]) for i, line in enumerate(older_lines) if line in newer_positions]
+        # longest increasing subsequence of the positions in newer_lines: tails[k] is the index in pairs of the
+        # smallest position that ends a subsequence of length k + 1
+        tails = list()
+        tail_positions = list()
+        previous = [-1] * len(pairs)
+        for index, (_, j) in enumerate(pairs):
+            k = bisect_left(tail_positions, j)
+            if k > 0:
+                previous[index] = tails[k - 1]
+            if k == len(tails):
+                tails.append(index)
+                tail_positions.append(j)
+            else:
+                tails[k] = index
+                tail_positions[k] = j
+        anchors = list()
+        index = tails[-1] if len(tails) > 0 else -1
+        while index >= 0:
+            anchors.append(pairs[index])
+            index = previous[index]
+        anchors.reverse()
+        return anchors
+
+    @staticmethod
+    def _count_matches(older_lines, newer_lines, with_anchors):
+        """
+
+        Parameters
+        ----------
+        older_lines: list
+        newer_lines: list
+        with_anchors: bool
+            whether the lines are split at the anchors before they are compared
+
+        Returns
+        -------
+        int
+            number of matched lines
+        """
+        size = min(len(older_lines), len(newer_lines))
+        prefix = 0
+        while prefix < size and older_lines[prefix] == newer_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < size - prefix and older_lines[-1 - suffix] == newer_lines[-1 - suffix]:
+            suffix += 1
+        num_matches = prefix + suffix
+        older_lines = older_lines[prefix:len(older_lines) - suffix]
+        newer_lines = newer_lines[prefix:len(newer_lines) - suffix]
+        if len(older_lines) == 0 or len(newer_lines) == 0:
+            return num_matches
+        anchors = LineDiff._get_anchors(older_lines, newer_lines) if with_anchors else list()
+        if len(anchors) == 0:
+            return num_matches + LineDiff._match_lines(older_lines=older_lines, newer_lines=newer_lines)
+        num_anchored_matches = len(anchors)
+        i0 = j0 = 0
+        for i, j in anchors + [(len(older_lines), len(newer_lines))]:
+            num_anchored_matches += LineDiff._count_matches(older_lines=older_lines[i0:i],
+                                                            newer_lines=newer_lines[j0:j], with_anchors=False)
+            i0, j0 = i + 1, j + 1
+        if len(older_lines) * len(newer_lines) <= LineDiff.MAX_UNANCHORED_SIZE:
+            # an anchor may split a longer run of repeated lines that SequenceMatcher would have matched
+            num_anchored_matches = max(num_anchored_matches,
+                                       LineDiff._match_lines(older_lines=older_lines, newer_lines=newer_lines))
+        return num_matches + num_anchored_matches
+
+    @staticmethod
+    def _match_lines(older_lines, newer_lines):
+        """
+
+        Parameters
+        ----------
+        older_lines: list
+        newer_lines: list
+
+        Returns
+        -------
+        int
+            number of lines matched by SequenceMatcher
+        """
+        num_matches = 0
+        # popular lines (e.g. blank ones) are junk, like in difflib.Differ, which keeps matching fast on generated files
+        matcher = SequenceMatcher(None, older_lines, newer_lines)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                num_matches += i2 - i1
+            elif tag == 'replace' and (i2 - i1) * (j2 - j1) <= LineDiff.MAX_REPLACE_SIZE:
+                # junk lines that are in both sides of a replaced block are matched, as Differ does
+                block_matcher = SequenceMatcher(None, older_lines[i1:i2], newer_lines[j1:j2], autojunk=False)
+                num_matches += sum(block.size for block in block_matcher.get_matching_blocks())
+        return num_matches
@@ -0,0 +1,400 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.control.database_conn import MiningCheckpointConn
+from microservices_miner.control.user_mgr import UserMgr
+from microservices_miner.model.file_modification import FileModification
+from datetime import datetime, timezone
+from pathlib import Path
+import subprocess
+import codecs
+import json
+import os
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class LocalGitExtractor(GHEExtractor):
+    """
+    extractor that mines the commits of a repository from a bare mirror of it instead of the API. The mirror is cloned
+    the first time and fetched by the next runs, and `git log` gives the dates, authors, messages, parents and the
+    additions, deletions and status of each file of the commits, so no request is made for them. Issues are still
+    extracted from the API. Credentials to clone private repositories are taken from the configuration of git (e.g.
+    a credential helper), not from the token of the API
+    """
+
+    MIRROR_DIR = 'mirrors'
+    BRANCH = 'master'
+    # separates the commits in the output of git log
+    COMMIT_SEPARATOR = '\x01'
+    LOG_FORMAT = '%x01%H%x00%P%x00%an%x00%ae%x00%aI%x00%B'
+    STATUS = {'A': 'added', 'M': 'modified', 'D': 'removed', 'R': 'renamed', 'C': 'copied', 'T': 'changed'}
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, db_path, num_workers=GHEExtractor.NUM_WORKERS, api_token=None, client=None, cache_path=None,
+                 writer=None, blob_store=None, mirror_dir=None, clone_url_template=None):
+        """
+
+        Parameters
+        ----------
+        db_path: str
+        num_workers: int
+        api_token: str
+        client: GHEClient
+        cache_path: str
+        writer: DatabaseWriter
+            see GHEExtractor
+        mirror_dir: str
+            directory of the mirrors; if None, GIT_MIRROR_DIR or the mirrors directory next to the working directory
+        clone_url_template: str
+            URL or path the mirrors are cloned from, with {owner} and {repo} fields; if None, the URL of the repository
+            in GHE is used
+        """
+        super().__init__(db_path=db_path, num_workers=num_workers, api_token=api_token, client=client,
+                         cache_path=cache_path, writer=writer, blob_store=blob_store)
+        if mirror_dir is None:
+            mirror_dir = os.getenv('GIT_MIRROR_DIR', str(Path(os.getcwd()).parent / LocalGitExtractor.MIRROR_DIR))
+        self.mirror_dir = mirror_dir
+        self.clone_url_template = clone_url_template
+        # authors and file modifications of the commits of the page being inserted
+        self._users = dict()
+        self._file_modifications = dict()
+
+    @staticmethod
+    def _run_git(args, git_dir=None):
+        """
+
+        Parameters
+        ----------
+        args: list of str
+        git_dir: str
+
+        Returns
+        -------
+        str
+            standard output of the command
+        """
+        cmd = ['git'] + (['--git-dir', git_dir] if git_dir is not None else list()) + args
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        assert result.returncode == 0, \
+            "Error! {} failed: {}".format(' '.join(cmd), result.stderr.decode(errors='replace'))
+        return result.stdout.decode()
+
+    def _get_clone_url(self, base_url, owner, repo_name):
+        """
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo_name: str
+
+        Returns
+        -------
+        str
+        """
+        if self.clone_url_template is not None:
+            return self.clone_url_template.format(owner=owner, repo=repo_name)
+        if base_url == GHEExtractor.PUBLIC_GITHUB_API:
+            host = GHEExtractor.PUBLIC_GITHUB_REPO_URL.rstrip('/')
+        else:
+            host = base_url[:-len('/' + GHEExtractor.API_V3)]
+        return '{}/{}/{}.git'.format(host, owner, repo_name)
+
+    def update_mirror(self, base_url, owner, repo_name):
+        """
+        clones the mirror of a repository or fetches the commits pushed since the last run
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo_name: str
+
+        Returns
+        -------
+        str
+            path to the mirror
+        """
+        path = os.path.join(self.mirror_dir, owner, '{}.git'.format(repo_name))
+        if os.path.isdir(path):
+            logging.info('Fetching {}'.format(path))
+            LocalGitExtractor._run_git(['fetch', '--prune', '--quiet', 'origin'], git_dir=path)
+        else:
+            clone_url = self._get_clone_url(base_url=base_url, owner=owner, repo_name=repo_name)
+            logging.info('Cloning {} into {}'.format(clone_url, path))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            LocalGitExtractor._run_git(['clone', '--mirror', '--quiet', clone_url, path])
+        return path
+
+    def _get_head(self, path):
+        """
+
+        Parameters
+        ----------
+        path: str
+
+        Returns
+        -------
+        str
+            SHA of the last commit of BRANCH or, if the mirror does not have it, of its default branch
+        """
+        for rev in [LocalGitExtractor.BRANCH, 'HEAD']:
+            try:
+                return LocalGitExtractor._run_git(['rev-parse', '--verify', '--quiet', rev + '^{commit}'],
+                                                  git_dir=path).strip()
+            except AssertionError:
+                continue
+        raise AssertionError("Error! {} has no commits".format(path))
+
+    def _is_ancestor(self, path, sha, head):
+        """
+
+        Parameters
+        ----------
+        path: str
+        sha: str
+        head: str
+
+        Returns
+        -------
+        bool
+        """
+        cmd = ['git', '--git-dir', path, 'merge-base', '--is-ancestor', sha, head]
+        return subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+    def _iter_log(self, path, rev_range, since):
+        """
+        runs git log and yields its commits as they are read, from the oldest to the newest one. Merge commits are
+        compared to their first parent, like in the API
+
+        Parameters
+        ----------
+        path: str
+        rev_range: str
+        since: str
+
+        Returns
+        -------
+        generator of str
+            the output of each commit, without the separator
+        """
+        cmd = ['git', '--git-dir', path, 'log', '--reverse', '--date-order', '-z', '--raw', '--numstat', '-M',
+               '--diff-merges=first-parent', '--format=tformat:' + LocalGitExtractor.LOG_FORMAT]
+        if since is not None:
+            cmd.append('--since={}'.format(since))
+        cmd.extend([rev_range, '--'])
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # a chunk may end in the middle of a character
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        buffer = ''
+        try:
+            while True:
+                chunk = process.stdout.read1(LocalGitExtractor.READ_SIZE)
+                if len(chunk) == 0:
+                    break
+                buffer += decoder.decode(chunk)
+                records = buffer.split(LocalGitExtractor.COMMIT_SEPARATOR)
+                buffer = records.pop()
+                for record in records:
+                    if len(record) > 0:
+                        yield record
+            if len(buffer) > 0:
+                yield buffer
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            return_code = process.wait()
+        assert return_code == 0, "Error! git log failed: {}".format(stderr.decode(errors='replace'))
+
+    @staticmethod
+    def _parse_record(record):
+        """
+
+        Parameters
+        ----------
+        record: str
+            output of git log for a commit
+
+        Returns
+        -------
+        (dict, list of FileModification)
+            commit data in the format of the API and its file modifications
+        """
+        fields = record.split('\0')
+        sha, parents, name, email, date_str, message = fields[:6]
+        statuses = list()
+        numstats = list()
+        tokens = iter(fields[6:])
+        for token in tokens:
+            token = token.lstrip('\n')
+            if len(token) == 0:
+                continue
+            if token.startswith(':'):
+                # e.g. ':100644 100644 <blob> <blob> R075', then the old and the new path of renames and copies
+                status = token.split(' ')[-1]
+                if status[0] in 'RC':
+                    next(tokens)
+                filename = next(tokens)
+                statuses.append((filename, LocalGitExtractor.STATUS.get(status[0], 'modified')))
+            else:
+                # e.g. '3\t1\tpath' or, for renames and copies, '3\t1\t' followed by the old and the new path
+                additions, deletions, filename = token.split('\t', 2)
+                if len(filename) == 0:
+                    next(tokens)
+                    filename = next(tokens)
+                # binary files have no lines
+                numstats.append((filename, int(additions) if additions != '-' else 0,
+                                 int(deletions) if deletions != '-' else 0))
+        assert len(statuses) == len(numstats), "Error! Unable to parse the files of commit {}".format(sha)
+        file_modifications = list()
+        for (filename, status), (_, additions, deletions) in zip(statuses, numstats):
+            file_modifications.append(FileModification(filename=filename, status=status, additions=additions,
+                                                       deletions=deletions, changes=additions + deletions))
+        dt = datetime.fromisoformat(date_str).astimezone(timezone.utc)
+        commit_data = {'sha': sha,
+                       'commit': {'author': {'name': name, 'email': email, 'date': dt.strftime('%Y-%m-%dT%H:%M:%SZ')},
+                                  'message': message.rstrip('\n')},
+                       'parents': [{'sha': p} for p in parents.split(' ') if len(p) > 0]}
+        return commit_data, file_modifications
+
+    def iter_commit_pages(self, base_url, owner, repo, api_token, since=None, page_url=None):
+        """
+        yields the pages of commits of the mirror from the oldest to the newest one, like
+        GHEExtractor.iter_commit_pages. If the previous run was over, only the commits that are not ancestors of its
+        last commit are listed, so since is ignored; otherwise since limits the commits by their author date
+
+        Parameters
+        ----------
+        base_url: str
+        owner: str
+        repo: Repository
+        api_token: str
+            not used
+        since: datetime
+        page_url: str
+            position of the page to start from (e.g. of a checkpoint)
+
+        Returns
+        -------
+        generator of (list of dict, str)
+            the commit data of each page and the position of the page that comes after it, which is None for the last
+            page
+        """
+        path = self.update_mirror(base_url=base_url, owner=owner, repo_name=repo.name)
+        if page_url is not None:
+            position = json.loads(page_url)
+        else:
+            position = {'head': self._get_head(path), 'after': None,
+                        'since': since.strftime('%Y-%m-%dT%H:%M:%SZ') if since is not None else None}
+            checkpoint = MiningCheckpointConn(path_to_db=self.db_path) \
+                .get_checkpoint(repository_id=repo.repository_id, phase=GHEExtractor.COMMITS_PHASE)
+            if checkpoint is not None and checkpoint.get('status') == MiningCheckpointConn.DONE \
+                    and checkpoint.get('last_sha') is not None \
+                    and self._is_ancestor(path=path, sha=checkpoint.get('last_sha'), head=position.get('head')):
+                position['after'] = checkpoint.get('last_sha')
+                position['since'] = None
+        if position.get('after') is not None:
+            rev_range = '{}..{}'.format(position.get('after'), position.get('head'))
+        else:
+            rev_range = position.get('head')
+        page = list()
+        for record in self._iter_log(path=path, rev_range=rev_range, since=position.get('since')):
+            commit_data, file_modifications = LocalGitExtractor._parse_record(record)
+            self._add_author(commit_data.get('commit').get('author'))
+            self._file_modifications[commit_data.get('sha')] = file_modifications
+            page.append(commit_data)
+            if len(page) >= GHEExtractor.PAGE_SIZE:
+                position['after'] = page[-1].get('sha')
+                yield page, json.dumps(position)
+                page = list()
+        yield page, None
+
+    def _add_author(self, author_data):
+        """
+        keeps the author of a commit, by the login _parse_commits looks it up with
+
+        Parameters
+        ----------
+        author_data: dict
+
+        Returns
+        -------
+        None
+        """
+        email = author_data.get('email')
+        if email is not None and '@' in email:
+            login = email.split('@')[0]
+            if login not in self._users:
+                self._users[login] = UserMgr.make_user(email=email, name=author_data.get('name'), login=login)
+
+    def _extract_users_from_ghe(self, base_url, username, api_token=None):
+        """
+        gets the author of a commit of the mirror, or requests the user from GHE otherwise (e.g. the author of an
+        issue)
+
+        Parameters
+        ----------
+        username: str
+        base_url: str
+        api_token: str
+
+        Returns
+        -------
+        User
+        """
+        user = self._users.get(username)
+        if user is not None:
+            return UserMgr.make_user(email=user.email, name=user.name, login=user.login)
+        return super()._extract_users_from_ghe(base_url=base_url, username=username, api_token=api_token)
+
+    def _fetch_file_modifications(self, base_url, commit_list, repo, owner, api_token):
+        """
+        gets the file modifications that git log gave for each commit
+
+        Parameters
+        ----------
+        base_url: str
+        commit_list: List[dict]
+        repo: Repository
+        owner: str
+        api_token: str
+
+        Returns
+        -------
+        generator of (dict, list of FileModification)
+        """
+        for d in commit_list:
+            yield d, self._file_modifications.get(d.get('sha'), list())
+
+    def _insert_commit_data_into_database(self, base_url, commit_list, repo, owner, api_token):
+        """
+        see GHEExtractor._insert_commit_data_into_database
+
+        Returns
+        -------
+        None
+        """
+        try:
+            super()._insert_commit_data_into_database(base_url=base_url, commit_list=commit_list, repo=repo,
+                                                      owner=owner, api_token=api_token)
+        finally:
+            for d in commit_list:
+                self._file_modifications.pop(d.get('sha'), None)
+
+    def _find_and_repair_inconsistencies(self, repository, owner, extensions, base_url):
+        """
+        git log counts the lines of every file, so there is nothing to repair: files that are modified without
+        changes are binary files or changes of mode
+
+        Returns
+        -------
+        None
+        """
+        self._save_checkpoint(repository_id=repository.repository_id, phase=GHEExtractor.REPAIR_PHASE,
+                              status=MiningCheckpointConn.DONE)
@@ -0,0 +1,233 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from microservices_miner.control.database_conn import ConnectionPool, ConnectionProfile, DatabaseWriter
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.mining.ghe_client import GHEClient, HostLimiter
+from microservices_miner.mining.rate_limiter import RateLimiter
+from microservices_miner.mining.response_cache import ResponseCache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict
+import threading
+import time
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class MiningProgress:
+    """
+    counters of a mining run, updated by the threads that mine repositories
+    """
+
+    def __init__(self, num_repositories):
+        """
+
+        Parameters
+        ----------
+        num_repositories: int
+        """
+        self.num_repositories = num_repositories
+        self.num_done = 0
+        self.num_failed = 0
+        self.num_commits = 0
+        self.num_issues = 0
+        self.failures = dict()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_result(self, url, result):
+        """
+
+        Parameters
+        ----------
+        url: str
+        result: dict
+            returned by GHEExtractor.mine_repository
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self.num_done += 1
+            self.num_commits += result.get('commits')
+            self.num_issues += result.get('issues')
+
+    def add_failure(self, url, error):
+        """
+
+        Parameters
+        ----------
+        url: str
+        error: Exception
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self.num_failed += 1
+            self.failures[url] = error
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start
+
+    def __str__(self):
+        return '{}/{} repositories mined ({} failed), {} commits, {} issues in {:.0f}s' \
+            .format(self.num_done, self.num_repositories, self.num_failed, self.num_commits, self.num_issues,
+                    self.elapsed)
+
+
+class MiningOrchestrator:
+    """
+    mines the repositories of a list of services in parallel. Services and repositories are registered one at a time,
+    then each repository is mined by a thread of a pool with its own GHEExtractor and HTTP sessions. The threads share
+    a RateLimiter, so that they stay within the budget of the token, and a HostLimiter, which caps the requests in
+    flight to each GHE host. Their writes go through a single DatabaseWriter, while their reads use their own
+    connections. A repository that fails does not stop the others; its checkpoints let the next run resume it
+    """
+
+    NUM_REPOSITORY_WORKERS = 4
+
+    def __init__(self, db_path, api_token=None, num_repository_workers=NUM_REPOSITORY_WORKERS,
+                 num_workers=GHEExtractor.NUM_WORKERS, max_requests_per_host=HostLimiter.MAX_REQUESTS_PER_HOST,
+                 cache_path=None, client_factory=None, rate_limiter=None,
+                 extractor_class=GHEExtractor, blob_store=None):
+        """
+
+        Parameters
+        ----------
+        db_path: str
+        api_token: str
+        num_repository_workers: int
+            number of repositories mined at a time
+        num_workers: int
+            maximum number of concurrent requests made by the thread of each repository
+        max_requests_per_host: int
+            maximum number of requests in flight to each host, across all threads
+        cache_path: str
+            path to the file that caches GHE responses across runs; if None, responses are not cached
+        client_factory: callable
+            creates the GHEClient of each thread given rate_limiter, cache and host_limiter keyword arguments;
+            if None, GHEClient is used
+        rate_limiter: RateLimiter
+            shared by the clients of all threads; if None, a RateLimiter with the default budget is used
+        extractor_class: type
+            GHEExtractor or a subclass of it, e.g. GraphQLExtractor
+        blob_store: BlobStore
+            store of the files downloaded by all threads; if None, the default store of GHEExtractor is used
+        """
+        assert isinstance(num_repository_workers, int) and num_repository_workers > 0, \
+            "Error! Invalid num_repository_workers={}".format(num_repository_workers)
+        self.db_path = db_path
+        self.api_token = api_token
+        self.num_repository_workers = num_repository_workers
+        self.num_workers = num_workers
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.host_limiter = HostLimiter(max_requests_per_host=max_requests_per_host)
+        self.cache = ResponseCache(path=cache_path) if cache_path is not None else None
+        self.client_factory = client_factory
+        self.extractor_class = extractor_class
+        self.blob_store = blob_store
+        self.progress = None
+        self._local = threading.local()
+        self._extractors = list()
+        self._lock = threading.Lock()
+
+    def _get_extractor(self, pool, writer):
+        """
+        gets the extractor of the calling thread, creating it if needed
+
+        Parameters
+        ----------
+        pool: ConnectionPool
+        writer: DatabaseWriter
+
+        Returns
+        -------
+        GHEExtractor
+        """
+        extractor = getattr(self._local, 'extractor', None)
+        if extractor is None:
+            kwargs = {'rate_limiter': self.rate_limiter, 'cache': self.cache, 'host_limiter': self.host_limiter}
+            if self.client_factory is not None:
+                client = self.client_factory(**kwargs)
+            else:
+                client = GHEClient(api_token=self.api_token, pool_size=self.num_workers, **kwargs)
+            extractor = self.extractor_class(db_path=pool, num_workers=self.num_workers, client=client, writer=writer)
+            with self._lock:
+                # the store is created by the first extractor and then shared, so that its size cap is global
+                if self.blob_store is None:
+                    self.blob_store = extractor._get_blob_store()
+                extractor.blob_store = self.blob_store
+                self._extractors.append(extractor)
+            self._local.extractor = extractor
+        return extractor
+
+    def _mine_repository(self, job, pool, writer):
+        """
+
+        Parameters
+        ----------
+        job: dict
+            returned by GHEExtractor.register_service
+        pool: ConnectionPool
+        writer: DatabaseWriter
+
+        Returns
+        -------
+        dict
+        """
+        logging.info('Mining {} in thread {}'.format(job.get('url'), threading.current_thread().name))
+        return self._get_extractor(pool=pool, writer=writer).mine_repository(job)
+
+    def run(self, service_list: List[Dict]) -> MiningProgress:
+        """
+
+        Parameters
+        ----------
+        service_list: List[Dict]
+            see GHEExtractor.get_target_services_description
+
+        Returns
+        -------
+        MiningProgress
+        """
+        pool = ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.BULK_LOAD)
+        schema_version = SchemaMgr(path_to_db=pool).migrate()
+        logging.info('Database {} is at schema version {}'.format(self.db_path, schema_version))
+        jobs = list()
+        for s in service_list:
+            jobs.extend(GHEExtractor.register_service(service_description=s, db_path=pool))
+        self.progress = MiningProgress(num_repositories=len(jobs))
+        writer = DatabaseWriter(path_to_db=pool)
+        try:
+            with ThreadPoolExecutor(max_workers=self.num_repository_workers, thread_name_prefix='miner') as executor:
+                futures = {executor.submit(self._mine_repository, job=job, pool=pool, writer=writer): job
+                           for job in jobs}
+                for future in as_completed(futures):
+                    url = futures[future].get('url')
+                    try:
+                        self.progress.add_result(url=url, result=future.result())
+                    except Exception as e:
+                        logging.error('Error! Unable to mine {}: {}'.format(url, e))
+                        self.progress.add_failure(url=url, error=e)
+                    logging.info('Progress: {} (last: {})'.format(self.progress, url))
+                    print('Progress: {}'.format(self.progress))
+        finally:
+            writer.close()
+            for extractor in self._extractors:
+                extractor.client.close()
+        for s in service_list:
+            GHEExtractor.update_service_dates(service_description=s, db_path=pool)
+            GHEExtractor.build_loc_timelines(service_description=s, db_path=pool)
+        logging.info('Data extraction is over: {} {}'.format(self.progress, self.rate_limiter))
+        if self.cache is not None:
+            logging.info('Response cache: hits={} misses={} size={}'.format(self.cache.hits, self.cache.misses,
+                                                                            self.cache.size))
+        return self.progress
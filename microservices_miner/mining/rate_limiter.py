@@ -0,0 +1,192 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+import threading
+import time
+import logging
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class RateLimiter:
+    """
+    token bucket shared by all threads that make requests with the same token. Besides pacing requests at a fixed
+    rate, it reads the X-RateLimit-* and Retry-After headers of every response: when the budget runs out (or GHE asks
+    to slow down) every thread sleeps until the reset time, and the pace is reduced so that the remaining budget lasts
+    until the reset
+    """
+
+    REQUESTS_PER_SECOND = 10.0
+    BURST = 10
+    # time to wait after a secondary rate limit response that has no Retry-After header
+    SECONDARY_RATE_LIMIT_WAIT = 60
+    # extra seconds added to the reset time to compensate for clock skew between us and GHE
+    RESET_MARGIN = 1
+    THROTTLED_STATUS_CODES = (403, 429)
+
+    def __init__(self, requests_per_second=REQUESTS_PER_SECOND, burst=BURST):
+        """
+
+        Parameters
+        ----------
+        requests_per_second: float
+            maximum sustained rate of requests
+        burst: int
+            maximum number of requests that can be made at once after an idle period
+        """
+        assert requests_per_second > 0, "Error! Invalid requests_per_second={}".format(requests_per_second)
+        assert isinstance(burst, int) and burst > 0, "Error! Invalid burst={}".format(burst)
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._rate = requests_per_second
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        # counters
+        self.limit = None
+        self.remaining = None
+        self.reset_at = None
+        self.throttled_time = 0.0
+        self.num_throttled_responses = 0
+
+    def _refill(self, now):
+        """
+
+        Parameters
+        ----------
+        now: float
+            monotonic time
+
+        Returns
+        -------
+        None
+        """
+        elapsed = now - self._last_refill
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self._rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """
+        blocks until a request can be made
+
+        Returns
+        -------
+        float
+            time (in seconds) spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.throttled_time += waited
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
+            waited += wait
+
+    def _pause(self, seconds, throttled=False):
+        """
+        pauses all threads for the given number of seconds
+
+        Parameters
+        ----------
+        seconds: float
+        throttled: bool
+            whether the pause is due to a throttled response, which is counted
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            if throttled:
+                self.num_throttled_responses += 1
+
+    def update(self, resp):
+        """
+        updates the budget given the headers of a response
+
+        Parameters
+        ----------
+        resp: requests.Response
+
+        Returns
+        -------
+        bool
+            True if the request was rejected due to rate limiting and must be retried; otherwise False
+        """
+        headers = resp.headers
+        remaining = RateLimiter._get_int_header(headers, 'X-RateLimit-Remaining')
+        limit = RateLimiter._get_int_header(headers, 'X-RateLimit-Limit')
+        reset_at = RateLimiter._get_int_header(headers, 'X-RateLimit-Reset')
+        retry_after = RateLimiter._get_int_header(headers, 'Retry-After')
+        seconds_to_reset = None
+        with self._lock:
+            if limit is not None:
+                self.limit = limit
+            if remaining is not None:
+                self.remaining = remaining
+            if reset_at is not None:
+                self.reset_at = reset_at
+                seconds_to_reset = max(0.0, reset_at - time.time()) + RateLimiter.RESET_MARGIN
+            # spread the remaining budget until the reset
+            if remaining is not None and seconds_to_reset is not None and remaining > 0:
+                self._rate = min(self.requests_per_second, remaining / seconds_to_reset)
+            else:
+                self._rate = self.requests_per_second
+
+        throttled = False
+        if resp.status_code in RateLimiter.THROTTLED_STATUS_CODES:
+            if retry_after is not None:
+                throttled = True
+                wait = retry_after
+            elif remaining == 0 and seconds_to_reset is not None:
+                throttled = True
+                wait = seconds_to_reset
+            elif 'rate limit' in resp.text.lower():
+                throttled = True
+                wait = RateLimiter.SECONDARY_RATE_LIMIT_WAIT
+            if throttled:
+                logging.warning('Rate limited by GHE: status={} url={} waiting {}s'
+                                .format(resp.status_code, resp.url, wait))
+                self._pause(wait, throttled=True)
+        elif remaining == 0 and seconds_to_reset is not None:
+            logging.info('Rate limit budget is over, waiting {}s until reset'.format(seconds_to_reset))
+            self._pause(seconds_to_reset)
+        return throttled
+
+    @staticmethod
+    def _get_int_header(headers, name):
+        """
+
+        Parameters
+        ----------
+        headers: dict
+        name: str
+
+        Returns
+        -------
+        int or None
+        """
+        value = headers.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    def __str__(self):
+        s = 'RateLimiter limit={} remaining={} reset_at={} throttled_time={:.1f}s throttled_responses={}'\
+            .format(self.limit, self.remaining, self.reset_at, self.throttled_time, self.num_throttled_responses)
+        return s
@@ -0,0 +1,220 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+import sqlite3
+import threading
+import time
+import json
+import logging
+from urllib.parse import urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logging.basicConfig(filename='github_miner.log', level=logging.DEBUG, format='%(asctime)s %(message)s')
+
+
+class ResponseCache:
+    """
+    persistent cache of GHE responses keyed by URL and parameters. Each entry stores the validators (ETag and
+    Last-Modified) of the response, so that requests can be made conditional and a 304 Not Modified answer, which does
+    not count against the rate limit, is served from the cache. When the cache grows beyond max_size bytes, the least
+    recently used entries are evicted
+    """
+
+    TABLE_NAME = 'response'
+    MAX_SIZE = 512 * 1024 * 1024
+    # headers that are stored along with the content
+    STORED_HEADERS = ('ETag', 'Last-Modified', 'Link', 'Content-Type')
+
+    def __init__(self, path, max_size=MAX_SIZE):
+        """
+
+        Parameters
+        ----------
+        path: str
+            path to the cache file (sqlite)
+        max_size: int
+            maximum size (in bytes) of the cached contents
+        """
+        assert isinstance(max_size, int) and max_size > 0, "Error! Invalid max_size={}".format(max_size)
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('create table if not exists {}(key text primary key, url text, headers text, content blob, '
+                          'size integer, last_access real);'.format(ResponseCache.TABLE_NAME))
+        self.conn.execute('create index if not exists {0}_last_access on {0}(last_access);'
+                          .format(ResponseCache.TABLE_NAME))
+        self.conn.commit()
+        row = self.conn.execute('select coalesce(sum(size), 0) from {};'.format(ResponseCache.TABLE_NAME)).fetchone()
+        self._size = row[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url, params=None):
+        """
+
+        Parameters
+        ----------
+        url: str
+        params: dict
+
+        Returns
+        -------
+        str
+        """
+        if params is None or len(params) == 0:
+            return url
+        return '{} {}'.format(url, urlencode(sorted(params.items())))
+
+    def get(self, key):
+        """
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        dict or None
+            dict with url, headers and content of the cached response
+        """
+        with self._lock:
+            row = self.conn.execute('select url, headers, content from {} where key = ?;'
+                                    .format(ResponseCache.TABLE_NAME), (key,)).fetchone()
+        if row is None:
+            return None
+        return {'url': row[0], 'headers': json.loads(row[1]), 'content': row[2]}
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        """
+
+        Parameters
+        ----------
+        entry: dict
+            cached entry
+
+        Returns
+        -------
+        dict
+            If-None-Match and If-Modified-Since headers
+        """
+        headers = dict()
+        etag = entry.get('headers').get('ETag')
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        last_modified = entry.get('headers').get('Last-Modified')
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def put(self, key, resp):
+        """
+        stores a response if it has a validator and counts it as a miss
+
+        Parameters
+        ----------
+        key: str
+        resp: requests.Response
+
+        Returns
+        -------
+        bool
+            True if the response was stored; otherwise False
+        """
+        headers = {h: resp.headers.get(h) for h in ResponseCache.STORED_HEADERS if resp.headers.get(h) is not None}
+        content = resp.content
+        size = len(content)
+        with self._lock:
+            self.misses += 1
+            if 'ETag' not in headers and 'Last-Modified' not in headers or size > self.max_size:
+                return False
+            row = self.conn.execute('select size from {} where key = ?;'.format(ResponseCache.TABLE_NAME),
+                                    (key,)).fetchone()
+            if row is not None:
+                self._size -= row[0]
+            self.conn.execute('insert or replace into {}(key, url, headers, content, size, last_access) '
+                              'values (?, ?, ?, ?, ?, ?);'.format(ResponseCache.TABLE_NAME),
+                              (key, resp.url, json.dumps(headers), content, size, time.time()))
+            self._size += size
+            self._evict()
+            self.conn.commit()
+        return True
+
+    def touch(self, key):
+        """
+        marks an entry as recently used, after it was served for a 304 Not Modified response, and counts it as a hit
+
+        Parameters
+        ----------
+        key: str
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            self.hits += 1
+            self.conn.execute('update {} set last_access = ? where key = ?;'.format(ResponseCache.TABLE_NAME),
+                              (time.time(), key))
+            self.conn.commit()
+
+    def _evict(self):
+        """
+        removes the least recently used entries until the size of the cache is below max_size. It must be called
+        while holding the lock
+
+        Returns
+        -------
+        None
+        """
+        while self._size > self.max_size:
+            rows = self.conn.execute('select key, size from {} order by last_access limit 100;'
+                                     .format(ResponseCache.TABLE_NAME)).fetchall()
+            if len(rows) == 0:
+                self._size = 0
+                break
+            for key, size in rows:
+                if self._size <= self.max_size:
+                    break
+                self.conn.execute('delete from {} where key = ?;'.format(ResponseCache.TABLE_NAME), (key,))
+                self._size -= size
+                logging.info('Evicted from response cache: {}'.format(key))
+
+    @staticmethod
+    def make_response(entry, not_modified_resp):
+        """
+        builds the response that is returned to the caller when GHE answers 304 Not Modified
+
+        Parameters
+        ----------
+        entry: dict
+            cached entry
+        not_modified_resp: requests.Response
+            the 304 response
+
+        Returns
+        -------
+        requests.Response
+        """
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.reason = 'OK'
+        resp._content = entry.get('content')
+        resp.headers = CaseInsensitiveDict(entry.get('headers'))
+        resp.url = entry.get('url')
+        resp.encoding = 'utf-8'
+        resp.request = not_modified_resp.request
+        return resp
+
+    @property
+    def size(self):
+        return self._size
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,74 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.blob_store import BlobStore
+import tempfile
+import time
+import os
+
+
+class TestBlobStore(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'blobs')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_put_and_get(self):
+        blob_store = BlobStore(path=self.path)
+        self.assertIsNone(blob_store.get('ab01'))
+        path = blob_store.put(sha='ab01', content=b'a\nb\n')
+        self.assertEqual(path, os.path.join(self.path, 'ab', 'ab01'))
+        self.assertEqual(blob_store.get('ab01'), path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'a\nb\n')
+        # the same blob is stored once
+        blob_store.put(sha='ab01', content=b'a\nb\n')
+        self.assertEqual(blob_store.size, 4)
+        self.assertEqual((blob_store.hits, blob_store.misses), (1, 1))
+
+    def test_index(self):
+        blob_store = BlobStore(path=self.path)
+        self.assertIsNone(blob_store.get_sha(commit_sha='c1', filename='app.py'))
+        blob_store.add_to_index(commit_sha='c1', filename='app.py', sha='ab01')
+        self.assertEqual(blob_store.get_sha(commit_sha='c1', filename='app.py'), 'ab01')
+        self.assertIsNone(blob_store.get_sha(commit_sha='c2', filename='app.py'))
+
+    def test_evict(self):
+        blob_store = BlobStore(path=self.path, max_size=30)
+        for sha in ['aa01', 'bb02', 'cc03']:
+            blob_store.put(sha=sha, content=b'0123456789')
+        # aa01 becomes the most recently used blob, so bb02 is evicted
+        blob_store.get('aa01')
+        blob_store.put(sha='dd04', content=b'0123456789')
+        self.assertEqual(blob_store.num_evicted, 2)
+        self.assertIsNone(blob_store.get('bb02'))
+        self.assertIsNone(blob_store.get('cc03'))
+        self.assertFalse(os.path.exists(blob_store.get_blob_path('bb02')))
+        self.assertIsNotNone(blob_store.get('aa01'))
+        self.assertIsNotNone(blob_store.get('dd04'))
+        self.assertEqual(blob_store.size, 20)
+
+    def test_reload(self):
+        blob_store = BlobStore(path=self.path)
+        blob_store.put(sha='aa01', content=b'old')
+        now = time.time()
+        os.utime(blob_store.get_blob_path('aa01'), (now - 60, now - 60))
+        blob_store.put(sha='bb02', content=b'new')
+        # a blob whose write was interrupted
+        with open(blob_store.get_blob_path('bb02') + '.1.tmp', 'wb') as f:
+            f.write(b'partial')
+
+        # the blobs of a previous run are kept, from the least to the most recently modified one
+        blob_store = BlobStore(path=self.path, max_size=4)
+        self.assertEqual(blob_store.size, 6)
+        self.assertFalse(os.path.exists(blob_store.get_blob_path('bb02') + '.1.tmp'))
+        blob_store.put(sha='cc03', content=b'c')
+        self.assertIsNone(blob_store.get('aa01'))
+        self.assertIsNone(blob_store.get('bb02'))
+        self.assertIsNotNone(blob_store.get('cc03'))
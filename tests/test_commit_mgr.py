@@ -0,0 +1,123 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from datetime import datetime, timedelta
+from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.control.database_conn import RepositoryConn, UserConn, ConnectionPool
+from microservices_miner.control.filesystem_mgr import FilenameFilter
+from microservices_miner.model.git_commit import Commit
+from microservices_miner.model.file_modification import FileModification
+from microservices_miner.model.repository import Repository
+from microservices_miner.model.user import User
+import sqlite3
+import tempfile
+import shutil
+import os
+
+
+class TestCommitMgr(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        self.commit_mgr = CommitMgr(path_to_db=self.db_path)
+        self.repo = Repository(name='bulk-repo', url='https://github.com/owner/bulk-repo')
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        self.user = User(name='Bulk "Tester"', email='bulk@ibm.com', login='bulk')
+        self.user.user_id = UserConn(path_to_db=self.db_path).insert_user(self.user)
+
+    def tearDown(self) -> None:
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def _make_commits(self, num_commits):
+        commits = list()
+        parent_sha = '0' * 40
+        start = datetime(2019, 1, 1)
+        for i in range(num_commits):
+            sha = '{:040x}'.format(0xbeef0000 + i)
+            commit = Commit(date=start + timedelta(hours=i), sha=sha, user=self.user, comment='commit {}'.format(i))
+            commit.file_modifications = [FileModification(filename='src/{}.py'.format(j), additions=j, deletions=1,
+                                                          changes=j + 1, status='modified') for j in range(3)]
+            commits.append((commit, [(0, parent_sha)]))
+            parent_sha = sha
+        return commits
+
+    def _count(self, table):
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute('select count(*) from {};'.format(table)).fetchone()[0]
+        conn.close()
+        return count
+
+    def test_insert_commits(self):
+        commits = self._make_commits(num_commits=10)
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+        inserted = self.commit_mgr.get_commits_by_repo(repository_id=self.repo.repository_id)
+        self.assertEqual(len(inserted), 10)
+        for commit, parent_commit_shas in commits:
+            self.assertIsNotNone(commit.commit_id)
+            c = self.commit_mgr.get_commit(sha=commit.sha)
+            self.assertEqual(c.commit_id, commit.commit_id)
+            self.assertEqual(c.user.user_id, self.user.user_id)
+            self.assertEqual(sorted(fm.filename for fm in c.file_modifications),
+                             ['src/0.py', 'src/1.py', 'src/2.py'])
+            self.assertEqual(self.commit_mgr.get_parent_commit_sha(commit=c), parent_commit_shas[0][1])
+
+    def test_insert_commits_twice(self):
+        commits = self._make_commits(num_commits=5)
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits[:3])
+        counts = [self._count(t) for t in ('repocommit', 'filemodification', 'parentcommit', 'parentcommit_repocommit')]
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits[:3])
+        self.assertEqual(counts, [self._count(t) for t in ('repocommit', 'filemodification', 'parentcommit',
+                                                           'parentcommit_repocommit')])
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+        self.assertEqual(len(self.commit_mgr.get_commits_by_repo(repository_id=self.repo.repository_id)), 5)
+        self.assertEqual(self._count('filemodification'), counts[1] + 2 * 3)
+
+    def test_insert_commits_repeated_positions(self):
+        commits = self._make_commits(num_commits=3)
+        num_commits = self._count('repocommit')
+        # repeated positions are rejected before anything is written
+        commits[1] = (commits[1][0], [(0, 'a' * 40), (0, 'b' * 40)])
+        with self.assertRaises(AssertionError):
+            self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+        self.assertEqual(self._count('repocommit'), num_commits)
+
+    def test_get_base_commits(self):
+        commits = self._make_commits(num_commits=48)
+        # a side branch whose commits are not first parents
+        side = Commit(date=datetime(2019, 1, 1, 12), sha='f' * 40, user=self.user, comment='side')
+        last, _ = commits[-1]
+        merge = Commit(date=datetime(2019, 1, 3), sha='e' * 40, user=self.user, comment='merge')
+        commits.extend([(side, [(0, commits[5][0].sha)]), (merge, [(0, last.sha), (1, side.sha)])])
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+
+        base_commits = self.commit_mgr.get_base_commits(repo=self.repo, start_date=None, end_date=None)
+        self.assertEqual([c.sha for c in base_commits], [merge.sha] + [c.sha for c, _ in reversed(commits[:48])])
+        self.assertTrue(all(len(c.file_modifications) == 3 for c in base_commits[1:]))
+
+        base_commits = self.commit_mgr.get_base_commits(repo=self.repo, start_date='2019-01-02', end_date=None)
+        self.assertEqual([c.sha for c in base_commits], [merge.sha] + [c.sha for c, _ in reversed(commits[24:48])])
+        base_commits = self.commit_mgr.get_base_commits(repo=self.repo, start_date=None, end_date='2019-01-02')
+        # the chain starts at the last inserted commit before end_date, which is the tip of the side branch
+        self.assertEqual([c.sha for c in base_commits], [side.sha] + [c.sha for c, _ in reversed(commits[:6])])
+
+    def test_get_base_commits_with_filter(self):
+        commits = self._make_commits(num_commits=5)
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+        filename_filter = FilenameFilter(extensions=['py'], including_patterns=('src/1', 'src/2'),
+                                         excluding_patterns=('2.py',))
+        base_commits = self.commit_mgr.get_base_commits(repo=self.repo, start_date=None, end_date=None,
+                                                        filename_filter=filename_filter)
+        self.assertEqual(len(base_commits), 5)
+        self.assertTrue(all([fm.filename for fm in c.file_modifications] == ['src/1.py'] for c in base_commits))
+        # commits are returned even if none of their file modifications passes the filter
+        filename_filter = FilenameFilter(extensions=['java'], including_patterns=(), excluding_patterns=())
+        base_commits = self.commit_mgr.get_base_commits(repo=self.repo, start_date=None, end_date=None,
+                                                        filename_filter=filename_filter)
+        self.assertEqual([c.sha for c in base_commits], [c.sha for c, _ in reversed(commits)])
+        self.assertTrue(all(len(c.file_modifications) == 0 for c in base_commits))
@@ -0,0 +1,128 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from datetime import datetime, timedelta
+from microservices_miner.control.commit_snapshot import CommitSnapshot
+from microservices_miner.control.commit_stats import CommitStats
+from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.control.data_mgr import DataMgr
+from microservices_miner.control.service_mgr import ServiceMgr
+from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.database_conn import RepositoryConn, UserConn, ConnectionPool, \
+    FileModificationConn
+from microservices_miner.model.git_commit import Commit
+from microservices_miner.model.file_modification import FileModification
+from microservices_miner.model.repository import Repository
+from microservices_miner.model.user import User
+import numpy as np
+import tempfile
+import shutil
+import os
+
+
+class TestCommitSnapshot(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        self.snapshot_path = os.path.join(self.temp_dir.name, 'commits.npz')
+
+        service_mgr = ServiceMgr(db_path=self.db_path)
+        self.service_id = service_mgr.insert_service(name='snapshot-service', start_date_str='2018-01-01')
+        conn = ConnectionPool.connect(self.db_path)
+        with conn:
+            conn.execute("insert into extensions(value, language) values ('py', 'Python');")
+        FileSystemMgr(db_path=self.db_path).insert_extensions(service_id=self.service_id,
+                                                              programming_languages=['Python'])
+        self.repo = Repository(name='snapshot-repo', url='https://github.com/owner/snapshot-repo')
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        service_mgr.insert_service_repository(service_name='snapshot-service', repository_id=self.repo.repository_id,
+                                              start_date='2018-03-01', initial_loc=100)
+        self.user = User(name='Snapshot Tester', email='snapshot@ibm.com', login='snapshot')
+        self.user.user_id = UserConn(path_to_db=self.db_path).insert_user(self.user)
+        self.commit_mgr = CommitMgr(path_to_db=self.db_path)
+        self.last_sha = '0' * 40
+        self.insert_commits(start=datetime(2018, 1, 1), num_commits=40)
+
+    def tearDown(self) -> None:
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def insert_commits(self, start, num_commits):
+        commits = list()
+        for i in range(num_commits):
+            sha = '{:040x}'.format(int(start.timestamp()) * 1000 + i)
+            comment = ['fix bug in parser', 'fixes 12', 'add feature', None][i % 4]
+            commit = Commit(date=start + timedelta(days=3 * i), sha=sha, user=self.user, comment=comment)
+            commit.file_modifications = [
+                FileModification(filename='src/app.py', additions=10 + i, deletions=i, changes=10 + 2 * i,
+                                 status='modified'),
+                FileModification(filename='README.md', additions=7, deletions=0, changes=7, status='modified'),
+                FileModification(filename='src/app_BASE_.py', additions=5, deletions=5, changes=10,
+                                 status='modified')]
+            commits.append((commit, [(0, self.last_sha)]))
+            self.last_sha = sha
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+
+    def assert_same_stats(self, snapshot):
+        service_mgr = ServiceMgr(db_path=self.db_path)
+        time_bins = tuple(datetime(2017, 12, 1) + timedelta(days=10) * i for i in range(30))
+        for service_name in service_mgr.list_all_service_names():
+            service = service_mgr.get_service(service_name=service_name)
+            expected = CommitStats.from_service(service)
+            actual = snapshot.get_commit_stats(service_id=service.service_id)
+            self.assertEqual(actual.compute_loc(time_bins), expected.compute_loc(time_bins))
+            self.assertEqual(actual.compute_changes(time_bins), expected.compute_changes(time_bins))
+            np.testing.assert_array_equal(actual.compute_changes_per_loc(time_bins),
+                                          expected.compute_changes_per_loc(time_bins))
+
+    def test_refresh(self):
+        snapshot = CommitSnapshot(db_path=self.db_path, path=self.snapshot_path)
+        conn = ConnectionPool.connect(self.db_path)
+        num_pairs = conn.execute('select count(*) from servicerepository;').fetchone()[0]
+        self.assertEqual(snapshot.refresh(), num_pairs)
+        data = snapshot.load()
+        rows = data['repository_id'] == self.repo.repository_id
+        # the commits before the start_date of the repository are not part of the service, and only src/app.py
+        # passes the extension and pattern rules
+        self.assertEqual(data['additions'][rows].tolist(), [10 + i for i in range(20, 40)])
+        self.assertEqual(data['changes'][rows].tolist(), [10 + 2 * i for i in range(20, 40)])
+        self.assertEqual(data['is_bugfix'][rows].tolist()[:4], [True, False, False, False])
+        self.assertEqual(data['closes_issue'][rows].tolist()[:4], [False, True, False, False])
+        self.assert_same_stats(snapshot)
+
+    def test_incremental_refresh(self):
+        CommitSnapshot(db_path=self.db_path, path=self.snapshot_path).refresh()
+        snapshot = CommitSnapshot(db_path=self.db_path, path=self.snapshot_path)
+        self.assertEqual(snapshot.refresh(), 0)
+        self.insert_commits(start=datetime(2018, 6, 1), num_commits=5)
+        self.assertEqual(snapshot.refresh(), 1)
+        snapshot = CommitSnapshot(db_path=self.db_path, path=self.snapshot_path)
+        self.assertEqual(int(np.sum(snapshot.load()['repository_id'] == self.repo.repository_id)), 25)
+        self.assert_same_stats(snapshot)
+
+    def test_refresh_after_repair(self):
+        snapshot = CommitSnapshot(db_path=self.db_path, path=self.snapshot_path)
+        snapshot.refresh()
+        commit = self.commit_mgr.repo_commit_conn.get_commit_and_its_filemodifications_by_sha(self.last_sha)
+        fm = FileModification(filename='src/app.py', additions=100000, deletions=0, changes=100000, status='modified')
+        FileModificationConn(path_to_db=self.db_path).update_filemodification(filemodification=fm,
+                                                                               commit_id=commit.commit_id)
+        self.assertEqual(snapshot.refresh(), 1)
+        data = CommitSnapshot(db_path=self.db_path, path=self.snapshot_path).load()
+        rows = data['repository_id'] == self.repo.repository_id
+        self.assertEqual(int(data['additions'][rows][-1]), 100000)
+        self.assert_same_stats(snapshot)
+
+    def test_data_mgr_reads_snapshot(self):
+        CommitSnapshot(db_path=self.db_path, path=self.snapshot_path).refresh()
+        time_bins = (datetime(2018, 1, 1), datetime(2018, 3, 1), datetime(2018, 6, 1))
+        from_db = DataMgr(db_path=self.db_path).get_commit_stats(service_name='snapshot-service')
+        from_snapshot = DataMgr(db_path=self.db_path, snapshot_path=self.snapshot_path) \
+            .get_commit_stats(service_name='snapshot-service')
+        self.assertEqual(from_db.compute_loc(time_bins), from_snapshot.compute_loc(time_bins))
+        self.assertNotEqual(from_snapshot.compute_loc(time_bins), [0, 0])
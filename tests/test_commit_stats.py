@@ -0,0 +1,184 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.control.commit_stats import CommitStats
+from microservices_miner.control.data_mgr import DataMgr
+from microservices_miner.model.git_commit import Commit
+from microservices_miner.model.file_modification import FileModification
+from microservices_miner.model.repository import Repository
+from microservices_miner.model.service import Service
+from datetime import datetime, timedelta
+import numpy as np
+import random
+import time
+
+
+def reference_loc(service, time_bins):
+    """
+    DataMgr.compute_loc as it was written before CommitStats
+    """
+    loc = 0
+    loc_list = list()
+    for i in range(1, len(time_bins)):
+        prev_time = time_bins[i-1]
+        cur_time = time_bins[i]
+        for repo_data in service.list_repository_data():
+            repo = repo_data.get('repository')
+            start_date = repo_data.get('start_date')
+            if start_date is not None:
+                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            else:
+                start_dt = None
+            sorted_commits = sorted(repo.commits, key=lambda k: k.date)
+            if start_dt is not None and prev_time <= start_dt < cur_time:
+                prev_time = start_dt
+                initial_loc = repo_data.get('initial_loc')
+                if initial_loc is not None:
+                    loc = initial_loc
+            for c in sorted_commits:
+                if prev_time <= c.date < cur_time:
+                    num_additions, num_deletions, _ = \
+                        DataMgr.compute_modifications(file_modifications=c.file_modifications)
+                    loc += num_additions - num_deletions
+        loc_list.append(loc)
+    return loc_list
+
+
+def reference_changes_per_loc(service, time_bins):
+    """
+    DataMgr.compute_changes_per_loc as it was written before CommitStats
+    """
+    loc = 0
+    changes_per_loc_list = list()
+    for i in range(1, len(time_bins)):
+        total_changes = 0
+        prev_time = time_bins[i - 1]
+        cur_time = time_bins[i]
+        for repo_data in service.list_repository_data():
+            repo = repo_data.get('repository')
+            start_date = repo_data.get('start_date')
+            if start_date is not None:
+                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            else:
+                start_dt = None
+            initial_loc = repo_data.get('initial_loc')
+            sorted_commits = sorted(repo.commits, key=lambda k: k.date)
+            if start_dt is not None and prev_time < start_dt < cur_time:
+                prev_time = start_dt
+                if initial_loc is not None:
+                    loc = initial_loc
+            for c in sorted_commits:
+                if prev_time <= c.date < cur_time:
+                    num_additions, num_deletions, num_changes = \
+                        DataMgr.compute_modifications(file_modifications=c.file_modifications)
+                    loc += num_additions - num_deletions
+                    total_changes += num_changes
+        if loc == 0:
+            changes_per_loc = np.nan
+        else:
+            changes_per_loc = total_changes/loc
+        changes_per_loc_list.append(changes_per_loc)
+    return changes_per_loc_list
+
+
+def reference_changes(service, time_bins):
+    """
+    DataMgr.compute_changes as it was written before CommitStats
+    """
+    loc = 0
+    changes = list()
+    for i in range(1, len(time_bins)):
+        total_changes = 0
+        prev_time = time_bins[i - 1]
+        cur_time = time_bins[i]
+        for repo_data in service.list_repository_data():
+            repo = repo_data.get('repository')
+            initial_loc = repo_data.get('initial_loc')
+            sorted_commits = sorted(repo.commits, key=lambda k: k.date)
+            i = 0
+            c = sorted_commits[i]
+            commit_date = c.date
+            while i < len(sorted_commits) and commit_date < cur_time:
+                c = sorted_commits[i]
+                commit_date = c.date
+                if prev_time <= c.date:
+                    num_additions, num_deletions, num_changes = \
+                        DataMgr.compute_modifications(file_modifications=c.file_modifications)
+                    loc += num_additions - num_deletions
+                    total_changes += num_changes
+                    if i == len(sorted_commits) - 1 and initial_loc is not None:
+                        num_changes = np.abs(loc - initial_loc)
+                        total_changes += num_changes
+                i += 1
+        changes.append(total_changes)
+    return changes
+
+
+class TestCommitStats(TestCase):
+
+    def setUp(self) -> None:
+        self.rnd = random.Random(1)
+        self.start = datetime(2018, 1, 1)
+
+    def _make_service(self, num_repositories, num_commits):
+        service = Service(name='service', start_date_str='2018-01-01', end_date_str=None)
+        for r in range(num_repositories):
+            repo = Repository(name='repo-{}'.format(r), url='https://github.com/owner/repo-{}'.format(r))
+            commits = list()
+            for i in range(num_commits):
+                # whole days, so that commits fall exactly on the limits of some time bins
+                dt = self.start + timedelta(days=self.rnd.randint(-30, 800), hours=self.rnd.choice([0, 0, 5]))
+                commit = Commit(date=dt, sha='{:040x}'.format(r * num_commits + i))
+                for j in range(self.rnd.randint(0, 3)):
+                    additions, deletions = self.rnd.randint(0, 200), self.rnd.randint(0, 100)
+                    commit.file_modifications.append(FileModification(
+                        filename='f{}.py'.format(j), additions=additions, deletions=deletions,
+                        changes=additions + deletions, status='modified'))
+                commits.append(commit)
+            repo.commits = commits
+            start_date = self.rnd.choice([None, (self.start + timedelta(days=self.rnd.randint(0, 700))).date(),
+                                          self.start.date()])
+            initial_loc = self.rnd.choice([None, self.rnd.randint(0, 5000)])
+            service.add_repository(repository=repo, start_date=str(start_date) if start_date else None,
+                                   end_date=None, initial_loc=initial_loc)
+        return service
+
+    def _make_bins(self, num_bins):
+        step = timedelta(days=self.rnd.choice([1, 7, 30]))
+        return tuple(self.start + step * i for i in range(num_bins + 1))
+
+    def test_same_as_reference(self):
+        for _ in range(30):
+            service = self._make_service(num_repositories=self.rnd.randint(1, 4), num_commits=self.rnd.randint(1, 60))
+            time_bins = self._make_bins(num_bins=self.rnd.randint(1, 40))
+            commit_stats = CommitStats.from_service(service)
+            self.assertEqual(commit_stats.compute_loc(time_bins), reference_loc(service, time_bins))
+            self.assertEqual(commit_stats.compute_changes(time_bins), reference_changes(service, time_bins))
+            np.testing.assert_array_equal(commit_stats.compute_changes_per_loc(time_bins),
+                                          reference_changes_per_loc(service, time_bins))
+            self.assertEqual(DataMgr.compute_loc(service, time_bins), reference_loc(service, time_bins))
+
+    def test_inconsistent_modifications(self):
+        service = self._make_service(num_repositories=1, num_commits=5)
+        repo = service.list_repository_data()[0].get('repository')
+        commit = repo.commits[2]
+        commit.file_modifications.append(FileModification(filename='g.py', additions=1, deletions=1, changes=5,
+                                                          status='modified'))
+        time_bins = (commit.date - timedelta(days=1), commit.date + timedelta(days=1))
+        with self.assertRaises(AssertionError):
+            CommitStats.from_service(service).compute_loc(time_bins)
+        # the commit is not counted
+        time_bins = (commit.date + timedelta(days=1), commit.date + timedelta(days=2))
+        CommitStats.from_service(service).compute_loc(time_bins)
+
+    def test_many_bins(self):
+        services = [self._make_service(num_repositories=2, num_commits=500) for _ in range(100)]
+        time_bins = tuple(self.start + timedelta(days=2) * i for i in range(501))
+        all_stats = [CommitStats.from_service(service) for service in services]
+        t = time.perf_counter()
+        for commit_stats in all_stats:
+            self.assertEqual(len(commit_stats.compute_loc(time_bins)), 500)
+        self.assertLess(time.perf_counter() - t, 1.0)
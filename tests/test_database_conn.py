@@ -5,8 +5,11 @@
 # Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
 from unittest import TestCase
 from microservices_miner.control.database_conn import ServiceRepositoryConn, ServiceConn, RepositoryCommitConn,\
-    ExtensionsConn, UserConn, RepositoryConn, FilenamePatternConn
+    ExtensionsConn, UserConn, RepositoryConn, FilenamePatternConn, ConnectionPool, ConnectionProfile, DatabaseWriter
+from microservices_miner.control.user_mgr import UserMgr
 import os
+import tempfile
+import threading
 from microservices_miner.model.repository import Repository
 from microservices_miner.model.service import Service
 from microservices_miner.model.git_commit import Commit
@@ -188,6 +191,23 @@ class TestRepositoryCommitConn(TestCase):
     def test_get_inconsistent_commits(self):
         self.conn.get_inconsistent_commits(repository_id=1, extensions=['py'])
 
+    def test_get_commits_by_repo_number_of_queries(self):
+        repository_id = 1
+        statements = list()
+        self.conn.conn.set_trace_callback(statements.append)
+        try:
+            commits = self.conn.get_commits_by_repo(repository_id=repository_id)
+        finally:
+            self.conn.conn.set_trace_callback(None)
+        self.assertGreater(len(commits), 1)
+        # users are joined instead of being queried once per commit
+        self.assertEqual(len(statements), 1)
+        user_conn = UserConn(path_to_db=self.db_path)
+        for c in commits:
+            if c.user is not None:
+                user = user_conn.get_user(user_id=c.user.user_id)
+                self.assertEqual((c.user.name, c.user.email, c.user.login), (user.name, user.email, user.login))
+
 
 class TestExtensionConn(TestCase):
 
@@ -272,3 +292,132 @@ class TestUserConn(TestCase):
 
         user = self.conn.get_user(user_id=999999999)
         self.assertIsNone(user)
+
+    def test_insert_user_with_quotes(self):
+        user = User(email='o"brien@ibm.com', name='John "Johnny" O\'Brien', login='jobrien')
+        user_id = self.conn.insert_user(user)
+        self.assertEqual(self.conn.insert_user(user), user_id)
+        found = self.conn.get_user(name=user.name, email=user.email)
+        self.assertEqual(found.user_id, user_id)
+        self.assertEqual(found.name, user.name)
+
+
+class TestConnectionPool(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('create table user(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, email string, login string)')
+        conn.commit()
+        conn.close()
+
+    def tearDown(self) -> None:
+        for profile in (ConnectionProfile.DEFAULT, ConnectionProfile.BULK_LOAD, ConnectionProfile.READ_ONLY):
+            ConnectionPool.get_pool(self.db_path, profile=profile).close()
+        self.temp_dir.cleanup()
+
+    def test_one_connection_per_thread(self):
+        pool = ConnectionPool.get_pool(self.db_path)
+        self.assertIs(pool, ConnectionPool.get_pool(self.db_path))
+        conns = [UserConn(path_to_db=self.db_path).conn for _ in range(100)]
+        self.assertTrue(all(c is conns[0] for c in conns))
+
+        other_conns = list()
+        t = threading.Thread(target=lambda: other_conns.append(UserConn(path_to_db=self.db_path).conn))
+        t.start()
+        t.join()
+        self.assertIsNot(other_conns[0], conns[0])
+        self.assertEqual(pool.num_connections, 2)
+
+    def test_mgr_accepts_pool(self):
+        pool = ConnectionPool.get_pool(self.db_path)
+        user_mgr = UserMgr(path_to_db=pool)
+        user_id = user_mgr.insert_user(User(email='tester@ibm.com', name='test-name', login='tester'))
+        user = UserConn(path_to_db=self.db_path).get_user(user_id=user_id)
+        self.assertEqual(user.login, 'tester')
+        self.assertEqual(pool.num_connections, 1)
+
+    def test_profiles(self):
+        conn = ConnectionPool.connect(self.db_path)
+        # the default profile does not convert the database to WAL
+        self.assertEqual(conn.execute('PRAGMA journal_mode;').fetchone()[0], 'delete')
+        self.assertEqual(conn.execute('PRAGMA cache_size;').fetchone()[0], -64 * 1024)
+        self.assertEqual(conn.execute('PRAGMA temp_store;').fetchone()[0], 2)
+
+        bulk_pool = ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.BULK_LOAD)
+        self.assertIsNot(bulk_pool, ConnectionPool.get_pool(self.db_path))
+        bulk_conn = bulk_pool.get_connection()
+        self.assertIsNot(bulk_conn, conn)
+        self.assertEqual(bulk_conn.execute('PRAGMA journal_mode;').fetchone()[0], 'wal')
+        self.assertEqual(bulk_conn.execute('PRAGMA synchronous;').fetchone()[0], 0)
+        self.assertEqual(bulk_conn.execute('PRAGMA cache_size;').fetchone()[0], -256 * 1024)
+
+    def test_read_only_profile(self):
+        UserConn(path_to_db=self.db_path).insert_user(User(email='tester@ibm.com', name='test-name', login='tester'))
+        pool = ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.READ_ONLY)
+        user_conn = UserConn(path_to_db=pool)
+        self.assertEqual(user_conn.get_user(login='tester').email, 'tester@ibm.com')
+        with self.assertRaises(sqlite3.OperationalError):
+            user_conn.conn.execute('insert into user(name, email, login) values (?, ?, ?);', ('a', 'b', 'c'))
+
+    def test_read_while_writing(self):
+        writer = ConnectionPool.connect(ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.BULK_LOAD))
+        writer.execute('insert into user(name, email, login) values (?, ?, ?);', ('a', 'b', 'c'))
+        self.assertTrue(writer.in_transaction)
+        # in WAL mode the reader sees the last committed state instead of waiting for the writer
+        reader = ConnectionPool.connect(ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.READ_ONLY))
+        reader.execute('PRAGMA busy_timeout = 0;')
+        self.assertEqual(reader.execute('select count(*) from user;').fetchone()[0], 0)
+        writer.commit()
+        self.assertEqual(reader.execute('select count(*) from user;').fetchone()[0], 1)
+
+
+class TestDatabaseWriter(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('create table user(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, email string, login string)')
+        conn.commit()
+        conn.close()
+        self.writer = DatabaseWriter(path_to_db=self.db_path)
+
+    def tearDown(self) -> None:
+        self.writer.close()
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def insert_user(self, login):
+        return UserConn(path_to_db=self.db_path).insert_user(User(email='{}@ibm.com'.format(login), name=login,
+                                                                  login=login))
+
+    def test_writes_from_many_threads(self):
+        threads = [threading.Thread(target=lambda k=k: [self.writer.call(self.insert_user, 'user-{}-{}'.format(k, i))
+                                                        for i in range(20)])
+                   for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.writer.num_writes, 80)
+        conn = ConnectionPool.connect(self.db_path)
+        self.assertEqual(conn.execute('select count(distinct login) from user;').fetchone()[0], 80)
+        # all writes used the connection of the writer thread
+        self.assertEqual(ConnectionPool.get_pool(self.db_path).num_connections, 2)
+
+    def test_writes_keep_their_order(self):
+        futures = [self.writer.submit(self.insert_user, 'user-{}'.format(i)) for i in range(10)]
+        user_ids = [f.result() for f in futures]
+        self.assertEqual(user_ids, sorted(user_ids))
+
+    def test_error_is_raised_by_caller(self):
+        def fail():
+            raise ValueError('invalid')
+
+        with self.assertRaises(ValueError):
+            self.writer.call(fail)
+        # the writer keeps running after an error
+        user_id = self.writer.call(self.insert_user, 'tester')
+        self.assertEqual(UserConn(path_to_db=self.db_path).get_user(login='tester').user_id, user_id)
@@ -1,8 +1,11 @@
 import unittest
-from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.filesystem_mgr import FileSystemMgr, FilenameFilter
 from microservices_miner.control.service_mgr import ServiceMgr
-from microservices_miner.control.database_conn import ServiceRepositoryConn
+from microservices_miner.control.database_conn import ServiceRepositoryConn, ConnectionPool
 import os
+import random
+import shutil
+import tempfile
 from microservices_miner.model.repository import Repository
 import sqlite3
 
@@ -55,5 +58,76 @@ class TestFileSystemMgr(unittest.TestCase):
                             break
 
 
+class TestFilenameFilter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        self.conn = ConnectionPool.connect(self.db_path)
+        with self.conn:
+            self.conn.execute("insert into extensions(value, language) values ('py', 'Python');")
+        self.fs = FileSystemMgr(db_path=self.db_path)
+        self.fs.insert_extensions(service_id=1, programming_languages=['Python'])
+
+    def tearDown(self) -> None:
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def test_same_as_substring_search(self):
+        rnd = random.Random(3)
+        parts = ['src', 'test', 'docs', '_BASE_', 'vendor', 'app', 'a.b', '']
+        for _ in range(200):
+            including = tuple(rnd.sample(parts, rnd.randint(0, 2)))
+            excluding = tuple(rnd.sample(parts, rnd.randint(0, 3)))
+            extensions = rnd.sample(['py', 'js', 'md', 'Dockerfile'], 2)
+            filename_filter = FilenameFilter(extensions, including, excluding)
+            filenames = ['/'.join(rnd.choice(parts) for _ in range(3)) + rnd.choice(['.py', '.js', '.md', ''])
+                         for _ in range(20)] + ['Dockerfile', None]
+            expected = [isinstance(f, str) and f[f.rfind('.') + 1:] in extensions and
+                        all(p not in f for p in excluding) and (len(including) == 0 or any(p in f for p in including))
+                        for f in filenames]
+            self.assertEqual(filename_filter.filter(filenames), expected)
+
+    def test_sql_same_as_filter(self):
+        rnd = random.Random(5)
+        parts = ['src', 'a.b', '..', '.', 'x.py', '', 'vendor', '_BASE_', 'docs', 'Dockerfile']
+        filenames = [''.join(rnd.choice(parts) + rnd.choice(['/', '', '.']) for _ in range(rnd.randint(0, 4)))
+                     for _ in range(500)] + ['', '.', 'abc.', '.gitignore', None]
+        with self.conn:
+            self.conn.execute('create temp table names(filename text);')
+            self.conn.executemany('insert into names(filename) values (?);', [(f,) for f in filenames])
+        for _ in range(100):
+            filename_filter = FilenameFilter(rnd.sample(['py', 'b', '', 'Dockerfile', 'gitignore'], rnd.randint(0, 3)),
+                                             tuple(rnd.sample(parts, rnd.randint(0, 2))),
+                                             tuple(rnd.sample(parts, rnd.randint(0, 2))))
+            sql, params = filename_filter.to_sql(column='filename')
+            rows = self.conn.execute('select filename from names where {} order by rowid;'.format(sql), params)
+            expected = [f for f, is_valid in zip(filenames, filename_filter.filter(filenames)) if is_valid]
+            self.assertEqual([row[0] for row in rows], expected)
+
+    def test_filter_is_cached(self):
+        self.assertTrue(self.fs.check_filename(filename='src/app.py', service_id=1, repository_id=1))
+        statements = list()
+        self.conn.set_trace_callback(statements.append)
+        try:
+            for filename in ('src/app.py', 'README.md', 'src/app_BASE_.py'):
+                FileSystemMgr(db_path=self.db_path).check_filename(filename=filename, service_id=1, repository_id=1)
+        finally:
+            self.conn.set_trace_callback(None)
+        self.assertEqual(statements, [])
+
+    def test_insert_pattern_invalidates_filter(self):
+        self.assertTrue(self.fs.check_filename(filename='src/app.py', service_id=1, repository_id=1))
+        self.assertTrue(self.fs.check_filename(filename='test/test_app.py', service_id=1, repository_id=1))
+        self.fs.insert_pattern(pattern='src/', pattern_type=FileSystemMgr.INCLUSION, service_id=1, repository_id=1)
+        self.assertTrue(self.fs.check_filename(filename='src/app.py', service_id=1, repository_id=1))
+        self.assertFalse(self.fs.check_filename(filename='test/test_app.py', service_id=1, repository_id=1))
+        # other repositories are not affected
+        self.assertTrue(self.fs.check_filename(filename='test/test_app.py', service_id=1, repository_id=2))
+        self.fs.insert_pattern(pattern='legacy', pattern_type=FileSystemMgr.EXCLUSION, service_id=1, repository_id=1)
+        self.assertFalse(self.fs.check_filename(filename='src/legacy/app.py', service_id=1, repository_id=1))
+
+
 if __name__ == '__main__':
     unittest.main()
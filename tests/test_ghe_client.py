@@ -0,0 +1,76 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from microservices_miner.mining.ghe_client import GHEClient
+import threading
+import json
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+
+    # number of requests that fail before the server starts answering with 200
+    failures = 0
+    requests_counter = 0
+    authorization = None
+
+    def do_GET(self):
+        FlakyHandler.requests_counter += 1
+        FlakyHandler.authorization = self.headers.get('Authorization')
+        if FlakyHandler.requests_counter <= FlakyHandler.failures:
+            self.send_response(502)
+            self.end_headers()
+        else:
+            body = json.dumps({'path': self.path}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestGHEClient(TestCase):
+
+    def setUp(self) -> None:
+        FlakyHandler.requests_counter = 0
+        FlakyHandler.failures = 0
+        FlakyHandler.authorization = None
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.client = GHEClient(api_token='secret', backoff_factor=0.01, max_retries=3)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_get(self):
+        resp = self.client.get(url='{}/users/tester'.format(self.base_url))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json().get('path'), '/users/tester')
+        self.assertEqual(FlakyHandler.authorization, 'token secret')
+
+    def test_get_retries_server_errors(self):
+        FlakyHandler.failures = 2
+        resp = self.client.get(url='{}/repos/owner/repo/commits'.format(self.base_url), params={'sha': 'master'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(FlakyHandler.requests_counter, 3)
+
+    def test_get_gives_up_after_max_retries(self):
+        FlakyHandler.failures = 10
+        resp = self.client.get(url='{}/repos/owner/repo/commits'.format(self.base_url))
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(FlakyHandler.requests_counter, self.client.max_retries + 1)
+
+    def test_session_per_host(self):
+        self.client.get(url='{}/a'.format(self.base_url))
+        self.client.get(url='{}/b'.format(self.base_url))
+        self.assertEqual(len(self.client._sessions), 1)
@@ -6,9 +6,27 @@
 from unittest import TestCase
 import os
 from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.mining.ghe_client import GHEClient
 import json
 from microservices_miner.control.service_mgr import ServiceMgr
-from datetime import datetime
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.database_conn import ConnectionPool, RepositoryConn, RepositoryCommitConn, \
+    MiningCheckpointConn, UserConn
+from microservices_miner.control.issue_mgr import IssueMgr
+from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.mining.blob_store import BlobStore
+from microservices_miner.model.repository import Repository
+from microservices_miner.model.git_commit import Commit
+from microservices_miner.model.file_modification import FileModification
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+import threading
+import time
+import tempfile
+import zlib
+import base64
+import shutil
 
 
 class TestGHEExtractor(TestCase):
@@ -47,3 +65,469 @@ class TestGHEExtractor(TestCase):
                         self.assertEqual(repo_end_date, end_date)
                         found = True
                 self.assertTrue(found)
+
+
+class StubbedFetchExtractor(GHEExtractor):
+    """
+    GHEExtractor whose requests for the details of a commit are answered after a delay, recording how many of them
+    have started and are running
+    """
+
+    def __init__(self, num_workers, delays):
+        super().__init__(db_path=os.getenv('DB_PATH'), num_workers=num_workers, client=GHEClient(api_token='secret'))
+        self.delays = delays
+        self.lock = threading.Lock()
+        self.num_started = 0
+        self.num_running = 0
+        self.max_running = 0
+
+    def _extract_file_modifications_from_ghe(self, base_url, owner, repo, sha, api_token):
+        with self.lock:
+            self.num_started += 1
+            self.num_running += 1
+            self.max_running = max(self.max_running, self.num_running)
+        time.sleep(self.delays[sha])
+        with self.lock:
+            self.num_running -= 1
+        return [sha], None, None
+
+
+class TestFetchFileModifications(TestCase):
+
+    def test_order_and_in_flight_requests(self):
+        num_workers = 3
+        shas = ['{:040x}'.format(i) for i in range(20)]
+        # the first commit is answered after the others would have been, if they were all requested at once
+        delays = {sha: 0.001 for sha in shas}
+        delays[shas[0]] = 0.1
+        extractor = StubbedFetchExtractor(num_workers=num_workers, delays=delays)
+        commit_list = [{'sha': sha} for sha in shas]
+        fetched = list()
+        for d, file_modifications in extractor._fetch_file_modifications(base_url='http://ghe', commit_list=commit_list,
+                                                                         repo='repo', owner='owner', api_token=None):
+            # requests are only made for the commits that are at most 2 * num_workers ahead of the one yielded
+            with extractor.lock:
+                self.assertLessEqual(extractor.num_started - len(fetched), 2 * num_workers)
+            fetched.append((d.get('sha'), file_modifications))
+            time.sleep(0.002)
+        extractor.client.close()
+        self.assertEqual(fetched, [(sha, [sha]) for sha in shas])
+        self.assertLessEqual(extractor.max_running, num_workers)
+        self.assertGreater(extractor.max_running, 1)
+
+
+class GHEHandler(BaseHTTPRequestHandler):
+    """
+    stand-in for the API of GHE. Commits have a linear history and are listed from the newest to the oldest one;
+    issues are listed from the least to the most recently updated one
+    """
+
+    num_commits = 0
+    num_issues = 0
+    # whether the file modifications of the commits are inconsistent, i.e. modified but without changes
+    inconsistent = False
+    # number of the request of a page of commits, a page of issues or a comparison that fails, if any
+    failing_request = None
+    # name of a repository whose requests fail, if any
+    failing_repo = None
+    # SHA of a commit whose comparison to its parent fails, if any
+    failing_sha = None
+    # whether comparisons return the inconsistent files, whose content changes every other commit
+    with_files = False
+    requested_pages = list()
+    commit_urls = list()
+    requested_issue_pages = list()
+    requested_comparisons = list()
+    requested_contents = list()
+    requested_users = list()
+    requested_details = list()
+    graphql_queries = list()
+    since = None
+
+    @staticmethod
+    def make_sha(i, repo='repo'):
+        # the SHAs of each repository are distinct
+        return '{:08x}{:032x}'.format(zlib.crc32(repo.encode()), i + 1)
+
+    @staticmethod
+    def make_blob(sha):
+        # the version of app.py in a commit and its blob SHA
+        version = (int(sha[8:], 16) - 1) // 2
+        content = ''.join('line {}\n'.format(j) for j in range(version + 1))
+        return content, '{:040x}'.format(version + 1)
+
+    @staticmethod
+    def make_date(i):
+        return (datetime(2019, 1, 1) + timedelta(hours=i)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def send_json(self, data, links=None):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        if links:
+            self.send_header('Link', ', '.join('<{}>; rel="{}"'.format(url, rel) for rel, url in links.items()))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_page(self, parsed, query, items, page, requests):
+        requests.append(page)
+        if len(requests) == GHEHandler.failing_request:
+            self.send_response(404)
+            self.end_headers()
+            return
+        per_page = int(query.get('per_page'))
+        num_pages = max((len(items) + per_page - 1) // per_page, 1)
+        links = dict()
+        url = 'http://{}{}?'.format(self.headers.get('Host'), parsed.path)
+        if page < num_pages:
+            links['next'] = url + urlencode(dict(query, page=page + 1))
+            links['last'] = url + urlencode(dict(query, page=num_pages))
+        if page > 1:
+            links['prev'] = url + urlencode(dict(query, page=page - 1))
+            links['first'] = url + urlencode(dict(query, page=1))
+        self.send_json(items[(page - 1) * per_page:page * per_page], links)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        page = int(query.get('page', 1))
+        # /repos/{owner}/{repo}/...
+        parts = parsed.path.split('/')
+        repo = parts[3] if len(parts) > 3 else None
+        if repo is not None and repo == GHEHandler.failing_repo:
+            self.send_response(404)
+            self.end_headers()
+        elif parsed.path.startswith('/users/'):
+            login = parsed.path.split('/')[-1]
+            GHEHandler.requested_users.append(login)
+            self.send_json({'login': login, 'email': '{}@ibm.com'.format(login), 'name': login})
+        elif parts[4:] == ['commits']:
+            GHEHandler.since = query.get('since')
+            GHEHandler.commit_urls.append(self.path)
+            # newest commits first
+            commits = [{'sha': GHEHandler.make_sha(i, repo),
+                        'commit': {'author': {'name': 'Tester', 'email': 'tester@ibm.com',
+                                              'date': GHEHandler.make_date(i)},
+                                   'message': 'commit {}'.format(i)},
+                        'parents': [{'sha': GHEHandler.make_sha(i - 1, repo)}] if i > 0 else []}
+                       for i in range(GHEHandler.num_commits - 1, -1, -1)
+                       if GHEHandler.since is None or GHEHandler.make_date(i) >= GHEHandler.since]
+            self.send_page(parsed, query, commits, page, GHEHandler.requested_pages)
+        elif parts[4:] == ['issues']:
+            issues = [{'title': 'issue {}'.format(i), 'body': 'body', 'created_at': GHEHandler.make_date(i),
+                       'closed_at': None, 'updated_at': GHEHandler.make_date(i), 'state': 'open',
+                       'labels': [{'name': 'bug', 'description': None}], 'user': {'login': 'reporter'},
+                       'assignees': []} for i in range(GHEHandler.num_issues)]
+            # every fifth item is a pull request
+            for issue in issues[4::5]:
+                issue['pull_request'] = dict()
+            issues = [issue for issue in issues
+                      if query.get('since') is None or issue.get('updated_at') >= query.get('since')]
+            self.send_page(parsed, query, issues, page, GHEHandler.requested_issue_pages)
+        elif parts[4:5] == ['compare']:
+            GHEHandler.requested_comparisons.append(parsed.path)
+            newer_sha = parsed.path.split('...')[-1]
+            if newer_sha == GHEHandler.failing_sha:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if GHEHandler.with_files:
+                contents_url = 'http://{}/repos/owner/{}/contents/app.py?ref={}'.format(self.headers.get('Host'),
+                                                                                         repo, newer_sha)
+                files = [{'filename': 'app.py', 'status': 'modified', 'additions': 0, 'deletions': 0, 'changes': 0,
+                          'sha': GHEHandler.make_blob(newer_sha)[1], 'contents_url': contents_url}]
+            else:
+                # the files of the comparison are not the inconsistent ones, so the commits are not repaired
+                files = []
+            self.send_json({'files': files})
+        elif parts[4:5] == ['contents']:
+            GHEHandler.requested_contents.append(query.get('ref'))
+            content, blob_sha = GHEHandler.make_blob(query.get('ref'))
+            self.send_json({'sha': blob_sha, 'content': base64.b64encode(content.encode()).decode()})
+        else:
+            GHEHandler.requested_details.append(parts[-1])
+            changes = 0 if GHEHandler.inconsistent else 4
+            self.send_json({'stats': {'additions': 3, 'deletions': 1},
+                            'files': [{'filename': 'app.py', 'status': 'modified', 'additions': 3, 'deletions': 1,
+                                       'changes': changes}]})
+
+    def send_connection(self, items, variables, with_nodes=True):
+        start = int(variables.get('after') or 0)
+        end = start + variables.get('first')
+        connection = {'pageInfo': {'hasNextPage': end < len(items), 'endCursor': str(end)}}
+        if with_nodes:
+            connection['nodes'] = items[start:end]
+        return connection
+
+    def do_POST(self):
+        """
+        stand-in for the GraphQL API, with the same commits and issues of the REST API. The cursor of a page is the
+        offset of the next one
+        """
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length'))))
+        query = request.get('query')
+        variables = request.get('variables')
+        repo = variables.get('name')
+        GHEHandler.graphql_queries.append(variables)
+        if len(GHEHandler.graphql_queries) == GHEHandler.failing_request:
+            self.send_response(502)
+            self.end_headers()
+            return
+        if 'history' in query:
+            GHEHandler.since = variables.get('since')
+            head = GHEHandler.num_commits - 1
+            if variables.get('expression') != 'master':
+                head = [GHEHandler.make_sha(i, repo) for i in range(GHEHandler.num_commits)] \
+                    .index(variables.get('expression'))
+            # the root commit changed no files
+            commits = [{'oid': GHEHandler.make_sha(i, repo), 'message': 'commit {}'.format(i),
+                        'authoredDate': GHEHandler.make_date(i), 'changedFilesIfAvailable': 1 if i > 0 else 0,
+                        'author': {'name': 'Tester', 'email': 'tester@ibm.com',
+                                   'user': {'login': 'tester-login', 'name': 'Tester', 'email': None}},
+                        'parents': {'nodes': [{'oid': GHEHandler.make_sha(i - 1, repo)}] if i > 0 else []}}
+                       for i in range(head, -1, -1)
+                       if GHEHandler.since is None or GHEHandler.make_date(i) >= GHEHandler.since]
+            history = self.send_connection(commits, variables, with_nodes=variables.get('withNodes'))
+            data = {'repository': {'object': {'oid': GHEHandler.make_sha(head, repo), 'history': history}}}
+        else:
+            issues = [{'title': 'issue {}'.format(i), 'body': 'body', 'createdAt': GHEHandler.make_date(i),
+                       'closedAt': None, 'updatedAt': GHEHandler.make_date(i), 'state': 'OPEN',
+                       'labels': {'nodes': [{'name': 'bug', 'description': None}]},
+                       'author': {'login': 'reporter', 'name': 'Reporter', 'email': ''},
+                       'assignees': {'nodes': [{'login': 'assignee', 'url': 'https://github.com/assignee'}]}}
+                      for i in range(GHEHandler.num_issues) if i % 5 != 4]
+            issues = [issue for issue in issues
+                      if variables.get('since') is None or issue.get('updatedAt') >= variables.get('since')]
+            data = {'repository': {'issues': self.send_connection(issues, variables)}}
+        self.send_json({'data': data})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMiningPhases(TestCase):
+
+    def setUp(self) -> None:
+        GHEHandler.num_commits = 25
+        GHEHandler.num_issues = 25
+        GHEHandler.inconsistent = False
+        GHEHandler.failing_request = None
+        GHEHandler.failing_repo = None
+        GHEHandler.failing_sha = None
+        GHEHandler.with_files = False
+        GHEHandler.requested_pages = list()
+        GHEHandler.commit_urls = list()
+        GHEHandler.requested_issue_pages = list()
+        GHEHandler.requested_comparisons = list()
+        GHEHandler.requested_contents = list()
+        GHEHandler.requested_users = list()
+        GHEHandler.requested_details = list()
+        GHEHandler.graphql_queries = list()
+        GHEHandler.since = None
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GHEHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        SchemaMgr(path_to_db=self.db_path).migrate()
+        self.repo = Repository(name='repo', url='{}/owner/repo'.format(self.base_url))
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        self.client = GHEClient(api_token='secret', max_retries=0)
+        self.blob_store = BlobStore(path=os.path.join(self.temp_dir.name, 'blobs'))
+        self.ghe_extractor = GHEExtractor(db_path=self.db_path, client=self.client, blob_store=self.blob_store)
+        self.checkpoint_conn = MiningCheckpointConn(path_to_db=self.db_path)
+        self.page_size = GHEExtractor.PAGE_SIZE
+        GHEExtractor.PAGE_SIZE = 10
+
+    def tearDown(self) -> None:
+        GHEExtractor.PAGE_SIZE = self.page_size
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def get_checkpoint(self, phase):
+        return self.checkpoint_conn.get_checkpoint(repository_id=self.repo.repository_id, phase=phase)
+
+    def assert_all_commits_inserted(self):
+        commit_conn = RepositoryCommitConn(path_to_db=self.db_path)
+        commits = commit_conn.get_commits_by_repo(repository_id=self.repo.repository_id)
+        self.assertEqual(sorted(c.sha for c in commits),
+                         sorted(GHEHandler.make_sha(i) for i in range(GHEHandler.num_commits)))
+        # the last commit of the branch was the last one to be inserted
+        chain = commit_conn.get_first_parent_chain(repository_id=self.repo.repository_id)
+        self.assertEqual([c.sha for c in chain],
+                         [GHEHandler.make_sha(i) for i in range(GHEHandler.num_commits - 1, -1, -1)])
+        self.assertTrue(all(len(c.file_modifications) == 1 for c in chain))
+
+    def test_iter_commit_pages(self):
+        pages = list(self.ghe_extractor.iter_commit_pages(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                          api_token=None))
+        self.assertEqual([len(commit_data) for commit_data, _ in pages], [5, 10, 10])
+        shas = [c.get('sha') for commit_data, _ in pages for c in commit_data]
+        self.assertEqual(shas, [GHEHandler.make_sha(i) for i in range(GHEHandler.num_commits)])
+        self.assertIsNone(pages[-1][1])
+        # the first page is requested to find the last one, and it is not requested again
+        self.assertEqual(GHEHandler.requested_pages, [1, 3, 2])
+        # the URLs of the pages do not change across runs, so their cached responses can be revalidated
+        urls = list(GHEHandler.commit_urls)
+        GHEHandler.commit_urls = list()
+        list(self.ghe_extractor.iter_commit_pages(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                  api_token=None))
+        self.assertEqual(GHEHandler.commit_urls, urls)
+
+    def test_mine_commits(self):
+        num_commits = self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                      api_token=None)
+        self.assertEqual(num_commits, GHEHandler.num_commits)
+        self.assert_all_commits_inserted()
+        # the author is requested once, and then found in the cache
+        self.assertEqual(GHEHandler.requested_users, ['tester'])
+        checkpoint = self.get_checkpoint(GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
+        self.assertEqual(checkpoint.get('last_sha'), GHEHandler.make_sha(GHEHandler.num_commits - 1))
+
+        # the next run only asks for the commits made since the newest one
+        GHEHandler.num_commits = 30
+        GHEHandler.requested_pages = list()
+        num_commits = self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                      api_token=None)
+        self.assertEqual(GHEHandler.since, GHEHandler.make_date(24)[:-1])
+        self.assertEqual(GHEHandler.requested_pages, [1])
+        self.assertEqual(num_commits, 6)
+        self.assert_all_commits_inserted()
+
+    def test_resume_commits(self):
+        GHEHandler.num_commits = 35
+        # pages are requested in the order 1, 4, 3, 2, so the second page fails after the older ones were written
+        GHEHandler.failing_request = 4
+        with self.assertRaises(AssertionError):
+            self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        checkpoint = self.get_checkpoint(GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.RUNNING)
+        self.assertIn('page=2', checkpoint.get('page_url'))
+        self.assertEqual(checkpoint.get('last_sha'), GHEHandler.make_sha(14))
+
+        GHEHandler.failing_request = None
+        GHEHandler.requested_pages = list()
+        self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        # only the page that failed and the newer ones are requested
+        self.assertEqual(GHEHandler.requested_pages, [2, 1])
+        self.assert_all_commits_inserted()
+        self.assertEqual(self.get_checkpoint(GHEExtractor.COMMITS_PHASE).get('status'), MiningCheckpointConn.DONE)
+
+    def test_mine_issues(self):
+        GHEHandler.failing_request = 2
+        with self.assertRaises(AssertionError):
+            self.ghe_extractor.mine_issues(base_url=self.base_url, owner='owner', repo=self.repo)
+        checkpoint = self.get_checkpoint(GHEExtractor.ISSUES_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.RUNNING)
+        self.assertEqual(checkpoint.get('last_date'), GHEHandler.make_date(9))
+
+        GHEHandler.failing_request = None
+        GHEHandler.requested_issue_pages = list()
+        num_issues = self.ghe_extractor.mine_issues(base_url=self.base_url, owner='owner', repo=self.repo)
+        self.assertEqual(GHEHandler.requested_issue_pages, [2, 3])
+        # pull requests are not issues
+        self.assertEqual(num_issues, 12)
+        conn = ConnectionPool.connect(self.db_path)
+        titles = [row[0] for row in conn.execute('select title from issue where repository_id == ? order by ID;',
+                                                 (self.repo.repository_id,))]
+        self.assertEqual(titles, ['issue {}'.format(i) for i in range(GHEHandler.num_issues) if i % 5 != 4])
+        issues = IssueMgr(path_to_db=self.db_path).get_issues_by_label(repository_id=self.repo.repository_id)
+        self.assertEqual(len(issues), 20)
+        self.assertEqual({issue.user.login for issue in issues}, {'reporter'})
+        self.assertEqual(GHEHandler.requested_users, ['reporter'])
+        checkpoint = self.get_checkpoint(GHEExtractor.ISSUES_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
+        self.assertEqual(checkpoint.get('last_date'), GHEHandler.make_date(24))
+
+        # the next run only asks for the issues updated since the most recently updated one
+        GHEHandler.requested_issue_pages = list()
+        self.ghe_extractor.mine_issues(base_url=self.base_url, owner='owner', repo=self.repo)
+        self.assertEqual(GHEHandler.requested_issue_pages, [1])
+        self.assertEqual(len(IssueMgr(path_to_db=self.db_path).get_issues_by_label(self.repo.repository_id)), 20)
+
+    def test_resume_repair(self):
+        GHEHandler.inconsistent = True
+        self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        GHEHandler.failing_sha = GHEHandler.make_sha(5)
+        with self.assertRaises(AssertionError):
+            self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner',
+                                                                extensions=['py'], base_url=self.base_url)
+        checkpoint = self.get_checkpoint(GHEExtractor.REPAIR_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.RUNNING)
+        # the first commit has no parent and the next four were repaired, even if later ones were compared
+        self.assertEqual(checkpoint.get('last_sha'), GHEHandler.make_sha(4))
+
+        GHEHandler.failing_sha = None
+        GHEHandler.requested_comparisons = list()
+        self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                            base_url=self.base_url)
+        self.assertEqual(sorted(c.split('...')[-1] for c in GHEHandler.requested_comparisons),
+                         sorted(GHEHandler.make_sha(i) for i in range(5, GHEHandler.num_commits)))
+        self.assertEqual(self.get_checkpoint(GHEExtractor.REPAIR_PHASE).get('status'), MiningCheckpointConn.DONE)
+
+        # the commits that were compared are skipped even though they are still inconsistent
+        GHEHandler.requested_comparisons = list()
+        self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                            base_url=self.base_url)
+        self.assertEqual(GHEHandler.requested_comparisons, [])
+
+    def test_repair_older_commits_of_later_runs(self):
+        GHEHandler.inconsistent = True
+        self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                            base_url=self.base_url)
+        # a later run inserts a commit of a merged branch, which is older than the commits that were repaired
+        user = UserConn(path_to_db=self.db_path).get_user(login='tester')
+        commit = Commit(date=datetime(2018, 6, 1), sha='f' * 40, user=user, comment='branch commit')
+        commit.file_modifications = [FileModification(filename='app.py', additions=3, deletions=1, changes=0,
+                                                      status='modified')]
+        CommitMgr(path_to_db=self.db_path).insert_commits(repository=self.repo,
+                                                          commits=[(commit, [(0, GHEHandler.make_sha(3))])])
+        GHEHandler.requested_comparisons = list()
+        self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                            base_url=self.base_url)
+        self.assertEqual([c.split('...')[-1] for c in GHEHandler.requested_comparisons], [commit.sha])
+        self.assertEqual(self.get_checkpoint(GHEExtractor.REPAIR_PHASE).get('last_id'), commit.commit_id)
+
+    def test_repair_with_blob_store(self):
+        GHEHandler.inconsistent = True
+        GHEHandler.with_files = True
+        self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        # commits are compared one at a time, so the blob of the older commit is known from the previous comparison
+        extractor = GHEExtractor(db_path=self.db_path, num_workers=1, client=self.client, blob_store=self.blob_store)
+        extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                   base_url=self.base_url)
+        # app.py changes every other commit, so each version is downloaded once
+        num_versions = (GHEHandler.num_commits - 1) // 2 + 1
+        self.assertEqual(len(GHEHandler.requested_contents), num_versions)
+        self.assertEqual(self.blob_store.hits, 2 * (GHEHandler.num_commits - 1) - num_versions)
+        commit_mgr = CommitMgr(path_to_db=self.db_path)
+        for i in range(1, GHEHandler.num_commits):
+            fm = commit_mgr.get_commit(sha=GHEHandler.make_sha(i)).file_modifications[0]
+            self.assertEqual((fm.additions, fm.deletions), (1 if i % 2 == 0 else 0, 0))
+
+    def test_repair_concurrently(self):
+        GHEHandler.inconsistent = True
+        GHEHandler.with_files = True
+        self.ghe_extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        self.ghe_extractor._find_and_repair_inconsistencies(repository=self.repo, owner='owner', extensions=['py'],
+                                                            base_url=self.base_url)
+        self.assertEqual(len(GHEHandler.requested_comparisons), GHEHandler.num_commits - 1)
+        # a version may be downloaded twice if the comparison that indexes it has not finished yet
+        self.assertLessEqual(len(GHEHandler.requested_contents), 2 * (GHEHandler.num_commits - 1))
+        # but it is stored once
+        num_versions = (GHEHandler.num_commits - 1) // 2 + 1
+        self.assertEqual(sum(len(names) for _, _, names in os.walk(os.path.join(self.temp_dir.name, 'blobs'))),
+                         num_versions)
+        commit_mgr = CommitMgr(path_to_db=self.db_path)
+        for i in range(1, GHEHandler.num_commits):
+            fm = commit_mgr.get_commit(sha=GHEHandler.make_sha(i)).file_modifications[0]
+            self.assertEqual((fm.additions, fm.deletions), (1 if i % 2 == 0 else 0, 0))
+        self.assertEqual(self.get_checkpoint(GHEExtractor.REPAIR_PHASE).get('status'), MiningCheckpointConn.DONE)
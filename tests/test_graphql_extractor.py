@@ -0,0 +1,143 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.graphql_extractor import GraphQLExtractor
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.mining.ghe_client import GHEClient
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.database_conn import ConnectionPool, RepositoryConn, RepositoryCommitConn, \
+    MiningCheckpointConn, UserConn
+from microservices_miner.control.issue_mgr import IssueMgr
+from microservices_miner.model.repository import Repository
+from tests.test_ghe_extractor import GHEHandler
+from http.server import ThreadingHTTPServer
+import threading
+import tempfile
+import shutil
+import json
+import os
+
+
+class TestGraphQLExtractor(TestCase):
+
+    def setUp(self) -> None:
+        GHEHandler.num_commits = 25
+        GHEHandler.num_issues = 25
+        GHEHandler.inconsistent = False
+        GHEHandler.failing_request = None
+        GHEHandler.failing_repo = None
+        GHEHandler.requested_pages = list()
+        GHEHandler.requested_issue_pages = list()
+        GHEHandler.requested_users = list()
+        GHEHandler.requested_details = list()
+        GHEHandler.graphql_queries = list()
+        GHEHandler.since = None
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GHEHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        SchemaMgr(path_to_db=self.db_path).migrate()
+        self.repo = Repository(name='repo', url='{}/owner/repo'.format(self.base_url))
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        self.client = GHEClient(api_token='secret', max_retries=0)
+        self.extractor = GraphQLExtractor(db_path=self.db_path, client=self.client)
+        self.page_size = GHEExtractor.PAGE_SIZE
+        GHEExtractor.PAGE_SIZE = 10
+
+    def tearDown(self) -> None:
+        GHEExtractor.PAGE_SIZE = self.page_size
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def get_checkpoint(self, phase):
+        return MiningCheckpointConn(path_to_db=self.db_path).get_checkpoint(repository_id=self.repo.repository_id,
+                                                                            phase=phase)
+
+    def assert_all_commits_inserted(self):
+        commit_conn = RepositoryCommitConn(path_to_db=self.db_path)
+        chain = commit_conn.get_first_parent_chain(repository_id=self.repo.repository_id)
+        self.assertEqual([c.sha for c in chain],
+                         [GHEHandler.make_sha(i) for i in range(GHEHandler.num_commits - 1, -1, -1)])
+        # the root commit changed no files
+        self.assertEqual([len(c.file_modifications) for c in chain], [1] * (GHEHandler.num_commits - 1) + [0])
+
+    def test_get_graphql_url(self):
+        self.assertEqual(GraphQLExtractor._get_graphql_url(GHEExtractor.PUBLIC_GITHUB_API),
+                         'https://api.github.com/graphql')
+        self.assertEqual(GraphQLExtractor._get_graphql_url('https://github.ibm.com/api/v3'),
+                         'https://github.ibm.com/api/graphql')
+
+    def test_mine_commits(self):
+        num_commits = self.extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                  api_token=None)
+        self.assertEqual(num_commits, GHEHandler.num_commits)
+        self.assert_all_commits_inserted()
+        # 3 queries list the cursors of the pages and 3 get their commits; the author came with the commits and only
+        # the files of the commits that changed files were requested from the REST API
+        self.assertEqual(len(GHEHandler.graphql_queries), 6)
+        self.assertEqual([q.get('withNodes') for q in GHEHandler.graphql_queries], [False] * 3 + [True] * 3)
+        self.assertEqual(GHEHandler.requested_pages, [])
+        self.assertEqual(GHEHandler.requested_users, [])
+        self.assertEqual(len(GHEHandler.requested_details), GHEHandler.num_commits - 1)
+        self.assertEqual(UserConn(path_to_db=self.db_path).get_user(login='tester-login').email, 'tester@ibm.com')
+        checkpoint = self.get_checkpoint(GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
+
+        # the next run only asks for the commits made since the newest one
+        GHEHandler.num_commits = 30
+        GHEHandler.graphql_queries = list()
+        num_commits = self.extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo,
+                                                  api_token=None)
+        self.assertEqual(GHEHandler.since, GHEHandler.make_date(24))
+        self.assertEqual(len(GHEHandler.graphql_queries), 2)
+        self.assertEqual(num_commits, 6)
+        self.assert_all_commits_inserted()
+
+    def test_resume_commits(self):
+        # the cursors are listed by queries 1-3, then pages are requested from the oldest to the newest one
+        GHEHandler.failing_request = 6
+        with self.assertRaises(AssertionError):
+            self.extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        checkpoint = self.get_checkpoint(GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.RUNNING)
+        position = json.loads(checkpoint.get('page_url'))
+        self.assertEqual(position.get('head'), GHEHandler.make_sha(GHEHandler.num_commits - 1))
+        self.assertEqual(position.get('afters'), [None])
+
+        GHEHandler.failing_request = None
+        GHEHandler.graphql_queries = list()
+        # commits pushed after the first run started are not part of its pages
+        GHEHandler.num_commits = 27
+        self.extractor.mine_commits(base_url=self.base_url, owner='owner', repo=self.repo, api_token=None)
+        self.assertEqual([q.get('after') for q in GHEHandler.graphql_queries], [None])
+        GHEHandler.num_commits = 25
+        self.assert_all_commits_inserted()
+
+    def test_mine_issues(self):
+        num_issues = self.extractor.mine_issues(base_url=self.base_url, owner='owner', repo=self.repo)
+        self.assertEqual(num_issues, 20)
+        self.assertEqual(len(GHEHandler.graphql_queries), 2)
+        self.assertEqual(GHEHandler.requested_issue_pages, [])
+        self.assertEqual(GHEHandler.requested_users, [])
+        issues = IssueMgr(path_to_db=self.db_path).get_issues_by_label(repository_id=self.repo.repository_id)
+        self.assertEqual(len(issues), 20)
+        self.assertEqual({issue.user.login for issue in issues}, {'reporter'})
+        self.assertEqual({issue.state for issue in issues}, {'open'})
+        checkpoint = self.get_checkpoint(GHEExtractor.ISSUES_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
+        self.assertEqual(checkpoint.get('last_date'), GHEHandler.make_date(23))
+
+        # the next run only asks for the issues updated since the most recently updated one
+        GHEHandler.graphql_queries = list()
+        self.extractor.mine_issues(base_url=self.base_url, owner='owner', repo=self.repo)
+        self.assertEqual([q.get('since') for q in GHEHandler.graphql_queries], [GHEHandler.make_date(23)])
+        self.assertEqual(len(IssueMgr(path_to_db=self.db_path).get_issues_by_label(self.repo.repository_id)), 20)
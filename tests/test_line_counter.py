@@ -0,0 +1,80 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.control.line_counter import LineCounter
+from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.database_conn import ConnectionPool
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+import random
+import tempfile
+import shutil
+import os
+
+
+class TestLineCounter(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.chunk_size = LineCounter.CHUNK_SIZE
+
+    def tearDown(self) -> None:
+        LineCounter.CHUNK_SIZE = self.chunk_size
+        self.temp_dir.cleanup()
+
+    def write(self, content, name='file'):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_count_lines(self):
+        self.assertEqual(LineCounter.count_lines(self.write(b'')), 0)
+        self.assertEqual(LineCounter.count_lines(self.write(b'\n')), 1)
+        self.assertEqual(LineCounter.count_lines(self.write(b'a\nb\n')), 2)
+        self.assertEqual(LineCounter.count_lines(self.write(b'a\nb')), 2)
+        self.assertEqual(LineCounter.count_lines(self.write(b'a\r\nb\r\n')), 2)
+        # bytes that are not UTF-8
+        self.assertEqual(LineCounter.count_lines(self.write(b'\xff\xfe\n\x80')), 2)
+        self.assertEqual(GHEExtractor._count_loc(self.write(b'a\nb\nc')), 3)
+
+    def test_same_as_readlines(self):
+        LineCounter.CHUNK_SIZE = 7
+        rnd = random.Random(42)
+        for _ in range(100):
+            content = ''.join(rnd.choice(['a', 'b', ' ', '\n']) for _ in range(rnd.randint(0, 50)))
+            path = self.write(content.encode())
+            with open(path) as f:
+                self.assertEqual(LineCounter.count_lines(path), len(f.readlines()))
+
+    def test_count_code_lines(self):
+        python = b'#!/usr/bin/env python\n"""\ndocstring\n"""\n\nimport os  # comment\n  \n' \
+                 b'def f():\n    """one line"""\n    # comment\n    return 1\n'
+        self.assertEqual(LineCounter.count_code_lines(self.write(python), language='Python'), 3)
+        java = b'/**\n * doc\n */\npublic class A {\n    // comment\n    int a; /* comment */\n' \
+               b'    /* comment */ int b;\n    /* a\n     b */\n}\n'
+        self.assertEqual(LineCounter.count_code_lines(self.write(java), language='Java'), 4)
+        # only blank lines are skipped when the syntax is unknown
+        self.assertEqual(LineCounter.count_code_lines(self.write(b'# a\n\n// b\n'), language='Unknown'), 2)
+        self.assertEqual(LineCounter.count_code_lines(self.write(b'# a\n\n// b\n')), 2)
+
+    def test_count_loc(self):
+        db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), db_path)
+        conn = ConnectionPool.connect(db_path)
+        with conn:
+            conn.execute("insert into extensions(value, language) values ('py', 'Python');")
+            conn.execute("insert into extensions(value, language) values ('java', 'Java');")
+        try:
+            FileSystemMgr(db_path=db_path).invalidate_filters()
+            line_counter = LineCounter(db_path=db_path)
+            # a blob has no extension, so its language is given by its filename in the repository
+            path = self.write(b'# comment\nx = 1\n\n// y\n', name='blob')
+            self.assertEqual(line_counter.count_loc(path), 4)
+            self.assertEqual(line_counter.count_loc(path, filename='src/app.py', skip_comments=True), 2)
+            self.assertEqual(line_counter.count_loc(path, filename='src/App.java', skip_comments=True), 2)
+            self.assertEqual(line_counter.count_loc(path, filename='README.md', skip_comments=True), 3)
+        finally:
+            ConnectionPool.get_pool(db_path).close()
@@ -0,0 +1,101 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.line_diff import LineDiff
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+import difflib
+import random
+import tempfile
+import os
+
+
+class TestLineDiff(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        return path
+
+    def count(self, older, newer):
+        return LineDiff.count_changes(older_filename=self.write('older', older),
+                                      newer_filename=self.write('newer', newer))
+
+    @staticmethod
+    def count_with_differ(older_lines, newer_lines):
+        diff = list(difflib.Differ().compare(older_lines, newer_lines))
+        return sum(1 for d in diff if d.startswith('+')), sum(1 for d in diff if d.startswith('-'))
+
+    def test_count_changes(self):
+        self.assertEqual(self.count('a\nb\nc\n', 'a\nb\nc\n'), (0, 0))
+        self.assertEqual(self.count('', 'a\nb\n'), (2, 0))
+        self.assertEqual(self.count('a\nb\n', ''), (0, 2))
+        self.assertEqual(self.count('a\nb\nc\n', 'a\nB\nc\nd\n'), (2, 1))
+        # the last line changes when a newline is added to it
+        self.assertEqual(self.count('a\nb', 'a\nb\nc\n'), (2, 1))
+        # line endings are not changes
+        self.assertEqual(self.count('a\r\nb\r\n', 'a\nb\n'), (0, 0))
+        self.assertEqual(self.count('x\na\nb\n', 'a\nb\nx\n'), (1, 1))
+
+    def test_diff_files(self):
+        older = self.write('older', 'a\nb\nc\n')
+        newer = self.write('newer', 'c\nb\na\n')
+        self.assertEqual(GHEExtractor._diff_files(older_filename=older, newer_filename=newer), (2, 2))
+
+    def test_same_counts_as_differ(self):
+        rnd = random.Random(42)
+        num_equal = 0
+        for _ in range(200):
+            # unique lines, blank lines and closing braces, like in source code
+            older_lines = [rnd.choice(['\n', '}\n', 'line {}\n'.format(i)]) for i in range(rnd.randint(0, 100))]
+            newer_lines = list(older_lines)
+            for _ in range(rnd.randint(1, 5)):
+                pos = rnd.randint(0, len(newer_lines))
+                size = rnd.randint(1, 4)
+                kind = rnd.randint(0, 2)
+                if kind == 0:
+                    newer_lines[pos:pos + size] = [line.replace('1', '2') for line in newer_lines[pos:pos + size]]
+                elif kind == 1:
+                    newer_lines[pos:pos] = ['new {}\n'.format(rnd.random()), '\n'] * size
+                else:
+                    del newer_lines[pos:pos + size]
+            additions, deletions = LineDiff.count_line_changes(older_lines=older_lines, newer_lines=newer_lines)
+            self.assertEqual(additions - deletions, len(newer_lines) - len(older_lines))
+            if (additions, deletions) == TestLineDiff.count_with_differ(older_lines, newer_lines):
+                num_equal += 1
+        # both are minimal diffs only where lines are unique, so a few blank lines or braces may be aligned differently
+        self.assertGreaterEqual(num_equal, 190)
+
+    def test_repeated_lines(self):
+        rnd = random.Random(42)
+        for _ in range(200):
+            older_lines = [str(rnd.randint(0, 5)) for _ in range(rnd.randint(0, 60))]
+            newer_lines = [line for line in older_lines if rnd.random() < 0.9] + [str(rnd.randint(0, 5))]
+            # the alignment may differ from the one of Differ, but not the net change
+            additions, deletions = LineDiff.count_line_changes(older_lines=older_lines, newer_lines=newer_lines)
+            self.assertEqual(additions - deletions, len(newer_lines) - len(older_lines))
+            self.assertLessEqual(additions, len(newer_lines))
+
+    def test_anchors(self):
+        older_lines = ['a', 'x', 'b', 'c', 'x', 'd']
+        newer_lines = ['c', 'a', 'b', 'x', 'd']
+        # x is not unique and c is out of order
+        self.assertEqual(LineDiff._get_anchors(older_lines, newer_lines), [(0, 1), (2, 2), (5, 4)])
+        self.assertEqual(LineDiff.count_line_changes(older_lines=older_lines, newer_lines=newer_lines), (1, 2))
+
+    def test_anchor_splits_repeated_lines(self):
+        older_lines = ['l0', 'l1', 'l0', 'l1', 'l3']
+        newer_lines = ['l3', 'l0', 'l1']
+        # the anchor on l3 gives up the match of l0, l1, which Differ finds
+        self.assertEqual(LineDiff._get_anchors(older_lines, newer_lines), [(4, 0)])
+        self.assertEqual(LineDiff.count_line_changes(older_lines=older_lines, newer_lines=newer_lines), (1, 3))
+        self.assertEqual(TestLineDiff.count_with_differ(older_lines, newer_lines), (1, 3))
@@ -0,0 +1,305 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from datetime import datetime, date, timedelta
+from microservices_miner.control.loc_timeline_mgr import LocTimelineMgr
+from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.control.data_mgr import DataMgr
+from microservices_miner.control.service_mgr import ServiceMgr
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.filesystem_mgr import FileSystemMgr
+from microservices_miner.control.database_conn import RepositoryConn, UserConn, ConnectionPool, LocTimelineConn, \
+    FileModificationConn, ServiceRepositoryConn, ConnectionProfile
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.model.git_commit import Commit
+from microservices_miner.model.file_modification import FileModification
+from microservices_miner.model.repository import Repository
+from microservices_miner.model.user import User
+import tempfile
+import shutil
+import os
+
+
+class CountingLocTimelineMgr(LocTimelineMgr):
+    """
+    counts the checks of the dates and rules of the timelines
+    """
+
+    def __init__(self, db_path):
+        super().__init__(db_path=db_path)
+        self.num_checks = 0
+
+    def _is_up_to_date(self, service_id, repository_id):
+        self.num_checks += 1
+        return super()._is_up_to_date(service_id=service_id, repository_id=repository_id)
+
+
+class CountingLocTimelineConn(LocTimelineConn):
+    """
+    counts the recomputations of the running values of the timelines
+    """
+
+    def __init__(self, path_to_db):
+        super().__init__(path_to_db=path_to_db)
+        self.num_updates = 0
+
+    def _update_running(self, service_id, repository_id, from_date='', from_position=0):
+        self.num_updates += 1
+        return super()._update_running(service_id=service_id, repository_id=repository_id, from_date=from_date,
+                                       from_position=from_position)
+
+
+class TestLocTimeline(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        SchemaMgr(self.db_path).migrate()
+
+        service_mgr = ServiceMgr(db_path=self.db_path)
+        self.service_id = service_mgr.insert_service(name='timeline-service', start_date_str='2018-01-01')
+        conn = ConnectionPool.connect(self.db_path)
+        with conn:
+            conn.execute("insert into extensions(value, language) values ('py', 'Python');")
+        FileSystemMgr(db_path=self.db_path).insert_extensions(service_id=self.service_id,
+                                                              programming_languages=['Python'])
+        self.repo = Repository(name='timeline-repo', url='https://github.com/owner/timeline-repo')
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        service_mgr.insert_service_repository(service_name='timeline-service', repository_id=self.repo.repository_id,
+                                              start_date='2018-02-01', initial_loc=None)
+        self.user = User(name='Timeline Tester', email='timeline@ibm.com', login='timeline')
+        self.user.user_id = UserConn(path_to_db=self.db_path).insert_user(self.user)
+        self.commit_mgr = CommitMgr(path_to_db=self.db_path)
+        self.timeline_mgr = LocTimelineMgr(db_path=self.db_path)
+        self.shas = list()
+        self.insert_commits(start=datetime(2018, 1, 1), num_commits=30, parent_sha='0' * 40)
+
+    def tearDown(self) -> None:
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def make_commit(self, commit_date, i):
+        sha = '{:040x}'.format(int(commit_date.timestamp()) * 1000 + i)
+        commit = Commit(date=commit_date, sha=sha, user=self.user, comment='change {}'.format(i))
+        commit.file_modifications = [
+            FileModification(filename='src/app.py', additions=10 + i, deletions=i, changes=10 + 2 * i,
+                             status='modified'),
+            FileModification(filename='README.md', additions=7, deletions=0, changes=7, status='modified'),
+            FileModification(filename='src/app_BASE_.py', additions=5, deletions=5, changes=10, status='modified')]
+        return commit
+
+    def insert_commits(self, start, num_commits, parent_sha):
+        commits = list()
+        for i in range(num_commits):
+            commit = self.make_commit(start + timedelta(days=2 * i), i)
+            commits.append((commit, [(0, parent_sha)]))
+            parent_sha = commit.sha
+            self.shas.append(commit.sha)
+        self.commit_mgr.insert_commits(repository=self.repo, commits=commits)
+
+    def get_expected(self):
+        service = ServiceMgr(db_path=self.db_path).get_service(service_id=self.service_id)
+        repository, _, _ = service.get_repository(repository_name=self.repo.name)
+        return DataMgr.compute_loc_per_repository(repository=repository)
+
+    def get_actual(self):
+        return self.timeline_mgr.get_loc_per_repository(service_id=self.service_id,
+                                                        repository_id=self.repo.repository_id)
+
+    def test_build(self):
+        self.assertEqual(self.timeline_mgr.build(service_id=self.service_id), 1)
+        self.assertEqual(self.timeline_mgr.build(service_id=self.service_id), 0)
+        loc_list, sha_list, date_list = self.get_actual()
+        # the commits before the start_date of the repository are not part of the service, and only src/app.py
+        # passes the extension and pattern rules, which adds 10 lines per commit
+        self.assertEqual(sha_list, self.shas[16:])
+        self.assertEqual(loc_list, [10 * i for i in range(1, 15)])
+        self.assertEqual((loc_list, sha_list, date_list), self.get_expected())
+
+    def test_append_commits(self):
+        self.timeline_mgr.build(service_id=self.service_id)
+        self.insert_commits(start=datetime(2018, 3, 1), num_commits=5, parent_sha=self.shas[-1])
+        commit = self.make_commit(datetime(2018, 4, 1), 5)
+        self.commit_mgr.insert_commit(repository=self.repo, commit=commit, parent_commit_shas=[(0, self.shas[-1])])
+        self.shas.append(commit.sha)
+        # the commits were appended at ingest time, so the timeline is not built again
+        self.assertEqual(self.timeline_mgr.build(service_id=self.service_id), 0)
+        loc_list, sha_list, _ = self.get_actual()
+        self.assertEqual(sha_list, self.shas[16:])
+        self.assertEqual(loc_list[-1], 10 * 20)
+        self.assertEqual(self.get_actual(), self.get_expected())
+
+    def test_branch(self):
+        self.timeline_mgr.build(service_id=self.service_id)
+        # a merge of a branch that starts at an older commit becomes the head of the chain of first parents
+        self.insert_commits(start=datetime(2018, 3, 1), num_commits=3, parent_sha=self.shas[25])
+        loc_list, sha_list, _ = self.get_actual()
+        self.assertEqual(sha_list, self.shas[16:26] + self.shas[30:])
+        self.assertEqual(loc_list[-1], 10 * 13)
+        self.assertEqual(self.get_actual(), self.get_expected())
+
+    def test_repair(self):
+        self.timeline_mgr.build(service_id=self.service_id)
+        commit_id = self.commit_mgr.repo_commit_conn.get_commit_and_its_filemodifications_by_sha(self.shas[20]) \
+            .commit_id
+        fm = FileModification(filename='src/app.py', additions=30, deletions=1000, changes=1030, status='modified')
+        fm_conn = FileModificationConn(path_to_db=self.db_path)
+        fm_conn.update_filemodification(filemodification=fm, commit_id=commit_id)
+        other_commit_id = self.commit_mgr.repo_commit_conn.get_commit_and_its_filemodifications_by_sha(
+            self.shas[24]).commit_id
+        fm = FileModification(filename='src/app.py', additions=15, deletions=0, changes=15, status='modified')
+        fm_conn.update_filemodification(filemodification=fm, commit_id=other_commit_id)
+        # the timeline is recomputed once per batch of repairs, from its oldest repaired commit
+        loc_list, _, _ = self.get_actual()
+        self.assertEqual(loc_list[3:6], [40, 50, 60])
+        timeline_conn = CountingLocTimelineConn(path_to_db=self.db_path)
+        timeline_conn.recompute_commits(commit_ids=[other_commit_id, commit_id, commit_id])
+        self.assertEqual(timeline_conn.num_updates, 1)
+        loc_list, _, _ = self.get_actual()
+        # LOC is never negative
+        self.assertEqual(loc_list[3:6], [40, 0, 10])
+        self.assertEqual(self.get_actual(), self.get_expected())
+
+    def test_get_loc(self):
+        repository_id = self.repo.repository_id
+        # the timeline is built by the miners, not by the queries
+        with self.assertRaises(AssertionError):
+            self.timeline_mgr.get_loc(self.service_id, repository_id, datetime(2018, 1, 15))
+        self.timeline_mgr = LocTimelineMgr(db_path=self.db_path)
+        self.timeline_mgr.build(service_id=self.service_id)
+        self.assertEqual(self.timeline_mgr.get_loc(self.service_id, repository_id, datetime(2018, 1, 15)), 0)
+        self.assertEqual(self.timeline_mgr.get_loc(self.service_id, repository_id, datetime(2018, 2, 2)), 10)
+        self.assertEqual(self.timeline_mgr.get_loc(self.service_id, repository_id, date(2018, 2, 4)), 20)
+        self.assertEqual(self.timeline_mgr.get_loc(self.service_id, repository_id, '2018-02-05T12:00:00'), 20)
+        self.assertEqual(self.timeline_mgr.get_loc(self.service_id, repository_id, datetime(2019, 1, 1)), 140)
+
+    def test_rules_changed(self):
+        self.timeline_mgr.build(service_id=self.service_id)
+        FileSystemMgr(db_path=self.db_path).insert_pattern(pattern='src/', pattern_type=FileSystemMgr.EXCLUSION,
+                                                           service_id=self.service_id,
+                                                           repository_id=self.repo.repository_id)
+        self.assertEqual(self.timeline_mgr.build(service_id=self.service_id), 1)
+        loc_list, _, _ = self.get_actual()
+        self.assertEqual(set(loc_list), {0})
+        self.assertEqual(self.get_actual(), self.get_expected())
+        # the rules are stored, not the SQL they are turned into
+        timeline_conn = LocTimelineConn(path_to_db=self.db_path)
+        pair = timeline_conn.get_pair(service_id=self.service_id, repository_id=self.repo.repository_id)
+        self.assertEqual(pair.get('extensions'), ['py'])
+        self.assertEqual(pair.get('including_patterns'), [])
+        self.assertIn('src/', pair.get('excluding_patterns'))
+        ServiceRepositoryConn(path_to_db=self.db_path).delete_service_repo(service_id=self.service_id)
+        self.assertIsNone(timeline_conn.get_pair(service_id=self.service_id, repository_id=self.repo.repository_id))
+
+    def test_check_once(self):
+        timeline_mgr = CountingLocTimelineMgr(db_path=self.db_path)
+        repository_id = self.repo.repository_id
+        timeline_mgr.build(service_id=self.service_id)
+        for day in range(1, 29):
+            timeline_mgr.get_loc(self.service_id, repository_id, datetime(2018, 2, day))
+        timeline_mgr.get_loc_per_repository(service_id=self.service_id, repository_id=repository_id)
+        self.assertEqual(timeline_mgr.num_checks, 1)
+        # a new manager checks the timeline the first time it is used
+        timeline_mgr = CountingLocTimelineMgr(db_path=self.db_path)
+        self.assertEqual(timeline_mgr.get_loc(self.service_id, repository_id, datetime(2019, 1, 1)), 140)
+        timeline_mgr.get_loc(self.service_id, repository_id, datetime(2018, 3, 1))
+        self.assertEqual(timeline_mgr.num_checks, 1)
+
+    def add_other_service(self):
+        """
+        adds the same repository to a second service, with an initial LOC
+
+        Returns
+        -------
+        int
+            ID of the service
+        """
+        service_mgr = ServiceMgr(db_path=self.db_path)
+        service_id = service_mgr.insert_service(name='other-service', start_date_str='2018-01-01')
+        FileSystemMgr(db_path=self.db_path).insert_extensions(service_id=service_id, programming_languages=['Python'])
+        service_mgr.insert_service_repository(service_name='other-service', repository_id=self.repo.repository_id,
+                                              start_date='2018-02-10', initial_loc=1000)
+        return service_id
+
+    def assert_same_loc(self, loc_timeline_mgr, service_ids, from_timelines):
+        """
+        checks that DataMgr gives the same LOC with and without the timelines
+
+        Parameters
+        ----------
+        loc_timeline_mgr: LocTimelineMgr
+        service_ids: list of int
+        from_timelines: bool
+            whether the timelines are expected to be current
+
+        Returns
+        -------
+        None
+        """
+        service_mgr = ServiceMgr(db_path=loc_timeline_mgr.db_path)
+        for service_id in service_ids:
+            service = service_mgr.get_service(service_id=service_id)
+            self.assertEqual(loc_timeline_mgr.is_service_current(service), from_timelines)
+            repository, _, _ = service.get_repository(repository_name=self.repo.name)
+            self.assertEqual(DataMgr.compute_loc_per_repository(repository=repository, service_id=service_id,
+                                                                loc_timeline_mgr=loc_timeline_mgr),
+                             DataMgr.compute_loc_per_repository(repository=repository))
+            for days in (1, 3, 10):
+                # some commits fall exactly on the limits of the time bins
+                time_bins = tuple(datetime(2018, 1, 1) + timedelta(days=days) * i for i in range(100 // days))
+                self.assertEqual(DataMgr.compute_loc(service, time_bins, loc_timeline_mgr=loc_timeline_mgr),
+                                 DataMgr.compute_loc(service, time_bins))
+
+    def test_data_mgr(self):
+        other_service_id = self.add_other_service()
+        for name in ('timeline-service', 'other-service'):
+            self.assertEqual(GHEExtractor.build_loc_timelines(service_description={'name': name},
+                                                              db_path=self.db_path), 1)
+        self.assert_same_loc(loc_timeline_mgr=LocTimelineMgr(db_path=self.db_path),
+                             service_ids=[self.service_id, other_service_id], from_timelines=True)
+
+    def test_read_only(self):
+        other_service_id = self.add_other_service()
+        self.timeline_mgr.build(service_id=self.service_id)
+        FileSystemMgr(db_path=self.db_path).insert_pattern(pattern='_BASE_', pattern_type=FileSystemMgr.INCLUSION,
+                                                           service_id=self.service_id,
+                                                           repository_id=self.repo.repository_id)
+        read_only_pool = ConnectionPool.get_pool(self.db_path, profile=ConnectionProfile.READ_ONLY)
+        try:
+            # analytics open the database with the read-only profile
+            self.assertIs(DataMgr(db_path=self.db_path).db_path, read_only_pool)
+            self.assertIs(ServiceMgr(db_path=self.db_path).read_db_path, read_only_pool)
+            # the timeline of the first service is out of date and the other one is missing; neither is built
+            self.assert_same_loc(loc_timeline_mgr=LocTimelineMgr(db_path=read_only_pool),
+                                 service_ids=[self.service_id, other_service_id], from_timelines=False)
+            self.assertEqual(self.timeline_mgr.build(service_id=self.service_id), 1)
+            self.assertEqual(self.timeline_mgr.build(service_id=other_service_id), 1)
+            self.assert_same_loc(loc_timeline_mgr=LocTimelineMgr(db_path=read_only_pool),
+                                 service_ids=[self.service_id, other_service_id], from_timelines=True)
+        finally:
+            read_only_pool.close()
+
+    def test_inconsistent_changes(self):
+        self.timeline_mgr.build(service_id=self.service_id)
+        commit_id = self.commit_mgr.repo_commit_conn.get_commit_and_its_filemodifications_by_sha(self.shas[20]) \
+            .commit_id
+        fm = FileModification(filename='src/app.py', additions=30, deletions=1, changes=0, status='modified')
+        FileModificationConn(path_to_db=self.db_path).update_filemodification(filemodification=fm, commit_id=commit_id)
+        LocTimelineConn(path_to_db=self.db_path).recompute_commits(commit_ids=[commit_id])
+        loc_timeline_mgr = LocTimelineMgr(db_path=self.db_path)
+        service = ServiceMgr(db_path=self.db_path).get_service(service_id=self.service_id)
+        self.assertTrue(loc_timeline_mgr.is_service_current(service))
+        # the commit of 2018-02-10 is checked only by the time bins that count it, by both sources of LOC
+        time_bins = tuple(datetime(2018, 1, 1) + timedelta(days=i) for i in range(41))
+        self.assertEqual(DataMgr.compute_loc(service, time_bins, loc_timeline_mgr=loc_timeline_mgr),
+                         DataMgr.compute_loc(service, time_bins))
+        time_bins = tuple(datetime(2018, 1, 1) + timedelta(days=i) for i in range(42))
+        with self.assertRaises(AssertionError) as expected:
+            DataMgr.compute_loc(service, time_bins)
+        with self.assertRaises(AssertionError) as actual:
+            DataMgr.compute_loc(service, time_bins, loc_timeline_mgr=loc_timeline_mgr)
+        self.assertEqual(str(actual.exception), str(expected.exception))
@@ -0,0 +1,165 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.local_git_extractor import LocalGitExtractor
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.commit_mgr import CommitMgr
+from microservices_miner.control.database_conn import ConnectionPool, RepositoryConn, RepositoryCommitConn, \
+    MiningCheckpointConn, UserConn
+from microservices_miner.model.repository import Repository
+import subprocess
+import tempfile
+import shutil
+import os
+
+
+class FailingExtractor(LocalGitExtractor):
+
+    # number of pages that are inserted before the insertion fails
+    num_pages = None
+
+    def _insert_commit_data_into_database(self, base_url, commit_list, repo, owner, api_token):
+        if FailingExtractor.num_pages == 0:
+            raise AssertionError('Error! insertion failed')
+        FailingExtractor.num_pages -= 1
+        super()._insert_commit_data_into_database(base_url=base_url, commit_list=commit_list, repo=repo, owner=owner,
+                                                  api_token=api_token)
+
+
+class TestLocalGitExtractor(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        SchemaMgr(path_to_db=self.db_path).migrate()
+        self.source = os.path.join(self.temp_dir.name, 'source', 'owner', 'repo')
+        os.makedirs(self.source)
+        self.num_commits = 0
+        self.git('init', '--quiet', '--initial-branch=master')
+        self.repo = Repository(name='repo', url='https://github.com/owner/repo')
+        self.repo.repository_id = RepositoryConn(path_to_db=self.db_path).insert_repository(self.repo)
+        clone_url_template = os.path.join(self.temp_dir.name, 'source', '{owner}', '{repo}')
+        self.extractor = LocalGitExtractor(db_path=self.db_path, mirror_dir=os.path.join(self.temp_dir.name, 'mirrors'),
+                                           clone_url_template=clone_url_template)
+        self.page_size = GHEExtractor.PAGE_SIZE
+        GHEExtractor.PAGE_SIZE = 3
+
+    def tearDown(self) -> None:
+        GHEExtractor.PAGE_SIZE = self.page_size
+        self.extractor.client.close()
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def git(self, *args):
+        # the n-th commit is made at n o'clock in UTC+2
+        date = '2019-01-01T{:02d}:00:00+02:00'.format(self.num_commits)
+        env = dict(os.environ, GIT_AUTHOR_NAME='Local Tester', GIT_AUTHOR_EMAIL='local.tester@ibm.com',
+                   GIT_COMMITTER_NAME='Local Tester', GIT_COMMITTER_EMAIL='local.tester@ibm.com',
+                   GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        return subprocess.run(['git', '-C', self.source] + list(args), env=env, check=True,
+                              stdout=subprocess.PIPE).stdout.decode().strip()
+
+    def write(self, filename, content, mode='w'):
+        path = os.path.join(self.source, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode) as f:
+            f.write(content)
+
+    def commit(self, message):
+        self.num_commits += 1
+        self.git('add', '--all')
+        self.git('commit', '--quiet', '-m', message)
+        return self.git('rev-parse', 'HEAD')
+
+    def make_history(self):
+        self.write('app.py', 'a\nb\nc\n')
+        self.write('logo.png', b'\x89PNG\x00\x01', mode='wb')
+        shas = [self.commit('add app')]
+        self.write('app.py', 'a\nB\nc\nd\n')
+        shas.append(self.commit('change app'))
+        os.makedirs(os.path.join(self.source, 'src'))
+        self.git('mv', 'app.py', 'src/main.py')
+        shas.append(self.commit('move app'))
+        self.git('checkout', '--quiet', '-b', 'feature')
+        self.write('feature.py', 'x\ny\n')
+        shas.append(self.commit('add feature'))
+        self.git('checkout', '--quiet', 'master')
+        self.write('README.md', 'readme\n')
+        shas.append(self.commit('add readme'))
+        self.num_commits += 1
+        self.git('merge', '--quiet', '--no-ff', '-m', 'merge feature', 'feature')
+        shas.append(self.git('rev-parse', 'HEAD'))
+        return shas
+
+    def mine(self, extractor=None):
+        extractor = extractor if extractor is not None else self.extractor
+        return extractor.mine_commits(base_url=GHEExtractor.PUBLIC_GITHUB_API, owner='owner', repo=self.repo,
+                                      api_token=None)
+
+    def get_commits(self):
+        commit_conn = RepositoryCommitConn(path_to_db=self.db_path)
+        return {c.sha: c for c in commit_conn.get_commits_by_repo(repository_id=self.repo.repository_id)}
+
+    def test_get_clone_url(self):
+        extractor = LocalGitExtractor(db_path=self.db_path, client=self.extractor.client)
+        self.assertEqual(extractor._get_clone_url(base_url=GHEExtractor.PUBLIC_GITHUB_API, owner='owner',
+                                                  repo_name='repo'), 'https://github.com/owner/repo.git')
+        self.assertEqual(extractor._get_clone_url(base_url='https://github.ibm.com/api/v3', owner='owner',
+                                                  repo_name='repo'), 'https://github.ibm.com/owner/repo.git')
+
+    def test_mine_commits(self):
+        shas = self.make_history()
+        self.assertEqual(self.mine(), len(shas))
+        self.assertTrue(os.path.isdir(os.path.join(self.temp_dir.name, 'mirrors', 'owner', 'repo.git')))
+        commits = self.get_commits()
+        self.assertEqual(set(commits.keys()), set(shas))
+        commit_mgr = CommitMgr(path_to_db=self.db_path)
+        files = {sha: {(fm.filename, fm.status, fm.additions, fm.deletions)
+                       for fm in commit_mgr.get_commit(sha=sha).file_modifications} for sha in shas}
+        # binary files have no lines
+        self.assertEqual(files[shas[0]], {('app.py', 'added', 3, 0), ('logo.png', 'added', 0, 0)})
+        self.assertEqual(files[shas[1]], {('app.py', 'modified', 2, 1)})
+        self.assertEqual(files[shas[2]], {('src/main.py', 'renamed', 0, 0)})
+        # the merge commit is compared to its first parent
+        self.assertEqual(files[shas[5]], {('feature.py', 'added', 2, 0)})
+        self.assertEqual(commits[shas[1]].date.isoformat(), '2019-01-01T00:00:00')
+        self.assertEqual(commits[shas[1]].user.login, 'local.tester')
+        self.assertEqual(UserConn(path_to_db=self.db_path).get_user(login='local.tester').email,
+                         'local.tester@ibm.com')
+        # the last commit of the branch was the last one to be inserted
+        chain = RepositoryCommitConn(path_to_db=self.db_path).get_first_parent_chain(
+            repository_id=self.repo.repository_id)
+        self.assertEqual([c.sha for c in chain], [shas[5], shas[4], shas[2], shas[1], shas[0]])
+
+        # the next run fetches the mirror and only lists the commits that were not mined
+        self.write('README.md', 'readme\nmore\n')
+        new_sha = self.commit('change readme')
+        self.assertEqual(self.mine(), 1)
+        self.assertIn(new_sha, self.get_commits())
+        checkpoint = MiningCheckpointConn(path_to_db=self.db_path).get_checkpoint(
+            repository_id=self.repo.repository_id, phase=GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
+        self.assertEqual(checkpoint.get('last_sha'), new_sha)
+        self.assertEqual(self.mine(), 0)
+
+    def test_resume_commits(self):
+        shas = self.make_history()
+        extractor = FailingExtractor(db_path=self.db_path, client=self.extractor.client,
+                                     mirror_dir=self.extractor.mirror_dir,
+                                     clone_url_template=self.extractor.clone_url_template)
+        FailingExtractor.num_pages = 1
+        with self.assertRaises(AssertionError):
+            self.mine(extractor)
+        self.assertEqual(len(self.get_commits()), 3)
+        checkpoint = MiningCheckpointConn(path_to_db=self.db_path).get_checkpoint(
+            repository_id=self.repo.repository_id, phase=GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.RUNNING)
+
+        # only the commits after the checkpoint are listed
+        self.assertEqual(self.mine(), 3)
+        self.assertEqual(set(self.get_commits().keys()), set(shas))
@@ -0,0 +1,140 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.orchestrator import MiningOrchestrator
+from microservices_miner.control.loc_timeline_mgr import LocTimelineMgr
+from microservices_miner.mining.ghe_extractor import GHEExtractor
+from microservices_miner.mining.ghe_client import GHEClient
+from microservices_miner.mining.rate_limiter import RateLimiter
+from microservices_miner.control.database_conn import ConnectionPool, ConnectionProfile, RepositoryConn, \
+    RepositoryCommitConn, MiningCheckpointConn, ServiceConn
+from tests.test_ghe_extractor import GHEHandler
+from http.server import ThreadingHTTPServer
+import threading
+import tempfile
+import shutil
+import time
+import os
+
+
+class ConcurrencyHandler(GHEHandler):
+    """
+    GHEHandler that records the maximum number of requests it served at once
+    """
+
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with ConcurrencyHandler.lock:
+            ConcurrencyHandler.in_flight += 1
+            ConcurrencyHandler.max_in_flight = max(ConcurrencyHandler.max_in_flight, ConcurrencyHandler.in_flight)
+        try:
+            time.sleep(0.002)
+            super().do_GET()
+        finally:
+            with ConcurrencyHandler.lock:
+                ConcurrencyHandler.in_flight -= 1
+
+
+class LocalClient(GHEClient):
+    """
+    sends the requests to the public GitHub API to the fixture server instead
+    """
+
+    def __init__(self, base_url, **kwargs):
+        super().__init__(api_token='secret', max_retries=0, **kwargs)
+        self.base_url = base_url
+
+    def get(self, url, params=None, api_token=None, allow_redirects=False):
+        url = url.replace(GHEExtractor.PUBLIC_GITHUB_API, self.base_url)
+        return super().get(url=url, params=params, api_token=api_token, allow_redirects=allow_redirects)
+
+
+class TestMiningOrchestrator(TestCase):
+
+    def setUp(self) -> None:
+        GHEHandler.num_commits = 15
+        GHEHandler.num_issues = 5
+        GHEHandler.inconsistent = False
+        GHEHandler.failing_request = None
+        GHEHandler.failing_repo = None
+        ConcurrencyHandler.in_flight = 0
+        ConcurrencyHandler.max_in_flight = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ConcurrencyHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        shutil.copy(os.getenv('DB_PATH'), self.db_path)
+        self.page_size = GHEExtractor.PAGE_SIZE
+        GHEExtractor.PAGE_SIZE = 10
+        self.service_list = list()
+        for k in range(2):
+            repositories = [{'name': 'repo-{}-{}'.format(k, i), 'owner': 'owner',
+                             'url': 'https://github.com/owner/repo-{}-{}'.format(k, i), 'start_date': '2019-01-01',
+                             'end_date': None, 'initial_loc': 0} for i in range(3)]
+            self.service_list.append({'name': 'orchestrated-service-{}'.format(k), 'start_date': '2019-01-01',
+                                      'end_date': None, 'programming_languages': ['python'],
+                                      'repositories': repositories})
+
+    def tearDown(self) -> None:
+        GHEExtractor.PAGE_SIZE = self.page_size
+        self.server.shutdown()
+        self.server.server_close()
+        for profile in (ConnectionProfile.DEFAULT, ConnectionProfile.BULK_LOAD):
+            ConnectionPool.get_pool(self.db_path, profile=profile).close()
+        self.temp_dir.cleanup()
+
+    def make_orchestrator(self, max_requests_per_host):
+        return MiningOrchestrator(db_path=self.db_path, num_repository_workers=3, num_workers=2,
+                                  max_requests_per_host=max_requests_per_host,
+                                  rate_limiter=RateLimiter(requests_per_second=1000, burst=100),
+                                  client_factory=lambda **kwargs: LocalClient(base_url=self.base_url, **kwargs))
+
+    def get_repository(self, name):
+        repo_url = '{}/owner/{}'.format(GHEExtractor.PUBLIC_GITHUB_API, name)
+        return RepositoryConn(path_to_db=self.db_path).get_repository_by_url(url=repo_url)
+
+    def test_run(self):
+        orchestrator = self.make_orchestrator(max_requests_per_host=2)
+        progress = orchestrator.run(service_list=self.service_list)
+        self.assertEqual(progress.num_done, 6)
+        self.assertEqual(progress.num_failed, 0)
+        self.assertEqual(progress.num_commits, 6 * GHEHandler.num_commits)
+        # every repository is mined by one of the threads of the pool, which keep their own extractor
+        self.assertGreater(len(orchestrator._extractors), 1)
+        self.assertLessEqual(len(orchestrator._extractors), 3)
+        self.assertLessEqual(ConcurrencyHandler.max_in_flight, 2)
+        commit_conn = RepositoryCommitConn(path_to_db=self.db_path)
+        for s in self.service_list:
+            for rep in s.get('repositories'):
+                repo = self.get_repository(rep.get('name'))
+                commits = commit_conn.get_commits_by_repo(repository_id=repo.repository_id)
+                self.assertEqual(sorted(c.sha for c in commits),
+                                 sorted(GHEHandler.make_sha(i, rep.get('name')) for i in range(GHEHandler.num_commits)))
+        # the LOC timelines are built by the run, so that analytics do not have to
+        loc_timeline_mgr = LocTimelineMgr(db_path=self.db_path)
+        for s in self.service_list:
+            service = ServiceConn(path_to_db=self.db_path).get_service(name=s.get('name'))
+            for rep in s.get('repositories'):
+                self.assertTrue(loc_timeline_mgr.is_current(service_id=service.service_id,
+                                                            repository_id=self.get_repository(rep.get('name'))
+                                                            .repository_id))
+
+    def test_failing_repository(self):
+        GHEHandler.failing_repo = 'repo-1-1'
+        progress = self.make_orchestrator(max_requests_per_host=4).run(service_list=self.service_list)
+        self.assertEqual(progress.num_done, 5)
+        self.assertEqual(progress.num_failed, 1)
+        self.assertEqual(list(progress.failures.keys()), ['https://github.com/owner/repo-1-1'])
+        # the other repositories are done, so the next run skips them
+        checkpoint_conn = MiningCheckpointConn(path_to_db=self.db_path)
+        checkpoint = checkpoint_conn.get_checkpoint(repository_id=self.get_repository('repo-0-0').repository_id,
+                                                    phase=GHEExtractor.COMMITS_PHASE)
+        self.assertEqual(checkpoint.get('status'), MiningCheckpointConn.DONE)
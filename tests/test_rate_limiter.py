@@ -0,0 +1,61 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.mining.rate_limiter import RateLimiter
+import time
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, headers, text=''):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+        self.url = 'https://api.github.com/repos/owner/repo/commits'
+
+
+class TestRateLimiter(TestCase):
+
+    def test_acquire_paces_requests(self):
+        rate_limiter = RateLimiter(requests_per_second=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            rate_limiter.acquire()
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 4 / 20 * 0.9)
+        self.assertGreater(rate_limiter.throttled_time, 0)
+
+    def test_update_reads_budget(self):
+        rate_limiter = RateLimiter()
+        reset_at = int(time.time()) + 3600
+        headers = {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': str(reset_at)}
+        throttled = rate_limiter.update(FakeResponse(status_code=200, headers=headers))
+        self.assertFalse(throttled)
+        self.assertEqual(rate_limiter.limit, 5000)
+        self.assertEqual(rate_limiter.remaining, 4999)
+        self.assertEqual(rate_limiter.reset_at, reset_at)
+
+    def test_update_retry_after(self):
+        rate_limiter = RateLimiter()
+        resp = FakeResponse(status_code=403, headers={'Retry-After': '1'},
+                            text='You have exceeded a secondary rate limit')
+        self.assertTrue(rate_limiter.update(resp))
+        self.assertEqual(rate_limiter.num_throttled_responses, 1)
+        start = time.monotonic()
+        rate_limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.9)
+
+    def test_update_exhausted_budget(self):
+        rate_limiter = RateLimiter()
+        headers = {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()))}
+        self.assertTrue(rate_limiter.update(FakeResponse(status_code=403, headers=headers)))
+        self.assertEqual(rate_limiter.remaining, 0)
+
+    def test_update_forbidden(self):
+        rate_limiter = RateLimiter()
+        resp = FakeResponse(status_code=403, headers={}, text='Resource not accessible by integration')
+        self.assertFalse(rate_limiter.update(resp))
+        self.assertEqual(rate_limiter.num_throttled_responses, 0)
@@ -0,0 +1,100 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from microservices_miner.mining.ghe_client import GHEClient
+from microservices_miner.mining.response_cache import ResponseCache
+import tempfile
+import threading
+import json
+import os
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+
+    etag = '"v1"'
+    num_full_responses = 0
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == ETagHandler.etag:
+            self.send_response(304)
+            self.send_header('ETag', ETagHandler.etag)
+            self.end_headers()
+            return
+        ETagHandler.num_full_responses += 1
+        body = json.dumps([{'sha': 'abc', 'path': self.path}]).encode()
+        self.send_response(200)
+        self.send_header('ETag', ETagHandler.etag)
+        self.send_header('Link', '<http://127.0.0.1/next?page=2>; rel="next"')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self) -> None:
+        ETagHandler.num_full_responses = 0
+        ETagHandler.etag = '"v1"'
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ETagHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.base_url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(path=os.path.join(self.temp_dir.name, 'cache.db'))
+        self.client = GHEClient(api_token='secret', cache=self.cache)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.cache.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.temp_dir.cleanup()
+
+    def test_not_modified_is_served_from_cache(self):
+        url = '{}/repos/owner/repo/issues'.format(self.base_url)
+        params = {'state': 'all', 'filter': 'all'}
+        first = self.client.get(url=url, params=params)
+        second = self.client.get(url=url, params=params)
+        self.assertEqual(ETagHandler.num_full_responses, 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertIn('next', second.links.keys())
+
+    def test_modified_resource_is_downloaded(self):
+        url = '{}/users/tester'.format(self.base_url)
+        self.client.get(url=url)
+        ETagHandler.etag = '"v2"'
+        self.client.get(url=url)
+        self.assertEqual(ETagHandler.num_full_responses, 2)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_cache_persists(self):
+        url = '{}/users/tester'.format(self.base_url)
+        self.client.get(url=url)
+        other_cache = ResponseCache(path=self.cache.path)
+        self.assertIsNotNone(other_cache.get(ResponseCache.make_key(url)))
+        self.assertEqual(other_cache.size, self.cache.size)
+        other_cache.close()
+
+    def test_lru_eviction(self):
+        self.client.get(url='{}/a'.format(self.base_url))
+        entry_size = self.cache.size
+        self.cache.max_size = 2 * entry_size
+        self.client.get(url='{}/b'.format(self.base_url))
+        # a is now the most recently used entry
+        self.client.get(url='{}/a'.format(self.base_url))
+        self.client.get(url='{}/c'.format(self.base_url))
+        self.assertLessEqual(self.cache.size, self.cache.max_size)
+        self.assertIsNotNone(self.cache.get(ResponseCache.make_key('{}/a'.format(self.base_url))))
+        self.assertIsNone(self.cache.get(ResponseCache.make_key('{}/b'.format(self.base_url))))
+        self.assertIsNotNone(self.cache.get(ResponseCache.make_key('{}/c'.format(self.base_url))))
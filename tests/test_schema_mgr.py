@@ -0,0 +1,85 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.control.schema_mgr import SchemaMgr
+from microservices_miner.control.database_conn import ConnectionPool, RepositoryCommitConn, LocTimelineConn, \
+    EXTENSION_SQL
+import sqlite3
+import tempfile
+import shutil
+import os
+
+
+class TestSchemaMgr(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'fresh.db')
+
+    def tearDown(self) -> None:
+        for name in os.listdir(self.temp_dir.name):
+            ConnectionPool.get_pool(os.path.join(self.temp_dir.name, name)).close()
+        self.temp_dir.cleanup()
+
+    def test_migrate_fresh_database(self):
+        schema_mgr = SchemaMgr(path_to_db=self.db_path)
+        self.assertEqual(schema_mgr.get_version(), 0)
+        self.assertEqual(schema_mgr.migrate(), SchemaMgr.get_latest_version())
+        self.assertEqual(schema_mgr.get_version(), SchemaMgr.get_latest_version())
+        tables = {row[0] for row in schema_mgr.conn.execute('select name from sqlite_master where type == "table";')}
+        for table in ('repository', 'user', 'issue', 'label', 'assignee', 'issueassignee', 'issuelabel', 'service',
+                      'filemodification', 'servicerepository', 'repocommit', 'parentcommit_repocommit',
+                      'parentcommit', 'extensions', 'service_extensions', 'filename_pattern', 'miningcheckpoint',
+                      'loctimelinepair', 'loctimeline'):
+            self.assertIn(table, tables)
+        # the filename filter of a timeline is stored as rules, not as SQL
+        columns = [row[1] for row in schema_mgr.conn.execute('PRAGMA table_info(loctimelinepair);')]
+        self.assertEqual(columns, list(LocTimelineConn.PAIR_COLUMNS))
+        # migrating again does nothing
+        self.assertEqual(schema_mgr.migrate(), SchemaMgr.get_latest_version())
+        # the Conn classes work on the new database
+        self.assertEqual(RepositoryCommitConn(path_to_db=self.db_path).get_commits_by_repo(repository_id=1), [])
+
+    def test_migrate_existing_database(self):
+        db_path = os.path.join(self.temp_dir.name, 'existing.db')
+        shutil.copy(os.getenv('DB_PATH'), db_path)
+        conn = sqlite3.connect(db_path)
+        num_commits = conn.execute('select count(*) from repocommit;').fetchone()[0]
+        conn.close()
+        schema_mgr = SchemaMgr(path_to_db=db_path)
+        self.assertEqual(schema_mgr.migrate(), SchemaMgr.get_latest_version())
+        self.assertEqual(schema_mgr.conn.execute('select count(*) from repocommit;').fetchone()[0], num_commits)
+
+    def test_query_plans(self):
+        schema_mgr = SchemaMgr(path_to_db=self.db_path)
+        schema_mgr.migrate()
+        hot_queries = [
+            ('select date, sha, repocommit.ID, comment from repocommit where repository_id == ?;', (1,),
+             'repocommit_repository_id_date'),
+            ('select date, sha, repocommit.ID, comment from repocommit where repository_id == ? and '
+             'date between date(?) and date(?);', (1, '2019-01-01', '2019-12-31'), 'repocommit_repository_id_date'),
+            ('select date, sha, user_id, id, comment from repocommit where sha == ?;', ('abc',),
+             'sqlite_autoindex_repocommit'),
+            ('select filename, changes, additions, deletions, status from filemodification where commit_id == ?;',
+             (1,), 'filemodification_commit_id'),
+            ('select name, email, ID, login from user where login == ?;', ('tester',), 'user_login'),
+            ('select name, email, ID, login from user where email == ?;', ('tester@ibm.com',), 'user_email'),
+            ('select ID from user where name == ? and email == ?;', ('tester', 'tester@ibm.com'), 'user_name_email'),
+            ('select pattern from filename_pattern where service_id == ? and repository_id == ? and type == ?;',
+             (1, 1, 'inclusion'), 'filename_pattern_service_id_repository_id_type'),
+            ('select id from parentcommit where sha == ? and position == ?;', ('abc', 0), 'parentcommit_sha_position'),
+            ('select sha from parentcommit join parentcommit_repocommit on parentcommit.ID == '
+             'parentcommit_repocommit.parentcommit_id where parentcommit_repocommit.repocommit_id == ? '
+             'and parentcommit.position = 0;', (1,), 'parentcommit_repocommit_repocommit_id'),
+            ('select id, name, start_date, end_date from service where name == ?;', ('service',), 'service_name'),
+            ('select filename from filemodification fm where fm.commit_id == ? and {} in (?, ?);'
+             .format(EXTENSION_SQL.format('fm.filename')), (1, 'py', 'js'), 'filemodification_commit_id_extension'),
+        ]
+        for sql, params, index in hot_queries:
+            plan = ' '.join(schema_mgr.get_query_plan(sql, params))
+            self.assertIn(index, plan, msg=sql)
+            self.assertNotRegex(plan, r'SCAN (repocommit|filemodification|user|filename_pattern|parentcommit)\b',
+                                msg=sql)
@@ -0,0 +1,64 @@
+# (C) Copyright IBM Corporation 2017, 2018, 2019
+# U.S. Government Users Restricted Rights:  Use, duplication or disclosure restricted
+# by GSA ADP Schedule Contract with IBM Corp.
+#
+# Author: Leonardo P. Tizzei <ltizzei@br.ibm.com>
+from unittest import TestCase
+from microservices_miner.control.user_mgr import UserMgr
+from microservices_miner.control.database_conn import UserConn, ConnectionPool
+from microservices_miner.model.user import User
+import tempfile
+import sqlite3
+import os
+
+
+class TestUserMgr(TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'test.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('create table user(ID INTEGER PRIMARY KEY AUTOINCREMENT, name string, email string, login string)')
+        conn.executemany('insert into user(name, email, login) values (?, ?, ?);',
+                         [('Ann', 'ann@ibm.com', 'ann'), ('Bob', 'bob@ibm.com', 'bob'),
+                          ('Ann', 'ann.other@ibm.com', 'ann-other')])
+        conn.commit()
+        conn.close()
+        self.user_mgr = UserMgr(path_to_db=self.db_path)
+
+    def tearDown(self) -> None:
+        ConnectionPool.get_pool(self.db_path).close()
+        self.temp_dir.cleanup()
+
+    def test_cache_gives_same_users_as_database(self):
+        lookups = [('ann', None, None), ('ann-other', None, None), (None, 'Ann', None), ('carl', 'Bob', None),
+                   ('carl', None, 'ann.other@ibm.com'), ('carl', 'Carl', 'carl@ibm.com'), (None, None, None)]
+        expected = [self.user_mgr.get_user_from_database(login=login, name=name, email=email)
+                    for login, name, email in lookups]
+        self.assertEqual(self.user_mgr.warm_cache(), 3)
+        actual = [self.user_mgr.get_user_from_database(login=login, name=name, email=email)
+                  for login, name, email in lookups]
+        self.assertEqual([u.user_id if u is not None else None for u in actual],
+                         [u.user_id if u is not None else None for u in expected])
+        self.assertEqual(self.user_mgr.num_cache_hits, 3)
+        self.assertEqual(self.user_mgr.num_cache_misses, 4)
+
+    def test_cache_misses_query_database(self):
+        self.user_mgr.warm_cache()
+        # inserted by someone else after the cache was warmed
+        user_id = UserConn(path_to_db=self.db_path).insert_user(User(name='Carl', email='carl@ibm.com', login='carl'))
+        self.assertEqual(self.user_mgr.get_user_from_database(login=None, email='carl@ibm.com').user_id, user_id)
+        self.assertEqual(self.user_mgr.get_user_from_database(login='carl').user_id, user_id)
+        self.assertEqual(self.user_mgr.num_cache_misses, 1)
+
+        dan = User(name='Dan', email='dan@ibm.com', login='dan')
+        self.user_mgr.insert_user(dan)
+        self.assertIs(self.user_mgr.get_user_from_database(login='dan'), dan)
+        self.assertEqual(self.user_mgr.num_cache_misses, 1)
+
+    def test_login_inserted_by_others(self):
+        self.user_mgr.warm_cache()
+        # e.g. by the extractor of another thread, whose user has the same name as a cached one
+        user_id = UserConn(path_to_db=self.db_path).insert_user(User(name='Bob', email='bob2@ibm.com', login='bob2'))
+        self.assertEqual(self.user_mgr.get_user_from_database(login='bob2', name='Bob').user_id, user_id)
+        self.assertEqual(self.user_mgr.get_user_from_database(login=None, name='Bob').login, 'bob')